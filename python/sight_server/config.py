@@ -47,6 +47,148 @@ class Settings(BaseSettings):
         description="LLM温度参数，控制随机性"
     )
 
+    LLM_PROFILES: str = Field(
+        default="",
+        description='命名的LLM配置（JSON），如 {"fast": {"model": "deepseek-chat", "temperature": 0, "max_tokens": 512, '
+                    '"timeout": 15, "prompt_price": 1.0, "completion_price": 2.0}}，未给出的字段沿用 LLM_MODEL/LLM_TEMPERATURE，'
+                    '单价为每百万 token'
+    )
+
+    LLM_PROFILE_BINDINGS: str = Field(
+        default="",
+        description="组件绑定的LLM配置，如 intent=fast,validation=fast,summarization=fast,sql=default"
+                    "（组件: intent/sql/validation/answer/analysis/summarization，未绑定的使用 default）"
+    )
+
+    LLM_CACHE_ENABLED: bool = Field(
+        default=True,
+        description="是否启用LLM响应缓存（完整 prompt 相同时复用上次响应）"
+    )
+
+    LLM_CACHE_DIR: str = Field(
+        default="./cache/llm",
+        description="LLM响应缓存的磁盘目录，留空只使用内存层"
+    )
+
+    LLM_CACHE_MAX_ENTRIES: int = Field(
+        default=1000,
+        ge=1,
+        description="LLM响应缓存内存层最大条目数"
+    )
+
+    LLM_CACHE_DEFAULT_TTL: int = Field(
+        default=3600,
+        ge=0,
+        description="未单独配置的调用点的LLM响应缓存TTL（秒）"
+    )
+
+    LLM_CACHE_CALL_SITE_TTLS: str = Field(
+        default="",
+        description="按调用点覆盖TTL，如 intent=86400,sql_generation=3600,sql_fix=3600,validation=600（0 表示不缓存）"
+    )
+
+    LLM_CACHE_MAX_TEMPERATURE: float = Field(
+        default=0.5,
+        ge=0.0,
+        le=2.0,
+        description="允许缓存的最高温度，高于此温度的调用默认不缓存"
+    )
+
+    LLM_CACHE_HIGH_TEMPERATURE: bool = Field(
+        default=False,
+        description="温度高于 LLM_CACHE_MAX_TEMPERATURE 时是否仍缓存响应（需显式开启）"
+    )
+
+    LLM_GATEWAY_ENABLED: bool = Field(
+        default=True,
+        description="是否通过异步连接池网关发送LLM请求（并发限制、退避重试、对冲请求）"
+    )
+
+    LLM_MAX_CONCURRENCY: int = Field(
+        default=8,
+        ge=1,
+        le=256,
+        description="全局最大在途LLM请求数（含重试与对冲请求）"
+    )
+
+    LLM_POOL_MAX_CONNECTIONS: int = Field(
+        default=20,
+        ge=1,
+        le=512,
+        description="LLM HTTP连接池最大连接数"
+    )
+
+    LLM_REQUEST_TIMEOUT: float = Field(
+        default=60.0,
+        gt=0,
+        description="单次LLM请求超时时间（秒）"
+    )
+
+    LLM_MAX_RETRIES: int = Field(
+        default=4,
+        ge=0,
+        le=10,
+        description="429/5xx/网络错误的最大重试次数"
+    )
+
+    LLM_RETRY_BACKOFF_BASE: float = Field(
+        default=0.5,
+        gt=0,
+        description="重试退避基数（秒），第 n 次重试在 [0, base * 2^n] 内随机等待"
+    )
+
+    LLM_RETRY_BACKOFF_MAX: float = Field(
+        default=20.0,
+        gt=0,
+        description="单次重试退避上限（秒）"
+    )
+
+    LLM_HEDGE_ENABLED: bool = Field(
+        default=False,
+        description="是否启用对冲请求（请求超过 p95 延迟仍未返回时再发一个，取先返回者）"
+    )
+
+    LLM_HEDGE_DELAY: float = Field(
+        default=0.0,
+        ge=0,
+        description="固定对冲延迟（秒），0 表示使用各调用点观测到的 p95 延迟"
+    )
+
+    LLM_HEDGE_MIN_SAMPLES: int = Field(
+        default=20,
+        ge=1,
+        description="使用 p95 对冲前每个调用点至少需要的延迟样本数"
+    )
+
+    CHAT_HISTORY_MAX_SESSIONS: int = Field(
+        default=1000,
+        ge=0,
+        description="内存中最多保留的会话历史数（LRU淘汰），0 表示不限制"
+    )
+
+    CHAT_HISTORY_IDLE_TTL: int = Field(
+        default=3600,
+        ge=0,
+        description="会话历史空闲过期时间（秒），0 表示不过期"
+    )
+
+    CHAT_HISTORY_MAX_MESSAGES: int = Field(
+        default=20,
+        ge=0,
+        description="每个会话发送给LLM的最大历史消息数（滑动窗口），0 表示不限制"
+    )
+
+    CHAT_HISTORY_MAX_TOKENS: int = Field(
+        default=0,
+        ge=0,
+        description="每个会话历史的估算token上限，0 表示不限制"
+    )
+
+    CHAT_HISTORY_PERSIST: bool = Field(
+        default=False,
+        description="是否将被淘汰的会话历史持久化到PostgreSQL（DATABASE_URL），再次访问时恢复"
+    )
+
     # ==================== 服务器配置 ====================
     SERVER_HOST: str = Field(default="0.0.0.0", description="服务器监听地址")
     SERVER_PORT: int = Field(default=8001, ge=1024, le=65535, description="服务器监听端口")
@@ -69,6 +211,14 @@ class Settings(BaseSettings):
         description="日志时间格式"
     )
 
+    # ✅ 查询链路追踪：节点 / LLM / 数据库调用的计时 span，GET /debug/trace/{query_id} 查看
+    TRACE_ENABLED: bool = Field(default=True, description="是否记录查询链路追踪")
+    TRACE_MAX_TRACES: int = Field(default=200, ge=1, description="环形缓冲区中保留的最近查询追踪数")
+    TRACE_EXPORT_DIR: str = Field(
+        default="./logs/traces",
+        description="OpenTelemetry JSON 格式追踪的导出目录"
+    )
+
     # ==================== Agent配置 ====================
     AGENT_MAX_ITERATIONS: int = Field(
         default=75,
@@ -81,7 +231,7 @@ class Settings(BaseSettings):
         default=450,
         ge=10,
         le=600,
-        description="Agent最大执行时间（秒）"
+        description="Agent最大执行时间（秒），从请求到达开始计时；超时后LLM/数据库调用不再发起，返回已获取的部分结果（status=deadline_exceeded）"
     )
 
     # ✅ 新增：结果验证配置
@@ -108,6 +258,108 @@ class Settings(BaseSettings):
         description="分析详细程度: simple/detailed/comprehensive"
     )
 
+    # ✅ 并行执行互不依赖的前置节点（schema获取 / 对话总结 / 意图分析）
+    GRAPH_PARALLEL_PREPARE_ENABLED: bool = Field(
+        default=True,
+        description="是否在组合节点内并行执行schema获取、对话总结和意图分析"
+    )
+
+    # ✅ 验证与回答融合：一次LLM调用返回验证结论和最终回答
+    GRAPH_FUSED_VALIDATE_ANSWER_ENABLED: bool = Field(
+        default=False,
+        description="是否用 validate_and_answer 融合节点替代结果验证 + 答案生成（+ 最终验证）的多次LLM调用"
+    )
+
+    # ✅ 分级意图识别：关键词规则优先，置信度不足时才调用LLM
+    INTENT_RULE_FIRST_ENABLED: bool = Field(
+        default=True,
+        description="是否先用关键词规则识别意图（关闭后每次都调用LLM）"
+    )
+
+    INTENT_RULE_CONFIDENCE_THRESHOLD: float = Field(
+        default=0.6,
+        ge=0.0,
+        le=1.0,
+        description="关键词意图置信度达到该值时跳过LLM（可用 python -m core.processors.intent_engine 离线评估）"
+    )
+
+    INTENT_RULE_MIN_QUERY_CHARS: int = Field(
+        default=6,
+        ge=0,
+        description="关键词意图结果可直接采用的最短查询长度，更短的查询交给LLM判断是否明确"
+    )
+
+    INTENT_SQL_FUSED_ENABLED: bool = Field(
+        default=False,
+        description="意图 + SQL 融合模式：关键词置信度不足时不单独调用意图LLM，由一次SQL生成调用同时返回意图和SQL"
+    )
+
+    # ✅ 按查询裁剪schema：SQL生成/修复prompt只携带相关的表和字段
+    SCHEMA_PRUNING_ENABLED: bool = Field(
+        default=True,
+        description="是否按查询裁剪SQL生成/修复prompt中的schema（关闭后始终使用完整schema）"
+    )
+
+    SCHEMA_PRUNING_TOKEN_BUDGET: int = Field(
+        default=800,
+        ge=50,
+        description="精简schema的token预算（估算值，可用 python -m core.schema_selector 查看裁剪效果）"
+    )
+
+    SCHEMA_PRUNING_CORE_TABLES: str = Field(
+        default="a_sight,tourist_spot",
+        description="始终保留的核心表（逗号分隔）"
+    )
+
+    SCHEMA_PRUNING_USE_EMBEDDINGS: bool = Field(
+        default=False,
+        description="是否使用查询缓存的向量模型计算查询与字段的语义相似度（需要语义缓存已启用）"
+    )
+
+    QUERY_LLM_TOKEN_BUDGET: int = Field(
+        default=0,
+        ge=0,
+        description="每个查询的LLM token预算（prompt+completion），用完后跳过结果验证、深度分析等可选LLM节点，0 表示不限制"
+    )
+
+    QUERY_LLM_TIME_BUDGET_MS: float = Field(
+        default=0,
+        ge=0,
+        description="每个查询的LLM累计耗时预算（毫秒），0 表示不限制"
+    )
+
+    # ✅ 模板回答：空结果、聚合统计和少量列表不调用LLM生成答案
+    ANSWER_TEMPLATE_ENABLED: bool = Field(
+        default=True,
+        description="是否对简单结果使用模板回答（分析类问题或客户端要求洞察时仍调用LLM）"
+    )
+
+    ANSWER_TEMPLATE_MAX_LIST_ITEMS: int = Field(
+        default=10,
+        ge=0,
+        description="结果数不超过该值的明细查询使用模板回答"
+    )
+
+    # ✅ 启发式结果验证：分数落在不确定区间时才调用验证LLM
+    VALIDATION_HEURISTIC_ENABLED: bool = Field(
+        default=True,
+        description="是否先用确定性规则验证查询结果（关闭后每次都调用验证LLM）"
+    )
+
+    VALIDATION_HEURISTIC_PASS_SCORE: float = Field(
+        default=0.8,
+        ge=0.0,
+        le=1.01,
+        description="启发式分数不低于该值直接通过（可用 python -m core.processors.heuristic_validator 离线评估）"
+    )
+
+    VALIDATION_HEURISTIC_FAIL_SCORE: float = Field(
+        default=0.3,
+        ge=0.0,
+        le=1.0,
+        description="启发式分数低于该值直接判定失败并重新生成SQL"
+    )
+
     # ==================== 缓存配置 ==================== (✅ 新增)
     ENABLE_CACHE: bool = Field(
         default=True,
@@ -133,6 +385,109 @@ class Settings(BaseSettings):
         description="最大缓存条目数"
     )
 
+    CACHE_MAX_BYTES: int = Field(
+        default=256 * 1024 * 1024,
+        ge=0,
+        description="文件缓存最大编码字节数，0表示只按条目数限制"
+    )
+
+    CACHE_COMPRESSION: str = Field(
+        default="auto",
+        description="缓存压缩算法: auto/zstd/gzip/none（auto 优先使用 zstd）"
+    )
+
+    CACHE_COMPRESS_THRESHOLD: int = Field(
+        default=1024,
+        ge=0,
+        description="缓存结果序列化后超过该字节数才压缩"
+    )
+
+    CACHE_STALE_WHILE_REVALIDATE: int = Field(
+        default=3600,
+        ge=0,
+        description="缓存过期后仍返回旧结果并后台重放SQL刷新的时间窗口（秒），0表示关闭"
+    )
+
+    CACHE_INVALIDATION_MODE: str = Field(
+        default="poll",
+        description="缓存失效信号源: notify（触发器 + LISTEN/NOTIFY）/poll（轮询 pg_stat_user_tables）/off"
+    )
+
+    CACHE_INVALIDATION_POLL_INTERVAL: float = Field(
+        default=10.0,
+        gt=0,
+        description="数据表变更轮询间隔（秒）"
+    )
+
+    SQL_RESULT_CACHE_ENABLED: bool = Field(
+        default=True,
+        description="是否启用SQL指纹结果缓存（相同SQL复用执行结果）"
+    )
+
+    SQL_RESULT_CACHE_TTL: int = Field(
+        default=600,
+        ge=0,
+        description="SQL指纹结果缓存生存时间（秒）"
+    )
+
+    SQL_RESULT_CACHE_MAX_ENTRIES: int = Field(
+        default=500,
+        ge=1,
+        description="SQL指纹结果缓存最大条目数"
+    )
+
+    NEGATIVE_CACHE_ENABLED: bool = Field(
+        default=True,
+        description="是否缓存无数据/重试耗尽后失败的查询结果（客户端可用 force_refresh 跳过）"
+    )
+
+    NEGATIVE_CACHE_NO_DATA_TTL: int = Field(
+        default=300,
+        ge=0,
+        description="无数据结果的缓存时间（秒）"
+    )
+
+    NEGATIVE_CACHE_FAILURE_TTL: int = Field(
+        default=120,
+        ge=0,
+        description="失败结果的缓存时间（秒）"
+    )
+
+    CACHE_WARMUP_ENABLED: bool = Field(
+        default=True,
+        description="启动时是否根据历史查询预热缓存（完成后服务才就绪）"
+    )
+
+    CACHE_WARMUP_LIMIT: int = Field(
+        default=50,
+        ge=0,
+        description="预热的热门查询数量"
+    )
+
+    CACHE_WARMUP_LOOKBACK_DAYS: int = Field(
+        default=30,
+        ge=1,
+        description="统计热门查询时回溯的会话历史天数"
+    )
+
+    CACHE_WARMUP_TIME_BUDGET: float = Field(
+        default=60.0,
+        gt=0,
+        description="启动预热的时间预算（秒），超出后剩余查询跳过"
+    )
+
+    CACHE_PIN_TOP_N: int = Field(
+        default=10,
+        ge=0,
+        description="预热后固定（不淘汰、不过期）的热门条目数量"
+    )
+
+    CACHE_PINNED_REFRESH_INTERVAL: float = Field(
+        default=1800.0,
+        gt=0,
+        description="固定条目的后台刷新间隔（秒）"
+    )
+
     CACHE_SEMANTIC_SEARCH: bool = Field(
         default=True,
         description="是否启用语义相似度缓存搜索"
@@ -150,6 +505,27 @@ class Settings(BaseSettings):
         description="Embedding模型名称（用于语义搜索）"
     )
 
+    CACHE_EMBEDDING_QUANTIZATION: str = Field(
+        default="none",
+        description="Embedding推理量化模式: none/float16/int8（int8 为 CPU 动态量化）"
+    )
+
+    CACHE_EMBEDDING_BATCH_SIZE: int = Field(
+        default=32,
+        ge=1,
+        description="Embedding批量编码大小"
+    )
+
+    CACHE_KEY_NORMALIZATION_STEPS: str = Field(
+        default="width,simplify,punctuation,numerals,levels,synonyms,particles",
+        description="缓存键规范化步骤（逗号分隔，按顺序执行）: width/simplify/punctuation/numerals/levels/synonyms/particles，留空只做大小写/空白规范化"
+    )
+
+    CACHE_KEY_SYNONYMS_FILE: Optional[str] = Field(
+        default=None,
+        description="额外的同义词表 JSON 文件（{\"别称\": \"规范名\"}），与内置地名表合并"
+    )
+
     # ==================== Schema缓存 ====================
     SCHEMA_CACHE_ENABLED: bool = Field(
         default=True,
@@ -256,7 +632,28 @@ class Settings(BaseSettings):
             "api_key": self.DEEPSEEK_API_KEY,
             "api_base": self.DEEPSEEK_API_BASE,
             "model": self.LLM_MODEL,
-            "temperature": self.LLM_TEMPERATURE
+            "temperature": self.LLM_TEMPERATURE,
+            "profiles": self.LLM_PROFILES,
+            "profile_bindings": self.LLM_PROFILE_BINDINGS,
+            "cache_enabled": self.LLM_CACHE_ENABLED,
+            "cache_dir": self.LLM_CACHE_DIR,
+            "cache_max_temperature": self.LLM_CACHE_MAX_TEMPERATURE,
+            "cache_high_temperature": self.LLM_CACHE_HIGH_TEMPERATURE,
+            "gateway_enabled": self.LLM_GATEWAY_ENABLED,
+            "max_concurrency": self.LLM_MAX_CONCURRENCY,
+            "pool_max_connections": self.LLM_POOL_MAX_CONNECTIONS,
+            "request_timeout": self.LLM_REQUEST_TIMEOUT,
+            "max_retries": self.LLM_MAX_RETRIES,
+            "retry_backoff_base": self.LLM_RETRY_BACKOFF_BASE,
+            "retry_backoff_max": self.LLM_RETRY_BACKOFF_MAX,
+            "hedge_enabled": self.LLM_HEDGE_ENABLED,
+            "hedge_delay": self.LLM_HEDGE_DELAY,
+            "hedge_min_samples": self.LLM_HEDGE_MIN_SAMPLES,
+            "chat_history_max_sessions": self.CHAT_HISTORY_MAX_SESSIONS,
+            "chat_history_idle_ttl": self.CHAT_HISTORY_IDLE_TTL,
+            "chat_history_max_messages": self.CHAT_HISTORY_MAX_MESSAGES,
+            "chat_history_max_tokens": self.CHAT_HISTORY_MAX_TOKENS,
+            "chat_history_persist": self.CHAT_HISTORY_PERSIST
         }
 
     def get_agent_config(self) -> dict:
@@ -268,7 +665,24 @@ class Settings(BaseSettings):
             "enable_result_validation": self.ENABLE_RESULT_VALIDATION,
             "max_validation_retries": self.MAX_VALIDATION_RETRIES,
             "enable_answer_analysis": self.ENABLE_ANSWER_ANALYSIS,
-            "analysis_detail_level": self.ANALYSIS_DETAIL_LEVEL
+            "analysis_detail_level": self.ANALYSIS_DETAIL_LEVEL,
+            "graph_parallel_prepare_enabled": self.GRAPH_PARALLEL_PREPARE_ENABLED,
+            "graph_fused_validate_answer_enabled": self.GRAPH_FUSED_VALIDATE_ANSWER_ENABLED,
+            "intent_rule_first_enabled": self.INTENT_RULE_FIRST_ENABLED,
+            "intent_rule_confidence_threshold": self.INTENT_RULE_CONFIDENCE_THRESHOLD,
+            "intent_rule_min_query_chars": self.INTENT_RULE_MIN_QUERY_CHARS,
+            "intent_sql_fused_enabled": self.INTENT_SQL_FUSED_ENABLED,
+            "schema_pruning_enabled": self.SCHEMA_PRUNING_ENABLED,
+            "schema_pruning_token_budget": self.SCHEMA_PRUNING_TOKEN_BUDGET,
+            "schema_pruning_core_tables": self.SCHEMA_PRUNING_CORE_TABLES,
+            "schema_pruning_use_embeddings": self.SCHEMA_PRUNING_USE_EMBEDDINGS,
+            "query_llm_token_budget": self.QUERY_LLM_TOKEN_BUDGET,
+            "query_llm_time_budget_ms": self.QUERY_LLM_TIME_BUDGET_MS,
+            "answer_template_enabled": self.ANSWER_TEMPLATE_ENABLED,
+            "answer_template_max_list_items": self.ANSWER_TEMPLATE_MAX_LIST_ITEMS,
+            "validation_heuristic_enabled": self.VALIDATION_HEURISTIC_ENABLED,
+            "validation_heuristic_pass_score": self.VALIDATION_HEURISTIC_PASS_SCORE,
+            "validation_heuristic_fail_score": self.VALIDATION_HEURISTIC_FAIL_SCORE
         }
 
     def get_cache_config(self) -> dict:
@@ -278,9 +692,31 @@ class Settings(BaseSettings):
             "cache_dir": self.CACHE_DIR,
             "ttl": self.CACHE_TTL,
             "max_size": self.CACHE_MAX_SIZE,
+            "max_bytes": self.CACHE_MAX_BYTES,
+            "compression": self.CACHE_COMPRESSION,
+            "compress_threshold": self.CACHE_COMPRESS_THRESHOLD,
+            "stale_while_revalidate": self.CACHE_STALE_WHILE_REVALIDATE,
+            "invalidation_mode": self.CACHE_INVALIDATION_MODE,
+            "invalidation_poll_interval": self.CACHE_INVALIDATION_POLL_INTERVAL,
+            "sql_result_cache_enabled": self.SQL_RESULT_CACHE_ENABLED,
+            "sql_result_cache_ttl": self.SQL_RESULT_CACHE_TTL,
+            "sql_result_cache_max_entries": self.SQL_RESULT_CACHE_MAX_ENTRIES,
+            "negative_cache_enabled": self.NEGATIVE_CACHE_ENABLED,
+            "negative_cache_no_data_ttl": self.NEGATIVE_CACHE_NO_DATA_TTL,
+            "negative_cache_failure_ttl": self.NEGATIVE_CACHE_FAILURE_TTL,
+            "warmup_enabled": self.CACHE_WARMUP_ENABLED,
+            "warmup_limit": self.CACHE_WARMUP_LIMIT,
+            "warmup_lookback_days": self.CACHE_WARMUP_LOOKBACK_DAYS,
+            "warmup_time_budget": self.CACHE_WARMUP_TIME_BUDGET,
+            "pin_top_n": self.CACHE_PIN_TOP_N,
+            "pinned_refresh_interval": self.CACHE_PINNED_REFRESH_INTERVAL,
             "enable_semantic_search": self.CACHE_SEMANTIC_SEARCH,
             "similarity_threshold": self.CACHE_SIMILARITY_THRESHOLD,
-            "embedding_model": self.CACHE_EMBEDDING_MODEL
+            "embedding_model": self.CACHE_EMBEDDING_MODEL,
+            "embedding_quantization": self.CACHE_EMBEDDING_QUANTIZATION,
+            "embedding_batch_size": self.CACHE_EMBEDDING_BATCH_SIZE,
+            "key_normalization_steps": self.CACHE_KEY_NORMALIZATION_STEPS,
+            "key_synonyms_file": self.CACHE_KEY_SYNONYMS_FILE
         }
 
     def get_cors_config(self) -> dict:
@@ -329,6 +765,15 @@ def print_config_info():
     print(f"  DEEPSEEK_API_KEY: {masked_key}")
     print(f"  LLM_MODEL: {settings.LLM_MODEL}")
     print(f"  LLM_TEMPERATURE: {settings.LLM_TEMPERATURE}")
+    print(f"  LLM_PROFILE_BINDINGS: {settings.LLM_PROFILE_BINDINGS or '(default)'}")
+    print(f"  LLM_CACHE_ENABLED: {settings.LLM_CACHE_ENABLED}")
+    print(f"  LLM_GATEWAY_ENABLED: {settings.LLM_GATEWAY_ENABLED}")
+    print(f"  LLM_MAX_CONCURRENCY: {settings.LLM_MAX_CONCURRENCY}")
+    print(f"  LLM_MAX_RETRIES: {settings.LLM_MAX_RETRIES}")
+    print(f"  LLM_HEDGE_ENABLED: {settings.LLM_HEDGE_ENABLED}")
+    print(f"  CHAT_HISTORY_MAX_SESSIONS: {settings.CHAT_HISTORY_MAX_SESSIONS}")
+    print(f"  CHAT_HISTORY_MAX_MESSAGES: {settings.CHAT_HISTORY_MAX_MESSAGES}")
+    print(f"  CHAT_HISTORY_PERSIST: {settings.CHAT_HISTORY_PERSIST}")
 
     print(f"\n[服务器配置]")
     print(f"  SERVER_HOST: {settings.SERVER_HOST}")
@@ -337,6 +782,9 @@ def print_config_info():
 
     print(f"\n[日志配置]")
     print(f"  LOG_LEVEL: {settings.LOG_LEVEL}")
+    print(f"  TRACE_ENABLED: {settings.TRACE_ENABLED}")
+    print(f"  TRACE_MAX_TRACES: {settings.TRACE_MAX_TRACES}")
+    print(f"  TRACE_EXPORT_DIR: {settings.TRACE_EXPORT_DIR}")
 
     print(f"\n[Agent配置]")
     print(f"  AGENT_MAX_ITERATIONS: {settings.AGENT_MAX_ITERATIONS}")
@@ -345,15 +793,31 @@ def print_config_info():
     print(f"  MAX_VALIDATION_RETRIES: {settings.MAX_VALIDATION_RETRIES}")
     print(f"  ENABLE_ANSWER_ANALYSIS: {settings.ENABLE_ANSWER_ANALYSIS}")
     print(f"  ANALYSIS_DETAIL_LEVEL: {settings.ANALYSIS_DETAIL_LEVEL}")
+    print(f"  INTENT_SQL_FUSED_ENABLED: {settings.INTENT_SQL_FUSED_ENABLED}")
+    print(f"  GRAPH_FUSED_VALIDATE_ANSWER_ENABLED: {settings.GRAPH_FUSED_VALIDATE_ANSWER_ENABLED}")
+    print(f"  SCHEMA_PRUNING_ENABLED: {settings.SCHEMA_PRUNING_ENABLED}")
+    print(f"  SCHEMA_PRUNING_TOKEN_BUDGET: {settings.SCHEMA_PRUNING_TOKEN_BUDGET}")
+    print(f"  QUERY_LLM_TOKEN_BUDGET: {settings.QUERY_LLM_TOKEN_BUDGET}")
+    print(f"  QUERY_LLM_TIME_BUDGET_MS: {settings.QUERY_LLM_TIME_BUDGET_MS}ms")
+    print(f"  ANSWER_TEMPLATE_ENABLED: {settings.ANSWER_TEMPLATE_ENABLED}")
+    print(f"  ANSWER_TEMPLATE_MAX_LIST_ITEMS: {settings.ANSWER_TEMPLATE_MAX_LIST_ITEMS}")
+    print(f"  VALIDATION_HEURISTIC_ENABLED: {settings.VALIDATION_HEURISTIC_ENABLED}")
+    print(f"  VALIDATION_HEURISTIC_BAND: {settings.VALIDATION_HEURISTIC_FAIL_SCORE}-{settings.VALIDATION_HEURISTIC_PASS_SCORE}")
 
     print(f"\n[缓存配置] (✅ 新增)")
     print(f"  ENABLE_CACHE: {settings.ENABLE_CACHE}")
     print(f"  CACHE_DIR: {settings.CACHE_DIR}")
     print(f"  CACHE_TTL: {settings.CACHE_TTL}秒")
     print(f"  CACHE_MAX_SIZE: {settings.CACHE_MAX_SIZE}")
+    print(f"  CACHE_MAX_BYTES: {settings.CACHE_MAX_BYTES}")
+    print(f"  CACHE_COMPRESSION: {settings.CACHE_COMPRESSION}")
+    print(f"  CACHE_INVALIDATION_MODE: {settings.CACHE_INVALIDATION_MODE}")
+    print(f"  CACHE_WARMUP_ENABLED: {settings.CACHE_WARMUP_ENABLED}")
+    print(f"  CACHE_PIN_TOP_N: {settings.CACHE_PIN_TOP_N}")
     print(f"  CACHE_SEMANTIC_SEARCH: {settings.CACHE_SEMANTIC_SEARCH}")
     print(f"  CACHE_SIMILARITY_THRESHOLD: {settings.CACHE_SIMILARITY_THRESHOLD}")
     print(f"  CACHE_EMBEDDING_MODEL: {settings.CACHE_EMBEDDING_MODEL}")
+    print(f"  CACHE_KEY_NORMALIZATION_STEPS: {settings.CACHE_KEY_NORMALIZATION_STEPS}")
 
     print("=" * 60)
 
@@ -5,18 +5,19 @@ SQL查询Agent模块 - Sight Server
 """
 
 import logging
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Union
 import json
 from datetime import datetime
 import time
 import uuid
 import asyncio
+import sqlparse
 
-from .llm import BaseLLM
+from config import settings
 from .database import DatabaseConnector
 from .prompts import PromptManager, PromptType
 from .schemas import QueryResult, AgentState
-from .processors import SQLGenerator, SQLExecutor, ResultParser, AnswerGenerator, OptimizedSQLExecutor
+from .processors import SQLGenerator, SQLExecutor, ResultParser, AnswerGenerator, OptimizedSQLExecutor, TieredIntentEngine, AnswerRouter, HeuristicResultValidator
 from .graph import build_node_context, build_node_mapping, GraphBuilder
 from .graph.context_schemas import AgentContextSchema
 from .memory import MemoryManager
@@ -25,6 +26,12 @@ from .checkpoint import CheckpointManager
 from .error_handler import EnhancedErrorHandler  # ✅ 导入错误处理器
 from .cache_manager import QueryCacheManager  # ✅ 导入缓存管理器
 from .structured_logger import StructuredLogger  # ✅ 导入结构化日志器
+from .sql_result_cache import SqlResultCache
+from .schema_selector import SchemaSelector, DEFAULT_CORE_TABLES
+from .deadline import deadline_after, deadline_scope
+from .llm_usage import track_query
+from .tracing import get_trace_store, start_trace
+from .llm_profiles import DEFAULT_PROFILE, LLMProfile, LLMProfileRegistry, parse_llm_profiles
 
 # ✅ 新增：导入LangGraph内置的PostgreSQL组件
 # 使用同步版本避免async context manager问题
@@ -77,6 +84,21 @@ class SQLQueryAgent:
         use_langgraph_postgres: bool = True,  # 是否使用LangGraph内置PostgreSQL组件
         postgres_connection_string: Optional[str] = None,  # PostgreSQL连接字符串
         enable_final_validation: bool = False,  # ✅ 新增：是否启用最终验证节点
+        sql_result_cache: Optional[SqlResultCache] = None,
+        enable_sql_result_cache: bool = True,
+        intent_rule_threshold: Optional[float] = 0.6,
+        intent_min_query_chars: int = 6,
+        schema_token_budget: Optional[int] = 800,
+        schema_core_tables: Optional[List[str]] = None,
+        schema_embedding_service: Optional[Any] = None,
+        llm_token_budget: int = 0,
+        llm_time_budget_ms: float = 0,
+        answer_template_max_items: Optional[int] = 10,
+        validation_score_band: Optional[Tuple[float, float]] = (0.3, 0.8),
+        llm_profiles: Union[str, Dict[str, Dict[str, Any]], None] = None,
+        llm_profile_bindings: Optional[Dict[str, str]] = None,
+        fused_intent_sql: bool = False,
+        max_execution_time: Optional[float] = None,
     ):
         """
         初始化SQL查询Agent
@@ -95,12 +117,30 @@ class SQLQueryAgent:
             cache_ttl: 缓存生存时间（秒）（✅ 新增）
             max_retries: 最大重试次数（✅ 新增）
             graph_recursion_limit: LangGraph 最大递归层数限制
+            sql_result_cache: 外部传入的SQL指纹结果缓存
+            enable_sql_result_cache: 未传入时是否创建默认的SQL指纹结果缓存
+            intent_rule_threshold: 关键词意图分析置信度达到该值时跳过LLM，None 表示总是调用LLM
+            intent_min_query_chars: 关键词意图分析可直接采用的最短查询长度
+            schema_token_budget: 按查询裁剪schema的token预算，None 表示SQL生成始终使用完整schema
+            schema_core_tables: 裁剪时始终保留的核心表，默认 a_sight/tourist_spot
+            schema_embedding_service: 计算查询与字段语义相似度的向量服务或返回它的无参函数（可选）
+            llm_token_budget: 每个查询的LLM token预算，用完后跳过可选的LLM节点，0 表示不限制
+            llm_time_budget_ms: 每个查询的LLM累计耗时预算（毫秒），0 表示不限制
+            answer_template_max_items: 不超过该条数的简单结果使用模板回答，None 表示答案始终由LLM生成
+            validation_score_band: 启发式验证的 (失败分数, 通过分数)，分数落在区间内才调用验证LLM，None 表示总是调用LLM
+            llm_profiles: 命名的LLM配置（JSON 字符串或字典，见 LLM_PROFILES），default 由 LLM_MODEL 与 temperature 生成
+            llm_profile_bindings: 组件 → 配置名（intent/sql/validation/answer/analysis/summarization），未绑定的使用 default
+            fused_intent_sql: 意图 + SQL 融合模式，关键词置信度不足时不单独调用意图LLM，由SQL生成一次返回意图和SQL
+            max_execution_time: 单个查询的最大执行时间（秒），调用方未传入 deadline 时据此设定截止时间，None 或 0 表示不限制
         """
         self.logger = logger
         self.logger.info(
             "Initializing SQLQueryAgent (LangGraph + Memory + Checkpoint mode)...")
 
         self.enable_spatial = enable_spatial
+        self.llm_token_budget = llm_token_budget
+        self.llm_time_budget_ms = llm_time_budget_ms
+        self.max_execution_time = max_execution_time
         self.enable_memory = enable_memory
         self.enable_checkpoint = enable_checkpoint
         self.checkpoint_interval = checkpoint_interval
@@ -130,10 +170,17 @@ class SQLQueryAgent:
                 f"✗ DatabaseConnector initialization failed: {e}")
             raise
 
-        # 初始化LLM
+        # 初始化LLM（✅ 按组件路由到命名的模型配置，SQL生成使用 sql 组件绑定的配置）
         try:
-            self.llm = BaseLLM(temperature=temperature)
-            self.logger.info("✓ BaseLLM initialized")
+            default_profile = LLMProfile(
+                DEFAULT_PROFILE,
+                model=settings.LLM_MODEL,
+                temperature=temperature if temperature is not None else settings.LLM_TEMPERATURE)
+            self.llm_profiles = LLMProfileRegistry(
+                parse_llm_profiles(llm_profiles, default_profile), llm_profile_bindings)
+            self.llm = self.llm_profiles.get_llm("sql")
+            self.logger.info(
+                f"✓ BaseLLM initialized (bindings={self.llm_profiles.get_stats()['bindings']})")
         except Exception as e:
             self.logger.error(f"✗ BaseLLM initialization failed: {e}")
             raise
@@ -157,14 +204,48 @@ class SQLQueryAgent:
         self.logger.info("✓ ResultParser initialized")
 
         # 答案生成器
-        self.answer_generator = AnswerGenerator(self.llm)
+        self.answer_generator = AnswerGenerator(self.llm_profiles.get_llm("answer"))
         self.logger.info("✓ AnswerGenerator initialized")
 
+        # ✅ 答案路由：空结果、聚合统计和少量列表使用模板回答，不调用LLM
+        if answer_template_max_items is not None:
+            self.answer_router = AnswerRouter(
+                self.answer_generator, max_list_items=answer_template_max_items)
+            self.logger.info(
+                f"✓ AnswerRouter initialized (max_list_items={answer_template_max_items})")
+        else:
+            self.answer_router = None
+
+        # ✅ 分级意图引擎：关键词规则置信度足够时跳过LLM
+        #    融合模式下未配置阈值时不采用关键词结果（>1），需要LLM判断的意图全部推迟到SQL生成
+        if intent_rule_threshold is not None or fused_intent_sql:
+            threshold = intent_rule_threshold if intent_rule_threshold is not None else 1.01
+            self.intent_engine = TieredIntentEngine(
+                self.llm_profiles.get_llm("intent"),
+                confidence_threshold=threshold,
+                min_query_chars=intent_min_query_chars,
+                defer_to_sql=fused_intent_sql)
+            self.logger.info(
+                f"✓ TieredIntentEngine initialized (threshold={threshold}, fused={fused_intent_sql})")
+        else:
+            self.intent_engine = None
+
         # Schema获取器
         from .processors import SchemaFetcher
         self.schema_fetcher = SchemaFetcher(self.db_connector)
         self.logger.info("✓ SchemaFetcher initialized")
 
+        # ✅ Schema裁剪：SQL生成/修复prompt只携带与查询相关的表和字段
+        if schema_token_budget is not None:
+            self.schema_selector = SchemaSelector(
+                token_budget=schema_token_budget,
+                core_tables=schema_core_tables or DEFAULT_CORE_TABLES,
+                embedding_service=schema_embedding_service)
+            self.logger.info(
+                f"✓ SchemaSelector initialized (budget={schema_token_budget} tokens)")
+        else:
+            self.schema_selector = None
+
         # ✅ 增强错误处理器（新增）
         if self.enable_error_handler:
             self.error_handler = EnhancedErrorHandler(
@@ -188,9 +269,31 @@ class SQLQueryAgent:
         else:
             self.cache_manager = None
 
+        # SQL指纹结果缓存（不同表述生成相同SQL时复用执行结果）
+        if sql_result_cache is not None:
+            self.sql_result_cache = sql_result_cache
+        elif enable_sql_result_cache:
+            self.sql_result_cache = SqlResultCache()
+            self.logger.info("✓ SqlResultCache initialized")
+        else:
+            self.sql_result_cache = None
+
         self.result_validator = None
         self.data_analyzer = None
 
+        # ✅ 启发式结果验证：结论明确时不调用验证LLM
+        if validation_score_band is not None:
+            fail_score, pass_score = validation_score_band
+            self.heuristic_validator = HeuristicResultValidator(
+                pass_score=pass_score,
+                fail_score=fail_score,
+                result_parser=self.result_parser,
+                answer_generator=self.answer_generator)
+            self.logger.info(
+                f"✓ HeuristicResultValidator initialized (band={fail_score}-{pass_score})")
+        else:
+            self.heuristic_validator = None
+
         # ==================== 初始化Memory和Checkpoint ====================
 
         # ✅ 新增：初始化LangGraph内置PostgreSQL组件
@@ -283,6 +386,9 @@ class SQLQueryAgent:
         self.structured_logger = StructuredLogger(log_dir="./logs")
         self.logger.info("✓ StructuredLogger initialized")
 
+        # ✅ 查询链路追踪：最近查询的节点/LLM/数据库 span 保存在环形缓冲区
+        get_trace_store().configure(max_traces=settings.TRACE_MAX_TRACES, enabled=settings.TRACE_ENABLED)
+
         # 创建节点函数
         self.node_context = build_node_context(
             sql_generator=self.sql_generator,
@@ -296,6 +402,12 @@ class SQLQueryAgent:
             structured_logger=self.structured_logger,
             result_validator=self.result_validator,
             data_analyzer=self.data_analyzer,
+            sql_result_cache=self.sql_result_cache,
+            intent_engine=self.intent_engine,
+            schema_selector=self.schema_selector,
+            answer_router=self.answer_router,
+            heuristic_validator=self.heuristic_validator,
+            llm_profiles=self.llm_profiles,
         )
         self.node_handlers = build_node_mapping(self.node_context)
         self.logger.info("? Node handlers registered")
@@ -344,10 +456,19 @@ class SQLQueryAgent:
         self,
         query: str,
         conversation_id: Optional[str] = None,
-        resume_from_checkpoint: Optional[str] = None
+        resume_from_checkpoint: Optional[str] = None,
+        want_insights: bool = False,
+        deadline: Optional[float] = None
     ) -> str:
-        """执行自然语言 SQL 查询，返回结构化 JSON 字符串。"""
+        """
+        执行自然语言 SQL 查询，返回结构化 JSON 字符串（want_insights 为 True 时答案始终经过LLM深度分析）。
+
+        deadline 为请求截止时间（Unix 时间戳，通常由 HTTP 层在请求到达时设定），未传入时按 max_execution_time 计算；
+        超时后图用已获取的部分结果生成答案，status 为 deadline_exceeded。
+        """
         start_time = time.time()
+        if deadline is None:
+            deadline = deadline_after(self.max_execution_time, start_time)
         query_id: Optional[str] = None
         memory_data: Dict[str, Any] = {}
 
@@ -361,14 +482,21 @@ class SQLQueryAgent:
                 conversation_id,
                 query_id,
             ) = self._prepare_run_context(query, conversation_id, resume_from_checkpoint)
+            initial_state["want_insights"] = want_insights
+            initial_state["deadline"] = deadline
 
-            result_state = self._run_with_checkpoints(
-                initial_state)  # type: ignore
+            # ✅ 记录本次查询各节点的LLM用量并执行预算，同时记录链路追踪；LLM/数据库调用以剩余时间作为超时
+            with track_query(query_id, self.llm_token_budget, self.llm_time_budget_ms) as usage, \
+                    start_trace(query_id, query=query, conversation_id=conversation_id), \
+                    deadline_scope(deadline):
+                result_state = self._run_with_checkpoints(
+                    initial_state)  # type: ignore
 
             self._update_memory_post_run(query, result_state, memory_data)
 
             query_result, sql_history, final_data_snapshot, data_count = self._build_query_result(
                 result_state)
+            query_result.llm_usage = usage.summary()
             self._log_result_details(
                 result_state, final_data_snapshot, sql_history, query_result)
 
@@ -400,6 +528,39 @@ class SQLQueryAgent:
 
             return json_output
 
+    def replay_sql(self, sql: str) -> Dict[str, Any]:
+        """
+        重放已保存的SQL（不经过LLM），按工作流相同的方式合并多步结果
+
+        用于缓存过期后的后台刷新
+
+        Args:
+            sql: 以 "; " 连接的 SQL 历史
+
+        Returns:
+            {"status", "data", "count"}，任一语句失败时 status 为 error
+        """
+        statements = [stmt.strip().rstrip(";") for stmt in sqlparse.split(sql) if stmt.strip()]
+        if not statements:
+            return {"status": "error", "error": "no SQL to replay"}
+
+        final_data: Optional[List[Dict[str, Any]]] = None
+        for index, statement in enumerate(statements):
+            execution_result = self.sql_executor.execute(statement)
+            if execution_result.get("status") != "success":
+                return {"status": "error", "error": execution_result.get("error")}
+            if self.sql_result_cache:
+                self.sql_result_cache.put(statement, execution_result)
+
+            data = execution_result.get("data") or []
+            final_data = data if index == 0 else self.result_parser.merge_results([final_data or [], data])
+
+        return {
+            "status": "success",
+            "data": final_data,
+            "count": len(final_data) if final_data else 0,
+        }
+
     def _prepare_run_context(
         self,
         query: str,
@@ -511,6 +672,14 @@ class SQLQueryAgent:
             sql=sql_string,
             intent_info=result_state.get("intent_info"),
         )
+        if query_result.status == "error":
+            query_result.error_type = result_state.get("error_type")
+            query_result.retry_count = result_state.get("retry_count", 0)
+            # 与 should_retry_or_fail 的终止条件一致：SQL执行重试或总重试达到上限
+            query_result.retries_exhausted = (
+                result_state.get("sql_execution_retries", 0) >= result_state.get("max_sql_execution_retries", 3)
+                or query_result.retry_count >= result_state.get("max_retries", 5)
+            )
 
         return query_result, sql_history, final_data, data_count
 
@@ -687,6 +856,9 @@ class SQLQueryAgent:
             # Schema字段
             "database_schema": None,
             "schema_fetched": False,
+            "formatted_schema": None,
+            "pruned_schema": None,
+            "schema_selection": None,
             "sql_history": [],
             "execution_results": [],
             "thought_chain": [],
@@ -716,14 +888,21 @@ class SQLQueryAgent:
             "saved_checkpoint_id": None,
             "saved_checkpoint_step": None,
             "is_resumed_from_checkpoint": False,
-            "last_checkpoint_time": None
+            "last_checkpoint_time": None,
+            "llm_budget_exhausted": False,
+            "want_insights": False,
+            "fused_answer_ready": False,
+            "deadline": None,
+            "deadline_exceeded": False,
         }
         return initial_state
 
     def run_with_thought_chain(
         self,
         query: str,
-        conversation_id: Optional[str] = None
+        conversation_id: Optional[str] = None,
+        want_insights: bool = False,
+        deadline: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         执行SQL查询并返回完整的思维链
@@ -733,6 +912,8 @@ class SQLQueryAgent:
         Args:
             query: 自然语言查询字符串
             conversation_id: 会话ID
+            want_insights: 是否要求深度分析（答案始终经过LLM，不使用模板回答）
+            deadline: 请求截止时间（Unix 时间戳），未传入时按 max_execution_time 计算
 
         Returns:
             包含思维链和最终结果的字典:
@@ -741,6 +922,7 @@ class SQLQueryAgent:
                 "final_answer": str,
                 "thought_chain": List[Dict],
                 "step_count": int,
+                "llm_usage": Dict,
                 "sql_queries_with_results": List[Dict],
                 "result_data": Dict,
                 "memory_info": Dict (可选),
@@ -764,9 +946,17 @@ class SQLQueryAgent:
 
             # 创建初始状态
             initial_state = self._create_initial_state(query, conversation_id, memory_data)
+            initial_state["want_insights"] = want_insights
+            if deadline is None:
+                deadline = deadline_after(self.max_execution_time)
+            initial_state["deadline"] = deadline
 
             # 执行LangGraph工作流
-            result_state =   self._run_with_checkpoints(initial_state)
+            query_id = f"{conversation_id}_{int(time.time())}"
+            with track_query(query_id, self.llm_token_budget, self.llm_time_budget_ms) as usage, \
+                    start_trace(query_id, query=query, conversation_id=conversation_id), \
+                    deadline_scope(deadline):
+                result_state =   self._run_with_checkpoints(initial_state)
 
             # 学习查询模式
             if self.enable_memory and self.memory_manager:
@@ -799,6 +989,8 @@ class SQLQueryAgent:
                 "final_answer": result_state.get("answer", ""),
                 "thought_chain": result_state.get("thought_chain", []),
                 "step_count": len(result_state.get("thought_chain", [])),
+                "node_timings": result_state.get("node_execution_logs", []),
+                "llm_usage": usage.summary(),
                 "sql_queries_with_results": sql_queries_with_results,
                 "result_data": {
                     "status": result_state.get("status"),
@@ -0,0 +1,357 @@
+"""
+缓存编码模块 - Sight Server
+为查询结果缓存提供紧凑的二进制编码：列式转换 + 序列化 + 超过阈值时压缩
+"""
+
+import gzip
+import json
+import time
+import logging
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# ✅ 可选依赖：msgpack / zstandard，不可用时回退到 JSON / gzip
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+# 二进制格式头: MAGIC(3 字节) + 序列化方式(1 字节) + 压缩方式(1 字节)
+MAGIC = b"SC1"
+SERIALIZER_JSON = b"j"
+SERIALIZER_MSGPACK = b"m"
+COMPRESSION_NONE = b"n"
+COMPRESSION_GZIP = b"g"
+COMPRESSION_ZSTD = b"z"
+
+# 列式编码标记字段
+COLUMNAR_COLUMNS = "__cols__"
+COLUMNAR_ROWS = "__rows__"
+
+
+def _json_default(obj: Any) -> Any:
+    """JSON 序列化回退（与 DecimalEncoder 保持一致）"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def columnarize(obj: Any, min_rows: int = 2) -> Any:
+    """
+    将对象中"字典列表"转换为列式结构，避免每条记录重复键名
+
+    [{"name": "西湖", "level": "5A"}, {"name": "灵隐寺", "level": "4A"}]
+    → {"__cols__": ["name", "level"], "__rows__": [["西湖", "5A"], ["灵隐寺", "4A"]]}
+
+    键集合不一致的记录列表保持原样
+
+    Args:
+        obj: 任意可序列化对象
+        min_rows: 转换所需的最少记录数
+
+    Returns:
+        转换后的对象
+    """
+    if isinstance(obj, dict):
+        return {k: columnarize(v, min_rows) for k, v in obj.items()}
+    if isinstance(obj, list):
+        if len(obj) >= min_rows and all(isinstance(row, dict) for row in obj):
+            columns = list(obj[0].keys())
+            column_set = set(columns)
+            if all(len(row) == len(columns) and row.keys() == column_set for row in obj):
+                return {
+                    COLUMNAR_COLUMNS: columns,
+                    COLUMNAR_ROWS: [
+                        [columnarize(row[c], min_rows) for c in columns] for row in obj
+                    ],
+                }
+        return [columnarize(item, min_rows) for item in obj]
+    return obj
+
+
+def decolumnarize(obj: Any) -> Any:
+    """
+    还原 columnarize 的列式结构
+
+    Args:
+        obj: 列式编码后的对象
+
+    Returns:
+        原始结构的对象
+    """
+    if isinstance(obj, dict):
+        if COLUMNAR_COLUMNS in obj and COLUMNAR_ROWS in obj and len(obj) == 2:
+            columns = obj[COLUMNAR_COLUMNS]
+            return [
+                {c: decolumnarize(v) for c, v in zip(columns, row)}
+                for row in obj[COLUMNAR_ROWS]
+            ]
+        return {k: decolumnarize(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [decolumnarize(item) for item in obj]
+    return obj
+
+
+class CacheCodec:
+    """
+    查询结果缓存编解码器
+
+    编码流程: 列式转换 → msgpack（不可用时为紧凑 JSON）→ 超过阈值时 zstd/gzip 压缩
+    解码时根据格式头自动识别，兼容旧版明文 JSON 缓存文件
+
+    按存储层级（file/database 等）分别统计编码大小、压缩率和编解码耗时
+    """
+
+    file_extension = ".cache"
+
+    def __init__(
+        self,
+        compression: str = "auto",
+        compress_threshold: int = 1024,
+        compression_level: int = 3,
+        use_msgpack: bool = True,
+        columnar: bool = True,
+    ):
+        """
+        初始化编解码器
+
+        Args:
+            compression: 压缩算法 auto/zstd/gzip/none，auto 优先使用 zstd
+            compress_threshold: 序列化后超过该字节数才压缩
+            compression_level: 压缩级别
+            use_msgpack: msgpack 可用时是否使用 msgpack 序列化
+            columnar: 是否启用列式转换
+        """
+        if compression == "auto":
+            compression = "zstd" if ZSTD_AVAILABLE else "gzip"
+        elif compression == "zstd" and not ZSTD_AVAILABLE:
+            logger.warning("zstandard not installed, falling back to gzip")
+            compression = "gzip"
+        if compression not in ("zstd", "gzip", "none"):
+            raise ValueError(f"Unsupported cache compression: {compression}")
+
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.compression_level = compression_level
+        self.use_msgpack = use_msgpack and MSGPACK_AVAILABLE
+        self.columnar = columnar
+
+        self._zstd_compressor = None
+        self._zstd_decompressor = None
+        if compression == "zstd":
+            self._zstd_compressor = zstandard.ZstdCompressor(level=compression_level)
+            self._zstd_decompressor = zstandard.ZstdDecompressor()
+
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    # ==================== 编码 ====================
+
+    def encode(self, obj: Dict[str, Any], tier: str = "file") -> bytes:
+        """
+        将对象编码为二进制
+
+        Args:
+            obj: 要编码的对象
+            tier: 统计所属的存储层级
+
+        Returns:
+            带格式头的二进制数据
+        """
+        start = time.perf_counter()
+        payload = self.columnarize(obj)
+
+        if self.use_msgpack:
+            serializer = SERIALIZER_MSGPACK
+            body = msgpack.packb(payload, default=_json_default, use_bin_type=True)
+        else:
+            serializer = SERIALIZER_JSON
+            body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"),
+                              default=_json_default).encode("utf-8")
+        raw_size = len(body)
+
+        compression = COMPRESSION_NONE
+        if self.compression != "none" and raw_size >= self.compress_threshold:
+            if self.compression == "zstd":
+                body = self._zstd_compressor.compress(body)
+                compression = COMPRESSION_ZSTD
+            else:
+                body = gzip.compress(body, compresslevel=self.compression_level)
+                compression = COMPRESSION_GZIP
+
+        data = MAGIC + serializer + compression + body
+        self._record(tier, "encode", time.perf_counter() - start, raw_size, len(data))
+        return data
+
+    def columnarize(self, obj: Any) -> Any:
+        """按配置执行列式转换（供只接受 JSON 的存储层使用）"""
+        return columnarize(obj) if self.columnar else obj
+
+    # ==================== 解码 ====================
+
+    def decode(self, data: bytes, tier: str = "file") -> Dict[str, Any]:
+        """
+        解码二进制数据（无格式头时按旧版明文 JSON 处理）
+
+        Args:
+            data: 编码后的数据
+            tier: 统计所属的存储层级
+
+        Returns:
+            解码后的对象
+        """
+        start = time.perf_counter()
+        if not data.startswith(MAGIC):
+            obj = json.loads(data.decode("utf-8"))
+            self._record(tier, "decode", time.perf_counter() - start)
+            return obj
+
+        serializer = data[3:4]
+        compression = data[4:5]
+        body = data[5:]
+
+        if compression == COMPRESSION_ZSTD:
+            if not ZSTD_AVAILABLE:
+                raise ValueError("Cache entry is zstd-compressed but zstandard is not installed")
+            decompressor = self._zstd_decompressor or zstandard.ZstdDecompressor()
+            body = decompressor.decompress(body)
+        elif compression == COMPRESSION_GZIP:
+            body = gzip.decompress(body)
+
+        if serializer == SERIALIZER_MSGPACK:
+            if not MSGPACK_AVAILABLE:
+                raise ValueError("Cache entry is msgpack-encoded but msgpack is not installed")
+            payload = msgpack.unpackb(body, raw=False)
+        else:
+            payload = json.loads(body.decode("utf-8"))
+
+        obj = decolumnarize(payload)
+        self._record(tier, "decode", time.perf_counter() - start)
+        return obj
+
+    # ==================== 统计 ====================
+
+    def _record(
+        self,
+        tier: str,
+        op: str,
+        elapsed: float,
+        raw_size: Optional[int] = None,
+        encoded_size: Optional[int] = None
+    ) -> None:
+        with self._stats_lock:
+            stats = self._stats.setdefault(tier, {
+                "encodes": 0, "decodes": 0,
+                "encode_time": 0.0, "decode_time": 0.0,
+                "raw_bytes": 0, "encoded_bytes": 0,
+            })
+            stats[f"{op}s"] += 1
+            stats[f"{op}_time"] += elapsed
+            if raw_size is not None:
+                stats["raw_bytes"] += raw_size
+                stats["encoded_bytes"] += encoded_size
+
+    def record_sizes(self, tier: str, raw_size: int, encoded_size: int, elapsed: float) -> None:
+        """记录由外部完成编码的层级（如数据库 JSON 列）的大小与耗时"""
+        self._record(tier, "encode", elapsed, raw_size, encoded_size)
+
+    def record_decode(self, tier: str, elapsed: float) -> None:
+        """记录由外部完成解码的层级的耗时"""
+        self._record(tier, "decode", elapsed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取编码统计
+
+        Returns:
+            编码配置及各层级的编码大小、压缩率、平均编解码耗时
+        """
+        with self._stats_lock:
+            tiers = {}
+            for tier, s in self._stats.items():
+                tiers[tier] = {
+                    "encodes": s["encodes"],
+                    "decodes": s["decodes"],
+                    "avg_encoded_bytes": round(s["encoded_bytes"] / s["encodes"], 1) if s["encodes"] else 0,
+                    "compression_ratio": round(s["raw_bytes"] / s["encoded_bytes"], 2) if s["encoded_bytes"] else 0,
+                    "avg_encode_ms": round(s["encode_time"] / s["encodes"] * 1000, 3) if s["encodes"] else 0,
+                    "avg_decode_ms": round(s["decode_time"] / s["decodes"] * 1000, 3) if s["decodes"] else 0,
+                }
+        return {
+            "serializer": "msgpack" if self.use_msgpack else "json",
+            "compression": self.compression,
+            "compress_threshold": self.compress_threshold,
+            "columnar": self.columnar,
+            "tiers": tiers,
+        }
+
+
+# 测试代码：对比旧版格式化 JSON 与新编码的大小和耗时
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    def make_result(rows: int) -> Dict[str, Any]:
+        return {
+            "status": "success",
+            "answer": "浙江省共有以下5A级景区",
+            "count": rows,
+            "data": [
+                {
+                    "name": f"景区{i}",
+                    "level": "5A",
+                    "province": "浙江省",
+                    "city": "杭州市",
+                    "lng": Decimal("120.1551") + i,
+                    "lat": Decimal("30.2741"),
+                    "rating": 4.8,
+                    "address": "浙江省杭州市西湖区龙井路1号",
+                }
+                for i in range(rows)
+            ],
+            "sql": "SELECT * FROM a_sight WHERE level = '5A'",
+        }
+
+    print("=== 查询结果编码对比 ===\n")
+    codec = CacheCodec()
+    print(f"serializer={'msgpack' if codec.use_msgpack else 'json'}, compression={codec.compression}\n")
+
+    for rows in (1, 20, 200, 2000):
+        result = make_result(rows)
+        iterations = max(5, 2000 // rows)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            legacy = json.dumps(result, ensure_ascii=False, indent=2, default=_json_default).encode("utf-8")
+        legacy_ms = (time.perf_counter() - start) / iterations * 1000
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            encoded = codec.encode(result, tier="bench")
+        encode_ms = (time.perf_counter() - start) / iterations * 1000
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            decoded = codec.decode(encoded, tier="bench")
+        decode_ms = (time.perf_counter() - start) / iterations * 1000
+        assert decoded == json.loads(legacy)
+
+        print(f"rows={rows:>5}: legacy {len(legacy):>8} B ({legacy_ms:.3f} ms), "
+              f"encoded {len(encoded):>7} B ({encode_ms:.3f} ms enc / {decode_ms:.3f} ms dec), "
+              f"{len(legacy) / len(encoded):.1f}x smaller")
+
+    print(f"\n{codec.get_stats()}")
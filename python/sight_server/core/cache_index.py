@@ -0,0 +1,275 @@
+"""
+缓存索引模块 - Sight Server
+为查询缓存提供 O(1) LRU 淘汰与 O(log n) TTL 过期的内存索引，以及后台淘汰线程
+"""
+
+import heapq
+import queue
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CacheIndex:
+    """
+    缓存内存索引
+
+    数据结构:
+    - 有序字典（recency list）: 按最近访问顺序保存缓存键，头部为最久未使用
+      访问/写入 move_to_end 为 O(1)，LRU 弹出为 O(1)
+    - 最小堆（expiry heap）: 按过期时间排序的 (expires_at, cache_key)
+      写入 O(log n)；删除与续期采用惰性失效，弹出时与 _expires 比对
+    - 固定集合（pinned）: 固定的缓存键不参与 LRU 淘汰和过期
+
+    索引本身不加锁，由调用方（QueryCacheManager）统一加锁
+    """
+
+    def __init__(self):
+        self._recency: "OrderedDict[str, None]" = OrderedDict()
+        self._expires: Dict[str, float] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._pinned: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._recency) + len(self._pinned)
+
+    def __contains__(self, cache_key: str) -> bool:
+        return cache_key in self._recency or cache_key in self._pinned
+
+    def add(self, cache_key: str, expires_at: float) -> None:
+        """
+        写入或更新缓存键（视为最近使用）
+
+        Args:
+            cache_key: 缓存键
+            expires_at: 过期时间戳（秒）
+        """
+        if cache_key in self._pinned:
+            return
+        self._recency[cache_key] = None
+        self._recency.move_to_end(cache_key)
+        if self._expires.get(cache_key) != expires_at:
+            self._expires[cache_key] = expires_at
+            heapq.heappush(self._expiry_heap, (expires_at, cache_key))
+        self._maybe_rebuild_heap()
+
+    def touch(self, cache_key: str) -> None:
+        """标记缓存键为最近使用"""
+        if cache_key in self._recency:
+            self._recency.move_to_end(cache_key)
+
+    def remove(self, cache_key: str) -> None:
+        """移除缓存键（堆中的旧记录惰性失效）"""
+        self._recency.pop(cache_key, None)
+        self._expires.pop(cache_key, None)
+        self._pinned.discard(cache_key)
+
+    def pin(self, cache_key: str) -> None:
+        """固定缓存键：不再被 LRU 淘汰，也不会过期"""
+        self._recency.pop(cache_key, None)
+        self._expires.pop(cache_key, None)
+        self._pinned.add(cache_key)
+
+    def unpin(self, cache_key: str, expires_at: float) -> None:
+        """取消固定，恢复为普通缓存键（视为最近使用）"""
+        if cache_key in self._pinned:
+            self._pinned.discard(cache_key)
+            self.add(cache_key, expires_at)
+
+    def is_pinned(self, cache_key: str) -> bool:
+        """判断缓存键是否已固定"""
+        return cache_key in self._pinned
+
+    def clear(self) -> None:
+        """清空索引"""
+        self._recency.clear()
+        self._expires.clear()
+        self._expiry_heap.clear()
+        self._pinned.clear()
+
+    def expires_at(self, cache_key: str) -> Optional[float]:
+        """获取缓存键的过期时间"""
+        return self._expires.get(cache_key)
+
+    def is_expired(self, cache_key: str, now: float) -> bool:
+        """判断缓存键是否已过期（未知键视为未过期，由调用方自行回退判断）"""
+        expires_at = self._expires.get(cache_key)
+        return expires_at is not None and expires_at <= now
+
+    def pop_lru(self, count: int) -> List[str]:
+        """
+        弹出最久未使用的缓存键
+
+        Args:
+            count: 弹出数量
+
+        Returns:
+            被弹出的缓存键列表（从最旧到较新）
+        """
+        evicted = []
+        while self._recency and len(evicted) < count:
+            cache_key, _ = self._recency.popitem(last=False)
+            self._expires.pop(cache_key, None)
+            evicted.append(cache_key)
+        return evicted
+
+    def pop_expired(self, now: float) -> List[str]:
+        """
+        弹出所有已过期的缓存键（O(k log n)，k 为过期数量）
+
+        Args:
+            now: 当前时间戳
+
+        Returns:
+            已过期的缓存键列表
+        """
+        expired = []
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, cache_key = heapq.heappop(heap)
+            # 惰性失效：只处理与当前过期时间一致的记录
+            if self._expires.get(cache_key) == expires_at:
+                self._recency.pop(cache_key, None)
+                del self._expires[cache_key]
+                expired.append(cache_key)
+        return expired
+
+    def _maybe_rebuild_heap(self) -> None:
+        """失效记录过多时重建堆，避免堆无限增长（均摊 O(1)）"""
+        if len(self._expiry_heap) > 2 * len(self._expires) + 64:
+            self._expiry_heap = [(ts, key) for key, ts in self._expires.items()]
+            heapq.heapify(self._expiry_heap)
+
+
+class CacheEvictionWorker:
+    """
+    后台淘汰线程
+
+    - 接收批量淘汰任务，在后台删除缓存文件和数据库记录，不阻塞保存路径
+    - 按固定间隔调用过期清理回调（淘汰任务持续不断时也会按时清理）
+    """
+
+    def __init__(
+        self,
+        evict_callback: Callable[[List[str]], None],
+        expire_callback: Optional[Callable[[], int]] = None,
+        expire_interval: float = 60.0,
+    ):
+        """
+        初始化后台淘汰线程
+
+        Args:
+            evict_callback: 批量删除回调，参数为缓存键列表
+            expire_callback: 周期性过期清理回调
+            expire_interval: 过期清理间隔（秒）
+        """
+        self.evict_callback = evict_callback
+        self.expire_callback = expire_callback
+        self.expire_interval = expire_interval
+
+        self._queue: "queue.Queue[Optional[List[str]]]" = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="cache-eviction", daemon=True)
+        self._thread.start()
+
+        self.batches_processed = 0
+        self.keys_evicted = 0
+
+    def submit(self, cache_keys: Iterable[str]) -> None:
+        """提交一批待删除的缓存键"""
+        batch = list(cache_keys)
+        if batch and not self._stopped.is_set():
+            self._queue.put(batch)
+
+    def pending(self) -> int:
+        """待处理的批次数"""
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        last_expire = time.monotonic()
+        while not self._stopped.is_set():
+            # 最多等到下一次过期清理的时间点，繁忙时不会推迟清理
+            timeout = max(0.0, self.expire_interval - (time.monotonic() - last_expire))
+            try:
+                batch = self._queue.get(timeout=timeout)
+                received = True
+            except queue.Empty:
+                batch, received = None, False
+
+            if time.monotonic() - last_expire >= self.expire_interval:
+                last_expire = time.monotonic()
+                if self.expire_callback:
+                    try:
+                        self.expire_callback()
+                    except Exception as e:
+                        logger.warning(f"Background cache expiry failed: {e}")
+
+            if not received:
+                continue
+            if batch is None:
+                self._queue.task_done()
+                break
+            try:
+                self.evict_callback(batch)
+                self.batches_processed += 1
+                self.keys_evicted += len(batch)
+            except Exception as e:
+                logger.warning(f"Background cache eviction failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """等待已提交的批次处理完成"""
+        self._queue.join()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """处理完剩余批次后停止线程"""
+        if self._stopped.is_set():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._stopped.set()
+
+
+# 测试代码：满容量时每次保存的淘汰开销（旧方案排序 vs 新方案索引）
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    print("=== 满容量保存的淘汰开销 ===\n")
+
+    for capacity in (500, 1000, 5000, 20000):
+        saves = 2000
+
+        # 旧方案：每次保存时复制并按 updated_at 排序全部条目
+        entries = {f"key{i}": {"updated_at": f"{i:012d}"} for i in range(capacity)}
+        start = time.perf_counter()
+        for i in range(capacity, capacity + saves):
+            items = list(entries.items())
+            items.sort(key=lambda x: x[1].get("updated_at", ""))
+            del entries[items[0][0]]
+            entries[f"key{i}"] = {"updated_at": f"{i:012d}"}
+        sort_us = (time.perf_counter() - start) / saves * 1_000_000
+
+        # 新方案：有序字典 + 过期堆
+        index = CacheIndex()
+        for i in range(capacity):
+            index.add(f"key{i}", 1_000_000.0 + i)
+        start = time.perf_counter()
+        for i in range(capacity, capacity + saves):
+            index.pop_lru(1)
+            index.add(f"key{i}", 1_000_000.0 + i)
+        index_us = (time.perf_counter() - start) / saves * 1_000_000
+
+        # 过期清理：一次弹出 10% 的过期条目
+        start = time.perf_counter()
+        expired = index.pop_expired(1_000_000.0 + saves + capacity // 10 - 1)
+        expire_ms = (time.perf_counter() - start) * 1000
+
+        print(f"capacity={capacity:>6}: sort-based {sort_us:>9.1f} us/save, "
+              f"indexed {index_us:>5.2f} us/save, "
+              f"expire {len(expired)} keys in {expire_ms:.2f} ms")
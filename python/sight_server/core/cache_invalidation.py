@@ -0,0 +1,261 @@
+"""
+缓存失效模块 - Sight Server
+提取 SQL 依赖的数据表，并根据数据库变更信号（LISTEN/NOTIFY 或 pg_stat_user_tables 轮询）
+精确失效依赖这些表的查询缓存
+"""
+
+import re
+import select
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# 默认通知频道（与 DatabaseConnector.install_table_change_triggers 保持一致）
+DEFAULT_NOTIFY_CHANNEL = "sight_table_changed"
+
+_IDENTIFIER = r'(?:"[^"]+"|[a-zA-Z_][\w$]*)'
+_QUALIFIED_NAME = rf'{_IDENTIFIER}(?:\s*\.\s*{_IDENTIFIER})?'
+_TABLE_REF_PATTERN = re.compile(
+    rf'\b(?:FROM|JOIN|UPDATE|INTO)\s+(?!\()({_QUALIFIED_NAME}(?:\s*(?:AS\s+)?{_IDENTIFIER})?'
+    rf'(?:\s*,\s*(?!\(){_QUALIFIED_NAME}(?:\s*(?:AS\s+)?{_IDENTIFIER})?)*)',
+    re.IGNORECASE
+)
+_CTE_PATTERN = re.compile(rf'(?:\bWITH(?:\s+RECURSIVE)?|,)\s*({_IDENTIFIER})\s+AS\s*\(', re.IGNORECASE)
+_STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+_COMMENT_PATTERN = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+
+# FROM 之后可能出现但不是表名的关键字
+_NON_TABLE_WORDS = {
+    "select", "lateral", "only", "where", "group", "order", "limit", "on",
+    "using", "join", "left", "right", "inner", "outer", "cross", "full",
+    "natural", "as", "unnest", "generate_series", "values",
+}
+
+
+def _normalize_identifier(name: str) -> str:
+    """去掉引号和模式前缀，返回小写表名"""
+    name = name.split(".")[-1].strip()
+    if name.startswith('"') and name.endswith('"'):
+        return name[1:-1]
+    return name.lower()
+
+
+def extract_sql_tables(sql: Optional[str]) -> List[str]:
+    """
+    提取 SQL 引用的数据表（FROM/JOIN 子句，含逗号分隔的表列表和模式限定名）
+
+    CTE 名称、子查询、字符串常量和注释中的内容会被排除
+
+    Args:
+        sql: SQL 语句，可以是用 ";" 连接的多条语句
+
+    Returns:
+        排序后的表名列表（小写、不含模式前缀）
+    """
+    if not sql:
+        return []
+
+    cleaned = _COMMENT_PATTERN.sub(" ", sql)
+    cleaned = _STRING_LITERAL_PATTERN.sub("''", cleaned)
+    cte_names = {_normalize_identifier(name) for name in _CTE_PATTERN.findall(cleaned)}
+
+    tables: Set[str] = set()
+    for match in _TABLE_REF_PATTERN.finditer(cleaned):
+        for ref in match.group(1).split(","):
+            parts = re.split(r'\s+', ref.strip())
+            if not parts or not parts[0]:
+                continue
+            # 去掉 "schema . table" 中的空白
+            name = _normalize_identifier(re.sub(r'\s*\.\s*', '.', parts[0]))
+            if name and name not in _NON_TABLE_WORDS and name not in cte_names:
+                tables.add(name)
+    return sorted(tables)
+
+
+class TableChangeMonitor:
+    """
+    数据表变更监听器
+
+    两种信号源:
+    - notify: 在独立连接上 LISTEN，表上的语句级触发器通过 pg_notify 发送表名
+    - poll:   定期读取 pg_stat_user_tables 的增删改计数，计数变化即视为表已变更
+
+    检测到变更后调用 on_change(表名集合)，由缓存管理器失效依赖条目
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[Set[str]], int],
+        database_connector=None,
+        connection_string: Optional[str] = None,
+        mode: str = "poll",
+        poll_interval: float = 10.0,
+        channel: str = DEFAULT_NOTIFY_CHANNEL,
+    ):
+        """
+        初始化变更监听器
+
+        Args:
+            on_change: 变更回调，参数为变更的表名集合，返回失效的缓存条目数
+            database_connector: 数据库连接器（poll 模式读取统计计数）
+            connection_string: 数据库连接字符串（notify 模式建立独立 LISTEN 连接）
+            mode: 信号源 notify/poll
+            poll_interval: 轮询间隔（秒）；notify 模式下为等待通知的超时时间
+            channel: notify 模式的频道名
+        """
+        if mode not in ("notify", "poll"):
+            raise ValueError(f"Unsupported table change monitor mode: {mode}")
+
+        self.on_change = on_change
+        self.database_connector = database_connector
+        self.connection_string = connection_string or (
+            database_connector.get_connection_string() if database_connector else None)
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.channel = channel
+
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listen_connection = None
+        self._counters: Optional[Dict[str, int]] = None
+
+        # 统计
+        self.signals_received = 0
+        self.entries_invalidated = 0
+        self.last_changed_tables: List[str] = []
+
+    # ==================== 生命周期 ====================
+
+    def start(self) -> None:
+        """启动后台监听线程"""
+        if self._thread is not None:
+            return
+        target = self._run_notify if self.mode == "notify" else self._run_poll
+        self._thread = threading.Thread(
+            target=target, name=f"table-change-{self.mode}", daemon=True)
+        self._thread.start()
+        logger.info(f"Table change monitor started (mode={self.mode})")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止监听"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._listen_connection is not None:
+            try:
+                self._listen_connection.close()
+            except Exception:
+                pass
+            self._listen_connection = None
+
+    # ==================== 信号处理 ====================
+
+    def _dispatch(self, tables: Iterable[str]) -> None:
+        """将变更的表交给回调处理"""
+        # pg_stat_user_tables 和 TG_TABLE_NAME 给出的都是实际表名，无需再规范化
+        changed = {t for t in tables if t}
+        if not changed:
+            return
+        self.signals_received += 1
+        self.last_changed_tables = sorted(changed)
+        try:
+            invalidated = self.on_change(changed) or 0
+            self.entries_invalidated += invalidated
+            logger.info(
+                f"Tables changed: {self.last_changed_tables}, invalidated {invalidated} cache entries")
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for tables {self.last_changed_tables}: {e}")
+
+    def poll_once(self) -> Set[str]:
+        """
+        读取一次修改计数并与上次比较（首次调用只建立基线）
+
+        Returns:
+            计数发生变化的表名集合
+        """
+        counters = self.database_connector.get_table_modification_counters()
+        if self._counters is None:
+            self._counters = counters
+            return set()
+        changed = {
+            table for table, count in counters.items()
+            if self._counters.get(table) != count
+        }
+        # 被删除的表同样视为变更
+        changed.update(set(self._counters) - set(counters))
+        self._counters = counters
+        return changed
+
+    def _run_poll(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                changed = self.poll_once()
+                if changed:
+                    self._dispatch(changed)
+            except Exception as e:
+                logger.warning(f"Polling table modification counters failed: {e}")
+            self._stopped.wait(self.poll_interval)
+
+    def _connect_listener(self):
+        """建立独立的 LISTEN 连接（autocommit 模式才能及时收到通知）"""
+        import psycopg2
+
+        connection = psycopg2.connect(self.connection_string)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return connection
+
+    def _run_notify(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                if self._listen_connection is None:
+                    self._listen_connection = self._connect_listener()
+                    logger.info(f"Listening for table changes on channel '{self.channel}'")
+
+                connection = self._listen_connection
+                if select.select([connection], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                connection.poll()
+                changed = set()
+                while connection.notifies:
+                    changed.add(connection.notifies.pop(0).payload)
+                self._dispatch(changed)
+            except Exception as e:
+                logger.warning(f"Table change listener error, reconnecting: {e}")
+                if self._listen_connection is not None:
+                    try:
+                        self._listen_connection.close()
+                    except Exception:
+                        pass
+                    self._listen_connection = None
+                self._stopped.wait(self.poll_interval)
+
+    def get_stats(self) -> Dict[str, object]:
+        """获取监听统计"""
+        return {
+            "mode": self.mode,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "signals_received": self.signals_received,
+            "entries_invalidated": self.entries_invalidated,
+            "last_changed_tables": self.last_changed_tables,
+        }
+
+
+# 测试代码
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    print("=== SQL 依赖表提取 ===\n")
+    samples = [
+        "SELECT * FROM a_sight WHERE level = '5A'",
+        "SELECT s.name FROM public.a_sight s JOIN tourist_spot t ON s.name = t.name",
+        'SELECT * FROM "Tourist_Spot", a_sight WHERE city = \'FROM fake\'',
+        "WITH top AS (SELECT * FROM a_sight) SELECT * FROM top LEFT JOIN tourist_spot ON true",
+        "SELECT * FROM (SELECT * FROM a_sight) sub; SELECT count(*) FROM tourist_spot -- FROM ignored",
+    ]
+    for sql in samples:
+        print(f"{extract_sql_tables(sql)}  <-  {sql}")
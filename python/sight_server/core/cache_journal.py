@@ -0,0 +1,321 @@
+"""
+缓存元数据日志模块 - Sight Server
+以追加写日志（journal）+ 周期性压缩（compaction）的方式持久化缓存元数据，
+避免每次缓存变更都重写整个 query_cache_metadata.json
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class CacheMetadataJournal:
+    """
+    缓存元数据日志
+
+    存储结构:
+    - 快照文件（snapshot）: 完整元数据，仅在压缩时通过原子重命名整体替换
+    - 日志文件（journal）: 每行一条 JSON 操作记录，缓存变更时追加写入
+
+    操作记录（均为幂等操作，重复回放结果不变）:
+    - {"op": "put", "key": ..., "entry": {...}}   写入/覆盖一个缓存条目
+    - {"op": "del", "key": ...}                   删除一个缓存条目
+    - {"op": "meta", "fields": {...}}             更新顶层字段（命中统计、清理时间等）
+
+    启动恢复: 加载快照 → 逐行回放日志，末尾不完整的行（写入中途崩溃）会被忽略
+    """
+
+    def __init__(
+        self,
+        snapshot_path: str,
+        journal_path: Optional[str] = None,
+        compact_min_records: int = 1000,
+        compact_ratio: float = 2.0,
+        fsync: bool = False,
+    ):
+        """
+        初始化元数据日志
+
+        Args:
+            snapshot_path: 快照文件路径
+            journal_path: 日志文件路径，默认为快照路径加 .journal 后缀
+            compact_min_records: 触发压缩的最小日志记录数
+            compact_ratio: 日志记录数超过 条目数 × ratio 时触发压缩
+            fsync: 每次追加后是否 fsync（更安全但更慢）
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or f"{snapshot_path}.journal"
+        self.compact_min_records = compact_min_records
+        self.compact_ratio = compact_ratio
+        self.fsync = fsync
+
+        self._lock = threading.RLock()
+        self._journal_file = None
+        self._journal_records = 0
+
+        # 写入开销统计
+        self._append_count = 0
+        self._append_bytes = 0
+        self._append_time = 0.0
+        self._compact_count = 0
+        self._last_compact_ms = 0.0
+        self._recovery_ms = 0.0
+        self._skipped_records = 0
+
+    # ==================== 加载与恢复 ====================
+
+    def load(self, default: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        加载快照并回放日志
+
+        Args:
+            default: 快照不存在或损坏时使用的初始元数据
+
+        Returns:
+            恢复后的元数据
+        """
+        start = time.perf_counter()
+        metadata = self._read_snapshot(default)
+        metadata.setdefault("cache_entries", {})
+
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            try:
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            # 通常是崩溃时写了一半的最后一行
+                            self._skipped_records += 1
+                            continue
+                        self.apply(metadata, record)
+                        replayed += 1
+            except Exception as e:
+                logger.warning(f"Failed to replay cache metadata journal: {e}")
+
+        self._journal_records = replayed
+        self._recovery_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"Cache metadata recovered: entries={len(metadata['cache_entries'])}, "
+            f"journal_records={replayed}, skipped={self._skipped_records}, "
+            f"time={self._recovery_ms:.1f}ms")
+        return metadata
+
+    def _read_snapshot(self, default: Dict[str, Any]) -> Dict[str, Any]:
+        """读取快照文件，失败时返回默认值"""
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to load cache metadata snapshot: {e}")
+        return default
+
+    @staticmethod
+    def apply(metadata: Dict[str, Any], record: Dict[str, Any]) -> None:
+        """
+        将一条操作记录应用到元数据
+
+        Args:
+            metadata: 元数据字典（原地修改）
+            record: 操作记录
+        """
+        op = record.get("op")
+        entries = metadata.setdefault("cache_entries", {})
+        if op == "put":
+            entries[record["key"]] = record.get("entry", {})
+        elif op == "del":
+            entries.pop(record["key"], None)
+        elif op == "meta":
+            metadata.update(record.get("fields", {}))
+
+    # ==================== 追加写入 ====================
+
+    def put(self, cache_key: str, entry: Dict[str, Any]) -> None:
+        """记录条目写入"""
+        self._append({"op": "put", "key": cache_key, "entry": entry})
+
+    def delete(self, cache_key: str) -> None:
+        """记录条目删除"""
+        self._append({"op": "del", "key": cache_key})
+
+    def set_fields(self, fields: Dict[str, Any]) -> None:
+        """记录顶层字段更新"""
+        self._append({"op": "meta", "fields": fields})
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        """追加一条记录（O(1)，与缓存规模无关）"""
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        start = time.perf_counter()
+        with self._lock:
+            try:
+                if self._journal_file is None:
+                    self._journal_file = open(
+                        self.journal_path, 'a', encoding='utf-8')
+                self._journal_file.write(line)
+                self._journal_file.flush()
+                if self.fsync:
+                    os.fsync(self._journal_file.fileno())
+                self._journal_records += 1
+            except Exception as e:
+                logger.error(f"Failed to append cache metadata journal: {e}")
+                return
+            self._append_count += 1
+            self._append_bytes += len(line.encode('utf-8'))
+            self._append_time += time.perf_counter() - start
+
+    # ==================== 压缩 ====================
+
+    def needs_compaction(self, entry_count: int) -> bool:
+        """
+        判断是否需要压缩
+
+        阈值与条目数成正比，因此压缩的 O(n) 开销被均摊为每次操作 O(1)
+
+        Args:
+            entry_count: 当前缓存条目数
+        """
+        threshold = max(self.compact_min_records,
+                        int(entry_count * self.compact_ratio))
+        return self._journal_records >= threshold
+
+    def compact(self, metadata: Dict[str, Any]) -> bool:
+        """
+        将完整元数据写入新快照并清空日志
+
+        写入顺序: 临时文件 → fsync → 原子重命名为快照 → 原子替换为空日志。
+        任一步骤崩溃时，旧快照 + 日志或新快照 + 旧日志都能恢复出正确状态（操作幂等）。
+
+        Args:
+            metadata: 完整元数据
+
+        Returns:
+            是否成功
+        """
+        start = time.perf_counter()
+        with self._lock:
+            try:
+                self._atomic_write(
+                    self.snapshot_path,
+                    json.dumps(metadata, ensure_ascii=False,
+                               indent=2, default=str)
+                )
+                if self._journal_file is not None:
+                    self._journal_file.close()
+                    self._journal_file = None
+                self._atomic_write(self.journal_path, "")
+                self._journal_records = 0
+            except Exception as e:
+                logger.error(f"Failed to compact cache metadata: {e}")
+                return False
+
+            self._compact_count += 1
+            self._last_compact_ms = (time.perf_counter() - start) * 1000
+        logger.debug(
+            f"Cache metadata compacted: entries={len(metadata.get('cache_entries', {}))}, "
+            f"time={self._last_compact_ms:.1f}ms")
+        return True
+
+    @staticmethod
+    def _atomic_write(path: str, content: str) -> None:
+        """写入临时文件后原子重命名"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def close(self) -> None:
+        """关闭日志文件句柄"""
+        with self._lock:
+            if self._journal_file is not None:
+                try:
+                    self._journal_file.close()
+                finally:
+                    self._journal_file = None
+
+    # ==================== 统计 ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取日志写入统计
+
+        Returns:
+            统计信息（追加次数、平均写入耗时、压缩次数等）
+        """
+        avg_us = (self._append_time / self._append_count *
+                  1_000_000) if self._append_count else 0.0
+        avg_bytes = (self._append_bytes /
+                     self._append_count) if self._append_count else 0
+        return {
+            "journal_records": self._journal_records,
+            "appends": self._append_count,
+            "avg_append_us": round(avg_us, 2),
+            "avg_append_bytes": round(avg_bytes, 1),
+            "compactions": self._compact_count,
+            "last_compact_ms": round(self._last_compact_ms, 2),
+            "recovery_ms": round(self._recovery_ms, 2),
+            "skipped_records": self._skipped_records,
+        }
+
+
+# 测试代码：比较全量重写与追加日志的单次写入开销
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO)
+
+    print("=== 元数据写入开销对比 ===\n")
+
+    def make_entry(i: int) -> Dict[str, Any]:
+        return {
+            "query": f"查询浙江省的5A景区 {i}",
+            "created_at": "2025-10-04T00:00:00",
+            "updated_at": "2025-10-04T00:00:00",
+            "last_accessed": "2025-10-04T00:00:00",
+            "hit_count": 1,
+            "size": 2048,
+        }
+
+    for size in (100, 1000, 5000):
+        tmp_dir = tempfile.mkdtemp()
+        snapshot = os.path.join(tmp_dir, "query_cache_metadata.json")
+        metadata = {"cache_entries": {f"key{i}": make_entry(i) for i in range(size)}}
+
+        # 旧方案：每次变更重写整个文件
+        ops = min(200, size)
+        start = time.perf_counter()
+        for i in range(ops):
+            metadata["cache_entries"][f"key{i}"]["hit_count"] += 1
+            with open(snapshot, 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, ensure_ascii=False, indent=2)
+        rewrite_us = (time.perf_counter() - start) / ops * 1_000_000
+
+        # 新方案：追加日志
+        journal = CacheMetadataJournal(snapshot)
+        start = time.perf_counter()
+        for i in range(ops):
+            entry = metadata["cache_entries"][f"key{i}"]
+            entry["hit_count"] += 1
+            journal.put(f"key{i}", entry)
+        journal_us = (time.perf_counter() - start) / ops * 1_000_000
+        journal.close()
+
+        # 恢复验证
+        recovered = CacheMetadataJournal(snapshot).load({"cache_entries": {}})
+        assert recovered["cache_entries"]["key0"]["hit_count"] == metadata["cache_entries"]["key0"]["hit_count"]
+
+        print(f"entries={size:>5}: full rewrite {rewrite_us:>9.1f} us/op, "
+              f"journal append {journal_us:>6.1f} us/op")
+        shutil.rmtree(tmp_dir)
@@ -13,6 +13,8 @@ from typing import Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from decimal import Decimal
 
+from .query_normalizer import QueryNormalizer
+
 # 配置默认值
 DEFAULT_EMBEDDING_MODEL_OFFLINE_MODE = False
 DEFAULT_EMBEDDING_MODEL_TIMEOUT = 30
@@ -80,7 +82,10 @@ class QueryCacheManager:
         embedding_model: str = "paraphrase-multilingual-MiniLM-L12-v2",
         enable_database_persistence: bool = True,  # ✅ 新增：启用数据库持久化
         database_connector = None,                 # ✅ 新增：数据库连接器实例
-        cache_strategy: str = "hybrid"             # ✅ 新增：缓存策略 hybrid/db_only/file_only
+        cache_strategy: str = "hybrid",            # ✅ 新增：缓存策略 hybrid/db_only/file_only
+        embedding_quantization: str = "none",
+        embedding_batch_size: int = 32,
+        query_normalizer: Optional[QueryNormalizer] = None
     ):
         """
         初始化缓存管理器
@@ -92,11 +97,15 @@ class QueryCacheManager:
             enable_semantic_search: 是否启用语义相似度搜索（✅ 新增）
             similarity_threshold: 语义相似度阈值（0-1），默认0.92（✅ 新增）
             embedding_model: Embedding模型名称（✅ 新增）
+            embedding_quantization: Embedding推理量化模式 none/float16/int8
+            embedding_batch_size: Embedding批量编码大小
+            query_normalizer: 查询规范化流水线（缓存键与语义索引共用），默认全部步骤
         """
         self.cache_dir = cache_dir
         self.ttl = ttl
         self.max_size = max_size
         self.cache_metadata_file = os.path.join(cache_dir, "cache_metadata.json")
+        self.query_normalizer = query_normalizer or QueryNormalizer()
 
         # ✅ 语义搜索配置
         self.enable_semantic_search = enable_semantic_search
@@ -104,7 +113,7 @@ class QueryCacheManager:
 
         # ✅ 初始化 Embedding 模型（仅在启用语义搜索时，延迟导入）
         self.embedding_model = None
-        self.query_embeddings = {}  # 缓存查询向量，避免重复计算
+        self.embedding_service = None  # 共享向量服务（批量编码 + 向量持久化）
 
         if self.enable_semantic_search:
             # 延迟导入 sentence-transformers
@@ -112,9 +121,19 @@ class QueryCacheManager:
 
             if SENTENCE_TRANSFORMERS_AVAILABLE and SentenceTransformer:
                 try:
-                    # 使用改进的模型加载方法
-                    self.embedding_model = self._initialize_embedding_model_safely(embedding_model, cache_dir)
-                    
+                    from .embedding_service import get_shared_embedding_service
+
+                    # 使用改进的模型加载方法，模型在进程内共享
+                    self.embedding_service = get_shared_embedding_service(
+                        embedding_model,
+                        loader=lambda: self._initialize_embedding_model_safely(embedding_model, cache_dir),
+                        store_dir=os.path.join(cache_dir, "embeddings"),
+                        quantization=embedding_quantization,
+                        batch_size=embedding_batch_size
+                    )
+                    if self.embedding_service:
+                        self.embedding_model = self.embedding_service.model
+
                     if self.embedding_model:
                         logger.info("✓ Embedding model loaded successfully")
                     else:
@@ -276,12 +295,12 @@ class QueryCacheManager:
             缓存键（MD5哈希）
 
         优化点：
-        - 标准化查询文本（去除多余空格、统一小写）
+        - 标准化查询文本（全半角、繁简、标点、数字/等级、同义词）
         - 添加 query_intent 到缓存键（区分 summary/query）
         - 移除 conversation_id（跨会话共享缓存）
         """
-        # ✅ 标准化查询文本（去除多余空格、统一小写）
-        normalized_query = " ".join(query.lower().strip().split())
+        # ✅ 标准化查询文本
+        normalized_query = self.query_normalizer.normalize(query)
 
         # ✅ 选择关键上下文字段
         key_context = {
@@ -489,6 +508,8 @@ class QueryCacheManager:
             }
 
             self._save_metadata()
+            if self.embedding_service and query:
+                self.embedding_service.add([self.query_normalizer.normalize(query)])
             logger.debug(f"File cache set for key: {cache_key}")
             return True
 
@@ -673,7 +694,8 @@ class QueryCacheManager:
             stats["semantic_search"] = {
                 "enabled": True,
                 "semantic_hits": semantic_hits,
-                "similarity_threshold": self.similarity_threshold
+                "similarity_threshold": self.similarity_threshold,
+                "embedding_service": self.embedding_service.get_stats() if self.embedding_service else None
             }
         else:
             stats["semantic_search"] = {
@@ -703,7 +725,8 @@ class QueryCacheManager:
         self.metadata["last_cleanup"] = datetime.now().isoformat()
 
         # ✅ 清空向量缓存
-        self.query_embeddings.clear()
+        if self.embedding_service:
+            self.embedding_service.clear()
 
         self._save_metadata()
         logger.info(f"Cleared all {removed_count} cache entries")
@@ -732,43 +755,22 @@ class QueryCacheManager:
 
         try:
             # 1. 标准化查询文本（与 get_cache_key 一致）
-            normalized_query = " ".join(query.lower().strip().split())
-
-            # 2. 编码当前查询
-            query_embedding = self.embedding_model.encode(normalized_query, convert_to_tensor=True)
-
-            # 3. 遍历已缓存的查询
-            best_match = None
-            best_similarity = 0.0
-            target_intent = context.get("query_intent", "query")
-            target_spatial = context.get("enable_spatial", True)
-
-            for cached_key, cached_entry in self.metadata["cache_entries"].items():
-                cached_query = cached_entry.get("query", "")
-                if not cached_query:
-                    continue
-
-                # ✅ 上下文过滤（确保 intent 和 spatial 一致）
-                # 从缓存键中提取上下文信息（需要解析，这里简化处理：直接比较查询文本）
-                # 注意：这里假设缓存元数据中存储了原始查询文本
-
-                # 获取或计算缓存查询的向量
-                if cached_query not in self.query_embeddings:
-                    self.query_embeddings[cached_query] = self.embedding_model.encode(
-                        cached_query, convert_to_tensor=True
-                    )
-
-                cached_embedding = self.query_embeddings[cached_query]
-
-                # 计算余弦相似度
-                similarity = util.cos_sim(query_embedding, cached_embedding).item()
+            normalized_query = self.query_normalizer.normalize(query)
 
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = cached_key
+            # 2. 与已缓存查询批量比较（已缓存查询的向量持久化复用，缺失的一次性批量编码）
+            query_to_key = {
+                self.query_normalizer.normalize(entry["query"]): key
+                for key, entry in self.metadata["cache_entries"].items()
+                if entry.get("query")
+            }
+            match = self.embedding_service.most_similar(normalized_query, list(query_to_key))
+            if match is None:
+                return None
+            best_query, best_similarity = match
+            best_match = query_to_key[best_query]
 
-            # 4. 如果相似度超过阈值，返回缓存键
-            if best_match and best_similarity >= self.similarity_threshold:
+            # 3. 如果相似度超过阈值，返回缓存键
+            if best_similarity >= self.similarity_threshold:
                 logger.info(
                     f"✓ Found similar cached query (similarity={best_similarity:.2%}): "
                     f"'{query[:50]}...' → '{self.metadata['cache_entries'][best_match]['query'][:50]}...'"
@@ -0,0 +1,152 @@
+"""
+缓存后台刷新模块 - Sight Server
+实现 stale-while-revalidate：过期条目先直接返回，后台只重放保存的 SQL 刷新数据，
+重放失败（或结果行数变化导致答案可能失效）时才完整重跑 Agent
+"""
+
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class StaleCacheRefresher:
+    """
+    过期缓存后台刷新器
+
+    - 同一缓存键同时只刷新一次（去重）
+    - 队列有上限，刷新任务积压时直接丢弃，由 TTL 兜底
+    """
+
+    def __init__(
+        self,
+        replay_fn: Callable[[str], Dict[str, Any]],
+        save_fn: Callable[[str, Dict[str, Any]], Any],
+        rerun_fn: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+        max_pending: int = 100,
+    ):
+        """
+        初始化刷新器
+
+        Args:
+            replay_fn: SQL重放函数，参数为SQL，返回 {"status", "data", "count"}
+            save_fn: 保存刷新结果的函数，参数为 (查询文本, 结果数据)
+            rerun_fn: 完整重跑Agent的函数，参数为查询文本，返回新的结果数据（失败返回 None）
+            max_pending: 最大待刷新任务数
+        """
+        self.replay_fn = replay_fn
+        self.save_fn = save_fn
+        self.rerun_fn = rerun_fn
+
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending)
+        self._in_flight: Set[str] = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="cache-refresh", daemon=True)
+        self._thread.start()
+
+        # 统计
+        self.scheduled = 0
+        self.dropped = 0
+        self.replayed = 0
+        self.rerun = 0
+        self.failed = 0
+
+    def schedule(self, cache_key: str, query_text: str, cached_result: Dict[str, Any]) -> bool:
+        """
+        提交刷新任务
+
+        Args:
+            cache_key: 缓存键
+            query_text: 原始查询
+            cached_result: 当前（已过期的）缓存结果
+
+        Returns:
+            是否已提交（已在刷新中或队列已满时返回 False）
+        """
+        with self._lock:
+            if cache_key in self._in_flight:
+                return False
+            try:
+                self._queue.put_nowait((cache_key, query_text, cached_result))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._in_flight.add(cache_key)
+            self.scheduled += 1
+        logger.debug(f"Scheduled stale cache refresh: {query_text[:50]}")
+        return True
+
+    def _run(self) -> None:
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            cache_key, query_text, cached_result = task
+            try:
+                self._refresh(query_text, cached_result)
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Stale cache refresh failed for '{query_text[:50]}': {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(cache_key)
+                self._queue.task_done()
+
+    def _refresh(self, query_text: str, cached_result: Dict[str, Any]) -> None:
+        """重放SQL刷新数据，必要时完整重跑"""
+        sql = cached_result.get("sql")
+        if sql:
+            replay = self.replay_fn(sql)
+            # 行数不变时原答案仍然适用，只替换数据
+            if replay.get("status") == "success" and replay.get("count") == cached_result.get("count"):
+                refreshed = {
+                    k: v for k, v in cached_result.items()
+                    if k not in ("stale", "query_text", "response_time", "hit_count")
+                }
+                if refreshed.get("data") is not None:
+                    refreshed["data"] = replay.get("data")
+                self.save_fn(query_text, refreshed)
+                self.replayed += 1
+                logger.info(f"Stale cache refreshed by SQL replay: {query_text[:50]}")
+                return
+            logger.info(
+                f"SQL replay unusable (status={replay.get('status')}, "
+                f"count {cached_result.get('count')} -> {replay.get('count')}), re-running agent")
+
+        if self.rerun_fn is None:
+            self.failed += 1
+            return
+        result = self.rerun_fn(query_text)
+        if result:
+            self.save_fn(query_text, result)
+            self.rerun += 1
+            logger.info(f"Stale cache refreshed by full agent re-run: {query_text[:50]}")
+        else:
+            self.failed += 1
+
+    def flush(self) -> None:
+        """等待已提交的刷新任务完成"""
+        self._queue.join()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止刷新线程（未处理的任务丢弃）"""
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取刷新统计"""
+        return {
+            "pending": self._queue.qsize(),
+            "in_flight": len(self._in_flight),
+            "scheduled": self.scheduled,
+            "dropped": self.dropped,
+            "refreshed_by_replay": self.replayed,
+            "refreshed_by_rerun": self.rerun,
+            "failed": self.failed,
+        }
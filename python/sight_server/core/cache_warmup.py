@@ -0,0 +1,269 @@
+"""
+缓存预热模块 - Sight Server
+根据历史查询频次和时间对热门查询排序，在服务就绪前预先填充各级缓存，
+并支持固定前 N 个热门条目、按计划后台刷新
+"""
+
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    """
+    查询缓存预热器
+
+    预热每条热门查询时依次尝试:
+    1. 已有缓存（文件/数据库任一层存在时同步到另一层）
+    2. 重放历史SQL（不经过LLM），行数与历史一致时复用历史答案
+    3. 完整重跑 Agent（仅在 allow_rerun 时）
+    """
+
+    def __init__(
+        self,
+        cache_manager,
+        database_connector,
+        replay_fn: Callable[[str], Dict[str, Any]],
+        rerun_fn: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+        half_life_hours: float = 72.0,
+    ):
+        """
+        初始化预热器
+
+        Args:
+            cache_manager: 查询缓存管理器
+            database_connector: 数据库连接器（读取会话历史）
+            replay_fn: SQL重放函数，返回 {"status", "data", "count"}
+            rerun_fn: 完整重跑 Agent 的函数，返回缓存数据
+            half_life_hours: 时间衰减半衰期（小时），越久远的查询权重越低
+        """
+        self.cache_manager = cache_manager
+        self.database_connector = database_connector
+        self.replay_fn = replay_fn
+        self.rerun_fn = rerun_fn
+        self.half_life_hours = half_life_hours
+
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._refresh_stopped = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    # ==================== 排序 ====================
+
+    def rank_queries(self, lookback_days: int = 30, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        按 频次 × 时间衰减 对历史查询排序
+
+        Args:
+            lookback_days: 统计最近多少天的会话历史
+            limit: 返回数量
+
+        Returns:
+            排序后的候选查询（含 score）
+        """
+        rows = self.database_connector.get_popular_queries(
+            lookback_days=lookback_days, limit=limit * 4)
+        now = datetime.now(timezone.utc)
+
+        candidates = []
+        for row in rows:
+            last_seen = row.get("last_seen")
+            age_hours = 0.0
+            if isinstance(last_seen, datetime):
+                if last_seen.tzinfo is None:
+                    last_seen = last_seen.replace(tzinfo=timezone.utc)
+                age_hours = max(0.0, (now - last_seen).total_seconds() / 3600)
+            frequency = int(row.get("frequency") or 0) + int(row.get("cache_hits") or 0)
+            candidate = dict(row)
+            candidate["score"] = frequency * 0.5 ** (age_hours / self.half_life_hours)
+            candidates.append(candidate)
+
+        candidates.sort(key=lambda c: c["score"], reverse=True)
+        return candidates[:limit]
+
+    # ==================== 预热 ====================
+
+    def warm_up(
+        self,
+        limit: int = 50,
+        lookback_days: int = 30,
+        pin_top_n: int = 0,
+        allow_rerun: bool = False,
+        time_budget: float = 60.0,
+    ) -> Dict[str, Any]:
+        """
+        预热缓存
+
+        Args:
+            limit: 预热的热门查询数量
+            lookback_days: 统计最近多少天的会话历史
+            pin_top_n: 固定排名前 N 的条目
+            allow_rerun: 重放失败时是否完整重跑 Agent（会调用LLM）
+            time_budget: 预热总时间预算（秒），超出后剩余查询跳过
+
+        Returns:
+            预热报告（耗时、覆盖率、各来源数量）
+        """
+        start = time.perf_counter()
+        report: Dict[str, Any] = {
+            "started_at": datetime.now().isoformat(),
+            "candidates": 0,
+            "already_cached": 0,
+            "from_replay": 0,
+            "from_rerun": 0,
+            "skipped": 0,
+            "failed": 0,
+            "pinned": 0,
+        }
+
+        try:
+            candidates = self.rank_queries(lookback_days=lookback_days, limit=limit)
+        except Exception as e:
+            logger.error(f"Cache warm-up ranking failed: {e}")
+            candidates = []
+        report["candidates"] = len(candidates)
+
+        total_frequency = 0
+        covered_frequency = 0
+        warmed_queries: List[str] = []
+
+        for candidate in candidates:
+            query_text = candidate.get("query_text") or ""
+            frequency = int(candidate.get("frequency") or 0)
+            total_frequency += frequency
+            if not query_text:
+                report["skipped"] += 1
+                continue
+            if time.perf_counter() - start > time_budget:
+                report["skipped"] += 1
+                continue
+
+            try:
+                source = self._warm_query(query_text, candidate, allow_rerun)
+            except Exception as e:
+                logger.warning(f"Cache warm-up failed for '{query_text[:50]}': {e}")
+                source = "failed"
+
+            report[source] += 1
+            if source in ("already_cached", "from_replay", "from_rerun"):
+                covered_frequency += frequency
+                warmed_queries.append(query_text)
+
+        for query_text in warmed_queries[:pin_top_n]:
+            if self.cache_manager.pin(query_text):
+                report["pinned"] += 1
+
+        warmed = len(warmed_queries)
+        report["warmed"] = warmed
+        report["query_coverage_percent"] = round(warmed / len(candidates) * 100, 2) if candidates else 0
+        report["traffic_coverage_percent"] = round(
+            covered_frequency / total_frequency * 100, 2) if total_frequency else 0
+        report["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        self.last_report = report
+        logger.info(
+            f"✓ Cache warm-up finished: {warmed}/{len(candidates)} queries, "
+            f"traffic coverage {report['traffic_coverage_percent']}%, "
+            f"pinned {report['pinned']}, {report['duration_ms']}ms")
+        return report
+
+    def _warm_query(self, query_text: str, candidate: Dict[str, Any], allow_rerun: bool) -> str:
+        """预热单条查询，返回结果来源（报告字段名）"""
+        if self.cache_manager.hydrate(query_text):
+            return "already_cached"
+
+        history = candidate.get("result_data") or {}
+        if isinstance(history, str):
+            try:
+                history = json.loads(history)
+            except json.JSONDecodeError:
+                history = {}
+
+        sql = candidate.get("sql_query")
+        if sql:
+            replay = self.replay_fn(sql)
+            if replay.get("status") == "success" and replay.get("count") == history.get("count"):
+                self.cache_manager.save_query_cache(query_text, {
+                    "status": "success",
+                    "answer": history.get("answer", ""),
+                    "data": replay.get("data") if history.get("data") is not None else None,
+                    "count": replay.get("count", 0),
+                    "message": "查询成功",
+                    "sql": sql,
+                })
+                return "from_replay"
+
+        if allow_rerun and self.rerun_fn is not None:
+            result = self.rerun_fn(query_text)
+            if result:
+                self.cache_manager.save_query_cache(query_text, result)
+                return "from_rerun"
+
+        return "skipped"
+
+    # ==================== 固定条目定期刷新 ====================
+
+    def start_pinned_refresh(self, interval: float = 1800.0) -> None:
+        """
+        启动固定条目的定期刷新线程
+
+        Args:
+            interval: 刷新间隔（秒）
+        """
+        if self._refresh_thread is not None:
+            return
+
+        def _loop():
+            while not self._refresh_stopped.wait(interval):
+                try:
+                    scheduled = self.cache_manager.refresh_pinned()
+                    logger.info(f"Scheduled refresh for {scheduled} pinned cache entries")
+                except Exception as e:
+                    logger.warning(f"Pinned cache refresh failed: {e}")
+
+        self._refresh_thread = threading.Thread(
+            target=_loop, name="pinned-cache-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        """停止定期刷新线程"""
+        self._refresh_stopped.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=5.0)
+            self._refresh_thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取预热统计（最近一次预热报告）"""
+        return {
+            "last_warmup": self.last_report,
+            "pinned_refresh_running": self._refresh_thread is not None and self._refresh_thread.is_alive(),
+        }
+
+
+# 测试代码
+if __name__ == "__main__":
+    from datetime import timedelta
+
+    logging.basicConfig(level=logging.INFO)
+
+    class _FakeDatabase:
+        def get_popular_queries(self, lookback_days=30, limit=200):
+            now = datetime.now(timezone.utc)
+            return [
+                {"query_text": "浙江省的5A景区", "frequency": 40, "cache_hits": 5,
+                 "last_seen": now - timedelta(days=10)},
+                {"query_text": "杭州西湖附近的景点", "frequency": 12, "cache_hits": 0,
+                 "last_seen": now - timedelta(hours=2)},
+                {"query_text": "北京有哪些博物馆", "frequency": 25, "cache_hits": 3,
+                 "last_seen": now - timedelta(days=2)},
+            ]
+
+    print("=== 热门查询排序（频次 × 时间衰减） ===\n")
+    warmer = CacheWarmer(cache_manager=None, database_connector=_FakeDatabase(),
+                         replay_fn=lambda sql: {})
+    for candidate in warmer.rank_queries(limit=10):
+        print(f"{candidate['score']:8.2f}  {candidate['query_text']}")
@@ -0,0 +1,401 @@
+"""
+有界会话历史模块 - Sight Server
+为 BaseLLM 的带历史调用提供有上限的会话存储：
+会话按 LRU + 空闲 TTL 淘汰，每个会话按消息数/token 数保留滑动窗口，
+被淘汰的会话可选持久化到 PostgreSQL，再次访问时恢复
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+from .schema_selector import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content
+    return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+
+
+class WindowedChatMessageHistory(BaseChatMessageHistory):
+    """
+    滑动窗口会话历史
+
+    追加消息后从最早的消息开始丢弃，直到消息数和估算 token 数都在上限内；
+    窗口开头不保留孤立的 AI 回复（保证以用户消息开始）
+    """
+
+    def __init__(self, max_messages: int = 20, max_tokens: int = 0,
+                 on_trim: Optional[Callable[[int], None]] = None):
+        """
+        初始化会话历史
+
+        Args:
+            max_messages: 保留的最大消息数，0 表示不限制
+            max_tokens: 保留消息的估算 token 上限，0 表示不限制
+            on_trim: 丢弃消息时的回调（参数为丢弃条数），用于统计
+        """
+        self.messages: List[BaseMessage] = []
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.on_trim = on_trim
+        self.last_access = time.monotonic()
+        self._tokens: List[int] = []
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """追加消息并裁剪窗口"""
+        for message in messages:
+            self.messages.append(message)
+            self._tokens.append(estimate_tokens(_message_text(message)))
+        self._trim()
+
+    def add_message(self, message: BaseMessage) -> None:
+        """追加单条消息"""
+        self.add_messages([message])
+
+    def clear(self) -> None:
+        """清空历史"""
+        self.messages = []
+        self._tokens = []
+
+    @property
+    def token_count(self) -> int:
+        """窗口内消息的估算 token 数"""
+        return sum(self._tokens)
+
+    @property
+    def byte_size(self) -> int:
+        """窗口内消息内容的字节数（UTF-8）"""
+        return sum(len(_message_text(m).encode("utf-8")) for m in self.messages)
+
+    def _trim(self) -> None:
+        drop = 0
+        total = len(self.messages)
+        tokens = sum(self._tokens)
+        while drop < total:
+            over_count = self.max_messages and total - drop > self.max_messages
+            over_tokens = self.max_tokens and tokens > self.max_tokens
+            orphan_ai = drop > 0 and self.messages[drop].type == "ai"
+            if not (over_count or over_tokens or orphan_ai):
+                break
+            tokens -= self._tokens[drop]
+            drop += 1
+        if drop:
+            del self.messages[:drop]
+            del self._tokens[:drop]
+            if self.on_trim:
+                self.on_trim(drop)
+
+
+class PostgresChatHistoryPersister:
+    """
+    被淘汰会话的 PostgreSQL 持久化（每个会话一行，消息以 JSONB 保存）
+    """
+
+    def __init__(self, connection_string: str, table: str = "llm_chat_history"):
+        """
+        初始化持久化器
+
+        Args:
+            connection_string: PostgreSQL连接字符串
+            table: 保存会话历史的表名（不存在时自动创建）
+        """
+        self.connection_string = connection_string
+        self.table = table
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None or self._connection.closed:
+            import psycopg2
+
+            self._connection = psycopg2.connect(self.connection_string)
+            self._connection.autocommit = True
+            with self._connection.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{self.table}" ('
+                    "session_id TEXT PRIMARY KEY, "
+                    "messages JSONB NOT NULL, "
+                    "updated_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+                )
+        return self._connection
+
+    def save(self, session_id: str, messages: List[BaseMessage]) -> None:
+        """保存会话消息（覆盖已有记录）"""
+        payload = json.dumps(messages_to_dict(messages), ensure_ascii=False)
+        with self._lock:
+            with self._connect().cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO "{self.table}" (session_id, messages, updated_at) '
+                    "VALUES (%s, %s::jsonb, now()) "
+                    "ON CONFLICT (session_id) DO UPDATE "
+                    "SET messages = EXCLUDED.messages, updated_at = now()",
+                    (session_id, payload),
+                )
+
+    def load(self, session_id: str) -> Optional[List[BaseMessage]]:
+        """读取会话消息，不存在时返回 None"""
+        with self._lock:
+            with self._connect().cursor() as cursor:
+                cursor.execute(
+                    f'SELECT messages FROM "{self.table}" WHERE session_id = %s', (session_id,))
+                row = cursor.fetchone()
+        if row is None:
+            return None
+        data = row[0] if not isinstance(row[0], str) else json.loads(row[0])
+        return messages_from_dict(data)
+
+    def delete(self, session_id: str) -> None:
+        """删除会话记录"""
+        with self._lock:
+            with self._connect().cursor() as cursor:
+                cursor.execute(f'DELETE FROM "{self.table}" WHERE session_id = %s', (session_id,))
+
+    def close(self) -> None:
+        """关闭连接"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class ChatHistoryStore:
+    """
+    有界会话历史存储
+
+    - 会话数超过 max_sessions 时淘汰最久未访问的会话（LRU）
+    - 空闲超过 idle_ttl 秒的会话在访问存储时被清理
+    - 配置了 persister 时被淘汰的会话写入数据库，再次访问时恢复（同样受窗口限制）
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        idle_ttl: float = 3600.0,
+        max_messages: int = 20,
+        max_tokens: int = 0,
+        persister: Optional[PostgresChatHistoryPersister] = None,
+    ):
+        """
+        初始化会话历史存储
+
+        Args:
+            max_sessions: 内存中最多保留的会话数，0 表示不限制
+            idle_ttl: 会话空闲过期时间（秒），0 表示不过期
+            max_messages: 每个会话保留的最大消息数，0 表示不限制
+            max_tokens: 每个会话保留的估算 token 上限，0 表示不限制
+            persister: 被淘汰会话的持久化器（可选）
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.persister = persister
+
+        self._sessions: "OrderedDict[str, WindowedChatMessageHistory]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._last_sweep = time.monotonic()
+
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+        self.trimmed_messages = 0
+        self.persisted = 0
+        self.restored = 0
+        self.persist_errors = 0
+
+    def _on_trim(self, count: int) -> None:
+        self.trimmed_messages += count
+
+    def _new_history(self) -> WindowedChatMessageHistory:
+        return WindowedChatMessageHistory(
+            max_messages=self.max_messages, max_tokens=self.max_tokens, on_trim=self._on_trim)
+
+    def get(self, session_id: str) -> WindowedChatMessageHistory:
+        """
+        获取或创建会话历史（RunnableWithMessageHistory 的 get_session_history）
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            会话历史
+        """
+        with self._lock:
+            self._sweep_idle()
+            history = self._sessions.get(session_id)
+            if history is None:
+                history = self._new_history()
+                restored = self._restore(session_id)
+                if restored:
+                    history.add_messages(restored)
+                self._sessions[session_id] = history
+                while self.max_sessions and len(self._sessions) > self.max_sessions:
+                    old_id, old_history = self._sessions.popitem(last=False)
+                    self.evicted_lru += 1
+                    self._persist(old_id, old_history)
+            else:
+                self._sessions.move_to_end(session_id)
+            history.last_access = time.monotonic()
+            return history
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._sessions
+
+    def keys(self) -> List[str]:
+        """内存中的会话ID列表"""
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def peek(self, session_id: str) -> Optional[WindowedChatMessageHistory]:
+        """读取会话历史（不刷新访问时间，不从数据库恢复）"""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def clear_session(self, session_id: str) -> bool:
+        """
+        清空会话历史（同时删除持久化记录）
+
+        Returns:
+            会话是否在内存中
+        """
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is not None:
+                history.clear()
+        if self.persister is not None:
+            try:
+                self.persister.delete(session_id)
+            except Exception as e:
+                logger.warning(f"Failed to delete persisted history for {session_id}: {e}")
+        return history is not None
+
+    def clear(self) -> None:
+        """清空内存中的全部会话（不写入数据库）"""
+        with self._lock:
+            self._sessions.clear()
+
+    def flush(self) -> int:
+        """
+        将内存中的会话全部持久化（服务关闭时调用）
+
+        Returns:
+            写入的会话数
+        """
+        if self.persister is None:
+            return 0
+        with self._lock:
+            sessions = list(self._sessions.items())
+        return sum(self._persist(session_id, history) for session_id, history in sessions)
+
+    def _sweep_idle(self) -> None:
+        now = time.monotonic()
+        # 最多每 1/10 TTL（且不超过 60 秒）扫描一次
+        if not self.idle_ttl or now - self._last_sweep < min(self.idle_ttl / 10, 60.0):
+            return
+        self._last_sweep = now
+        expired = [sid for sid, h in self._sessions.items() if now - h.last_access > self.idle_ttl]
+        for session_id in expired:
+            history = self._sessions.pop(session_id)
+            self.evicted_idle += 1
+            self._persist(session_id, history)
+        if expired:
+            logger.debug(f"Evicted {len(expired)} idle chat sessions")
+
+    def _persist(self, session_id: str, history: WindowedChatMessageHistory) -> bool:
+        if self.persister is None or not history.messages:
+            return False
+        try:
+            self.persister.save(session_id, history.messages)
+            self.persisted += 1
+            return True
+        except Exception as e:
+            self.persist_errors += 1
+            logger.warning(f"Failed to persist chat history for {session_id}: {e}")
+            return False
+
+    def _restore(self, session_id: str) -> Optional[List[BaseMessage]]:
+        if self.persister is None:
+            return None
+        try:
+            messages = self.persister.load(session_id)
+        except Exception as e:
+            self.persist_errors += 1
+            logger.warning(f"Failed to restore chat history for {session_id}: {e}")
+            return None
+        if messages:
+            self.restored += 1
+        return messages
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取存储统计
+
+        Returns:
+            会话数、消息数、字节数、token 数、淘汰与持久化计数
+        """
+        with self._lock:
+            histories = list(self._sessions.values())
+            return {
+                "sessions": len(histories),
+                "messages": sum(len(h.messages) for h in histories),
+                "bytes": sum(h.byte_size for h in histories),
+                "estimated_tokens": sum(h.token_count for h in histories),
+                "max_sessions": self.max_sessions,
+                "idle_ttl": self.idle_ttl,
+                "max_messages": self.max_messages,
+                "max_tokens": self.max_tokens,
+                "evicted_lru": self.evicted_lru,
+                "evicted_idle": self.evicted_idle,
+                "trimmed_messages": self.trimmed_messages,
+                "persistence": self.persister is not None,
+                "persisted": self.persisted,
+                "restored": self.restored,
+                "persist_errors": self.persist_errors,
+            }
+
+
+# 测试代码
+if __name__ == "__main__":
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    logging.basicConfig(level=logging.INFO)
+
+    class MemoryPersister:
+        """用字典代替数据库演示淘汰与恢复"""
+
+        def __init__(self):
+            self.rows: Dict[str, List[BaseMessage]] = {}
+
+        def save(self, session_id, messages):
+            self.rows[session_id] = list(messages)
+
+        def load(self, session_id):
+            return self.rows.get(session_id)
+
+        def delete(self, session_id):
+            self.rows.pop(session_id, None)
+
+    store = ChatHistoryStore(max_sessions=3, max_messages=6, max_tokens=120,
+                             persister=MemoryPersister())  # type: ignore[arg-type]
+
+    for i in range(5):
+        history = store.get(f"session_{i}")
+        for turn in range(6):
+            history.add_messages([HumanMessage(content=f"第{turn}轮：杭州西湖附近有哪些5A景区？"),
+                                  AIMessage(content=f"第{turn}轮回答：西湖、灵隐寺、千岛湖等景区。")])
+        print(f"session_{i}: {len(history.messages)} messages, ~{history.token_count} tokens, "
+              f"first={history.messages[0].type}")
+
+    print(f"\n内存中的会话: {store.keys()}")
+    restored = store.get("session_0")
+    print(f"恢复 session_0: {len(restored.messages)} messages")
+    print(json.dumps(store.get_stats(), ensure_ascii=False, indent=2))
@@ -918,6 +918,48 @@ class DatabaseConnector:
             self.logger.error(f"获取会话历史记录失败: {e}")
             return []
 
+    def get_popular_queries(
+        self,
+        lookback_days: int = 30,
+        limit: int = 200
+    ) -> Sequence[Dict[str, Any]]:
+        """
+        按查询频次统计历史热门查询（用于缓存预热）
+
+        Args:
+            lookback_days: 统计最近多少天的会话历史
+            limit: 返回记录数量
+
+        Returns:
+            热门查询列表，包含频次、最近查询时间、最近一次的SQL和结果、查询缓存命中数
+        """
+        try:
+            with self.raw_connection.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT
+                        h.query_text,
+                        COUNT(*) AS frequency,
+                        MAX(h.created_at) AS last_seen,
+                        (ARRAY_AGG(h.sql_query ORDER BY h.created_at DESC))[1] AS sql_query,
+                        (ARRAY_AGG(h.result_data ORDER BY h.created_at DESC))[1] AS result_data,
+                        COALESCE(MAX(c.hit_count), 0) AS cache_hits
+                    FROM conversation_history h
+                    LEFT JOIN (
+                        SELECT query_text, MAX(hit_count) AS hit_count
+                        FROM query_cache
+                        GROUP BY query_text
+                    ) c ON c.query_text = h.query_text
+                    WHERE h.status = 'success'
+                      AND h.created_at >= NOW() - (%s * INTERVAL '1 day')
+                    GROUP BY h.query_text
+                    ORDER BY frequency DESC, last_seen DESC
+                    LIMIT %s
+                """, (lookback_days, limit))
+                return cursor.fetchall()
+        except Exception as e:
+            self.logger.error(f"获取热门查询失败: {e}")
+            return []
+
     def save_ai_context(
         self,
         session_id: str,
@@ -1255,12 +1297,13 @@ class DatabaseConnector:
             self.logger.error(f"保存查询结果缓存失败: {e}")
             raise
 
-    def get_query_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
+    def get_query_cache(self, cache_key: str, count_hit: bool = True) -> Optional[Dict[str, Any]]:
         """
         从 query_cache 表获取查询结果缓存
 
         Args:
             cache_key: 缓存键
+            count_hit: 是否累加 hit_count（预热/同步等内部读取传 False）
 
         Returns:
             缓存数据，如果不存在或已过期则返回None
@@ -1274,15 +1317,14 @@ class DatabaseConnector:
                     WHERE cache_key = %s AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
                 """, (cache_key,))
                 result = cursor.fetchone()
-                if result:
+                if result and count_hit:
                     # 更新命中次数
                     cursor.execute("""
                         UPDATE query_cache 
                         SET hit_count = hit_count + 1, updated_at = CURRENT_TIMESTAMP
                         WHERE id = %s
                     """, (result['id'],))
-                    return dict(result)
-                return None
+                return dict(result) if result else None
         except Exception as e:
             self.logger.error(f"获取查询结果缓存失败: {e}")
             return None
@@ -1438,6 +1480,88 @@ class DatabaseConnector:
             self.logger.error(f"删除模式学习缓存失败: {e}")
             return False
 
+    def delete_query_caches(self, cache_keys: List[str]) -> int:
+        """
+        批量删除查询结果缓存
+
+        Args:
+            cache_keys: 缓存键列表
+
+        Returns:
+            删除的记录数量
+        """
+        if not cache_keys:
+            return 0
+        try:
+            with self.raw_connection.cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM query_cache WHERE cache_key = ANY(%s)", (list(cache_keys),))
+                return cursor.rowcount
+        except Exception as e:
+            self.logger.error(f"批量删除查询结果缓存失败: {e}")
+            return 0
+
+    def get_table_modification_counters(self, schema_name: Optional[str] = None) -> Dict[str, int]:
+        """
+        获取各用户表的累计增删改行数（pg_stat_user_tables），用于检测数据变更
+
+        Args:
+            schema_name: 模式名，默认使用 default_schema
+
+        Returns:
+            表名到累计修改行数的映射
+        """
+        with self.raw_connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT relname, n_tup_ins + n_tup_upd + n_tup_del AS modifications
+                FROM pg_stat_user_tables
+                WHERE schemaname = %s
+            """, (schema_name or self.default_schema,))
+            return {row[0]: int(row[1]) for row in cursor.fetchall()}
+
+    def install_table_change_triggers(
+        self,
+        table_names: Optional[List[str]] = None,
+        channel: str = "sight_table_changed"
+    ) -> List[str]:
+        """
+        为数据表安装语句级触发器，数据变更时通过 pg_notify 发送表名
+
+        Args:
+            table_names: 要安装触发器的表，默认为所有可用表
+            channel: 通知频道名
+
+        Returns:
+            成功安装触发器的表名列表
+        """
+        tables = table_names or self.get_usable_table_names()
+        installed = []
+        with self.raw_connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE OR REPLACE FUNCTION sight_notify_table_change() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify('{channel}', TG_TABLE_NAME);
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """)
+            for table in tables:
+                if table == "query_cache":
+                    continue
+                schema, name = self._split_table_identifier(table)
+                try:
+                    cursor.execute(f"""
+                        DROP TRIGGER IF EXISTS sight_table_change ON "{schema}"."{name}";
+                        CREATE TRIGGER sight_table_change
+                        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "{schema}"."{name}"
+                        FOR EACH STATEMENT EXECUTE FUNCTION sight_notify_table_change()
+                    """)
+                    installed.append(name)
+                except Exception as e:
+                    self.logger.warning(f"安装表变更触发器失败 {table}: {e}")
+        self.logger.info(f"已为 {len(installed)} 张表安装变更通知触发器")
+        return installed
+
     def cleanup_expired_query_cache(self) -> int:
         """
         清理过期的查询结果缓存
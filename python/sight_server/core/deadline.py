@@ -0,0 +1,130 @@
+"""
+请求截止时间模块 - Sight Server
+HTTP 层按 AGENT_MAX_EXECUTION_TIME 设定截止时间（Unix 时间戳），写入 AgentState 供条件边判断，
+同时放入上下文变量，LLM 与数据库调用以剩余时间作为超时，超时后图直接用已获取的部分结果生成答案
+"""
+
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的截止时间（LangGraph 在线程池中执行节点时会复制上下文）
+_current_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "request_deadline", default=None)
+
+DEADLINE_EXCEEDED_STATUS = "deadline_exceeded"
+DEADLINE_EXCEEDED_MESSAGE = "查询超过最大执行时间，返回已获取的部分结果"
+
+
+class DeadlineExceededError(TimeoutError):
+    """请求已超过截止时间"""
+
+
+def deadline_after(seconds: Optional[float], now: Optional[float] = None) -> Optional[float]:
+    """
+    计算截止时间
+
+    Args:
+        seconds: 允许的执行时间（秒），None 或不大于 0 表示不限制
+        now: 起始时间（Unix 时间戳），默认当前时间
+
+    Returns:
+        截止时间（Unix 时间戳），不限制时为 None
+    """
+    if not seconds or seconds <= 0:
+        return None
+    return (now if now is not None else time.time()) + seconds
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    在该范围内生效的请求截止时间
+
+    Args:
+        deadline: 截止时间（Unix 时间戳），None 表示不限制
+
+    Yields:
+        截止时间
+    """
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    """获取当前上下文中的截止时间（不在请求内时返回 None）"""
+    return _current_deadline.get()
+
+
+def remaining_seconds(deadline: Optional[float] = None) -> Optional[float]:
+    """
+    距截止时间的剩余秒数
+
+    Args:
+        deadline: 截止时间，默认使用当前上下文中的截止时间
+
+    Returns:
+        剩余秒数（已超时为 0），没有截止时间时为 None
+    """
+    if deadline is None:
+        deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+def is_past_deadline(deadline: Optional[float] = None) -> bool:
+    """
+    是否已超过截止时间
+
+    Args:
+        deadline: 截止时间，默认使用当前上下文中的截止时间
+
+    Returns:
+        已超时为 True；没有截止时间时为 False
+    """
+    remaining = remaining_seconds(deadline)
+    return remaining is not None and remaining <= 0
+
+
+def clamp_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    用剩余时间限制单次调用的超时
+
+    Args:
+        timeout: 调用自身的超时（秒），None 表示使用调用方默认值
+
+    Returns:
+        min(timeout, 剩余时间)；没有截止时间时原样返回 timeout
+
+    Raises:
+        DeadlineExceededError: 已超过截止时间
+    """
+    remaining = remaining_seconds()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceededError("请求已超过截止时间")
+    return min(timeout, remaining) if timeout else remaining
+
+
+# 测试代码
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    print(f"no deadline: remaining={remaining_seconds()}, clamp(60)={clamp_timeout(60)}")
+    with deadline_scope(deadline_after(0.2)):
+        print(f"remaining={remaining_seconds():.2f}s, clamp(60)={clamp_timeout(60):.2f}s, clamp(None)={clamp_timeout(None):.2f}s")
+        time.sleep(0.25)
+        print(f"past deadline: {is_past_deadline()}")
+        try:
+            clamp_timeout(60)
+        except DeadlineExceededError as e:
+            print(f"DeadlineExceededError: {e}")
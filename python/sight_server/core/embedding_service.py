@@ -0,0 +1,441 @@
+"""
+Embedding服务模块 - Sight Server
+语义缓存共用的向量服务：批量编码、向量持久化到缓存目录、可选 int8/float16 量化推理，
+重启后直接加载已保存的向量，不会重复编码已有条目
+"""
+
+import os
+import re
+import atexit
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 推理量化模式: none（原始 float32）/ float16（模型权重半精度，内存减半）/ int8（动态量化 Linear 层，CPU 推理加速）
+QUANTIZATION_MODES = ("none", "float16", "int8")
+
+
+def quantize_model(model, mode: str = "none"):
+    """
+    对 SentenceTransformer 模型做推理量化
+
+    Args:
+        model: SentenceTransformer 模型
+        mode: 量化模式 none/float16/int8
+
+    Returns:
+        量化后的模型
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unsupported embedding quantization: {mode}")
+    if mode == "none":
+        return model
+
+    import torch
+
+    if mode == "int8":
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model.half()
+
+
+class EmbeddingService:
+    """
+    查询向量服务
+
+    - 向量统一做 L2 归一化并以 float16 保存，余弦相似度即点积
+    - 缓存条目的向量持久化到 {store_dir}/{模型}-{量化}.npz，模型或量化模式变化时自动使用新文件；
+      有变更时最多每 save_interval 秒整体写盘一次，关闭/退出时再写一次
+    - 新增条目先进入待编码队列，攒够一批（或需要检索时）再一次性批量编码
+    - 只用于检索的查询向量放在有界的临时缓存中，不持久化
+    """
+
+    def __init__(
+        self,
+        model,
+        model_name: str,
+        store_dir: Optional[str] = None,
+        batch_size: int = 32,
+        quantization: str = "none",
+        max_entries: int = 10000,
+        recent_size: int = 256,
+        save_interval: float = 60.0,
+    ):
+        """
+        初始化向量服务
+
+        Args:
+            model: SentenceTransformer 模型（未量化）
+            model_name: 模型名称（用于区分持久化文件）
+            store_dir: 向量持久化目录，None 表示只保存在内存中
+            batch_size: 批量编码大小
+            quantization: 推理量化模式 none/float16/int8
+            max_entries: 持久化向量的最大条目数（超过后丢弃最早加入的）
+            recent_size: 临时查询向量缓存大小
+            save_interval: 两次写盘的最小间隔（秒），0 表示每次变更都写盘
+        """
+        self.model_name = model_name
+        self.quantization = quantization
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+        self.recent_size = recent_size
+        self.save_interval = save_interval
+        self.model = quantize_model(model, quantization)
+
+        self._lock = threading.RLock()
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._recent: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._pending: "OrderedDict[str, None]" = OrderedDict()
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        self._store_path = None
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+            slug = re.sub(r'[^\w.-]', '_', model_name)
+            self._store_path = os.path.join(store_dir, f"{slug}-{quantization}.npz")
+
+        # 统计
+        self.loaded = 0
+        self.encoded = 0
+        self.batches = 0
+        self.encode_ms = 0.0
+        self.reused = 0
+        self.saves = 0
+
+        self._load_store()
+
+    # ==================== 持久化 ====================
+
+    def _load_store(self) -> None:
+        """加载已持久化的向量"""
+        if not self._store_path or not os.path.exists(self._store_path):
+            return
+        try:
+            with np.load(self._store_path, allow_pickle=False) as store:
+                texts = store["texts"].tolist()
+                vectors = store["vectors"]
+            for text, vector in zip(texts, vectors):
+                self._vectors[text] = vector
+            self.loaded = len(texts)
+            logger.info(f"✓ Loaded {self.loaded} persisted embeddings from {self._store_path}")
+        except Exception as e:
+            logger.warning(f"Failed to load persisted embeddings {self._store_path}: {e}")
+
+    def save(self) -> bool:
+        """
+        将向量写入持久化文件（先写临时文件再替换，避免中途崩溃损坏）
+
+        Returns:
+            是否写入
+        """
+        with self._lock:
+            if not self._store_path or not self._dirty:
+                return False
+            texts = list(self._vectors)
+            vectors = (np.stack(list(self._vectors.values())) if texts
+                       else np.zeros((0, 0), dtype=np.float16))
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+        tmp_path = f"{self._store_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, texts=np.array(texts, dtype=str), vectors=vectors)
+            os.replace(tmp_path, self._store_path)
+            self.saves += 1
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to persist embeddings: {e}")
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def _maybe_save(self) -> bool:
+        """距上次写盘超过 save_interval 时写盘（合并多次变更，避免每次新增都重写整个文件）"""
+        with self._lock:
+            due = self._dirty and time.monotonic() - self._last_save >= self.save_interval
+        return self.save() if due else False
+
+    def close(self) -> None:
+        """编码所有待编码条目并立即写盘（关闭或进程退出时调用）"""
+        self.flush_pending()
+        self.save()
+
+    # ==================== 编码 ====================
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """批量编码并归一化为 float16"""
+        start = time.perf_counter()
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        self.encode_ms += (time.perf_counter() - start) * 1000
+        self.encoded += len(texts)
+        self.batches += 1
+        return np.asarray(vectors, dtype=np.float16)
+
+    def _store_vectors(self, texts: List[str], vectors: Iterable[np.ndarray]) -> None:
+        """保存条目向量（调用方需持有锁）"""
+        for text, vector in zip(texts, vectors):
+            self._vectors[text] = vector
+            self._vectors.move_to_end(text)
+        while len(self._vectors) > self.max_entries:
+            self._vectors.popitem(last=False)
+        self._dirty = True
+
+    def embed(self, text: str) -> np.ndarray:
+        """
+        获取单条文本的向量（已有条目直接复用，否则编码后放入临时缓存）
+
+        Args:
+            text: 文本
+
+        Returns:
+            归一化的 float16 向量
+        """
+        with self._lock:
+            vector = self._vectors.get(text)
+            if vector is None:
+                vector = self._recent.get(text)
+            if vector is not None:
+                self.reused += 1
+                return vector
+
+        vector = self._encode_batch([text])[0]
+        with self._lock:
+            self._recent[text] = vector
+            while len(self._recent) > self.recent_size:
+                self._recent.popitem(last=False)
+        return vector
+
+    def add(self, texts: Iterable[str]) -> None:
+        """
+        登记需要持久化向量的缓存条目，攒够一批后批量编码
+
+        Args:
+            texts: 缓存条目的查询文本
+        """
+        with self._lock:
+            for text in texts:
+                if not text or text in self._vectors:
+                    continue
+                # 检索时已经编码过的查询直接转为持久化条目
+                vector = self._recent.pop(text, None)
+                if vector is not None:
+                    self._store_vectors([text], [vector])
+                    self.reused += 1
+                else:
+                    self._pending[text] = None
+            ready = len(self._pending) >= self.batch_size
+        if ready:
+            self.flush_pending()
+
+    def flush_pending(self) -> int:
+        """
+        批量编码所有待编码条目（写盘按 save_interval 合并）
+
+        Returns:
+            编码的条目数
+        """
+        with self._lock:
+            texts = [t for t in self._pending if t not in self._vectors]
+            self._pending.clear()
+        if texts:
+            vectors = self._encode_batch(texts)
+            with self._lock:
+                self._store_vectors(texts, vectors)
+        self._maybe_save()
+        return len(texts)
+
+    def remove(self, texts: Iterable[str]) -> None:
+        """移除条目向量（缓存条目被淘汰、过期或失效时调用；只标记变更，下次写盘时生效）"""
+        with self._lock:
+            for text in texts:
+                self._pending.pop(text, None)
+                if self._vectors.pop(text, None) is not None:
+                    self._dirty = True
+
+    def clear(self) -> None:
+        """清空所有向量（包括持久化文件）"""
+        with self._lock:
+            self._vectors.clear()
+            self._recent.clear()
+            self._pending.clear()
+            self._dirty = True
+        self.save()
+
+    # ==================== 检索 ====================
+
+    def most_similar(self, query: str, candidates: List[str]) -> Optional[Tuple[str, float]]:
+        """
+        在候选文本中查找与查询余弦相似度最高的一条
+
+        缺少向量的候选会一次性批量编码并持久化
+
+        Args:
+            query: 查询文本
+            candidates: 候选文本（通常为已缓存的查询）
+
+        Returns:
+            (最相似文本, 相似度)，没有候选时返回 None
+        """
+        if not candidates:
+            return None
+
+        with self._lock:
+            for text in candidates:
+                if text not in self._vectors:
+                    self._pending[text] = None
+        self.flush_pending()
+
+        query_vector = self.embed(query).astype(np.float32)
+        with self._lock:
+            available = [text for text in candidates if text in self._vectors]
+            if not available:
+                return None
+            matrix = np.stack([self._vectors[text] for text in available])
+
+        scores = matrix.astype(np.float32) @ query_vector
+        best = int(np.argmax(scores))
+        return available[best], float(scores[best])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取向量服务统计
+
+        Returns:
+            向量条目数、编码次数/耗时、复用次数、向量内存占用等
+        """
+        with self._lock:
+            vector_bytes = sum(v.nbytes for v in self._vectors.values())
+            entries = len(self._vectors)
+            pending = len(self._pending)
+        return {
+            "model": self.model_name,
+            "quantization": self.quantization,
+            "entries": entries,
+            "pending": pending,
+            "loaded_from_store": self.loaded,
+            "encoded": self.encoded,
+            "encode_batches": self.batches,
+            "avg_encode_ms_per_text": round(self.encode_ms / self.encoded, 3) if self.encoded else 0,
+            "reused": self.reused,
+            "saves": self.saves,
+            "vector_memory_bytes": vector_bytes,
+            "store_path": self._store_path,
+        }
+
+
+# ==================== 共享实例 ====================
+
+_shared_services: Dict[Tuple[str, str], EmbeddingService] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_embedding_service(
+    model_name: str,
+    loader: Callable[[], Any],
+    store_dir: Optional[str] = None,
+    quantization: str = "none",
+    batch_size: int = 32,
+) -> Optional[EmbeddingService]:
+    """
+    获取（或创建）进程内共享的向量服务，多个缓存管理器只加载一次模型
+
+    Args:
+        model_name: 模型名称
+        loader: 模型加载函数，返回 SentenceTransformer 模型（失败返回 None）
+        store_dir: 向量持久化目录（仅首次创建时生效）
+        quantization: 推理量化模式
+        batch_size: 批量编码大小
+
+    Returns:
+        向量服务，模型加载失败时返回 None
+    """
+    key = (model_name, quantization)
+    with _shared_lock:
+        service = _shared_services.get(key)
+        if service is None:
+            model = loader()
+            if model is None:
+                return None
+            service = EmbeddingService(
+                model, model_name, store_dir=store_dir,
+                batch_size=batch_size, quantization=quantization)
+            _shared_services[key] = service
+            # 退出前把未攒满一批的条目编码并写盘，下次启动无需重新编码
+            atexit.register(service.close)
+        return service
+
+
+def _current_rss_mb() -> float:
+    """当前进程常驻内存（MB）"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# 测试代码：CPU 编码基准（逐条 vs 批量，各量化模式）
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO)
+    from sentence_transformers import SentenceTransformer
+
+    model_name = sys.argv[1] if len(sys.argv) > 1 else "paraphrase-multilingual-MiniLM-L12-v2"
+    queries = [
+        f"{city}{kind}有哪些{level}景区"
+        for city in ("杭州", "北京", "成都", "西安", "苏州", "桂林", "厦门", "昆明")
+        for kind in ("", "附近", "市区")
+        for level in ("5A", "4A")
+    ]
+
+    print(f"=== Embedding CPU 基准: {model_name}, {len(queries)} 条查询 ===\n")
+    print(f"{'mode':8} {'single ms/q':>12} {'batch ms/q':>11} {'rss MB':>8} {'cos vs fp32':>12}")
+    baseline = None
+    for mode in QUANTIZATION_MODES:
+        rss_before = _current_rss_mb()
+        service = EmbeddingService(
+            SentenceTransformer(model_name, device="cpu"), model_name,
+            store_dir=tempfile.mkdtemp(), quantization=mode)
+        rss_after = _current_rss_mb()
+
+        start = time.perf_counter()
+        single = [service._encode_batch([q])[0] for q in queries]
+        single_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        start = time.perf_counter()
+        batch = service._encode_batch(queries)
+        batch_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        batch = batch.astype(np.float32)
+        if baseline is None:
+            baseline = batch
+        agreement = float(np.mean(np.sum(batch * baseline, axis=1)))
+        print(f"{mode:8} {single_ms:12.2f} {batch_ms:11.2f} {rss_after - rss_before:8.1f} {agreement:12.4f}")
+        del single
+
+    service.add(queries)
+    service.close()
+    reloaded = EmbeddingService(
+        SentenceTransformer(model_name, device="cpu"), model_name,
+        store_dir=os.path.dirname(service._store_path), quantization=service.quantization)
+    print(f"\nreloaded {reloaded.loaded} persisted embeddings, encoded after restart: {reloaded.encoded}")
+    print(reloaded.most_similar("杭州有哪些5A级景区", queries))
@@ -4,13 +4,14 @@ LangGraph图构建器模块 - Sight Server
 """
 
 import logging
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, Optional
 
 from langgraph.graph import StateGraph, END
 
 from ..schemas import AgentState
-from .edges import should_continue_querying, should_retry_or_fail, should_requery, should_summarize_conversation, should_interrupt_after_intent
+from .edges import should_continue_querying, should_retry_or_fail, should_requery, should_summarize_conversation, should_interrupt_after_intent, should_interrupt_after_generation, should_finish_after_validate_and_answer
 from .summarization import summarize_conversation
+from .nodes.base import track_node
 from .context_schemas import AgentContextSchema
 from langgraph.checkpoint.memory import InMemorySaver
 from config import settings
@@ -30,29 +31,39 @@ class GraphBuilder:
     """
 
     @staticmethod
-    def build(node_handlers: Dict[str, Callable[[AgentState], Dict[str, Any]]], checkpointer=None, store=None, enable_final_validation: bool = False):
+    def build(node_handlers: Dict[str, Callable[[AgentState], Dict[str, Any]]], checkpointer=None, store=None, enable_final_validation: bool = False, parallel_prepare: Optional[bool] = None, fused_validate_answer: Optional[bool] = None):
         """
         构建LangGraph工作流
 
         节点执行结构:
         `
         START
-          → fetch_schema (获取数据库Schema)
-          → analyze_intent (解析查询意图)
+          → prepare_query (并行: fetch_schema / summarize_conversation / analyze_intent)
+            或顺序执行 fetch_schema → [summarize_conversation] → analyze_intent
           → enhance_query (增强查询文本)
           → generate_sql (生成SQL)
-          → execute_sql (执行SQL)
+          → [条件] should_interrupt_after_generation
+              ↘ interrupt_check (融合生成判定查询不明确) 或 execute_sql (执行SQL)
           → [条件] should_retry_or_fail
               ↘ handle_error (处理错误) 或 check_results (规则检查)
           → [条件] should_requery
               ↘ generate_sql (需要重新查询) 或 validate_results (结果验证)
+                或 generate_answer (LLM预算已用完，跳过验证)
           → [条件] should_continue_querying
               ↘ generate_sql (继续迭代) 或 generate_answer (生成答案)
               → END
+
+        融合模式（fused_validate_answer）用 validate_and_answer 替代 validate_results：
+        一次LLM调用返回验证结论与最终回答，验证通过时直接 END（跳过 generate_answer / final_validation），
+        仅在结论要求时回到 generate_sql
         `
 
         Args:
             node_handlers: 节点名称到可调用对象的映射
+            parallel_prepare: 是否并行执行 schema/总结/意图（需提供 prepare_query 节点），
+                默认读取 GRAPH_PARALLEL_PREPARE_ENABLED
+            fused_validate_answer: 是否用 validate_and_answer 融合节点替代 validate_results（需提供该节点），
+                默认读取 GRAPH_FUSED_VALIDATE_ANSWER_ENABLED
 
         Returns:
             编译后的LangGraph
@@ -81,9 +92,22 @@ class GraphBuilder:
             missing_list = ", ".join(sorted(missing))
             raise ValueError(f"Missing node handlers: {missing_list}")
 
+        if parallel_prepare is None:
+            parallel_prepare = settings.GRAPH_PARALLEL_PREPARE_ENABLED
+        parallel_prepare = parallel_prepare and "prepare_query" in node_handlers
+
+        if fused_validate_answer is None:
+            fused_validate_answer = settings.GRAPH_FUSED_VALIDATE_ANSWER_ENABLED
+        fused_validate_answer = fused_validate_answer and "validate_and_answer" in node_handlers
+        validate_node = "validate_and_answer" if fused_validate_answer else "validate_results"
+
         workflow = StateGraph(AgentState, context_schema=AgentContextSchema)
 
-        workflow.add_node("fetch_schema", node_handlers["fetch_schema"])
+        if parallel_prepare:
+            # ✅ schema/总结/意图互不依赖，在组合节点内并行执行
+            workflow.add_node("prepare_query", node_handlers["prepare_query"])
+        else:
+            workflow.add_node("fetch_schema", node_handlers["fetch_schema"])
 
         workflow.add_node("analyze_intent", node_handlers["analyze_intent"])
         workflow.add_node("interrupt_check", node_handlers["interrupt_check"])
@@ -92,7 +116,7 @@ class GraphBuilder:
         workflow.add_node("execute_sql", node_handlers["execute_sql"])
         workflow.add_node("handle_error", node_handlers["handle_error"])
         workflow.add_node("check_results", node_handlers["check_results"])
-        workflow.add_node("validate_results", node_handlers["validate_results"])
+        workflow.add_node(validate_node, node_handlers[validate_node])
         workflow.add_node("generate_answer", node_handlers["generate_answer"])
 
         # ✅ 新增：final_validation节点可选
@@ -100,29 +124,40 @@ class GraphBuilder:
             workflow.add_node("final_validation", node_handlers["final_validation"])
             logger.info("✓ Added final_validation node (enabled)")
 
-        # ✅ 新增：对话总结节点
-        workflow.add_node("summarize_conversation", summarize_conversation)
-        logger.info("✓ Added summarize_conversation node for memory optimization")
-
-        node_count = 11 if not enable_final_validation else 12
-        logger.info(f"✓ Added {node_count} nodes to workflow (including fetch_schema, interrupt_check, handle_error, check_results, and validate_results)")
-
-        workflow.set_entry_point(key="fetch_schema")
-
-        # 在查询开始前添加总结检查
-        workflow.add_conditional_edges(
-            "fetch_schema",
-            should_summarize_conversation,
-            {
-                "summarize_conversation": "summarize_conversation",
-                "continue": "analyze_intent",
-            },
-        )
-
-        workflow.add_edge("summarize_conversation", "analyze_intent")
-        logger.info("✓ Added summary check at workflow start")
-
-        # 在analyze_intent后添加条件边
+        if parallel_prepare:
+            workflow.set_entry_point(key="prepare_query")
+
+            # prepare_query 已包含意图分析，直接判断是否需要中断
+            workflow.add_conditional_edges(
+                "prepare_query",
+                should_interrupt_after_intent,
+                {
+                    "interrupt_check": "interrupt_check",
+                    "enhance_query": "enhance_query",
+                },
+            )
+            logger.info("✓ Added parallel prepare_query entry (schema / summary / intent)")
+        else:
+            # ✅ 新增：对话总结节点
+            workflow.add_node("summarize_conversation", track_node("summarize_conversation", summarize_conversation))
+            logger.info("✓ Added summarize_conversation node for memory optimization")
+
+            workflow.set_entry_point(key="fetch_schema")
+
+            # 在查询开始前添加总结检查
+            workflow.add_conditional_edges(
+                "fetch_schema",
+                should_summarize_conversation,
+                {
+                    "summarize_conversation": "summarize_conversation",
+                    "continue": "analyze_intent",
+                },
+            )
+
+            workflow.add_edge("summarize_conversation", "analyze_intent")
+            logger.info("✓ Added summary check at workflow start")
+
+        # 在analyze_intent后添加条件边（interrupt_check 澄清后重新分析意图）
         workflow.add_conditional_edges(
             "analyze_intent",
             should_interrupt_after_intent,
@@ -137,10 +172,19 @@ class GraphBuilder:
         workflow.add_edge("interrupt_check", "analyze_intent")
         logger.info("✓ Added interrupt restart edge")
         workflow.add_edge("enhance_query", "generate_sql")
-        workflow.add_edge("generate_sql", "execute_sql")
-
         logger.info("✓ Added sequential edges")
 
+        # 融合生成判定查询不明确时，先请求澄清而不是执行 SQL
+        workflow.add_conditional_edges(
+            "generate_sql",
+            should_interrupt_after_generation,
+            {
+                "interrupt_check": "interrupt_check",
+                "execute_sql": "execute_sql",
+            },
+        )
+        logger.info("✓ Added interrupt check after fused SQL generation")
+
         workflow.add_conditional_edges(
             "execute_sql",
             should_retry_or_fail,
@@ -160,7 +204,8 @@ class GraphBuilder:
             should_requery,
             {
                 "generate_sql": "generate_sql",
-                "validate_results": "validate_results",
+                "validate_results": validate_node,
+                "generate_answer": "generate_answer",
             },
         )
 
@@ -168,14 +213,27 @@ class GraphBuilder:
 
         # 移除validate_results后的总结检查，因为现在在查询开始时检查
 
-        workflow.add_conditional_edges(
-            "validate_results",
-            should_continue_querying,
-            {
-                "generate_sql": "generate_sql",
-                "generate_answer": "generate_answer",
-            },
-        )
+        if fused_validate_answer:
+            # ✅ 验证与回答融合：回答已生成时直接结束
+            workflow.add_conditional_edges(
+                "validate_and_answer",
+                should_finish_after_validate_and_answer,
+                {
+                    "generate_sql": "generate_sql",
+                    "generate_answer": "generate_answer",
+                    "end": END,
+                },
+            )
+            logger.info("✓ Added fused validate_and_answer node")
+        else:
+            workflow.add_conditional_edges(
+                "validate_results",
+                should_continue_querying,
+                {
+                    "generate_sql": "generate_sql",
+                    "generate_answer": "generate_answer",
+                },
+            )
 
         logger.info("✓ Added conditional edge for iteration control")
 
@@ -8,11 +8,25 @@ from typing import Literal
 
 from langgraph.types import Command
 
+from ..deadline import is_past_deadline
+from ..llm_usage import current_query_usage
 from ..schemas import AgentState
 
 logger = logging.getLogger(__name__)
 
 
+def _note_budget_skip(node: str) -> None:
+    """记录因LLM预算耗尽而跳过的节点（写入查询用量的 skipped_nodes）"""
+    usage = current_query_usage()
+    if usage is not None:
+        usage.note_skipped(node)
+
+
+def _deadline_passed(state: AgentState) -> bool:
+    """请求是否已超过截止时间（节点已标记，或在条件边判断时刚好到期）"""
+    return bool(state.get("deadline_exceeded")) or is_past_deadline(state.get("deadline"))
+
+
 def should_retry_or_fail(
     state: AgentState
 ) -> Literal["handle_error", "check_results"]:
@@ -24,6 +38,7 @@ def should_retry_or_fail(
     2. 如果有错误且可以重试 → 进入错误处理节点
     3. 如果错误不可恢复 → 继续（在check_results中会停止）
     4. 如果SQL执行重试耗尽 → 继续到规则检查节点（避免无限循环）
+    5. 如果已超过请求截止时间 → 不再修复SQL，继续到规则检查节点（随后直接生成答案）
 
     Args:
         state: Agent状态
@@ -44,6 +59,17 @@ def should_retry_or_fail(
         logger.info("[Edge: should_retry_or_fail] No error, proceeding to check_results")
         return "check_results"
 
+    # 已超过请求截止时间，不再修复SQL
+    if _deadline_passed(state):
+        logger.warning("[Edge: should_retry_or_fail] Deadline exceeded, skipping SQL fix")
+        return "check_results"
+
+    # LLM预算已用完，不再调用LLM修复SQL
+    if state.get("llm_budget_exhausted"):
+        _note_budget_skip("handle_error")
+        logger.warning("[Edge: should_retry_or_fail] LLM budget exhausted, skipping SQL fix")
+        return "check_results"
+
     # 有错误但SQL执行重试已耗尽
     if sql_execution_retries >= max_sql_execution_retries:
         logger.warning(
@@ -78,7 +104,8 @@ def should_continue_querying(
     1. 如果有错误 → 生成答案（结束）
     2. 如果达到最大迭代次数 → 生成答案（结束）
     3. 如果 should_continue=False → 生成答案（结束）
-    4. 否则 → 继续生成SQL（循环）
+    4. 如果已超过请求截止时间 → 用已获取的部分结果生成答案（结束）
+    5. 否则 → 继续生成SQL（循环）
 
     Args:
         state: Agent状态
@@ -91,6 +118,17 @@ def should_continue_querying(
         logger.info("[Edge: should_continue_querying] Error detected, going to generate_answer")
         return "generate_answer"
 
+    # 已超过请求截止时间
+    if _deadline_passed(state):
+        logger.warning("[Edge: should_continue_querying] Deadline exceeded, going to generate_answer")
+        return "generate_answer"
+
+    # LLM预算已用完
+    if state.get("llm_budget_exhausted"):
+        _note_budget_skip("generate_sql")
+        logger.info("[Edge: should_continue_querying] LLM budget exhausted, going to generate_answer")
+        return "generate_answer"
+
     # 检查迭代次数
     current_step = state.get("current_step", 0)
     max_iterations = state.get("max_iterations", 10)
@@ -119,7 +157,7 @@ def should_continue_querying(
 
 def should_requery(
     state: AgentState
-) -> Literal["generate_sql", "validate_results"]:
+) -> Literal["generate_sql", "validate_results", "generate_answer"]:
     """
     条件边: 根据规则检查结果决定是否重新查询
 
@@ -127,13 +165,23 @@ def should_requery(
     1. 检查 should_continue 标志
     2. 如果 should_continue=True → 返回 generate_sql 重新查询
     3. 如果 should_continue=False → 继续到 validate_results 进行质量验证
+    4. 如果 LLM 预算已用完或已超过请求截止时间 → 跳过重新查询和结果验证，直接生成答案
 
     Args:
         state: Agent状态
 
     Returns:
-        下一个节点名称: "generate_sql" 或 "validate_results"
+        下一个节点名称: "generate_sql"、"validate_results" 或 "generate_answer"
     """
+    if _deadline_passed(state):
+        logger.warning("[Edge: should_requery] Deadline exceeded, skipping validation, going to generate_answer")
+        return "generate_answer"
+
+    if state.get("llm_budget_exhausted"):
+        _note_budget_skip("validate_results")
+        logger.info("[Edge: should_requery] LLM budget exhausted, skipping validation, going to generate_answer")
+        return "generate_answer"
+
     # 检查是否需要继续查询
     should_continue = state.get("should_continue", False)
 
@@ -146,6 +194,33 @@ def should_requery(
     return "validate_results"
 
 
+def should_finish_after_validate_and_answer(
+    state: AgentState
+) -> Literal["generate_sql", "generate_answer", "end"]:
+    """
+    条件边: 验证与回答融合节点之后的走向
+
+    决策逻辑:
+    1. 验证未通过且仍可迭代（同 should_continue_querying） → generate_sql
+    2. 融合节点已生成最终回答 → end
+    3. 否则（启发式结论、无数据、LLM不可用） → generate_answer
+
+    Args:
+        state: Agent状态
+
+    Returns:
+        下一个节点名称: "generate_sql"、"generate_answer" 或 "end"
+    """
+    if should_continue_querying(state) == "generate_sql":
+        return "generate_sql"
+
+    if state.get("fused_answer_ready"):
+        logger.info("[Edge: should_finish_after_validate_and_answer] Answer ready, finishing")
+        return "end"
+
+    return "generate_answer"
+
+
 def should_summarize_conversation(state: AgentState) -> Literal["summarize_conversation", "continue"]:
     """
     条件边: 判断是否需要总结对话
@@ -233,6 +308,35 @@ def should_interrupt_after_intent(
     return "enhance_query"
 
 
+def should_interrupt_after_generation(
+    state: AgentState
+) -> Literal["interrupt_check", "execute_sql"]:
+    """
+    条件边: SQL生成后判断是否需要中断
+
+    意图分析被推迟（tier="deferred"）时，is_query_clear 由意图 + SQL 融合调用给出，
+    should_interrupt_after_intent 无法提前判断，因此在执行 SQL 前补做一次检查
+
+    决策逻辑:
+    1. 融合生成（tier="fused"）且 is_query_clear=False → interrupt_check（不执行模型判定为不明确的 SQL）
+    2. 否则 → execute_sql
+
+    Args:
+        state: Agent状态
+
+    Returns:
+        下一个节点名称: "interrupt_check" 或 "execute_sql"
+    """
+    intent_info = state.get("intent_info") or {}
+    if intent_info.get("tier") == "fused" and not intent_info.get("is_query_clear", True):
+        logger.info(
+            f"[Edge: should_interrupt_after_generation] Fused intent marks query unclear, going to interrupt_check"
+        )
+        return "interrupt_check"
+
+    return "execute_sql"
+
+
 # 其他可能的条件边函数（未来扩展）
 
 def should_use_spatial_query(state: AgentState) -> Literal["spatial_node", "regular_node"]:
@@ -4,15 +4,17 @@ from typing import Any, Callable, Dict
 
 from ...schemas import AgentState
 from .answer import GenerateAnswerNode
-from .base import NodeContext
+from .base import NodeContext, track_node
 from .error import HandleErrorNode
 from .fetch_schema import FetchSchemaNode
 from .intent import AnalyzeIntentNode, EnhanceQueryNode
 from .interrupt import InterruptCheckNode
+from .prepare import PrepareQueryNode
 from .legacy import LegacyAgentNodes  # Legacy compatibility
 from .sql_execution import ExecuteSqlNode
 from .sql_generation import GenerateSqlNode
 from .validation import CheckResultsNode, ValidateResultsNode
+from .validate_and_answer import ValidateAndAnswerNode
 from .final_validation import FinalValidationNode
 
 NodeCallable = Callable[[AgentState], Dict[str, Any]]
@@ -27,19 +29,25 @@ def build_legacy_nodes(**kwargs: Any) -> LegacyAgentNodes:
 
 
 def build_node_mapping(context: NodeContext) -> Dict[str, NodeCallable]:
-    return {
-        "fetch_schema": FetchSchemaNode(context),
-        "analyze_intent": AnalyzeIntentNode(context),
+    fetch_schema = FetchSchemaNode(context)
+    analyze_intent = AnalyzeIntentNode(context)
+    handlers: Dict[str, NodeCallable] = {
+        "fetch_schema": fetch_schema,
+        "analyze_intent": analyze_intent,
+        "prepare_query": PrepareQueryNode(context, fetch_schema, analyze_intent),
         "interrupt_check": InterruptCheckNode(context),
         "enhance_query": EnhanceQueryNode(context),
         "generate_sql": GenerateSqlNode(context),
         "execute_sql": ExecuteSqlNode(context),
         "validate_results": ValidateResultsNode(context),
+        "validate_and_answer": ValidateAndAnswerNode(context),
         "check_results": CheckResultsNode(context),
         "generate_answer": GenerateAnswerNode(context),
         "handle_error": HandleErrorNode(context),
         "final_validation": FinalValidationNode(context),
     }
+    # 每个节点内的 LLM 调用按节点名记录用量
+    return {name: track_node(name, handler) for name, handler in handlers.items()}
 
 
 class AgentNodes:
@@ -2,13 +2,14 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
 
+from ...deadline import DEADLINE_EXCEEDED_MESSAGE, DEADLINE_EXCEEDED_STATUS, is_past_deadline
 from ...schemas import AgentState
 from .base import NodeBase
 from .memory_decorators import with_memory_tracking
 
 
 class GenerateAnswerNode(NodeBase):
-    """Generate the final answer with optional deep analysis support."""
+    """Generate the final answer: template answers for simple results, LLM analysis otherwise."""
 
     @with_memory_tracking("generate_answer")
     def __call__(self, state: AgentState) -> Dict[str, Any]:
@@ -31,47 +32,84 @@ class GenerateAnswerNode(NodeBase):
                 requires_spatial,
             )
 
-            if self.data_analyzer:
-                self.logger.info(
-                    "[Node: generate_answer] Using DataAnalyzer for deep analysis",
-                )
-                analysis_result = self.data_analyzer.analyze(
-                    query=query,
-                    final_data=final_data or [],
-                    intent_info=intent_info,
-                )
-
-                answer = analysis_result.answer
-                analysis = analysis_result.analysis
-                insights = analysis_result.insights
-                suggestions = analysis_result.suggestions
-                analysis_type = analysis_result.analysis_type
-
-                self.logger.info(
-                    "[Node: generate_answer] Analysis completed - Type: %s",
-                    analysis_type,
-                )
-            else:
-                self.logger.warning(
-                    "[Node: generate_answer] DataAnalyzer not available, using EnhancedAnswerGenerator",
-                )
-                from ...processors.enhanced_answer_generator import (
-                    EnhancedAnswerGenerator,
-                )
-
-                enhanced_generator = EnhancedAnswerGenerator(self.llm)
-                answer, analysis_details = enhanced_generator.generate_enhanced_answer(
+            # ✅ 答案路由：空结果、聚合统计和少量列表直接使用模板回答
+            route = None
+            if self.answer_router:
+                route = self.answer_router.route(
                     query,
                     final_data,
                     count,
-                    query_intent,
-                    requires_spatial,
+                    want_insights=state.get("want_insights", False),
+                )
+                if route["route"] == "llm" and state.get("llm_budget_exhausted"):
+                    route = {"route": "template", "reason": "llm_budget_exhausted"}
+                if route["route"] == "llm" and self._deadline_passed(state):
+                    route = {"route": "template", "reason": "deadline_exceeded"}
+                self.logger.info(
+                    "[Node: generate_answer] Answer route: %s (%s)",
+                    route["route"],
+                    route["reason"],
                 )
 
-                analysis = analysis_details.get("analysis", "")
-                insights = analysis_details.get("insights", [])
-                suggestions = analysis_details.get("suggestions")
-                analysis_type = analysis_details.get("analysis_type", "general")
+            if route and route["route"] == "template":
+                answer = self.answer_router.render(query, final_data, count)
+                analysis = None
+                insights = []
+                suggestions = None
+                analysis_type = "template"
+            else:
+                # LLM预算已用完或已超过截止时间时跳过深度分析
+                deep_analysis = not state.get("llm_budget_exhausted") and not self._deadline_passed(state)
+                if not deep_analysis:
+                    self.logger.info(
+                        "[Node: generate_answer] LLM budget exhausted or deadline exceeded, using rule-based answer",
+                    )
+
+                if self.data_analyzer and deep_analysis:
+                    self.logger.info(
+                        "[Node: generate_answer] Using DataAnalyzer for deep analysis",
+                    )
+                    analysis_result = self.data_analyzer.analyze(
+                        query=query,
+                        final_data=final_data or [],
+                        intent_info=intent_info,
+                    )
+
+                    answer = analysis_result.answer
+                    analysis = analysis_result.analysis
+                    insights = analysis_result.insights
+                    suggestions = analysis_result.suggestions
+                    analysis_type = analysis_result.analysis_type
+
+                    self.logger.info(
+                        "[Node: generate_answer] Analysis completed - Type: %s",
+                        analysis_type,
+                    )
+                else:
+                    self.logger.warning(
+                        "[Node: generate_answer] DataAnalyzer not available, using EnhancedAnswerGenerator",
+                    )
+                    from ...processors.enhanced_answer_generator import (
+                        EnhancedAnswerGenerator,
+                    )
+
+                    enhanced_generator = EnhancedAnswerGenerator(self.llm_for("answer"))
+                    answer, analysis_details = enhanced_generator.generate_enhanced_answer(
+                        query,
+                        final_data,
+                        count,
+                        query_intent,
+                        requires_spatial,
+                        deep_analysis=deep_analysis,
+                    )
+
+                    analysis = analysis_details.get("analysis", "")
+                    insights = analysis_details.get("insights", [])
+                    suggestions = analysis_details.get("suggestions")
+                    analysis_type = analysis_details.get("analysis_type", "general")
+
+            if route:
+                self.answer_router.record(route["route"], route["reason"])
 
             status, message = self._derive_status(state, count)
             should_return_data = query_intent != "summary"
@@ -85,6 +123,7 @@ class GenerateAnswerNode(NodeBase):
                 "has_suggestions": bool(suggestions),
                 "query_intent": query_intent,
                 "should_return_data": should_return_data,
+                "answer_route": route["reason"] if route else None,
                 "status": "completed",
             }
 
@@ -111,7 +150,14 @@ class GenerateAnswerNode(NodeBase):
             )
 
     # ------------------------------------------------------------------
+    @staticmethod
+    def _deadline_passed(state: AgentState) -> bool:
+        return bool(state.get("deadline_exceeded")) or is_past_deadline(state.get("deadline"))
+
     def _derive_status(self, state: AgentState, count: int) -> tuple[str, str]:
+        # 超过截止时间时返回已获取的部分结果（优先于中途的超时错误）
+        if self._deadline_passed(state):
+            return DEADLINE_EXCEEDED_STATUS, DEADLINE_EXCEEDED_MESSAGE
         if state.get("error"):
             return "error", state["error"]
         if count > 0:
@@ -132,14 +178,18 @@ class GenerateAnswerNode(NodeBase):
 
         try:
             answer = self.answer_generator.generate(query, final_data, count)
+            if self._deadline_passed(state):
+                status, message = DEADLINE_EXCEEDED_STATUS, DEADLINE_EXCEEDED_MESSAGE
+            else:
+                status, message = "success", "查询成功，使用回退回答生成"
             return {
                 "answer": answer,
                 "analysis": None,
                 "insights": None,
                 "suggestions": None,
                 "analysis_type": None,
-                "status": "success",
-                "message": "查询成功，使用回退回答生成",
+                "status": status,
+                "message": message,
                 "should_return_data": should_return_data,
                 "thought_chain": [
                     {
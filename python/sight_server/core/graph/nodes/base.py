@@ -2,7 +2,11 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Callable, Dict
+
+from ...deadline import is_past_deadline
+from ...llm_usage import budget_exhausted, node_scope
+from ...tracing import span
 
 
 @dataclass
@@ -18,6 +22,34 @@ class NodeContext:
     structured_logger: Any = None
     result_validator: Any = None
     data_analyzer: Any = None
+    sql_result_cache: Any = None
+    intent_engine: Any = None
+    schema_selector: Any = None
+    answer_router: Any = None
+    heuristic_validator: Any = None
+    llm_profiles: Any = None
+
+
+def track_node(name: str, handler: Callable[[Any], Dict[str, Any]]) -> Callable[[Any], Dict[str, Any]]:
+    """Attribute LLM usage inside ``handler`` to node ``name`` and time it as a trace span.
+
+    Flags the state once the query's LLM budget is spent or its deadline has passed, so the
+    conditional edges can route straight to ``generate_answer``.
+    """
+
+    def tracked(state: Any) -> Dict[str, Any]:
+        with node_scope(name), span(f"node.{name}", node=name, iteration=state.get("current_step", 0)):
+            update = handler(state)
+        if not state.get("llm_budget_exhausted") and budget_exhausted():
+            update = dict(update or {})
+            update["llm_budget_exhausted"] = True
+        if not state.get("deadline_exceeded") and is_past_deadline(state.get("deadline")):
+            update = dict(update or {})
+            update["deadline_exceeded"] = True
+        return update
+
+    tracked.__name__ = name
+    return tracked
 
 
 class NodeBase:
@@ -51,6 +83,12 @@ class NodeBase:
     def llm(self) -> Any:
         return self.context.llm
 
+    def llm_for(self, component: str) -> Any:
+        """Return the LLM bound to ``component`` (intent/validation/answer/...), falling back to the default LLM."""
+        if self.context.llm is None or self.context.llm_profiles is None:
+            return self.context.llm
+        return self.context.llm_profiles.get_llm(component)
+
     @property
     def error_handler(self) -> Any:
         return self.context.error_handler
@@ -70,3 +108,23 @@ class NodeBase:
     @property
     def data_analyzer(self) -> Any:
         return self.context.data_analyzer
+
+    @property
+    def sql_result_cache(self) -> Any:
+        return self.context.sql_result_cache
+
+    @property
+    def intent_engine(self) -> Any:
+        return self.context.intent_engine
+
+    @property
+    def schema_selector(self) -> Any:
+        return self.context.schema_selector
+
+    @property
+    def answer_router(self) -> Any:
+        return self.context.answer_router
+
+    @property
+    def heuristic_validator(self) -> Any:
+        return self.context.heuristic_validator
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import time
-from typing import Any, Dict, List, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from ...schemas import AgentState
 from ...prompts import PromptManager
+from ...schema_selector import estimate_tokens
 from .base import NodeBase
 
 
@@ -59,6 +60,7 @@ class FetchSchemaNode(NodeBase):
                 system_prompt = PromptManager.build_system_prompt_with_schema(formatted_schema)
 
                 injected = self._inject_schema_into_llms(formatted_schema, system_prompt)
+                pruned_schema, selection = self._select_schema(state, schema, formatted_schema)
 
                 thought_step = {
                     "step": 0,
@@ -71,6 +73,9 @@ class FetchSchemaNode(NodeBase):
                         "schema_length": len(formatted_schema),
                         "system_context_updated": injected,
                         "system_prompt_updated": injected,
+                        "schema_tokens": estimate_tokens(formatted_schema),
+                        "pruned_schema_tokens": selection.get("schema_tokens") if selection else None,
+                        "selected_tables": list(selection["tables"]) if selection else None,
                     },
                     "status": "completed",
                 }
@@ -78,6 +83,8 @@ class FetchSchemaNode(NodeBase):
                 return {
                     "database_schema": schema,
                     "formatted_schema": formatted_schema,
+                    "pruned_schema": pruned_schema,
+                    "schema_selection": selection,
                     "schema_fetched": True,
                     "thought_chain": [thought_step],
                 }
@@ -99,6 +106,34 @@ class FetchSchemaNode(NodeBase):
 
         return self._failure_state("未知错误", max_retries)
 
+    def _select_schema(
+        self, state: AgentState, schema: Dict[str, Any], formatted_schema: str
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Prune the schema to the tables/columns relevant to this query (None keeps the full schema)."""
+        if self.schema_selector is None or not state.get("query"):
+            return None, None
+        try:
+            selection = self.schema_selector.select(state["query"], schema)
+            pruned_schema = self.schema_fetcher.format_schema_for_llm(selection.pop("schema"))
+        except Exception as exc:
+            self.logger.warning("[Node: fetch_schema] Schema pruning failed, using full schema: %s", exc)
+            return None, None
+
+        full_tokens = estimate_tokens(formatted_schema)
+        selection["schema_tokens"] = estimate_tokens(pruned_schema)
+        selection["schema_tokens_full"] = full_tokens
+        self.schema_selector.record(full_tokens, selection["schema_tokens"])
+        self.logger.info(
+            "[Node: fetch_schema] Pruned schema to %s (%s/%s columns, ~%s → ~%s tokens, %.2fms)",
+            "/".join(selection["tables"]),
+            selection["columns_kept"],
+            selection["columns_total"],
+            full_tokens,
+            selection["schema_tokens"],
+            selection["elapsed_ms"],
+        )
+        return pruned_schema, selection
+
     def _inject_schema_into_llms(self, formatted_schema: str, system_prompt: str) -> bool:
         updated_any = False
         registry: List[tuple[str, Any]] = []
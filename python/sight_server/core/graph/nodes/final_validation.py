@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
 
+from ...deadline import is_past_deadline
+from ...llm_usage import current_query_usage
 from ...schemas import AgentState
 from .base import NodeBase
 
@@ -46,6 +48,78 @@ class FinalValidationNode(NodeBase):
                     ],
                 }
 
+            # 已超过请求截止时间，跳过最终验证
+            if state.get("deadline_exceeded") or is_past_deadline(state.get("deadline")):
+                self.logger.info(
+                    "[Node: final_validation] Deadline exceeded, skipping validation"
+                )
+                return {
+                    "final_validation_passed": True,
+                    "final_validation_reason": "已超过请求截止时间，跳过验证",
+                    "thought_chain": [
+                        {
+                            "step": current_step + 8,
+                            "type": "final_validation",
+                            "action": "skip_validation",
+                            "output": "已超过请求截止时间，跳过验证",
+                            "status": "skipped",
+                        }
+                    ],
+                }
+
+            # LLM预算已用完，跳过最终验证
+            if state.get("llm_budget_exhausted"):
+                self.logger.info(
+                    "[Node: final_validation] LLM budget exhausted, skipping validation"
+                )
+                usage = current_query_usage()
+                if usage is not None:
+                    usage.note_skipped("final_validation")
+                return {
+                    "final_validation_passed": True,
+                    "final_validation_reason": "LLM预算已用完，跳过验证",
+                    "thought_chain": [
+                        {
+                            "step": current_step + 8,
+                            "type": "final_validation",
+                            "action": "skip_validation",
+                            "output": "LLM预算已用完，跳过验证",
+                            "status": "skipped",
+                        }
+                    ],
+                }
+
+            # 模板回答由数据直接渲染，结果已通过启发式验证时无需再用LLM评估
+            if state.get("analysis_type") == "template" and self.heuristic_validator:
+                heuristic = self.heuristic_validator.score(
+                    query,
+                    final_data,
+                    query_intent or "query",
+                    state.get("requires_spatial", False),
+                )
+                if heuristic["verdict"] == "pass":
+                    self.logger.info(
+                        "[Node: final_validation] Template answer on heuristically valid data, skipping LLM"
+                    )
+                    return {
+                        "final_validation_passed": True,
+                        "final_validation_reason": "模板回答，结果已通过启发式验证",
+                        "final_validation_confidence": heuristic["score"],
+                        "thought_chain": [
+                            {
+                                "step": current_step + 8,
+                                "type": "final_validation",
+                                "action": "heuristic_validation",
+                                "output": {
+                                    "passed": True,
+                                    "method": "heuristic",
+                                    "heuristic_score": heuristic["score"],
+                                },
+                                "status": "completed",
+                            }
+                        ],
+                    }
+
             # 使用LLM进行最终答案质量验证
             validation_result = self._validate_answer_with_llm(
                 query=query,
@@ -181,7 +255,7 @@ class FinalValidationNode(NodeBase):
 
 请输出："""
 
-            response = self.llm.llm.invoke(prompt)
+            response = self.llm_for("validation").invoke_prompt(prompt, call_site="validation")
             validation_text = (
                 response.content.strip()
                 if hasattr(response, "content")
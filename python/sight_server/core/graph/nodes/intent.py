@@ -9,7 +9,7 @@ from .memory_decorators import with_memory_tracking
 
 
 class AnalyzeIntentNode(NodeBase):
-    """Determine query intent via PromptManager (LLM first, fallback keywords)."""
+    """Determine query intent: keyword rules first, LLM only when rule confidence is low."""
 
     @with_memory_tracking("intent_analysis")
     def __call__(self, state: AgentState) -> Dict[str, object]:
@@ -17,11 +17,14 @@ class AnalyzeIntentNode(NodeBase):
             query = state["query"]
             self.logger.info("[Node: analyze_intent] Analyzing query: %s", query)
 
-            intent_info = PromptManager.analyze_query_intent(
-                query,
-                llm=self.llm,
-                use_llm_analysis=True,
-            )
+            if self.intent_engine is not None:
+                intent_info = self.intent_engine.analyze(query)
+            else:
+                intent_info = PromptManager.analyze_query_intent(
+                    query,
+                    llm=self.llm_for("intent"),
+                    use_llm_analysis=True,
+                )
 
             match_mode = "fuzzy"
             lowered_query = query.lower()
@@ -36,9 +39,11 @@ class AnalyzeIntentNode(NodeBase):
                 "step": 1,
                 "type": "intent_analysis",
                 "action": (
-                    "analyze_query_intent_with_llm"
-                    if self.llm
+                    "defer_intent_to_sql_generation"
+                    if intent_info.get("tier") == "deferred"
                     else "analyze_query_intent_with_keywords"
+                    if not self.llm or intent_info.get("tier") == "rules"
+                    else "analyze_query_intent_with_llm"
                 ),
                 "input": query,
                 "output": thought_output,
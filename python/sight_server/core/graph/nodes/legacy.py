@@ -1827,7 +1827,7 @@ class LegacyAgentNodes:
 评估结果:"""
 
             # 调用LLM
-            response = self.llm.llm.invoke(prompt)
+            response = self.llm.invoke_prompt(prompt, call_site="validation")
 
             if hasattr(response, 'content'):
                 validation_text = response.content.strip()
@@ -2036,7 +2036,7 @@ class LegacyAgentNodes:
 分析结果:"""
 
             # 调用LLM
-            response = self.llm.llm.invoke(prompt)
+            response = self.llm.invoke_prompt(prompt, call_site="validation")
 
             if hasattr(response, 'content'):
                 analysis_text = response.content.strip()
@@ -2483,7 +2483,7 @@ class LegacyAgentNodes:
 决策结果:"""
 
             # 调用LLM
-            response = self.llm.llm.invoke(prompt)
+            response = self.llm.invoke_prompt(prompt, call_site="validation")
 
             if hasattr(response, 'content'):
                 decision_text = response.content.strip()
@@ -39,7 +39,7 @@ class ExecuteSqlNode(NodeBase):
         if cached_payload:
             return self._use_cached_result(state, cached_payload, current_sql)
 
-        execution_result = self.sql_executor.execute(current_sql)
+        execution_result = self._execute_with_sql_cache(current_sql)
         if execution_result.get("status") == "error":
             return self._handle_execution_error(state, execution_result, start_time)
 
@@ -61,6 +61,22 @@ class ExecuteSqlNode(NodeBase):
 
         return payload
 
+    def _execute_with_sql_cache(self, sql: str) -> Dict[str, Any]:
+        """Consult the SQL-fingerprint cache before executing against Postgres."""
+        if not self.sql_result_cache:
+            return self.sql_executor.execute(sql)
+
+        cached = self.sql_result_cache.get(sql)
+        if cached is not None:
+            self.logger.info("[Node: execute_sql] SQL fingerprint cache hit")
+            cached["from_sql_cache"] = True
+            return cached
+
+        start = time.time()
+        execution_result = self.sql_executor.execute(sql)
+        self.sql_result_cache.put(sql, execution_result, duration_ms=(time.time() - start) * 1000)
+        return execution_result
+
     def _use_cached_result(self, state: AgentState, cached: Dict[str, Any], current_sql: str) -> Dict[str, Any]:
         current_step = state.get("current_step", 0)
         execution_result = cached.get("execution_result") or {
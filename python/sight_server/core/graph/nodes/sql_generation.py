@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import time
+from datetime import datetime
 from typing import Any, Dict, Optional, List
 
 from ...schemas import AgentState
+from ...schema_selector import estimate_tokens
 from .base import NodeBase
 from .memory_decorators import with_memory_tracking
 
@@ -20,8 +23,11 @@ class GenerateSqlNode(NodeBase):
             if cached_payload is not None:
                 return cached_payload
 
+            started_at = datetime.now().isoformat()
+            start = time.perf_counter()
             result = self._generate_sql_internal(state)
             result[self.FAILURE_FIELD] = 0
+            result["node_execution_logs"] = [self._execution_log(state, started_at, start)]
             return result
         except Exception as exc:
             return self._handle_generation_error(state, exc)
@@ -34,6 +40,10 @@ class GenerateSqlNode(NodeBase):
         last_error = state.get("last_error")
         validation_feedback = state.get("validation_feedback")
         match_mode = state.get("match_mode", "exact")
+        # ✅ 按查询裁剪后的schema（未裁剪时为 None，由生成器回退到完整schema）
+        prompt_schema = state.get("pruned_schema")
+        # ✅ 按错误修复SQL时使用完整schema：字段/表不存在（42703/42P01）可能正是裁剪造成的
+        fix_schema = state.get("formatted_schema")
 
         self.logger.info("[Node: generate_sql] Generating SQL for step %s", current_step)
         if fallback_strategy:
@@ -49,6 +59,7 @@ class GenerateSqlNode(NodeBase):
                 return pattern_result
 
         sql: Optional[str] = None
+        fused_intent: Optional[Dict[str, Any]] = None
         validation_retry_count = state.get("validation_retry_count", 0)
 
         if validation_feedback:
@@ -62,6 +73,7 @@ class GenerateSqlNode(NodeBase):
                     previous_sql=previous_sql,
                     feedback=validation_feedback,
                     intent_info=intent_info,
+                    database_schema=prompt_schema,
                 )
                 validation_retry_count += 1
             else:
@@ -69,6 +81,7 @@ class GenerateSqlNode(NodeBase):
                     enhanced_query,
                     intent_info=state.get("intent_info"),
                     match_mode=match_mode,
+                    database_schema=prompt_schema,
                 )
         elif fallback_strategy == "retry_sql" and last_error:
             previous_sql = state.get("current_sql") or (
@@ -82,6 +95,7 @@ class GenerateSqlNode(NodeBase):
                         error_context=error_context,
                         query=enhanced_query,
                         intent_type_override=state.get("query_intent"),
+                        database_schema=fix_schema,
                     )
                 else:
                     sql = self.sql_generator.fix_sql_with_error(
@@ -89,11 +103,13 @@ class GenerateSqlNode(NodeBase):
                         error=last_error,
                         query=enhanced_query,
                         intent_type=state.get("query_intent"),
+                        database_schema=fix_schema,
                     )
             else:
                 sql = self.sql_generator.generate_initial_sql(
                     enhanced_query,
                     match_mode=match_mode,
+                    database_schema=fix_schema,
                 )
         elif fallback_strategy == "simplify_query":
             previous_sql = state.get("current_sql") or (
@@ -105,16 +121,29 @@ class GenerateSqlNode(NodeBase):
                 sql = self.sql_generator.generate_initial_sql(
                     enhanced_query,
                     match_mode=match_mode,
+                    database_schema=prompt_schema,
                 )
                 sql = self.sql_generator.simplify_sql(sql, max_limit=50)
         elif current_step == 0:
             intent_info = state.get("intent_info")
-            self.logger.info("[Node: generate_sql] Using intent info: %s", intent_info)
-            sql = self.sql_generator.generate_initial_sql(
-                enhanced_query,
-                intent_info=intent_info,
-                match_mode=match_mode,
-            )
+            if (intent_info or {}).get("tier") == "deferred":
+                # ✅ 意图 + SQL 融合：意图分析被推迟，一次调用同时确定意图和 SQL
+                fused = self.sql_generator.generate_sql_with_intent(
+                    state["query"],
+                    intent_hint=intent_info,
+                    match_mode=match_mode,
+                    database_schema=prompt_schema,
+                )
+                sql, fused_intent = fused["sql"], fused["intent_info"]
+                self.logger.info("[Node: generate_sql] Fused intent: %s", fused_intent.get("intent_type"))
+            else:
+                self.logger.info("[Node: generate_sql] Using intent info: %s", intent_info)
+                sql = self.sql_generator.generate_initial_sql(
+                    enhanced_query,
+                    intent_info=intent_info,
+                    match_mode=match_mode,
+                    database_schema=prompt_schema,
+                )
         else:
             sql = self._generate_followup_sql(state, enhanced_query)
             if sql is None:
@@ -138,11 +167,17 @@ class GenerateSqlNode(NodeBase):
         thought_step = {
             "step": current_step + 3,
             "type": "sql_generation",
-            "action": "generate_sql",
+            "action": "generate_sql_with_intent" if fused_intent else "generate_sql",
             "input": enhanced_query,
             "output": sql,
             "status": "completed",
         }
+        if fused_intent:
+            thought_step["intent"] = {
+                "intent_type": fused_intent.get("intent_type"),
+                "is_spatial": fused_intent.get("is_spatial"),
+                "confidence": fused_intent.get("confidence"),
+            }
 
         result: Dict[str, Any] = {
             "current_sql": sql,
@@ -151,6 +186,11 @@ class GenerateSqlNode(NodeBase):
             "thought_chain": [thought_step],
         }
 
+        if fused_intent:
+            result["query_intent"] = fused_intent["intent_type"]
+            result["requires_spatial"] = fused_intent["is_spatial"]
+            result["intent_info"] = fused_intent
+
         if validation_feedback:
             result["validation_retry_count"] = validation_retry_count
             result["validation_feedback"] = None
@@ -173,6 +213,7 @@ class GenerateSqlNode(NodeBase):
             previous_sql=previous_sql,
             record_count=record_count,
             match_mode=match_mode,
+            database_schema=state.get("pruned_schema"),
         )
 
         sql_history = state.get("sql_history", [])
@@ -240,6 +281,23 @@ class GenerateSqlNode(NodeBase):
             self.logger.warning("[Node: generate_sql] Failed to compute cache key: %s", exc)
             return None
 
+    def _execution_log(self, state: AgentState, started_at: str, start: float) -> Dict[str, Any]:
+        """Per-node timing plus the schema tokens carried by the prompt (pruned vs. full)."""
+        selection = state.get("schema_selection") or {}
+        full_tokens = selection.get("schema_tokens_full")
+        if full_tokens is None and state.get("formatted_schema"):
+            full_tokens = estimate_tokens(state["formatted_schema"])
+        # error-driven fixes carry the full schema
+        pruned = bool(state.get("pruned_schema")) and state.get("fallback_strategy") != "retry_sql"
+        return {
+            "node": "generate_sql",
+            "started_at": started_at,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            "schema_pruned": pruned,
+            "prompt_schema_tokens": selection.get("schema_tokens", full_tokens) if pruned else full_tokens,
+            "full_schema_tokens": full_tokens,
+        }
+
     def _handle_generation_error(self, state: AgentState, exc: Exception) -> Dict[str, Any]:
         failure_count = state.get(self.FAILURE_FIELD, 0) + 1
         max_failures = state.get("max_retries", 5)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from ...deadline import DEADLINE_EXCEEDED_MESSAGE, DEADLINE_EXCEEDED_STATUS, is_past_deadline
+from ...schemas import AgentState, ValidatedAnswer
+from .memory_decorators import with_memory_tracking
+from .validation import ValidateResultsNode
+
+# 静态任务说明在前、本次查询的数据在后（prompt 前缀稳定，可命中服务端上下文缓存）
+VALIDATE_AND_ANSWER_PROMPT = """请扮演资深的数据分析专家，先验证查询结果是否满足用户需求，再直接给出面向用户的回答
+
+## 任务
+1. 验证：结果是否直接回答了用户问题、是否与查询意图匹配、是否存在明显缺失或异常值
+2. 未通过时，在 improvement_hint 中给出修改 SQL 的具体建议（缺少的过滤条件、字段或聚合方式等）
+3. 无论是否通过，都基于查询结果写出面向用户的回答（answer）：简洁准确，不编造结果中没有的数据
+4. 可选：给出 1-3 条关键洞察（insights）
+
+{format_instructions}
+
+---
+
+## 用户查询
+{query}
+
+## 查询意图
+{query_intent}（空间查询: {is_spatial}）
+
+## 执行的SQL
+{sql}
+
+## 查询结果
+- 结果条目数: {count}
+- 结果预览: {data_preview}"""
+
+
+class ValidateAndAnswerNode(ValidateResultsNode):
+    """Validate results and write the final answer in one LLM call.
+
+    Heuristic verdicts still short-circuit: a clear pass goes on to ``generate_answer``
+    (template answers need no LLM), a clear fail loops back to ``generate_sql``. Only
+    uncertain results pay for an LLM call, which returns the verdict, an improvement
+    hint and the answer together; ``fused_answer_ready`` lets the graph end right here.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.answer_parser = PydanticOutputParser(pydantic_object=ValidatedAnswer)
+        self.prompt_template = ChatPromptTemplate.from_template(VALIDATE_AND_ANSWER_PROMPT).partial(
+            format_instructions=self.answer_parser.get_format_instructions())
+
+    @with_memory_tracking("validate_and_answer")
+    def __call__(self, state: AgentState) -> Dict[str, Any]:
+        current_step = state.get("current_step", 0)
+        try:
+            final_data: Optional[List[Dict[str, Any]]] = state.get("final_data")
+            count = len(final_data) if final_data else 0
+            self.logger.info("[Node: validate_and_answer] Validating %s records", count)
+
+            if count == 0 or not final_data:
+                return self._pass_through(current_step, "无数据，跳过验证")
+
+            validation_result = self._validate_with_heuristics(state, final_data)
+            if validation_result is not None:
+                update = self._build_verdict_update(validation_result, current_step)
+                update["fused_answer_ready"] = False
+                return update
+
+            if not self.llm or state.get("llm_budget_exhausted"):
+                return self._pass_through(current_step, "无可用LLM，跳过验证")
+            if state.get("deadline_exceeded") or is_past_deadline(state.get("deadline")):
+                return self._pass_through(current_step, "已超过请求截止时间，跳过验证")
+
+            fused = self._validate_and_answer_with_llm(state, final_data, count)
+            validation_result = {
+                "passed": fused.validation_passed,
+                "reason": fused.reason,
+                "confidence": fused.confidence,
+                "guidance": fused.improvement_hint,
+                "method": "llm_fused",
+            }
+            update = self._build_verdict_update(validation_result, current_step)
+            if not fused.validation_passed and fused.improvement_hint:
+                update["last_error"] = f"结果验证失败: {fused.reason}；改进建议: {fused.improvement_hint}"
+
+            if self.answer_router:
+                self.answer_router.record("llm", "validate_and_answer")
+            query_intent = state.get("query_intent", "query")
+            should_return_data = query_intent != "summary"
+            if is_past_deadline(state.get("deadline")):
+                status, message = DEADLINE_EXCEEDED_STATUS, DEADLINE_EXCEEDED_MESSAGE
+            else:
+                status = "error" if state.get("error") else "success"
+                message = state.get("error") or "查询成功"
+            update.update({
+                "answer": fused.answer,
+                "analysis": None,
+                "insights": fused.insights,
+                "suggestions": None,
+                "analysis_type": "validated_llm",
+                "status": status,
+                "message": message,
+                "should_return_data": should_return_data,
+                "fused_answer_ready": bool(fused.answer),
+            })
+            update["thought_chain"] = update["thought_chain"] + [{
+                "step": current_step + 7,
+                "type": "final_answer",
+                "content": fused.answer,
+                "analysis_type": "validated_llm",
+                "insights_count": len(fused.insights),
+                "has_suggestions": False,
+                "query_intent": query_intent,
+                "should_return_data": should_return_data,
+                "answer_route": "validate_and_answer",
+                "status": "completed",
+            }]
+            return update
+
+        except Exception as exc:
+            self.logger.error("[Node: validate_and_answer] Error: %s", exc)
+            update = self._pass_through(current_step, f"验证流程出现异常，默认通过: {str(exc)}")
+            update["thought_chain"][0].update({"error": str(exc), "status": "failed"})
+            return update
+
+    # ------------------------------------------------------------------
+    def _validate_and_answer_with_llm(
+        self,
+        state: AgentState,
+        data: List[Dict[str, Any]],
+        count: int,
+    ) -> ValidatedAnswer:
+        prompt_value = self.prompt_template.invoke({
+            "query": state["query"],
+            "query_intent": state.get("query_intent") or "query",
+            "is_spatial": state.get("requires_spatial", False),
+            "sql": state.get("current_sql") or "",
+            "count": count,
+            "data_preview": self._prepare_validation_data_preview(data, count),
+        })
+        response = self.llm_for("answer").invoke_prompt(prompt_value, call_site="validate_answer")
+        result = self.answer_parser.parse(response.content)
+        self.logger.info(
+            "[Node: validate_and_answer] passed=%s confidence=%.2f",
+            result.validation_passed,
+            result.confidence,
+        )
+        return result
+
+    @staticmethod
+    def _pass_through(current_step: int, reason: str) -> Dict[str, Any]:
+        """不作结论，交给 generate_answer 生成回答"""
+        return {
+            "validation_passed": True,
+            "validation_reason": reason,
+            "fused_answer_ready": False,
+            "thought_chain": [
+                {
+                    "step": current_step + 6,
+                    "type": "result_validation",
+                    "action": "skip_validation",
+                    "output": reason,
+                    "status": "skipped",
+                }
+            ],
+        }
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
 
+from ...processors.heuristic_validator import has_missing_key_fields
 from ...schemas import AgentState, ValidationResult
 from .base import NodeBase
 from .memory_decorators import with_memory_tracking
@@ -10,7 +11,7 @@ from langchain_core.prompts import ChatPromptTemplate
 
 
 class ValidateResultsNode(NodeBase):
-    """Validate query results using LLM feedback."""
+    """Validate query results: deterministic heuristics first, LLM feedback only when the score is uncertain."""
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -53,77 +54,125 @@ class ValidateResultsNode(NodeBase):
                     ],
                 }
 
-            validation_result = self._validate_with_llm(
-                query=query,
-                data=final_data,
-                count=count,
-                query_intent=query_intent or "query",
-            )
+            # ✅ 第一级：启发式验证，分数落在不确定区间时才调用LLM
+            validation_result = self._validate_with_heuristics(state, final_data)
+            if validation_result is None:
+                validation_result = self._validate_with_llm(
+                    query=query,
+                    data=final_data,
+                    count=count,
+                    query_intent=query_intent or "query",
+                )
+                validation_result["method"] = "llm"
 
-            if validation_result["passed"]:
-                self.logger.info(
-                    "[Node: validate_results] ✅ Validation passed")
-                return {
-                    "validation_passed": True,
-                    "validation_reason": validation_result["reason"],
-                    "thought_chain": [
-                        {
-                            "step": current_step + 6,
-                            "type": "result_validation",
-                            "action": "validate_results",
-                            "output": {
-                                "passed": True,
-                                "reason": validation_result["reason"],
-                                "confidence": validation_result["confidence"],
-                            },
-                            "status": "completed",
-                        }
-                    ],
-                }
+            return self._build_verdict_update(validation_result, current_step)
 
-            self.logger.warning(
-                "[Node: validate_results] ❗ Validation failed: %s",
-                validation_result["reason"],
-            )
+        except Exception as exc:
+            self.logger.error("[Node: validate_results] Error: %s", exc)
             return {
-                "validation_passed": False,
-                "validation_error": validation_result["reason"],
-                "validation_guidance": validation_result["guidance"],
-                "should_continue": True,
-                "fallback_strategy": "retry_sql",
-                "last_error": f"结果验证失败: {validation_result['reason']}",
+                "validation_passed": True,
+                "validation_reason": f"验证流程出现异常，默认通过: {str(exc)}",
                 "thought_chain": [
                     {
-                        "step": current_step + 6,
+                        "step": state.get("current_step", 0) + 6,
                         "type": "result_validation",
-                        "action": "validate_results",
-                        "output": {
-                            "passed": False,
-                            "reason": validation_result["reason"],
-                            "guidance": validation_result["guidance"],
-                            "confidence": validation_result["confidence"],
-                        },
-                        "status": "completed",
+                        "error": str(exc),
+                        "status": "failed",
                     }
                 ],
             }
 
-        except Exception as exc:
-            self.logger.error("[Node: validate_results] Error: %s", exc)
+    # ------------------------------------------------------------------
+    def _build_verdict_update(self, validation_result: Dict[str, Any], current_step: int) -> Dict[str, Any]:
+        """把验证结论转换为状态更新：通过时记录原因，未通过时设置 retry_sql 回到 SQL 生成"""
+        if validation_result["passed"]:
+            self.logger.info(
+                "[Node: validate_results] ✅ Validation passed")
             return {
                 "validation_passed": True,
-                "validation_reason": f"验证流程出现异常，默认通过: {str(exc)}",
+                "validation_reason": validation_result["reason"],
                 "thought_chain": [
                     {
-                        "step": state.get("current_step", 0) + 6,
+                        "step": current_step + 6,
                         "type": "result_validation",
-                        "error": str(exc),
-                        "status": "failed",
+                        "action": "validate_results",
+                        "output": {
+                            "passed": True,
+                            "reason": validation_result["reason"],
+                            "confidence": validation_result["confidence"],
+                            "method": validation_result["method"],
+                            "heuristic_score": validation_result.get("heuristic_score"),
+                        },
+                        "status": "completed",
                     }
                 ],
             }
 
+        self.logger.warning(
+            "[Node: validate_results] ❗ Validation failed: %s",
+            validation_result["reason"],
+        )
+        return {
+            "validation_passed": False,
+            "validation_error": validation_result["reason"],
+            "validation_guidance": validation_result["guidance"],
+            "should_continue": True,
+            "fallback_strategy": "retry_sql",
+            "last_error": f"结果验证失败: {validation_result['reason']}",
+            "thought_chain": [
+                {
+                    "step": current_step + 6,
+                    "type": "result_validation",
+                    "action": "validate_results",
+                    "output": {
+                        "passed": False,
+                        "reason": validation_result["reason"],
+                        "guidance": validation_result["guidance"],
+                        "confidence": validation_result["confidence"],
+                        "method": validation_result["method"],
+                        "heuristic_score": validation_result.get("heuristic_score"),
+                    },
+                    "status": "completed",
+                }
+            ],
+        }
+
     # ------------------------------------------------------------------
+    def _validate_with_heuristics(
+        self,
+        state: AgentState,
+        data: List[Dict[str, Any]],
+    ) -> Optional[Dict[str, Any]]:
+        """启发式验证；结论明确时返回验证结果，不确定（或未启用）时返回 None 交给LLM"""
+        if not self.heuristic_validator:
+            return None
+
+        heuristic = self.heuristic_validator.validate(
+            query=state["query"],
+            data=data,
+            query_intent=state.get("query_intent") or "query",
+            requires_spatial=state.get("requires_spatial", False),
+        )
+        if heuristic["verdict"] == "uncertain":
+            self.logger.info(
+                "[Node: validate_results] Heuristic score %.2f is uncertain, escalating to LLM",
+                heuristic["score"],
+            )
+            return None
+
+        passed = heuristic["verdict"] == "pass"
+        return {
+            "passed": passed,
+            "reason": (
+                "启发式验证通过：结果条数、关键字段与查询意图匹配"
+                if passed else "启发式验证未通过：" + "；".join(heuristic["issues"])
+            ),
+            "confidence": heuristic["score"] if passed else round(1 - heuristic["score"], 3),
+            "guidance": heuristic["guidance"],
+            "method": "heuristic",
+            "heuristic_score": heuristic["score"],
+        }
+
     def _validate_with_llm(
         self,
         query: str,
@@ -184,20 +233,17 @@ class ValidateResultsNode(NodeBase):
 
 {format_instructions}""")
 
-                # 构建完整的链式调用: prompt | llm | parser
-                structured_chain = (
-                    prompt_template.partial(format_instructions=self.parser.get_format_instructions())
-                    | self.llm.llm
-                    | self.parser
-                )
-
-                # 调用链
-                validation_result = structured_chain.invoke({
+                # 渲染完整 prompt 后调用 LLM（相同 prompt 命中响应缓存），再解析结构化输出
+                prompt_value = prompt_template.partial(
+                    format_instructions=self.parser.get_format_instructions()
+                ).invoke({
                     "query": query,
                     "query_intent": query_intent,
                     "count": count,
                     "data_preview": data_preview
                 })
+                response = self.llm_for("validation").invoke_prompt(prompt_value, call_site="validation")
+                validation_result = self.parser.parse(response.content)
                 self.logger.info(msg=f'validation_result:\n   f{validation_result}')
                 return self._parse_structured_validation(validation_result)
 
@@ -264,7 +310,7 @@ class ValidateResultsNode(NodeBase):
 
 请输出："""
 
-        response = self.llm.llm.invoke(prompt)
+        response = self.llm_for("validation").invoke_prompt(prompt, call_site="validation")
         validation_text = (
             response.content.strip()
             if hasattr(response, "content")
@@ -574,19 +620,5 @@ class CheckResultsNode(NodeBase):
         }
 
     def _has_missing_key_fields(self, data: List[Dict[str, Any]]) -> bool:
-        """检查数据中关键字段是否缺失"""
-        if not data:
-            return False
-            
-        key_fields = ["name", "level", "所属省份", "地区"]
-        missing_count = 0
-        
-        for record in data:
-            for field in key_fields:
-                if field not in record or not record[field]:
-                    missing_count += 1
-                    break  # 每个记录只计一次缺失
-        
-        # 如果超过30%的记录缺少关键字段，认为需要补充
-        missing_ratio = missing_count / len(data)
-        return missing_ratio > 0.2
+        """检查数据中关键字段是否缺失（超过20%的记录缺少关键字段时需要补充）"""
+        return has_missing_key_fields(data)
@@ -3,28 +3,194 @@ LLM基础类模块 - Sight Server
 提供LangChain LLM封装，支持聊天历史和配置管理
 """
 
-from typing import Optional, Dict, Any
+import time
+import threading
+from typing import Optional, Dict, Any, List, Tuple
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.messages import AIMessage
 from config import settings
 import logging
 from .graph.context_schemas import LLMContextSchema
+from .chat_history import ChatHistoryStore, PostgresChatHistoryPersister, WindowedChatMessageHistory
+from .llm_cache import LLMResponseCache, parse_call_site_ttls
+from .llm_gateway import LLMGateway
+from .deadline import clamp_timeout, remaining_seconds
+from .llm_usage import record_llm_call
+from .tracing import set_span_attributes, span
+from .schema_selector import estimate_tokens
 
 logger = logging.getLogger(__name__)
 
+# 进程内共享的LLM响应缓存
+_shared_response_cache: Optional[LLMResponseCache] = None
+
+# 进程内共享的会话历史存储
+_shared_history_store: Optional[ChatHistoryStore] = None
+_history_store_lock = threading.Lock()
+
+# 进程内共享的LLM网关（按 api_base + api_key 区分，共用连接池与并发上限）
+_shared_gateways: Dict[tuple, LLMGateway] = {}
+_gateway_lock = threading.Lock()
+
+# LangChain 消息类型 → OpenAI 角色
+_MESSAGE_ROLES = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """
+    获取进程内共享的LLM响应缓存
+
+    Returns:
+        LLMResponseCache 实例，未启用时返回 None
+    """
+    global _shared_response_cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    if _shared_response_cache is None:
+        _shared_response_cache = LLMResponseCache(
+            cache_dir=settings.LLM_CACHE_DIR or None,
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            default_ttl=settings.LLM_CACHE_DEFAULT_TTL,
+            call_site_ttls=parse_call_site_ttls(settings.LLM_CACHE_CALL_SITE_TTLS),
+            max_temperature=settings.LLM_CACHE_MAX_TEMPERATURE,
+            cache_high_temperature=settings.LLM_CACHE_HIGH_TEMPERATURE,
+        )
+    return _shared_response_cache
+
+
+def get_chat_history_store() -> ChatHistoryStore:
+    """
+    获取进程内共享的会话历史存储（有界：LRU + 空闲TTL + 每会话滑动窗口）
+
+    Returns:
+        ChatHistoryStore 实例
+    """
+    global _shared_history_store
+    with _history_store_lock:
+        if _shared_history_store is None:
+            persister = None
+            if settings.CHAT_HISTORY_PERSIST:
+                persister = PostgresChatHistoryPersister(settings.DATABASE_URL)
+            _shared_history_store = ChatHistoryStore(
+                max_sessions=settings.CHAT_HISTORY_MAX_SESSIONS,
+                idle_ttl=settings.CHAT_HISTORY_IDLE_TTL,
+                max_messages=settings.CHAT_HISTORY_MAX_MESSAGES,
+                max_tokens=settings.CHAT_HISTORY_MAX_TOKENS,
+                persister=persister,
+            )
+        return _shared_history_store
+
+
+def close_chat_history_store() -> None:
+    """持久化内存中的会话历史并关闭数据库连接（服务关闭时调用）"""
+    store = _shared_history_store
+    if store is None or store.persister is None:
+        return
+    flushed = store.flush()
+    store.persister.close()
+    logger.info(f"Chat history store flushed ({flushed} sessions)")
+
+
+def get_llm_gateway(api_key: str, api_base: str) -> Optional[LLMGateway]:
+    """
+    获取进程内共享的LLM网关
+
+    Args:
+        api_key: API密钥
+        api_base: API基础URL
+
+    Returns:
+        LLMGateway 实例，未启用时返回 None
+    """
+    if not settings.LLM_GATEWAY_ENABLED:
+        return None
+    key = (api_base, api_key)
+    with _gateway_lock:
+        gateway = _shared_gateways.get(key)
+        if gateway is None:
+            gateway = LLMGateway(
+                api_key=api_key,
+                api_base=api_base,
+                model=settings.LLM_MODEL,
+                temperature=settings.LLM_TEMPERATURE,
+                max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+                timeout=settings.LLM_REQUEST_TIMEOUT,
+                max_retries=settings.LLM_MAX_RETRIES,
+                backoff_base=settings.LLM_RETRY_BACKOFF_BASE,
+                backoff_max=settings.LLM_RETRY_BACKOFF_MAX,
+                hedge_enabled=settings.LLM_HEDGE_ENABLED,
+                hedge_delay=settings.LLM_HEDGE_DELAY or None,
+                hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+            )
+            _shared_gateways[key] = gateway
+        return gateway
+
+
+def get_llm_gateway_stats() -> Dict[str, Any]:
+    """
+    获取所有共享网关的统计信息
+
+    Returns:
+        api_base → 网关统计
+    """
+    with _gateway_lock:
+        return {api_base: gateway.get_stats() for (api_base, _), gateway in _shared_gateways.items()}
+
+
+def close_llm_gateways() -> None:
+    """关闭所有共享网关（释放连接池与事件循环线程）"""
+    with _gateway_lock:
+        gateways = list(_shared_gateways.values())
+        _shared_gateways.clear()
+    for gateway in gateways:
+        gateway.close()
+
+
+def _trace_llm_record(record: Dict[str, Any]) -> None:
+    """把一次LLM调用的用量写入当前 span（llm.* span 内调用）"""
+    set_span_attributes(
+        prompt_tokens=record["prompt_tokens"],
+        completion_tokens=record["completion_tokens"],
+        prompt_cache_hit_tokens=record["prompt_cache_hit_tokens"],
+        cached=record["cached"],
+        estimated=record["estimated"],
+    )
+
+
+def _to_openai_messages(prompt: Any) -> List[Dict[str, str]]:
+    """
+    将 prompt 文本或 PromptValue 转换为 OpenAI 消息列表
+
+    Args:
+        prompt: prompt 文本或 PromptValue
+
+    Returns:
+        [{"role", "content"}]
+    """
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    return [
+        {"role": _MESSAGE_ROLES.get(message.type, "user"), "content": message.content}
+        for message in prompt.to_messages()
+    ]
+
 
 class BaseLLM:
     """
     LLM基础类，封装LangChain的ChatOpenAI
 
     功能:
-    - 支持聊天历史记录
+    - 支持聊天历史记录（有界存储：LRU/空闲TTL淘汰，每会话按消息数/token数保留滑动窗口）
     - 自动从配置文件加载参数
     - 支持自定义提示词和输出解析器
     - 会话管理
+    - 确定性 prompt 调用的响应缓存（invoke_prompt）
+    - invoke_prompt 经连接池网关发送（并发限制、退避重试、对冲请求）
+    - 每次调用按查询与图节点记录 token 与耗时（core.llm_usage）
     """
 
     def __init__(
@@ -35,7 +201,13 @@ class BaseLLM:
         api_base: Optional[str] = None,
         prompt: Optional[ChatPromptTemplate] = None,
         outparser: Optional[StrOutputParser] = None,
-        system_context: Optional[Dict[str, Any]] = None
+        system_context: Optional[Dict[str, Any]] = None,
+        response_cache: Optional[LLMResponseCache] = None,
+        gateway: Optional[LLMGateway] = None,
+        history_store: Optional[ChatHistoryStore] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        profile: str = "default"
     ):
         """
         初始化LLM实例
@@ -48,6 +220,12 @@ class BaseLLM:
             prompt: 自定义提示词模板
             outparser: 自定义输出解析器
             system_context: 系统上下文信息（如数据库schema）
+            response_cache: LLM响应缓存，默认使用进程内共享实例（LLM_CACHE_ENABLED 关闭时不缓存）
+            gateway: LLM网关，默认使用进程内共享实例（LLM_GATEWAY_ENABLED 关闭时直接调用 ChatOpenAI）
+            history_store: 会话历史存储，默认使用进程内共享实例（CHAT_HISTORY_* 配置）
+            max_tokens: 单次响应的最大 token 数，默认不限制
+            timeout: 单次请求超时（秒），默认使用 LLM_REQUEST_TIMEOUT
+            profile: LLM配置名（core.llm_profiles），用于按配置统计用量
         """
         # 使用配置文件中的值作为默认值，允许参数覆盖
         self.api_key = api_key or settings.DEEPSEEK_API_KEY
@@ -61,6 +239,9 @@ class BaseLLM:
         self.temperature = temperature if temperature is not None else settings.LLM_TEMPERATURE
         self.model = model or settings.LLM_MODEL
         self.api_base = api_base or settings.DEEPSEEK_API_BASE
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.profile = profile
 
         # 初始化系统上下文
         self.system_context = system_context or {}
@@ -77,11 +258,19 @@ class BaseLLM:
             temperature=self.temperature,
             model=self.model,
             api_key=self.api_key,
-            base_url=self.api_base
+            base_url=self.api_base,
+            max_tokens=self.max_tokens,
+            timeout=self.timeout
         )
 
-        # 初始化历史记录存储
-        self.history_store = {}
+        # ✅ 响应缓存（完整 prompt 相同时直接返回上次的响应）
+        self.response_cache = response_cache or get_response_cache()
+
+        # ✅ 连接池网关（并发限制、退避重试、对冲请求）
+        self.gateway = gateway or get_llm_gateway(self.api_key, self.api_base)
+
+        # ✅ 有界会话历史存储（按 session_id 共享，每次只发送窗口内的消息）
+        self.history_store = history_store or get_chat_history_store()
 
         # 创建链
         self.chain = self.prompt | self.llm | self.outparser
@@ -95,7 +284,7 @@ class BaseLLM:
         )
 
         logger.info(
-            f"BaseLLM initialized: model={self.model}, "
+            f"BaseLLM initialized: profile={self.profile}, model={self.model}, "
             f"temperature={self.temperature}, "
             f"api_base={self.api_base}, "
             f"system_context_keys={list(self.system_context.keys())}"
@@ -207,7 +396,7 @@ class BaseLLM:
             ("human", "{input}")
         ])
 
-    def get_session_history(self, session_id: str) -> ChatMessageHistory:
+    def get_session_history(self, session_id: str) -> WindowedChatMessageHistory:
         """
         获取或创建会话历史记录
 
@@ -215,11 +404,9 @@ class BaseLLM:
             session_id: 会话唯一标识符
 
         Returns:
-            ChatMessageHistory对象
+            WindowedChatMessageHistory对象（超出窗口的早期消息已丢弃）
         """
-        if session_id not in self.history_store:
-            self.history_store[session_id] = ChatMessageHistory()
-        return self.history_store[session_id]
+        return self.history_store.get(session_id)
 
     def invoke(self, input_text: str, session_id: str = "default") -> str:
         """
@@ -234,16 +421,160 @@ class BaseLLM:
         """
         context = LLMContextSchema(session_id=session_id)
         try:
-            response = self.chain_with_history.invoke(
-                {"input": input_text},
-                context=context
-            )
+            start = time.perf_counter()
+            with span("llm.chat", call_site="chat", model=self.model, profile=self.profile):
+                response = self.chain_with_history.invoke(
+                    {"input": input_text},
+                    context=context
+                )
+                # 链式调用拿不到 usage，按文本估算
+                _trace_llm_record(record_llm_call(
+                    "chat", estimate_tokens(input_text), estimate_tokens(response),
+                    (time.perf_counter() - start) * 1000, model=self.model, estimated=True, profile=self.profile))
             logger.debug(f"LLM response for session {session_id}: {response[:100]}...")
             return response
         except Exception as e:
             logger.error(f"Error invoking LLM: {e}")
             raise
 
+    def invoke_prompt(self, prompt: Any, call_site: str = "default") -> Any:
+        """
+        直接调用底层模型处理完整渲染后的 prompt（带响应缓存）
+
+        Args:
+            prompt: 完整的 prompt 文本（或 PromptValue）
+            call_site: 调用点名称，决定缓存 TTL（如 intent/sql_generation/sql_fix/validation）
+
+        Returns:
+            模型响应消息（缓存命中时为 AIMessage）
+        """
+        with span(f"llm.{call_site}", call_site=call_site, model=self.model, profile=self.profile):
+            start = time.perf_counter()
+            cache = self.response_cache
+            if cache is None or not cache.is_cacheable(call_site, self.temperature):
+                return self._call_model(prompt, call_site)
+
+            prompt_text = prompt if isinstance(prompt, str) else prompt.to_string()
+            key = cache.make_key(self.model, self.temperature, prompt_text)
+            cached = cache.get(key, call_site)
+            if cached is not None:
+                logger.debug(f"LLM response cache hit ({call_site}): {key[:12]}")
+                _trace_llm_record(record_llm_call(call_site, 0, 0, (time.perf_counter() - start) * 1000,
+                                                  model=self.model, cached=True, profile=self.profile))
+                return AIMessage(content=cached)
+
+            response = self._call_model(prompt, call_site)
+            content = response.content if hasattr(response, "content") else str(response)
+            if isinstance(content, str):
+                cache.set(key, content, call_site)
+            return response
+
+    def _call_model(self, prompt: Any, call_site: str) -> Any:
+        """
+        调用模型：启用网关时经连接池发送，否则直接调用 ChatOpenAI
+
+        Args:
+            prompt: 完整的 prompt 文本（或 PromptValue）
+            call_site: 调用点名称（网关按调用点统计延迟并计算对冲阈值）
+
+        Returns:
+            模型响应消息
+
+        Raises:
+            DeadlineExceededError: 请求已超过截止时间（不再发起调用）
+        """
+        # 请求有截止时间时，以剩余时间作为本次调用的超时
+        timeout = clamp_timeout(self.timeout)
+        start = time.perf_counter()
+        if self.gateway is None:
+            if timeout != self.timeout:
+                response = self.llm.invoke(prompt, timeout=timeout)
+            else:
+                response = self.llm.invoke(prompt)
+            prompt_tokens, completion_tokens, estimated = self._extract_usage(prompt, response)
+            _trace_llm_record(record_llm_call(
+                call_site, prompt_tokens, completion_tokens, (time.perf_counter() - start) * 1000,
+                model=self.model, estimated=estimated,
+                prompt_cache_hit_tokens=self._extract_cached_tokens(response), profile=self.profile))
+            return response
+
+        params: Dict[str, Any] = {"model": self.model, "temperature": self.temperature}
+        if self.max_tokens:
+            params["max_tokens"] = self.max_tokens
+        if timeout:
+            params["timeout"] = timeout
+        remaining = remaining_seconds()
+        if remaining is not None:
+            # 重试与对冲的总耗时也不超过剩余时间
+            params["total_timeout"] = remaining
+        result = self.gateway.complete(_to_openai_messages(prompt), call_site=call_site, **params)
+        usage = result.get("usage") or {}
+        response = AIMessage(
+            content=result["content"],
+            response_metadata={
+                "token_usage": usage,
+                "model_name": result.get("model") or self.model,
+                "latency_ms": result.get("latency_ms"),
+                "attempts": result.get("attempts"),
+                "hedged": result.get("hedged"),
+            },
+        )
+        prompt_tokens, completion_tokens, estimated = self._extract_usage(prompt, response)
+        _trace_llm_record(record_llm_call(
+            call_site, prompt_tokens, completion_tokens,
+            result.get("latency_ms") or (time.perf_counter() - start) * 1000,
+            model=self.model, estimated=estimated,
+            prompt_cache_hit_tokens=self._extract_cached_tokens(response), profile=self.profile))
+        set_span_attributes(attempts=result.get("attempts"), hedged=result.get("hedged"))
+        return response
+
+    @staticmethod
+    def _extract_usage(prompt: Any, response: Any) -> Tuple[int, int, bool]:
+        """
+        提取响应中的 token 用量，接口未返回时按文本估算
+
+        Args:
+            prompt: prompt 文本或 PromptValue
+            response: 模型响应
+
+        Returns:
+            (prompt_tokens, completion_tokens, 是否为估算值)
+        """
+        usage = getattr(response, "usage_metadata", None) or {}
+        if usage.get("input_tokens") is not None:
+            return int(usage["input_tokens"]), int(usage.get("output_tokens") or 0), False
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        if token_usage.get("prompt_tokens") is not None:
+            return int(token_usage["prompt_tokens"]), int(token_usage.get("completion_tokens") or 0), False
+
+        prompt_text = prompt if isinstance(prompt, str) else prompt.to_string()
+        content = getattr(response, "content", response)
+        return estimate_tokens(prompt_text), estimate_tokens(content if isinstance(content, str) else str(content)), True
+
+    @staticmethod
+    def _extract_cached_tokens(response: Any) -> int:
+        """
+        提取命中服务商上下文缓存（prompt 前缀缓存）的 prompt token 数
+
+        兼容 LangChain usage_metadata、DeepSeek（prompt_cache_hit_tokens）
+        和 OpenAI（prompt_tokens_details.cached_tokens）的返回格式
+
+        Args:
+            response: 模型响应
+
+        Returns:
+            缓存命中的 token 数，接口未返回时为 0
+        """
+        usage = getattr(response, "usage_metadata", None) or {}
+        cache_read = (usage.get("input_token_details") or {}).get("cache_read")
+        if cache_read is not None:
+            return int(cache_read)
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        if token_usage.get("prompt_cache_hit_tokens") is not None:
+            return int(token_usage["prompt_cache_hit_tokens"])
+        details = token_usage.get("prompt_tokens_details") or {}
+        return int(details.get("cached_tokens") or 0)
+
     def invoke_without_history(self, input_text: str) -> str:
         """
         调用LLM处理输入文本（不保存历史记录）
@@ -258,7 +589,12 @@ class BaseLLM:
             # 创建一个不包含历史记录的简单prompt
             simple_prompt = self._build_simple_prompt()
             simple_chain = simple_prompt | self.llm | self.outparser
-            response = simple_chain.invoke({"input": input_text})
+            start = time.perf_counter()
+            with span("llm.chat", call_site="chat", model=self.model, profile=self.profile):
+                response = simple_chain.invoke({"input": input_text})
+                _trace_llm_record(record_llm_call(
+                    "chat", estimate_tokens(input_text), estimate_tokens(response),
+                    (time.perf_counter() - start) * 1000, model=self.model, estimated=True, profile=self.profile))
             logger.debug(f"LLM response (no history): {response[:100]}...")
             return response
         except Exception as e:
@@ -285,8 +621,7 @@ class BaseLLM:
         Args:
             session_id: 会话ID
         """
-        if session_id in self.history_store:
-            self.history_store[session_id].clear()
+        if self.history_store.clear_session(session_id):
             logger.info(f"Session history cleared for: {session_id}")
 
     def clear_all_histories(self):
@@ -313,9 +648,8 @@ class BaseLLM:
         Returns:
             消息数量
         """
-        if session_id in self.history_store:
-            return len(self.history_store[session_id].messages)
-        return 0
+        history = self.history_store.peek(session_id)
+        return len(history.messages) if history is not None else 0
 
 
 # 测试代码
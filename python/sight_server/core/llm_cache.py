@@ -0,0 +1,322 @@
+"""
+LLM响应缓存模块 - Sight Server
+对完整渲染后的 prompt 做响应级缓存：键为 (模型, 温度, prompt) 的哈希，
+内存 LRU + 磁盘两级存储，按调用点设置不同的 TTL
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 各调用点的默认 TTL（秒），0 表示该调用点不缓存
+DEFAULT_CALL_SITE_TTLS: Dict[str, int] = {
+    "intent": 86400,          # 意图分析：只依赖查询文本
+    "sql_generation": 3600,   # SQL生成：prompt 已包含 schema，schema 变化时键自然变化
+    "sql_fix": 3600,          # SQL修复：相同 SQL + 相同错误
+    "validation": 600,        # 结果验证：prompt 包含结果样本
+    "answer": 0,              # 回答生成：面向用户的自然语言，不缓存
+    "validate_answer": 0,     # 验证 + 回答融合：同上，不缓存
+}
+
+
+def parse_call_site_ttls(spec: Optional[str]) -> Dict[str, int]:
+    """
+    解析调用点 TTL 配置
+
+    Args:
+        spec: 形如 "intent=86400,sql_fix=0" 的配置字符串
+
+    Returns:
+        调用点 → TTL（秒）
+    """
+    ttls: Dict[str, int] = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, _, value = item.partition("=")
+        try:
+            ttls[name.strip()] = int(value.strip())
+        except ValueError:
+            logger.warning(f"Invalid LLM cache TTL entry ignored: {item!r}")
+    return ttls
+
+
+class LLMResponseCache:
+    """
+    LLM响应缓存（线程安全）
+
+    - 键: sha256(model, temperature, prompt)
+    - 内存层: LRU，命中后直接返回
+    - 磁盘层: 每条响应一个 JSON 文件，进程重启后仍可命中，命中后回填内存层
+    - 温度高于 max_temperature 的调用默认不写入（输出本身是随机的），需显式开启
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_entries: int = 1000,
+        default_ttl: int = 3600,
+        call_site_ttls: Optional[Dict[str, int]] = None,
+        max_temperature: float = 0.5,
+        cache_high_temperature: bool = False,
+    ):
+        """
+        初始化LLM响应缓存
+
+        Args:
+            cache_dir: 磁盘缓存目录，None 表示只使用内存层
+            max_entries: 内存层最大条目数
+            default_ttl: 未单独配置的调用点使用的 TTL（秒）
+            call_site_ttls: 调用点 TTL 覆盖（与默认表合并）
+            max_temperature: 允许缓存的最高温度
+            cache_high_temperature: 温度高于 max_temperature 时是否仍然缓存
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.call_site_ttls = dict(DEFAULT_CALL_SITE_TTLS)
+        self.call_site_ttls.update(call_site_ttls or {})
+        self.max_temperature = max_temperature
+        self.cache_high_temperature = cache_high_temperature
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._site_stats: Dict[str, Dict[str, int]] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped_temperature = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    # ==================== 键与策略 ====================
+
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str) -> str:
+        """
+        生成缓存键
+
+        Args:
+            model: 模型名称
+            temperature: 温度
+            prompt: 完整渲染后的 prompt 文本
+
+        Returns:
+            sha256 十六进制摘要
+        """
+        payload = f"{model}\x1f{float(temperature):.3f}\x1f{prompt}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_ttl(self, call_site: str) -> int:
+        """获取调用点的 TTL（秒）"""
+        return self.call_site_ttls.get(call_site, self.default_ttl)
+
+    def is_cacheable(self, call_site: str, temperature: float) -> bool:
+        """
+        判断调用是否走缓存
+
+        Args:
+            call_site: 调用点名称
+            temperature: 本次调用的温度
+
+        Returns:
+            是否读写缓存
+        """
+        if self.get_ttl(call_site) <= 0:
+            return False
+        if temperature > self.max_temperature and not self.cache_high_temperature:
+            with self._lock:
+                self.skipped_temperature += 1
+            return False
+        return True
+
+    def _site(self, call_site: str) -> Dict[str, int]:
+        """调用点统计（调用方需持有锁）"""
+        return self._site_stats.setdefault(call_site, {"hits": 0, "misses": 0, "stores": 0})
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    # ==================== 读写 ====================
+
+    def get(self, key: str, call_site: str = "default") -> Optional[str]:
+        """
+        查找缓存的响应
+
+        Args:
+            key: 缓存键
+            call_site: 调用点名称（用于统计）
+
+        Returns:
+            响应文本，未命中或已过期返回 None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry["expires_at"] > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self._site(call_site)["hits"] += 1
+                return entry["response"]
+            if entry is not None:
+                del self._memory[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                self._site(call_site)["misses"] += 1
+                return None
+            self._put_memory(key, entry)
+            self.disk_hits += 1
+            self._site(call_site)["hits"] += 1
+        return entry["response"]
+
+    def set(self, key: str, response: str, call_site: str = "default", ttl: Optional[int] = None) -> None:
+        """
+        写入响应
+
+        Args:
+            key: 缓存键
+            response: 响应文本
+            call_site: 调用点名称
+            ttl: 覆盖调用点 TTL（秒）
+        """
+        ttl = self.get_ttl(call_site) if ttl is None else ttl
+        if ttl <= 0 or not response:
+            return
+        entry = {
+            "response": response,
+            "call_site": call_site,
+            "created_at": time.time(),
+            "expires_at": time.time() + ttl,
+        }
+        with self._lock:
+            self._put_memory(key, entry)
+            self.stores += 1
+            self._site(call_site)["stores"] += 1
+        self._write_disk(key, entry)
+
+    def _put_memory(self, key: str, entry: Dict[str, Any]) -> None:
+        """写入内存层并按 LRU 淘汰（调用方需持有锁）"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read LLM cache entry {key[:12]}: {e}")
+            return None
+        if entry.get("expires_at", 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]) -> None:
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write LLM cache entry {key[:12]}: {e}")
+
+    # ==================== 管理 ====================
+
+    def clear(self) -> int:
+        """
+        清空内存层和磁盘层
+
+        Returns:
+            删除的磁盘条目数
+        """
+        with self._lock:
+            self._memory.clear()
+        removed = 0
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".json"):
+                        try:
+                            os.remove(os.path.join(root, name))
+                            removed += 1
+                        except OSError:
+                            pass
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            命中率、内存/磁盘命中次数、各调用点统计等
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_enabled": bool(self.cache_dir),
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate_percent": round(hits / total * 100, 2) if total else 0,
+                "stores": self.stores,
+                "skipped_high_temperature": self.skipped_temperature,
+                "max_temperature": self.max_temperature,
+                "cache_high_temperature": self.cache_high_temperature,
+                "call_site_ttls": dict(self.call_site_ttls),
+                "call_sites": {name: dict(stats) for name, stats in self._site_stats.items()},
+            }
+
+
+# 测试代码
+if __name__ == "__main__":
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO)
+
+    cache_dir = tempfile.mkdtemp()
+    cache = LLMResponseCache(cache_dir=cache_dir, call_site_ttls=parse_call_site_ttls("validation=0"))
+    prompt = "分析查询意图: 浙江省的5A景区"
+    key = cache.make_key("deepseek-chat", 0.0, prompt)
+
+    print(f"cacheable(intent, t=0.0): {cache.is_cacheable('intent', 0.0)}")
+    print(f"cacheable(intent, t=1.3): {cache.is_cacheable('intent', 1.3)}")
+    print(f"cacheable(validation, t=0.0): {cache.is_cacheable('validation', 0.0)}")
+
+    print(f"first lookup: {cache.get(key, 'intent')}")
+    cache.set(key, '{"intent_type": "query"}', "intent")
+    print(f"memory lookup: {cache.get(key, 'intent')}")
+
+    # 新实例只能从磁盘层命中
+    restarted = LLMResponseCache(cache_dir=cache_dir)
+    print(f"disk lookup after restart: {restarted.get(key, 'intent')}")
+    print(restarted.get_stats())
@@ -0,0 +1,450 @@
+"""
+LLM网关模块 - Sight Server
+基于 httpx 异步连接池直接调用 OpenAI 兼容的 /chat/completions 接口：
+全局并发信号量、429/5xx 指数退避（带抖动）、可选的对冲请求（超过 p95 仍未返回时再发一次，取先返回者），
+以及按调用点统计的延迟指标
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码（限流 + 服务端错误）
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class LLMGatewayError(Exception):
+    """LLM网关请求失败（重试耗尽或不可重试的错误）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    """计算百分位数（最近邻插值）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class CallSiteMetrics:
+    """单个调用点的延迟与重试统计"""
+
+    def __init__(self, window: int = 500):
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        samples = list(self.latencies_ms)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "p50_ms": round(_percentile(samples, 50), 2),
+            "p95_ms": round(_percentile(samples, 95), 2),
+            "p99_ms": round(_percentile(samples, 99), 2),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+class LLMGateway:
+    """
+    LLM网关（进程内共享，线程安全）
+
+    - 连接池: 单个 httpx.AsyncClient，运行在独立的事件循环线程上，同步调用方通过 complete() 提交
+    - 并发: 全局 asyncio.Semaphore 限制同时在途的请求数（包括重试与对冲请求）
+    - 重试: 429/5xx/网络错误按 min(backoff_max, backoff_base * 2^n) 全抖动退避，优先遵循 Retry-After
+    - 对冲: 请求超过调用点的 p95 延迟（或固定 hedge_delay）仍未返回时再发一个，取先成功者
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_base: str,
+        model: str,
+        temperature: float = 0.0,
+        max_concurrency: int = 8,
+        max_connections: int = 20,
+        timeout: float = 60.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        hedge_enabled: bool = False,
+        hedge_delay: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        hedge_percentile: float = 95.0,
+    ):
+        """
+        初始化LLM网关
+
+        Args:
+            api_key: API密钥
+            api_base: OpenAI 兼容接口的基础URL（如 https://api.deepseek.com）
+            model: 默认模型名称
+            temperature: 默认温度
+            max_concurrency: 全局最大在途请求数
+            max_connections: 连接池最大连接数
+            timeout: 单次请求超时（秒）
+            max_retries: 最大重试次数
+            backoff_base: 退避基数（秒）
+            backoff_max: 单次退避上限（秒）
+            hedge_enabled: 是否启用对冲请求
+            hedge_delay: 固定对冲延迟（秒），None 表示使用调用点的历史 p95
+            hedge_min_samples: 使用 p95 对冲前至少需要的样本数
+            hedge_percentile: 对冲延迟使用的百分位
+        """
+        self.api_base = api_base.rstrip("/")
+        self.model = model
+        self.temperature = temperature
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_enabled = hedge_enabled
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_percentile = hedge_percentile
+        self._headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+        self._metrics: Dict[str, CallSiteMetrics] = {}
+        self._metrics_lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+        # 独立事件循环线程，承载连接池与信号量
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="llm-gateway", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+        logger.info(
+            f"LLMGateway initialized: base={self.api_base}, model={model}, "
+            f"concurrency={max_concurrency}, retries={max_retries}, hedge={hedge_enabled}")
+
+    async def _setup(self) -> None:
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=self.api_base,
+            headers=self._headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections),
+        )
+
+    # ==================== 对外接口 ====================
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        call_site: str = "default",
+        **params: Any,
+    ) -> Dict[str, Any]:
+        """
+        同步调用（供 LangGraph 节点等同步代码使用）
+
+        Args:
+            messages: OpenAI 格式消息列表
+            call_site: 调用点名称（用于指标统计与对冲延迟）
+            **params: 覆盖请求参数（model、temperature、max_tokens 等；timeout 覆盖单次请求超时，
+                total_timeout 限制含重试与对冲的总耗时，超出时抛出 TimeoutError）
+
+        Returns:
+            {"content", "usage", "model", "latency_ms", "attempts", "hedged"}
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("LLMGateway.complete() cannot be called from the gateway loop; use acomplete()")
+        future = asyncio.run_coroutine_threadsafe(
+            self.acomplete(messages, call_site=call_site, **params), self._loop)
+        return future.result()
+
+    async def acomplete(
+        self,
+        messages: List[Dict[str, str]],
+        call_site: str = "default",
+        **params: Any,
+    ) -> Dict[str, Any]:
+        """
+        异步调用（在任意事件循环中均可 await）
+
+        Args:
+            messages: OpenAI 格式消息列表
+            call_site: 调用点名称
+            **params: 覆盖请求参数
+
+        Returns:
+            同 complete()
+        """
+        if asyncio.get_running_loop() is not self._loop:
+            future = asyncio.run_coroutine_threadsafe(
+                self.acomplete(messages, call_site=call_site, **params), self._loop)
+            return await asyncio.wrap_future(future)
+
+        timeout = params.pop("timeout", None)
+        total_timeout = params.pop("total_timeout", None)
+        payload = {
+            "model": params.pop("model", None) or self.model,
+            "temperature": params.pop("temperature", self.temperature),
+            "messages": messages,
+        }
+        payload.update(params)
+
+        metrics = self._get_metrics(call_site)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                self._hedged_request(payload, call_site, metrics, timeout), total_timeout)
+        except Exception:
+            with self._metrics_lock:
+                metrics.calls += 1
+                metrics.errors += 1
+            raise
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        usage = result.get("usage") or {}
+        with self._metrics_lock:
+            metrics.calls += 1
+            metrics.latencies_ms.append(latency_ms)
+            metrics.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+            metrics.completion_tokens += int(usage.get("completion_tokens") or 0)
+        result["latency_ms"] = round(latency_ms, 2)
+        return result
+
+    # ==================== 对冲与重试 ====================
+
+    def _get_metrics(self, call_site: str) -> CallSiteMetrics:
+        with self._metrics_lock:
+            if call_site not in self._metrics:
+                self._metrics[call_site] = CallSiteMetrics()
+            return self._metrics[call_site]
+
+    def get_hedge_delay(self, call_site: str) -> Optional[float]:
+        """
+        获取调用点的对冲延迟（秒）
+
+        Returns:
+            对冲延迟，未启用或样本不足时返回 None
+        """
+        if not self.hedge_enabled:
+            return None
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        metrics = self._get_metrics(call_site)
+        with self._metrics_lock:
+            samples = list(metrics.latencies_ms)
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return _percentile(samples, self.hedge_percentile) / 1000
+
+    async def _hedged_request(self, payload: Dict[str, Any], call_site: str,
+                              metrics: CallSiteMetrics, timeout: Optional[float] = None) -> Dict[str, Any]:
+        delay = self.get_hedge_delay(call_site)
+        primary = asyncio.ensure_future(self._request_with_retry(payload, metrics, timeout))
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        with self._metrics_lock:
+            metrics.hedged += 1
+        hedge = asyncio.ensure_future(self._request_with_retry(payload, metrics, timeout))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        result = task.result()
+                        result["hedged"] = True
+                        if task is hedge:
+                            with self._metrics_lock:
+                                metrics.hedge_wins += 1
+                        return result
+                    error = task.exception()
+            raise error  # 两个请求都失败
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _request_with_retry(self, payload: Dict[str, Any], metrics: CallSiteMetrics,
+                                  timeout: Optional[float] = None) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            retry_after: Optional[float] = None
+            try:
+                async with self._semaphore:
+                    self._in_flight += 1
+                    self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+                    try:
+                        response = await self._client.post(
+                            "/chat/completions", json=payload,
+                            timeout=timeout if timeout else httpx.USE_CLIENT_DEFAULT)
+                    finally:
+                        self._in_flight -= 1
+
+                if response.status_code == 200:
+                    body = response.json()
+                    message = body["choices"][0]["message"]
+                    return {
+                        "content": message.get("content") or "",
+                        "usage": body.get("usage") or {},
+                        "model": body.get("model", payload["model"]),
+                        "attempts": attempt + 1,
+                        "hedged": False,
+                    }
+
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    raise LLMGatewayError(
+                        f"LLM request failed with HTTP {response.status_code}: {response.text[:200]}",
+                        status_code=response.status_code)
+                retry_after = self._parse_retry_after(response.headers.get("retry-after"))
+                reason = f"HTTP {response.status_code}"
+
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt >= self.max_retries:
+                    raise LLMGatewayError(f"LLM request failed after {attempt + 1} attempts: {e}") from e
+                reason = type(e).__name__
+
+            # 全抖动指数退避；服务端给出 Retry-After 时至少等待该时长
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.backoff_max))
+            attempt += 1
+            with self._metrics_lock:
+                metrics.retries += 1
+            logger.warning(f"LLM request retry {attempt}/{self.max_retries} in {delay:.2f}s ({reason})")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return None
+
+    # ==================== 统计与关闭 ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取网关统计
+
+        Returns:
+            全局配置、在途请求数以及各调用点的调用次数、重试、对冲和 p50/p95/p99 延迟
+        """
+        with self._metrics_lock:
+            call_sites = {name: metrics.snapshot() for name, metrics in self._metrics.items()}
+        return {
+            "api_base": self.api_base,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "max_retries": self.max_retries,
+            "hedge_enabled": self.hedge_enabled,
+            "call_sites": call_sites,
+        }
+
+    def close(self) -> None:
+        """关闭连接池并停止事件循环线程"""
+        if not self._loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"Error closing LLM gateway client: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+# 测试代码：对本地假 OpenAI 兼容服务压测（注入 429 与长尾延迟），无需真实 API
+if __name__ == "__main__":
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    state = {"requests": 0, "active": 0, "peak": 0}
+    state_lock = threading.Lock()
+
+    class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with state_lock:
+                state["requests"] += 1
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+                n = state["requests"]
+            try:
+                if n % 7 == 0:  # 注入限流
+                    self.send_response(429)
+                    self.send_header("Retry-After", "0.1")
+                    self.end_headers()
+                    return
+                time.sleep(1.5 if n % 10 == 0 else random.uniform(0.05, 0.15))  # 长尾
+                reply = json.dumps({
+                    "model": body["model"],
+                    "choices": [{"message": {"role": "assistant", "content": f"echo: {body['messages'][-1]['content']}"}}],
+                    "usage": {"prompt_tokens": 12, "completion_tokens": 5, "total_tokens": 17},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # 对冲请求胜出后客户端取消了另一个请求
+            finally:
+                with state_lock:
+                    state["active"] -= 1
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    for hedge in (False, True):
+        state.update(requests=0, peak=0)
+        gateway = LLMGateway("fake-key", base, "fake-model", max_concurrency=4,
+                             backoff_base=0.05, hedge_enabled=hedge, hedge_min_samples=10)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(
+                lambda i: gateway.complete([{"role": "user", "content": f"q{i}"}], call_site="demo"), range(60)))
+        elapsed = time.perf_counter() - start
+        stats = gateway.get_stats()
+        print(f"\nhedge={hedge}: {len(results)} calls in {elapsed:.2f}s, server requests={state['requests']}, "
+              f"gateway peak in-flight={stats['peak_in_flight']} (limit 4)")
+        print(f"  {stats['call_sites']['demo']}")
+        gateway.close()
+
+    server.shutdown()
@@ -0,0 +1,239 @@
+"""
+LLM模型路由模块 - Sight Server
+按组件选择模型：维护命名的LLM配置（模型、温度、max_tokens、超时、单价），
+意图分类、结果验证、对话总结等简单任务绑定到小而快的模型，SQL生成使用强模型，
+并按配置汇总调用次数、token、耗时与估算费用
+"""
+
+import json
+import logging
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional, Union
+
+from .llm_usage import get_usage_aggregator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = "default"
+
+# 可绑定模型配置的组件 → 对应的调用点
+LLM_COMPONENTS: Dict[str, tuple] = {
+    "intent": ("intent",),                      # IntentAnalyzer / TieredIntentEngine
+    "sql": ("sql_generation", "sql_fix"),       # SQLGenerator
+    "validation": ("validation",),              # ResultValidator / 验证节点
+    "answer": ("answer", "validate_answer"),    # AnswerGenerator / 验证与回答融合节点
+    "analysis": ("analysis",),                  # DataAnalyzer
+    "summarization": ("summarization",),        # 对话总结
+}
+
+
+@dataclass
+class LLMProfile:
+    """
+    命名的LLM配置
+
+    prompt_price / completion_price 为每百万 token 的单价，用于估算费用（0 表示不统计）
+    """
+    name: str
+    model: str
+    temperature: float
+    max_tokens: Optional[int] = None
+    timeout: Optional[float] = None
+    prompt_price: float = 0.0
+    completion_price: float = 0.0
+
+    def estimate_cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        """按单价估算费用"""
+        return (prompt_tokens * self.prompt_price + completion_tokens * self.completion_price) / 1_000_000
+
+
+def parse_llm_profiles(spec: Union[str, Dict[str, Any], None], default: LLMProfile) -> Dict[str, LLMProfile]:
+    """
+    解析LLM配置
+
+    Args:
+        spec: JSON 字符串或已解析的字典，如 {"fast": {"model": "deepseek-chat", "temperature": 0, "max_tokens": 512, "timeout": 15}}，
+              未给出的字段沿用 default；名为 default 的配置覆盖默认配置
+        default: 默认配置（LLM_MODEL / LLM_TEMPERATURE）
+
+    Returns:
+        配置名 → LLMProfile（始终包含 default）
+    """
+    profiles = {DEFAULT_PROFILE: default}
+    if isinstance(spec, str):
+        if not spec.strip():
+            return profiles
+        try:
+            raw = json.loads(spec)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Invalid LLM_PROFILES ignored: {e}")
+            return profiles
+    else:
+        raw = spec
+
+    base = asdict(default)
+    for name, fields in (raw or {}).items():
+        if not isinstance(fields, dict):
+            logger.warning(f"Invalid LLM profile entry ignored: {name!r}")
+            continue
+        known = {k: v for k, v in fields.items() if k in base and k != "name"}
+        profiles[name] = LLMProfile(**{**base, **known, "name": name})
+    return profiles
+
+
+def parse_profile_bindings(spec: Optional[str]) -> Dict[str, str]:
+    """
+    解析组件 → 配置名绑定
+
+    Args:
+        spec: 形如 "intent=fast,validation=fast,summarization=fast" 的配置字符串
+
+    Returns:
+        组件 → 配置名
+    """
+    bindings: Dict[str, str] = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        component, _, profile = item.partition("=")
+        bindings[component.strip()] = profile.strip()
+    return bindings
+
+
+class LLMProfileRegistry:
+    """
+    LLM配置注册表（线程安全）
+
+    - 每个配置懒加载一个 BaseLLM 实例，绑定到同一配置的组件共享该实例
+    - 未绑定或绑定到未知配置的组件使用 default
+    - get_stats() 合并全局用量（按配置）与单价，给出每个配置的耗时与估算费用
+    """
+
+    def __init__(
+        self,
+        profiles: Dict[str, LLMProfile],
+        bindings: Optional[Dict[str, str]] = None,
+        llm_factory: Optional[Callable[..., Any]] = None,
+    ):
+        """
+        初始化配置注册表
+
+        Args:
+            profiles: 配置名 → LLMProfile（必须包含 default）
+            bindings: 组件 → 配置名
+            llm_factory: 创建LLM实例的函数，默认 BaseLLM
+        """
+        if DEFAULT_PROFILE not in profiles:
+            raise ValueError(f"LLM profiles must include '{DEFAULT_PROFILE}'")
+        self.profiles = dict(profiles)
+        self.bindings: Dict[str, str] = {}
+        for component, profile in (bindings or {}).items():
+            if profile not in self.profiles:
+                logger.warning(
+                    f"LLM profile '{profile}' for component '{component}' is not defined, using '{DEFAULT_PROFILE}'")
+                continue
+            if component not in LLM_COMPONENTS:
+                logger.warning(f"Unknown LLM component '{component}' in profile bindings")
+            self.bindings[component] = profile
+
+        if llm_factory is None:
+            from .llm import BaseLLM
+            llm_factory = BaseLLM
+        self._llm_factory = llm_factory
+        self._llms: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def profile_for(self, component: str) -> LLMProfile:
+        """
+        获取组件绑定的配置
+
+        Args:
+            component: 组件名（见 LLM_COMPONENTS）
+
+        Returns:
+            LLMProfile
+        """
+        return self.profiles[self.bindings.get(component, DEFAULT_PROFILE)]
+
+    def get_llm(self, component: str = DEFAULT_PROFILE) -> Any:
+        """
+        获取组件使用的LLM实例
+
+        Args:
+            component: 组件名，default 表示默认配置
+
+        Returns:
+            BaseLLM 实例（同一配置共享）
+        """
+        profile = self.profile_for(component)
+        with self._lock:
+            llm = self._llms.get(profile.name)
+            if llm is None:
+                llm = self._llm_factory(
+                    temperature=profile.temperature,
+                    model=profile.model,
+                    max_tokens=profile.max_tokens,
+                    timeout=profile.timeout,
+                    profile=profile.name,
+                )
+                self._llms[profile.name] = llm
+                logger.info(f"LLM profile '{profile.name}' initialized: model={profile.model}")
+            return llm
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取各配置的绑定、用量、耗时与估算费用
+
+        Returns:
+            {"bindings": 组件 → 配置名, "profiles": 配置名 → 统计}
+        """
+        usage = get_usage_aggregator().get_stats().get("by_profile", {})
+        profiles: Dict[str, Any] = {}
+        for name, profile in self.profiles.items():
+            stats = usage.get(name, {})
+            profiles[name] = {
+                "model": profile.model,
+                "temperature": profile.temperature,
+                "max_tokens": profile.max_tokens,
+                "timeout": profile.timeout,
+                "components": [c for c in LLM_COMPONENTS if self.profile_for(c).name == name],
+                "calls": stats.get("calls", 0),
+                "prompt_tokens": stats.get("prompt_tokens", 0),
+                "completion_tokens": stats.get("completion_tokens", 0),
+                "avg_latency_ms": stats.get("avg_latency_ms", 0),
+                "estimated_cost": round(profile.estimate_cost(
+                    stats.get("prompt_tokens", 0), stats.get("completion_tokens", 0)), 6),
+            }
+        return {
+            "bindings": {c: self.profile_for(c).name for c in LLM_COMPONENTS},
+            "profiles": profiles,
+        }
+
+
+# 测试代码
+if __name__ == "__main__":
+    from .llm_usage import node_scope, record_llm_call
+
+    logging.basicConfig(level=logging.INFO)
+
+    class _EchoLLM:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+    default = LLMProfile(DEFAULT_PROFILE, model="deepseek-chat", temperature=1.3,
+                         prompt_price=2.0, completion_price=8.0)
+    profiles = parse_llm_profiles(
+        '{"fast": {"temperature": 0, "max_tokens": 512, "timeout": 15, "prompt_price": 1.0}}', default)
+    registry = LLMProfileRegistry(
+        profiles, parse_profile_bindings("intent=fast,validation=fast,summarization=fast,sql=strong"),
+        llm_factory=_EchoLLM)
+
+    for component in LLM_COMPONENTS:
+        print(f"{component:14} -> {registry.get_llm(component).kwargs}")
+
+    with node_scope("analyze_intent"):
+        record_llm_call("intent", 300, 40, 450.0, profile="fast")
+    with node_scope("generate_sql"):
+        record_llm_call("sql_generation", 2400, 200, 2600.0, profile=DEFAULT_PROFILE)
+    print(json.dumps(registry.get_stats(), ensure_ascii=False, indent=2))
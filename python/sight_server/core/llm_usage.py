@@ -0,0 +1,329 @@
+"""
+LLM用量统计模块 - Sight Server
+按查询（query_id）和图节点记录每次 LLM 调用的 prompt/completion token 与耗时，
+支持每个查询的 token/耗时预算，并汇总全局统计
+"""
+
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 当前查询的用量记录与当前执行的图节点（LangGraph 在线程池中执行节点时会复制上下文）
+_current_usage: contextvars.ContextVar[Optional["QueryUsage"]] = contextvars.ContextVar(
+    "llm_query_usage", default=None)
+_current_node: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "llm_graph_node", default=None)
+
+
+class QueryUsage:
+    """
+    单个查询的LLM用量与预算（线程安全，并行节点共享同一实例）
+
+    max_tokens / max_llm_ms 为 0 表示不限制；超出任一预算后 exhausted 为 True，
+    图会跳过可选的 LLM 节点（结果验证、深度分析等）直接生成答案
+    """
+
+    def __init__(self, query_id: str, max_tokens: int = 0, max_llm_ms: float = 0.0):
+        """
+        初始化查询用量记录
+
+        Args:
+            query_id: 查询ID
+            max_tokens: 每个查询的 token 预算（prompt + completion），0 表示不限制
+            max_llm_ms: 每个查询的 LLM 累计耗时预算（毫秒），0 表示不限制
+        """
+        self.query_id = query_id
+        self.max_tokens = max_tokens
+        self.max_llm_ms = max_llm_ms
+        self.calls: List[Dict[str, Any]] = []
+        self.skipped: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """追加一次调用记录"""
+        with self._lock:
+            self.calls.append(record)
+
+    def note_skipped(self, node: str) -> None:
+        """记录因预算耗尽而跳过的节点"""
+        with self._lock:
+            if node not in self.skipped:
+                self.skipped.append(node)
+
+    @property
+    def total_tokens(self) -> int:
+        with self._lock:
+            return sum(c["prompt_tokens"] + c["completion_tokens"] for c in self.calls)
+
+    @property
+    def llm_ms(self) -> float:
+        with self._lock:
+            return sum(c["latency_ms"] for c in self.calls)
+
+    @property
+    def exhausted(self) -> bool:
+        """token 或耗时预算是否已用完"""
+        if self.max_tokens and self.total_tokens >= self.max_tokens:
+            return True
+        if self.max_llm_ms and self.llm_ms >= self.max_llm_ms:
+            return True
+        return False
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        汇总本查询的用量
+
+        Returns:
+            总 token、总耗时、按节点汇总、预算信息
+        """
+        with self._lock:
+            calls = list(self.calls)
+            skipped = list(self.skipped)
+        by_node: Dict[str, Dict[str, Any]] = {}
+        for call in calls:
+            node = by_node.setdefault(call["node"], {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "prompt_cache_hit_tokens": 0,
+                "latency_ms": 0.0, "cached": 0})
+            node["calls"] += 1
+            node["prompt_tokens"] += call["prompt_tokens"]
+            node["prompt_cache_hit_tokens"] += call["prompt_cache_hit_tokens"]
+            node["completion_tokens"] += call["completion_tokens"]
+            node["latency_ms"] = round(node["latency_ms"] + call["latency_ms"], 2)
+            node["cached"] += int(call["cached"])
+
+        prompt_tokens = sum(c["prompt_tokens"] for c in calls)
+        completion_tokens = sum(c["completion_tokens"] for c in calls)
+        return {
+            "query_id": self.query_id,
+            "llm_calls": len(calls),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_cache_hit_tokens": sum(c["prompt_cache_hit_tokens"] for c in calls),
+            "llm_ms": round(sum(c["latency_ms"] for c in calls), 2),
+            "estimated_calls": sum(1 for c in calls if c["estimated"]),
+            "by_node": by_node,
+            "budget": {
+                "max_tokens": self.max_tokens,
+                "max_llm_ms": self.max_llm_ms,
+                "exhausted": self.exhausted,
+                "skipped_nodes": skipped,
+            },
+        }
+
+
+class UsageAggregator:
+    """全局LLM用量汇总（按节点与调用点）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_node: Dict[str, Dict[str, Any]] = {}
+        self._by_call_site: Dict[str, Dict[str, Any]] = {}
+        self._by_profile: Dict[str, Dict[str, Any]] = {}
+        self.queries = 0
+        self.budget_exhausted = 0
+        self.query_tokens = 0
+        self.query_llm_ms = 0.0
+
+    @staticmethod
+    def _bucket(table: Dict[str, Dict[str, Any]], name: str) -> Dict[str, Any]:
+        return table.setdefault(name, {
+            "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "prompt_cache_hit_tokens": 0,
+            "latency_ms": 0.0, "cached": 0})
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """累加一次调用"""
+        with self._lock:
+            for bucket in (self._bucket(self._by_node, record["node"]),
+                           self._bucket(self._by_call_site, record["call_site"]),
+                           self._bucket(self._by_profile, record["profile"])):
+                bucket["calls"] += 1
+                bucket["prompt_tokens"] += record["prompt_tokens"]
+                bucket["completion_tokens"] += record["completion_tokens"]
+                bucket["prompt_cache_hit_tokens"] += record["prompt_cache_hit_tokens"]
+                bucket["latency_ms"] += record["latency_ms"]
+                bucket["cached"] += int(record["cached"])
+
+    def finish_query(self, usage: QueryUsage) -> None:
+        """查询结束时累加查询级统计"""
+        with self._lock:
+            self.queries += 1
+            self.budget_exhausted += int(usage.exhausted)
+            self.query_tokens += usage.total_tokens
+            self.query_llm_ms += usage.llm_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取全局用量统计
+
+        Returns:
+            查询数、平均 token/耗时、预算耗尽次数、按节点、调用点和模型配置的汇总
+        """
+        def render(table: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+            return {
+                name: {
+                    **{k: v for k, v in bucket.items() if k != "latency_ms"},
+                    "total_tokens": bucket["prompt_tokens"] + bucket["completion_tokens"],
+                    "avg_latency_ms": round(bucket["latency_ms"] / bucket["calls"], 2) if bucket["calls"] else 0,
+                    "prompt_cache_hit_rate_percent": round(
+                        bucket["prompt_cache_hit_tokens"] / bucket["prompt_tokens"] * 100, 2)
+                    if bucket["prompt_tokens"] else 0,
+                }
+                for name, bucket in sorted(
+                    table.items(), key=lambda item: -(item[1]["prompt_tokens"] + item[1]["completion_tokens"]))
+            }
+
+        with self._lock:
+            n = self.queries
+            return {
+                "queries": n,
+                "avg_tokens_per_query": round(self.query_tokens / n, 1) if n else 0,
+                "avg_llm_ms_per_query": round(self.query_llm_ms / n, 2) if n else 0,
+                "budget_exhausted": self.budget_exhausted,
+                "by_node": render(self._by_node),
+                "by_call_site": render(self._by_call_site),
+                "by_profile": render(self._by_profile),
+            }
+
+
+_aggregator = UsageAggregator()
+
+
+def get_usage_aggregator() -> UsageAggregator:
+    """获取进程内共享的用量汇总"""
+    return _aggregator
+
+
+def current_query_usage() -> Optional[QueryUsage]:
+    """获取当前上下文中的查询用量记录（不在查询内时返回 None）"""
+    return _current_usage.get()
+
+
+def budget_exhausted() -> bool:
+    """当前查询的LLM预算是否已用完"""
+    usage = _current_usage.get()
+    return usage is not None and usage.exhausted
+
+
+@contextmanager
+def track_query(query_id: str, max_tokens: int = 0, max_llm_ms: float = 0.0) -> Iterator[QueryUsage]:
+    """
+    在查询执行期间记录LLM用量
+
+    Args:
+        query_id: 查询ID
+        max_tokens: token 预算，0 表示不限制
+        max_llm_ms: LLM 累计耗时预算（毫秒），0 表示不限制
+
+    Yields:
+        QueryUsage 实例
+    """
+    usage = QueryUsage(query_id, max_tokens=max_tokens, max_llm_ms=max_llm_ms)
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+        _aggregator.finish_query(usage)
+
+
+@contextmanager
+def node_scope(node: str) -> Iterator[None]:
+    """
+    标记当前执行的图节点（该范围内的 LLM 调用归属到该节点）
+
+    Args:
+        node: 节点名称
+    """
+    token = _current_node.set(node)
+    try:
+        yield
+    finally:
+        _current_node.reset(token)
+
+
+def record_llm_call(
+    call_site: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    latency_ms: float,
+    model: Optional[str] = None,
+    cached: bool = False,
+    estimated: bool = False,
+    prompt_cache_hit_tokens: int = 0,
+    profile: str = "default",
+) -> Dict[str, Any]:
+    """
+    记录一次LLM调用（归属到当前查询与当前节点）
+
+    Args:
+        call_site: 调用点名称
+        prompt_tokens: prompt token 数
+        completion_tokens: completion token 数
+        latency_ms: 耗时（毫秒）
+        model: 模型名称
+        cached: 是否命中响应缓存（缓存命中不消耗 token）
+        estimated: token 数是否为估算值（接口未返回 usage 时）
+        prompt_cache_hit_tokens: 命中服务商上下文缓存（prompt 前缀缓存）的 prompt token 数
+        profile: 发起调用的LLM配置名（core.llm_profiles）
+
+    Returns:
+        调用记录
+    """
+    usage = _current_usage.get()
+    record = {
+        "query_id": usage.query_id if usage else None,
+        "node": _current_node.get() or call_site,
+        "call_site": call_site,
+        "model": model,
+        "profile": profile,
+        "prompt_tokens": int(prompt_tokens or 0),
+        "completion_tokens": int(completion_tokens or 0),
+        "prompt_cache_hit_tokens": int(prompt_cache_hit_tokens or 0),
+        "latency_ms": round(float(latency_ms), 2),
+        "cached": cached,
+        "estimated": estimated,
+        "at": time.time(),
+    }
+    if usage is not None:
+        usage.add(record)
+        if usage.exhausted:
+            logger.info(
+                f"LLM budget exhausted for query {usage.query_id}: "
+                f"{usage.total_tokens}/{usage.max_tokens or '∞'} tokens, "
+                f"{usage.llm_ms:.0f}/{usage.max_llm_ms or '∞'}ms")
+    _aggregator.add(record)
+    return record
+
+
+# 测试代码
+if __name__ == "__main__":
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+
+    logging.basicConfig(level=logging.INFO)
+
+    with track_query("demo_query", max_tokens=3000) as usage:
+        # 并行节点：复制上下文后在线程中执行，用量仍归属同一查询
+        def stage(node: str, prompt_tokens: int) -> None:
+            with node_scope(node):
+                record_llm_call(node, prompt_tokens, 80, 900.0)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            for f in [pool.submit(contextvars.copy_context().run, stage, "analyze_intent", 400),
+                      pool.submit(contextvars.copy_context().run, stage, "fetch_schema", 0)]:
+                f.result()
+        with node_scope("generate_sql"):
+            record_llm_call("sql_generation", 1800, 220, 2100.0, prompt_cache_hit_tokens=1536)
+        print(f"exhausted after generate_sql: {usage.exhausted}")
+        with node_scope("validate_results"):
+            record_llm_call("validation", 900, 60, 1200.0)
+        print(f"exhausted after validate_results: {usage.exhausted}")
+
+    print(json.dumps(usage.summary(), ensure_ascii=False, indent=2))
+    print(json.dumps(get_usage_aggregator().get_stats(), ensure_ascii=False, indent=2))
@@ -0,0 +1,267 @@
+"""
+失败结果缓存模块 - Sight Server
+短期缓存"查询无数据"和"重试耗尽后失败"的结果，相同问题再次提交时直接返回，
+避免重复消耗多轮 LLM 重试；客户端可通过 force_refresh 强制重新查询
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from .cache_invalidation import extract_sql_tables
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_NO_DATA = "no_data"
+OUTCOME_FAILED = "failed"
+
+# 只有 SQL/数据库层面明确且与问题本身相关的错误才缓存；连接中断、超时、
+# LLM 调用或解析失败（通常没有 error_type）属于临时故障，不缓存
+CACHEABLE_ERROR_PREFIXES = ("SQL_SYNTAX_ERROR", "FIELD_ERROR", "PERMISSION_ERROR")
+
+
+def normalize_query(query: str) -> str:
+    """基础标准化（去除多余空格、统一小写），未配置规范化流水线时使用"""
+    return " ".join(query.lower().strip().split())
+
+
+class NegativeResultCache:
+    """
+    失败结果缓存（进程内）
+
+    - 键: 规范化查询文本（与查询缓存共用同一规范化函数）
+    - no_data: 查询成功但没有匹配数据，依赖的数据表变更时失效
+    - failed:  重试耗尽后仍失败，记录最终 SQL 和错误类型
+    """
+
+    def __init__(
+        self,
+        no_data_ttl: int = 300,
+        failure_ttl: int = 120,
+        max_entries: int = 1000,
+        normalizer: Optional[Callable[[str], str]] = None,
+    ):
+        """
+        初始化失败结果缓存
+
+        Args:
+            no_data_ttl: 无数据结果的生存时间（秒）
+            failure_ttl: 失败结果的生存时间（秒）
+            max_entries: 最大条目数
+            normalizer: 查询规范化函数（传入 QueryCacheManager.normalize_query 与缓存键保持一致）
+        """
+        self.no_data_ttl = no_data_ttl
+        self.failure_ttl = failure_ttl
+        self.max_entries = max_entries
+        self.normalize = normalizer or normalize_query
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._table_index: Dict[str, Set[str]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = {OUTCOME_NO_DATA: 0, OUTCOME_FAILED: 0}
+        self.bypassed = 0
+        self.invalidations = 0
+        self.saved_ms = 0.0
+
+    @staticmethod
+    def classify(result: Dict[str, Any]) -> Optional[str]:
+        """
+        判断 Agent 结果是否属于可缓存的失败结果
+
+        Args:
+            result: Agent 输出（status/count/error_type/retries_exhausted 等字段）
+
+        Returns:
+            no_data / failed，不需要缓存时返回 None
+
+        失败结果仅在 error_type 属于 CACHEABLE_ERROR_PREFIXES 且重试已用尽
+        （retries_exhausted，由 Agent 按结束运行的重试上限设置）时缓存，error_type 为空时不缓存
+        """
+        status = result.get("status")
+        if status == "success":
+            return OUTCOME_NO_DATA if not result.get("count") else None
+        if status != "error":
+            return None
+
+        error_type = (result.get("error_type") or "").upper()
+        if not error_type.startswith(CACHEABLE_ERROR_PREFIXES):
+            return None
+        if not result.get("retries_exhausted"):
+            return None
+        return OUTCOME_FAILED
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        查找查询的失败结果
+
+        Args:
+            query: 查询文本
+
+        Returns:
+            缓存的失败结果副本（含 outcome、sql、error_type、retry_count 等），未命中返回 None
+        """
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry["expires_at"] <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry["hits"] += 1
+            self.hits += 1
+            self.saved_ms += entry["execution_ms"]
+            return dict(entry)
+
+    def record(self, query: str, result: Dict[str, Any], execution_ms: float = 0.0) -> Optional[str]:
+        """
+        记录 Agent 结果：失败/无数据时缓存，成功且有数据时清除旧的失败记录
+
+        Args:
+            query: 查询文本
+            result: Agent 输出
+            execution_ms: 本次执行耗时（用于统计节省的时间）
+
+        Returns:
+            缓存的结果类型，未缓存返回 None
+        """
+        key = self.normalize(query)
+        outcome = self.classify(result)
+        if outcome is None:
+            self.invalidate(query)
+            return None
+
+        ttl = self.no_data_ttl if outcome == OUTCOME_NO_DATA else self.failure_ttl
+        sql = result.get("sql")
+        tables = extract_sql_tables(sql)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                "outcome": outcome,
+                "status": result.get("status"),
+                "answer": result.get("answer", ""),
+                "message": result.get("message", ""),
+                "sql": sql,
+                "error_type": result.get("error_type"),
+                "retry_count": result.get("retry_count", 0),
+                "intent_info": result.get("intent_info"),
+                "tables": tables,
+                "created_at": time.time(),
+                "expires_at": time.time() + ttl,
+                "execution_ms": execution_ms,
+                "hits": 0,
+            }
+            for table in tables:
+                self._table_index.setdefault(table, set()).add(key)
+            self.stores[outcome] += 1
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+        logger.info(f"Negative cache recorded ({outcome}): {query[:50]}")
+        return outcome
+
+    def record_bypass(self) -> None:
+        """记录一次 force_refresh 绕过"""
+        self.bypassed += 1
+
+    def _remove(self, key: str) -> None:
+        """移除条目（调用方需持有锁）"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table in entry["tables"]:
+            keys = self._table_index.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._table_index[table]
+
+    def invalidate(self, query: str) -> bool:
+        """移除查询的失败记录"""
+        with self._lock:
+            key = self.normalize(query)
+            existed = key in self._entries
+            self._remove(key)
+        return existed
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        失效依赖指定数据表的失败记录（数据变更后无数据的查询可能已有结果）
+
+        Args:
+            tables: 发生变更的表名
+
+        Returns:
+            失效的条目数量
+        """
+        with self._lock:
+            keys = set()
+            for table in tables:
+                keys.update(self._table_index.get(table, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self) -> int:
+        """清空缓存"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._table_index.clear()
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            命中率、各类结果的缓存次数、强制刷新次数、节省的执行时间等
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "no_data_ttl_seconds": self.no_data_ttl,
+            "failure_ttl_seconds": self.failure_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate_percent": round(self.hits / total * 100, 2) if total else 0,
+            "stored_no_data": self.stores[OUTCOME_NO_DATA],
+            "stored_failed": self.stores[OUTCOME_FAILED],
+            "force_refresh_bypassed": self.bypassed,
+            "invalidations": self.invalidations,
+            "saved_execution_ms": round(self.saved_ms, 2),
+        }
+
+
+# 测试代码
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    cache = NegativeResultCache(no_data_ttl=60, failure_ttl=30)
+    print(cache.record("火星上的5A景区", {
+        "status": "success", "count": 0, "answer": "未找到匹配结果",
+        "sql": "SELECT * FROM a_sight WHERE province = '火星'"}, execution_ms=8200))
+    print(cache.record("统计 景区 的 平均 海拔", {
+        "status": "error", "count": 0, "error_type": "field_error",
+        "retry_count": 3, "retries_exhausted": True, "sql": "SELECT avg(altitude) FROM a_sight"}, execution_ms=31000))
+    print(cache.record("杭州的景区", {
+        "status": "error", "error_type": "connection_error", "retry_count": 3, "retries_exhausted": True}))
+    print(cache.record("北京的景区", {
+        "status": "error", "error_type": None, "retry_count": 0, "retries_exhausted": False}))
+    print(cache.record("上海的景区", {
+        "status": "error", "error_type": "sql_syntax_error", "retry_count": 1, "retries_exhausted": False}))
+
+    hit = cache.get("  火星上的5a景区 ")
+    print(f"hit: {hit['outcome'] if hit else None}")
+    print(f"invalidated by a_sight change: {cache.invalidate_tables(['a_sight'])}")
+    print(cache.get_stats())
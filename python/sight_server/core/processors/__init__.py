@@ -9,11 +9,17 @@ from .result_parser import ResultParser
 from .answer_generator import AnswerGenerator
 from .schema_fetcher import SchemaFetcher
 from .optimized_sql_executor import OptimizedSQLExecutor
+from .intent_engine import TieredIntentEngine
+from .answer_router import AnswerRouter
+from .heuristic_validator import HeuristicResultValidator
 __all__ = [
     "SQLGenerator",
     "SQLExecutor",
     "ResultParser",
     "AnswerGenerator",
     "SchemaFetcher",
-    'OptimizedSQLExecutor'
+    'OptimizedSQLExecutor',
+    "TieredIntentEngine",
+    "AnswerRouter",
+    "HeuristicResultValidator"
 ]
@@ -4,7 +4,8 @@
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from decimal import Decimal
+from typing import List, Dict, Any, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,12 @@ class AnswerGenerator:
     - 提供上下文相关的答案
     """
 
+    # 列表/分组结果逐条列出的最大条数
+    MAX_LISTED_ITEMS = 10
+
+    # 出现这些字段时视为明细记录而非聚合结果
+    DETAIL_COLUMNS = ("name", "geometry", "geom", "coordinates", "lng_wgs84", "lat_wgs84")
+
     def __init__(self, llm=None):
         """
         初始化答案生成器
@@ -51,6 +58,10 @@ class AnswerGenerator:
             if count == 0 or not data:
                 return self._generate_no_data_answer(query)
 
+            # 聚合结果（如 COUNT/SUM/GROUP BY 的结果行）
+            if self.is_aggregate_result(data):
+                return self._generate_aggregate_answer(query, data, count)
+
             # 检测查询类型
             query_type = self._detect_query_type(query)
 
@@ -102,6 +113,80 @@ class AnswerGenerator:
         # 默认为列表类
         return "list"
 
+    @staticmethod
+    def _is_number(value: Any) -> bool:
+        if isinstance(value, bool):
+            return False
+        if isinstance(value, (int, float, Decimal)):
+            return True
+        try:
+            float(str(value))
+            return True
+        except (TypeError, ValueError):
+            return False
+
+    def is_aggregate_result(self, data: List[Dict[str, Any]]) -> bool:
+        """
+        判断结果是否为聚合结果：每行至多一个文本分组列，其余都是数值列（不含 name/geometry 等明细字段）
+
+        Args:
+            data: 查询结果
+
+        Returns:
+            是否为聚合结果
+        """
+        if not data or len(data) > self.MAX_LISTED_ITEMS:
+            return False
+        first = data[0]
+        if not first or any(key in first for key in self.DETAIL_COLUMNS):
+            return False
+        numeric = [key for key, value in first.items() if self._is_number(value)]
+        return bool(numeric) and len(first) - len(numeric) <= 1
+
+    def _generate_aggregate_answer(
+        self,
+        query: str,
+        data: List[Dict[str, Any]],
+        count: int
+    ) -> str:
+        """
+        生成聚合结果的回答（直接给出数值，而不是"找到 1 条记录"）
+
+        Args:
+            query: 原始查询
+            data: 聚合结果
+            count: 结果行数
+
+        Returns:
+            聚合类回答
+        """
+        def fmt(value: Any) -> str:
+            number = float(value)
+            return str(int(number)) if number.is_integer() else f"{number:.2f}"
+
+        def describe(record: Dict[str, Any]) -> Tuple[Optional[str], str]:
+            label = None
+            values = []
+            for key, value in record.items():
+                if self._is_number(value):
+                    values.append((key, fmt(value)))
+                else:
+                    label = "未知" if value is None else str(value)
+            if len(values) == 1:
+                return label, values[0][1]
+            return label, "，".join(f"{key}为{value}" for key, value in values)
+
+        if count == 1:
+            label, text = describe(data[0])
+            prefix = f"{label}：" if label else ""
+            return f"根据您的查询「{query}」，结果为 {prefix}{text}。"
+
+        items = []
+        for record in data:
+            label, text = describe(record)
+            items.append(f"{label}：{text}" if label else text)
+        return f"根据您的查询「{query}」，共 {count} 组结果：" + "；".join(items) + "。"
+
     def _generate_no_data_answer(self, query: str) -> str:
         """
         生成无数据的回答
@@ -132,7 +217,7 @@ class AnswerGenerator:
             统计类回答
         """
         # 基础统计答案
-        answer = f"根据您的查询「{query}」，共找到 {count} 条相关记录。"
+        answer = f"根据您的查询「{query}」，共找到 {count} 条相关记录"
 
         # 尝试提供更多统计信息
         try:
@@ -148,12 +233,12 @@ class AnswerGenerator:
                         f"{level}级{num}个"
                         for level, num in sorted(level_stats.items())
                     )
-                    answer += stats_text + "。"
+                    answer += stats_text
 
         except Exception as e:
             self.logger.debug(f"Failed to generate detailed statistics: {e}")
 
-        return answer
+        return answer + "。"
 
     def _generate_detail_answer(
         self,
@@ -214,7 +299,14 @@ class AnswerGenerator:
         Returns:
             列表类回答
         """
-        return f"根据您的查询「{query}」，找到 {count} 条相关记录。"
+        answer = f"根据您的查询「{query}」，找到 {count} 条相关记录"
+        names = [
+            f"{r['name']}（{r['level']}）" if r.get("level") else str(r["name"])
+            for r in data[:self.MAX_LISTED_ITEMS] if r.get("name")
+        ]
+        if names and count <= self.MAX_LISTED_ITEMS:
+            return answer + "：" + "、".join(names) + "。"
+        return answer + "。"
 
     def generate_with_llm(
         self,
@@ -248,7 +340,7 @@ class AnswerGenerator:
 请生成一个简洁的自然语言回答（1-2句话）。"""
 
             # 调用LLM
-            response = self.llm.llm.invoke(prompt)
+            response = self.llm.invoke_prompt(prompt, call_site="answer")
 
             if hasattr(response, 'content'):
                 answer = response.content.strip()
@@ -0,0 +1,155 @@
+"""
+答案路由模块 - Sight Server
+在答案生成前判断是否需要调用 LLM：空结果、聚合统计和少量列表结果直接使用
+AnswerGenerator 的模板回答，只有分析类问题或客户端明确要求洞察时才调用 LLM
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from .answer_generator import AnswerGenerator
+
+logger = logging.getLogger(__name__)
+
+# 需要LLM解读的问题关键词（原因、趋势、对比、建议等）
+ANALYTIC_KEYWORDS = (
+    "分析", "为什么", "原因", "趋势", "对比", "比较", "区别", "差异", "建议",
+    "洞察", "解读", "规律", "特点", "特色", "评价", "优缺点", "值得", "怎么样",
+    "如何", "适合", "攻略", "规划", "行程",
+)
+
+
+class AnswerRouter:
+    """
+    答案路由器
+
+    路由规则（按顺序）:
+    1. 客户端要求洞察（want_insights） → llm
+    2. 查询包含分析类关键词 → llm
+    3. 无结果 → template（no_data）
+    4. 聚合结果（COUNT/SUM/GROUP BY 行） → template（aggregate）
+    5. 结果数不超过 max_list_items → template（small_list）
+    6. 其余 → llm
+    """
+
+    def __init__(self, answer_generator: Optional[AnswerGenerator] = None, max_list_items: int = 10):
+        """
+        初始化答案路由器
+
+        Args:
+            answer_generator: 提供模板回答的 AnswerGenerator
+            max_list_items: 不超过该条数的明细结果使用模板回答
+        """
+        self.answer_generator = answer_generator or AnswerGenerator()
+        self.max_list_items = max_list_items
+
+        self._lock = threading.Lock()
+        self.template_answers = 0
+        self.llm_answers = 0
+        self.reasons: Dict[str, int] = {}
+
+    def route(
+        self,
+        query: str,
+        data: Optional[List[Dict[str, Any]]],
+        count: int,
+        want_insights: bool = False,
+    ) -> Dict[str, str]:
+        """
+        判断答案生成方式
+
+        Args:
+            query: 用户查询
+            data: 查询结果
+            count: 结果数量
+            want_insights: 客户端是否要求深度分析
+
+        Returns:
+            {"route": "template" | "llm", "reason": str}
+        """
+        if want_insights:
+            return {"route": "llm", "reason": "insights_requested"}
+        if any(kw in query for kw in ANALYTIC_KEYWORDS):
+            return {"route": "llm", "reason": "analytic_query"}
+        if count == 0 or not data:
+            return {"route": "template", "reason": "no_data"}
+        if self.answer_generator.is_aggregate_result(data):
+            return {"route": "template", "reason": "aggregate"}
+        if count <= self.max_list_items:
+            return {"route": "template", "reason": "small_list"}
+        return {"route": "llm", "reason": "large_result"}
+
+    def render(self, query: str, data: Optional[List[Dict[str, Any]]], count: int) -> str:
+        """
+        生成模板回答
+
+        Args:
+            query: 用户查询
+            data: 查询结果
+            count: 结果数量
+
+        Returns:
+            模板回答
+        """
+        return self.answer_generator.generate(query, data, count)
+
+    def record(self, route: str, reason: str) -> None:
+        """
+        记录一次实际采用的答案生成方式
+
+        Args:
+            route: "template" | "llm"
+            reason: 路由原因
+        """
+        with self._lock:
+            if route == "template":
+                self.template_answers += 1
+            else:
+                self.llm_answers += 1
+            key = f"{route}:{reason}"
+            self.reasons[key] = self.reasons.get(key, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取路由统计
+
+        Returns:
+            模板/LLM 回答数、免LLM回答占比、各路由原因计数
+        """
+        with self._lock:
+            total = self.template_answers + self.llm_answers
+            return {
+                "max_list_items": self.max_list_items,
+                "total": total,
+                "template_answers": self.template_answers,
+                "llm_answers": self.llm_answers,
+                "llm_free_percent": round(self.template_answers / total * 100, 2) if total else 0,
+                "reasons": dict(sorted(self.reasons.items(), key=lambda item: -item[1])),
+            }
+
+
+# 测试代码
+if __name__ == "__main__":
+    import json
+
+    logging.basicConfig(level=logging.INFO)
+
+    router = AnswerRouter()
+    spots = [{"name": "西湖", "level": "5A"}, {"name": "千岛湖", "level": "5A"}, {"name": "灵隐寺", "level": "4A"}]
+    samples = [
+        ("统计浙江省有多少个5A景区", [{"count": 19}], False),
+        ("统计各省份5A景区数量", [{"province": "浙江省", "count": 19}, {"province": "江苏省", "count": 25}], False),
+        ("查询浙江省的5A景区", spots, False),
+        ("查询火星上的景区", [], False),
+        ("分析浙江省5A景区的分布特点", spots, False),
+        ("查询浙江省的5A景区", spots, True),
+        ("列出全国的4A景区", [{"name": f"景区{i}", "level": "4A"} for i in range(40)], False),
+    ]
+    for query, data, insights in samples:
+        decision = router.route(query, data, len(data), want_insights=insights)
+        answer = router.render(query, data, len(data)) if decision["route"] == "template" else "<LLM>"
+        router.record(decision["route"], decision["reason"])
+        print(f"{decision['route']:8} {decision['reason']:18} {answer}")
+
+    print(json.dumps(router.get_stats(), ensure_ascii=False, indent=2))
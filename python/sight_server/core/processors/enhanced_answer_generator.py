@@ -119,7 +119,8 @@ class EnhancedAnswerGenerator:
         data: Optional[List[Dict[str, Any]]],
         count: int,
         intent_type: str = "query",
-        is_spatial: bool = False
+        is_spatial: bool = False,
+        deep_analysis: bool = True
     ) -> Tuple[str, Dict[str, Any]]:
         """
         生成增强的自然语言回答，包含深度分析
@@ -130,6 +131,7 @@ class EnhancedAnswerGenerator:
             count: 结果数量
             intent_type: 查询意图类型
             is_spatial: 是否空间查询
+            deep_analysis: 是否调用LLM做深度分析（False 时使用规则生成的基本分析）
 
         Returns:
             (answer, analysis_details): 增强回答和分析详情
@@ -140,6 +142,11 @@ class EnhancedAnswerGenerator:
                 basic_answer = self._generate_no_data_answer(query)
                 return basic_answer, {"analysis_type": "no_data", "confidence": 0.0}
 
+            # 不调用LLM（如查询的LLM预算已用完）
+            if not deep_analysis:
+                answer = self._generate_basic_analysis(query, data, count)
+                return answer, {"analysis_type": "basic", "confidence": 0.5}
+
             # 准备数据预览
             data_preview = self._prepare_data_preview(data, count)
 
@@ -254,7 +261,7 @@ class EnhancedAnswerGenerator:
             )
 
             # 调用LLM
-            response = self.llm.llm.invoke(prompt_text)
+            response = self.llm.invoke_prompt(prompt_text, call_site="answer")
 
             if hasattr(response, 'content'):
                 answer = response.content.strip()
@@ -297,7 +304,7 @@ class EnhancedAnswerGenerator:
             )
 
             # 调用LLM
-            response = self.llm.llm.invoke(prompt_text)
+            response = self.llm.invoke_prompt(prompt_text, call_site="answer")
 
             if hasattr(response, 'content'):
                 answer = response.content.strip()
@@ -0,0 +1,392 @@
+"""
+启发式结果验证模块 - Sight Server
+结果验证的第一级：用确定性规则（完整性、条数与意图是否匹配、关键字段、空间字段）给结果打分，
+分数落在不确定区间时才调用验证 LLM；并提供基于历史验证记录的离线评估（节省的 LLM 调用、与 LLM 结论的一致率）
+"""
+
+import re
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from .answer_generator import AnswerGenerator
+from .result_parser import ResultParser
+
+logger = logging.getLogger(__name__)
+
+# 明细结果的关键字段
+KEY_FIELDS = ["name", "level", "所属省份", "地区", "coordinates"]
+
+# 表示空间信息的字段
+SPATIAL_FIELDS = (
+    "coordinates", "geometry", "geom", "lng_wgs84", "lat_wgs84", "lng", "lat",
+    "longitude", "latitude", "distance", "距离", "distance_km", "distance_m",
+)
+
+# "前5个"、"推荐3个景区"、"top 10" 中请求的条数（排除 5A、5公里 等）
+_REQUESTED_COUNT_RE = re.compile(r"(?:前|top\s*)(\d{1,3})|(\d{1,3})\s*(?:个|家|条|处|座)", re.IGNORECASE)
+
+# 离线评估时历史记录缺少 LLM 耗时的估计值（毫秒）
+DEFAULT_ASSUMED_LLM_MS = 2500.0
+
+
+def has_missing_key_fields(
+    data: List[Dict[str, Any]],
+    key_fields: Optional[List[str]] = None,
+    max_missing_ratio: float = 0.2,
+) -> bool:
+    """
+    检查数据中关键字段是否缺失（超过 max_missing_ratio 的记录缺少任一关键字段）
+
+    Args:
+        data: 查询结果
+        key_fields: 关键字段，默认 KEY_FIELDS 中除 coordinates 外的字段
+        max_missing_ratio: 允许缺失的记录比例
+
+    Returns:
+        是否缺失
+    """
+    if not data:
+        return False
+
+    key_fields = key_fields if key_fields is not None else ["name", "level", "所属省份", "地区"]
+    missing_count = 0
+    for record in data:
+        for field in key_fields:
+            if field not in record or not record[field]:
+                missing_count += 1
+                break  # 每个记录只计一次缺失
+
+    return missing_count / len(data) > max_missing_ratio
+
+
+class HeuristicResultValidator:
+    """
+    启发式结果验证器
+
+    各项检查得分为 0-1，总分为各项之积（任一项明显不合格都会拉低总分）；
+    score >= pass_score 直接通过，score < fail_score 直接判定失败，
+    介于两者之间为不确定，交给验证 LLM
+    """
+
+    def __init__(
+        self,
+        pass_score: float = 0.8,
+        fail_score: float = 0.3,
+        result_parser: Optional[ResultParser] = None,
+        answer_generator: Optional[AnswerGenerator] = None,
+    ):
+        """
+        初始化启发式验证器
+
+        Args:
+            pass_score: 不低于该分数直接通过（大于 1 表示总是调用 LLM）
+            fail_score: 低于该分数直接判定失败（0 表示从不直接判定失败）
+            result_parser: 提供完整性评估的 ResultParser
+            answer_generator: 提供聚合结果判断的 AnswerGenerator
+        """
+        self.pass_score = pass_score
+        self.fail_score = fail_score
+        self.result_parser = result_parser or ResultParser()
+        self.answer_generator = answer_generator or AnswerGenerator()
+
+        self._lock = threading.Lock()
+        self.passed = 0
+        self.failed = 0
+        self.escalated = 0
+        self.heuristic_ms = 0.0
+
+    @staticmethod
+    def requested_count(query: str) -> Optional[int]:
+        """
+        解析查询中请求的条数
+
+        Args:
+            query: 用户查询
+
+        Returns:
+            请求的条数，未指定时返回 None
+        """
+        match = _REQUESTED_COUNT_RE.search(query)
+        if not match:
+            return None
+        return int(match.group(1) or match.group(2)) or None
+
+    def score(
+        self,
+        query: str,
+        data: Optional[List[Dict[str, Any]]],
+        query_intent: str = "query",
+        requires_spatial: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        计算结果的启发式分数
+
+        Args:
+            query: 用户查询
+            data: 查询结果
+            query_intent: 查询意图（query/summary）
+            requires_spatial: 是否要求空间信息
+
+        Returns:
+            {"score", "verdict": "pass"|"fail"|"uncertain", "checks", "issues", "guidance", "elapsed_ms"}
+        """
+        start = time.perf_counter()
+        data = data or []
+        count = len(data)
+        checks: Dict[str, float] = {}
+        issues: List[str] = []
+        guidance: List[str] = []
+
+        aggregate = self.answer_generator.is_aggregate_result(data)
+        detail = bool(data) and not aggregate
+        columns = set(data[0].keys()) if data else set()
+
+        # 1. 条数与意图是否匹配
+        requested = self.requested_count(query)
+        if count == 0:
+            checks["row_count"] = 0.0
+            issues.append("查询没有返回结果")
+            guidance.append("放宽过滤条件或检查地名、等级的写法")
+        elif query_intent == "summary":
+            checks["row_count"] = 1.0 if aggregate or count <= 200 else 0.7
+        elif aggregate:
+            checks["row_count"] = 0.5
+            issues.append("用户要求列出明细，但结果是聚合统计值")
+            guidance.append("返回景区明细记录而不是 COUNT/SUM 结果")
+        elif requested and count < requested:
+            checks["row_count"] = max(count / requested, 0.4)
+            issues.append(f"用户要求 {requested} 条，实际只有 {count} 条")
+            guidance.append("扩大查询范围以返回足够的记录")
+        elif requested and count > requested * 3:
+            checks["row_count"] = 0.6
+            issues.append(f"用户要求 {requested} 条，实际返回 {count} 条")
+            guidance.append(f"按相关性排序并 LIMIT {requested}")
+        else:
+            checks["row_count"] = 1.0
+
+        # 2. 完整性：结果中已选出的关键字段是否有空值
+        selected_keys = [f for f in KEY_FIELDS if f in columns]
+        if detail and selected_keys:
+            completeness = self.result_parser.evaluate_completeness(data, required_fields=selected_keys)
+            # 个别记录字段为空通常不影响回答，只做部分扣分
+            checks["completeness"] = 0.5 + 0.5 * completeness["completeness_score"]
+            if not completeness["complete"]:
+                issues.append(f"{completeness['records_with_missing']}/{count} 条记录的 "
+                              f"{'、'.join(completeness['missing_fields'])} 为空")
+        else:
+            checks["completeness"] = 1.0
+
+        # 3. 关键字段：明细查询应当包含景区名称等关键信息
+        if detail and query_intent != "summary":
+            if "name" not in columns:
+                checks["key_fields"] = 0.3
+                issues.append("明细结果缺少景区名称字段")
+                guidance.append("SELECT 中包含 name 字段")
+            elif has_missing_key_fields(data, selected_keys):
+                checks["key_fields"] = 0.6
+            else:
+                checks["key_fields"] = 1.0
+        else:
+            checks["key_fields"] = 1.0
+
+        # 4. 空间信息：要求空间查询时明细结果应包含坐标/距离
+        if requires_spatial and detail and query_intent != "summary":
+            if any(field in columns for field in SPATIAL_FIELDS):
+                checks["spatial"] = 1.0
+            else:
+                checks["spatial"] = 0.2
+                issues.append("空间查询结果缺少坐标或距离字段")
+                guidance.append("返回坐标（coordinates/lng_wgs84/lat_wgs84）或 ST_Distance 距离")
+        else:
+            checks["spatial"] = 1.0
+
+        score = 1.0
+        for value in checks.values():
+            score *= value
+        if score >= self.pass_score:
+            verdict = "pass"
+        elif score < self.fail_score:
+            verdict = "fail"
+        else:
+            verdict = "uncertain"
+
+        return {
+            "score": round(score, 3),
+            "verdict": verdict,
+            "checks": {name: round(value, 2) for name, value in checks.items()},
+            "issues": issues,
+            "guidance": "\n".join(guidance),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def validate(
+        self,
+        query: str,
+        data: Optional[List[Dict[str, Any]]],
+        query_intent: str = "query",
+        requires_spatial: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        启发式验证并记录统计（verdict 为 uncertain 时调用方应升级到 LLM 验证）
+
+        Args:
+            query: 用户查询
+            data: 查询结果
+            query_intent: 查询意图
+            requires_spatial: 是否要求空间信息
+
+        Returns:
+            score() 的结果
+        """
+        result = self.score(query, data, query_intent, requires_spatial)
+        with self._lock:
+            self.heuristic_ms += result["elapsed_ms"]
+            if result["verdict"] == "pass":
+                self.passed += 1
+            elif result["verdict"] == "fail":
+                self.failed += 1
+            else:
+                self.escalated += 1
+        logger.info(
+            f"Heuristic validation: {result['verdict']} (score={result['score']}, checks={result['checks']})")
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取运行统计
+
+        Returns:
+            直接通过/失败/升级到 LLM 的次数与节省的 LLM 调用占比
+        """
+        with self._lock:
+            total = self.passed + self.failed + self.escalated
+            return {
+                "pass_score": self.pass_score,
+                "fail_score": self.fail_score,
+                "total": total,
+                "heuristic_pass": self.passed,
+                "heuristic_fail": self.failed,
+                "escalated_to_llm": self.escalated,
+                "llm_calls_saved_percent": round((self.passed + self.failed) / total * 100, 2) if total else 0,
+                "avg_heuristic_ms": round(self.heuristic_ms / total, 3) if total else 0,
+            }
+
+
+def evaluate_heuristic_validator(
+    records: List[Dict[str, Any]],
+    validator: HeuristicResultValidator,
+    assumed_llm_ms: float = DEFAULT_ASSUMED_LLM_MS,
+) -> Dict[str, Any]:
+    """
+    离线评估：在历史验证记录上对比启发式结论与 LLM 验证结论
+
+    Args:
+        records: 验证记录 [{"query", "data", "query_intent"?, "requires_spatial"?, "llm_passed", "llm_ms"?}]
+        validator: 启发式验证器
+        assumed_llm_ms: 记录缺少 LLM 耗时时假定的值（毫秒）
+
+    Returns:
+        评估报告（节省的 LLM 调用与耗时、直接判定部分与 LLM 的一致率、不一致样例）
+    """
+    evaluated = 0
+    decided = 0
+    agree = 0
+    saved_ms = 0.0
+    by_verdict = {"pass": 0, "fail": 0, "uncertain": 0}
+    disagreements: List[Dict[str, Any]] = []
+
+    for record in records:
+        if "llm_passed" not in record:
+            continue
+        evaluated += 1
+        query = record.get("query", "")
+        result = validator.score(
+            query,
+            record.get("data") or [],
+            record.get("query_intent", "query"),
+            bool(record.get("requires_spatial", False)),
+        )
+        by_verdict[result["verdict"]] += 1
+        if result["verdict"] == "uncertain":
+            continue
+
+        decided += 1
+        saved_ms += float(record.get("llm_ms") or assumed_llm_ms)
+        if (result["verdict"] == "pass") == bool(record["llm_passed"]):
+            agree += 1
+        elif len(disagreements) < 10:
+            disagreements.append({
+                "query": query,
+                "heuristic": result["verdict"],
+                "score": result["score"],
+                "llm_passed": bool(record["llm_passed"]),
+                "issues": result["issues"],
+            })
+
+    return {
+        "records": evaluated,
+        "pass_score": validator.pass_score,
+        "fail_score": validator.fail_score,
+        "verdicts": by_verdict,
+        "llm_calls_saved": decided,
+        "llm_calls_saved_percent": round(decided / evaluated * 100, 2) if evaluated else 0,
+        "agreement_percent": round(agree / decided * 100, 2) if decided else 0,
+        "latency_saved_ms": round(saved_ms, 2),
+        "disagreements": disagreements,
+    }
+
+
+def _load_validation_records(path: str) -> List[Dict[str, Any]]:
+    """读取 JSON Lines 验证记录（query/data/query_intent/requires_spatial/llm_passed/llm_ms）"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# 测试代码：python -m core.processors.heuristic_validator [验证记录.jsonl] [pass_score] [fail_score]
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.WARNING)
+
+    spots = [
+        {"name": "西湖", "level": "5A", "地区": "杭州", "coordinates": [120.15, 30.28]},
+        {"name": "千岛湖", "level": "5A", "地区": "杭州", "coordinates": [119.05, 29.6]},
+        {"name": "灵隐寺", "level": "4A", "地区": "杭州", "coordinates": [120.1, 30.24]},
+    ]
+    no_geo = [{k: v for k, v in s.items() if k != "coordinates"} for s in spots]
+    if len(sys.argv) > 1:
+        sample = _load_validation_records(sys.argv[1])
+    else:
+        sample = [
+            {"query": "统计浙江省有多少个5A景区", "query_intent": "summary", "data": [{"count": 19}], "llm_passed": True},
+            {"query": "统计各省份5A景区数量", "query_intent": "summary",
+             "data": [{"所属省份": "浙江省", "count": 19}, {"所属省份": "江苏省", "count": 25}], "llm_passed": True},
+            {"query": "查询杭州的5A景区", "data": spots[:2], "llm_passed": True},
+            {"query": "推荐3个杭州的景区", "data": spots, "llm_passed": True},
+            {"query": "推荐5个杭州的景区", "data": spots[:1], "llm_passed": False},
+            {"query": "西湖附近5公里的景区", "requires_spatial": True, "data": spots, "llm_passed": True},
+            {"query": "西湖附近5公里的景区", "requires_spatial": True, "data": no_geo, "llm_passed": False},
+            {"query": "列出杭州的景区", "data": [{"count": 42}], "llm_passed": False},
+            {"query": "查询杭州的景区名称和等级", "data": [{"level": "5A", "地区": "杭州"}] * 4, "llm_passed": False},
+            {"query": "查询杭州的景区", "data": [{"name": "西湖", "level": None}, {"name": "宋城", "level": None},
+                                                {"name": "灵隐寺", "level": "4A"}], "llm_passed": True},
+        ]
+
+    pass_score = float(sys.argv[2]) if len(sys.argv) > 2 else 0.8
+    fail_score = float(sys.argv[3]) if len(sys.argv) > 3 else 0.3
+    validator = HeuristicResultValidator(pass_score=pass_score, fail_score=fail_score)
+    for record in sample:
+        result = validator.score(record["query"], record["data"], record.get("query_intent", "query"),
+                                 record.get("requires_spatial", False))
+        print(f"  {result['verdict']:9} {result['score']:.2f}  {record['query']}  {result['issues']}")
+
+    report = evaluate_heuristic_validator(sample, validator)
+    print(f"\n=== 启发式验证离线评估（{report['records']} 条记录） ===")
+    for key, value in report.items():
+        if key != "disagreements":
+            print(f"  {key}: {value}")
+    for item in report["disagreements"]:
+        print(f"  ✗ {item}")
@@ -120,7 +120,7 @@ class IntentAnalyzer:
 
             # 调用 LLM
             self.logger.debug(f"Analyzing intent with LLM for: {query}")
-            response = self.llm.llm.invoke(prompt_text)
+            response = self.llm.invoke_prompt(prompt_text, call_site="intent")
 
             # 解析结构化输出
             result: QueryIntentAnalysis = self.parser.parse(response.content)
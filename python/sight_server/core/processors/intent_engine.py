@@ -0,0 +1,443 @@
+"""
+分级意图引擎模块 - Sight Server
+先用预编译的关键词/正则评分器分析意图，置信度低于阈值时才调用 LLM，
+并提供基于历史查询集的离线评估（与 LLM 结果的一致率、节省的延迟）
+"""
+
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from ..prompts import PromptManager
+
+logger = logging.getLogger(__name__)
+
+# 离线评估时历史记录缺少 LLM 耗时的估计值（毫秒）
+DEFAULT_ASSUMED_LLM_MS = 1500.0
+
+
+class TieredIntentEngine:
+    """
+    分级意图引擎
+
+    - 第一级: PromptManager._analyze_intent_by_keywords（预编译正则，亚毫秒级）
+    - 第二级: IntentAnalyzer（LLM + Pydantic），仅在第一级置信度不足或查询过短时调用
+
+    过短的查询（如"查询景区"、"附近有什么"）关键词评分无法判断是否明确，始终交给 LLM 判断 is_query_clear
+
+    融合模式（defer_to_sql=True）: 置信度不足但足够长的查询不单独调用意图 LLM，返回 tier="deferred"
+    的关键词结果，由 SQL 生成节点用一次调用同时确定意图和 SQL（SQLGenerator.generate_sql_with_intent）
+    """
+
+    def __init__(
+        self,
+        llm: Optional[Any] = None,
+        confidence_threshold: float = 0.6,
+        min_query_chars: int = 6,
+        defer_to_sql: bool = False,
+    ):
+        """
+        初始化分级意图引擎
+
+        Args:
+            llm: BaseLLM 实例，为 None 时只使用关键词分析
+            confidence_threshold: 关键词分析置信度达到该值时跳过 LLM（大于 1 表示总是调用 LLM）
+            min_query_chars: 关键词分析可直接采用的最短查询长度
+            defer_to_sql: 是否启用意图 + SQL 融合模式（置信度不足时把意图判断推迟到 SQL 生成）
+        """
+        self.llm = llm
+        self.confidence_threshold = confidence_threshold
+        self.min_query_chars = min_query_chars
+        self.defer_to_sql = defer_to_sql
+
+        self.analyzer = None
+        if llm is not None:
+            from .intent_analyzer import IntentAnalyzer
+            self.analyzer = IntentAnalyzer(llm)
+
+        self._lock = threading.Lock()
+        self.rule_hits = 0
+        self.llm_calls = 0
+        self.deferred = 0
+        self.rule_ms = 0.0
+        self.llm_ms = 0.0
+
+    def analyze_by_rules(self, query: str) -> Dict[str, Any]:
+        """
+        关键词/正则意图分析
+
+        Args:
+            query: 用户查询
+
+        Returns:
+            关键词分析结果（含 confidence）
+        """
+        return PromptManager._analyze_intent_by_keywords(query)
+
+    def accepts(self, query: str, rule_result: Dict[str, Any]) -> bool:
+        """
+        判断是否直接采用关键词分析结果
+
+        Args:
+            query: 用户查询
+            rule_result: 关键词分析结果
+
+        Returns:
+            True 表示跳过 LLM
+        """
+        if len(query.strip()) < self.min_query_chars:
+            return False
+        return rule_result.get("confidence", 0.0) >= self.confidence_threshold
+
+    def analyze(self, query: str) -> Dict[str, Any]:
+        """
+        分级分析查询意图
+
+        Args:
+            query: 用户查询
+
+        Returns:
+            意图分析结果（与 IntentAnalyzer.analyze_intent 格式一致，额外包含 tier 字段）
+        """
+        start = time.perf_counter()
+        rule_result = self.analyze_by_rules(query)
+        rule_elapsed = (time.perf_counter() - start) * 1000
+
+        if self.analyzer is None or self.accepts(query, rule_result):
+            with self._lock:
+                self.rule_hits += 1
+                self.rule_ms += rule_elapsed
+            result = dict(rule_result)
+            result.setdefault("is_query_clear", True)
+            result["analysis_details"] = dict(result.get("analysis_details") or {})
+            result["analysis_details"]["method"] = "keyword_rules"
+            result["tier"] = "rules"
+            logger.info(
+                f"Intent resolved by rules (confidence={rule_result.get('confidence', 0):.2f}, "
+                f"{rule_elapsed:.2f}ms): {result['intent_type']}, spatial={result['is_spatial']}")
+            return result
+
+        if self.defer_to_sql and len(query.strip()) >= self.min_query_chars:
+            with self._lock:
+                self.deferred += 1
+                self.rule_ms += rule_elapsed
+            result = dict(rule_result)
+            result.setdefault("is_query_clear", True)
+            result["analysis_details"] = dict(result.get("analysis_details") or {})
+            result["analysis_details"]["method"] = "keyword_rules"
+            result["tier"] = "deferred"
+            logger.info(
+                f"Intent deferred to fused SQL generation (rule confidence={rule_result.get('confidence', 0):.2f})")
+            return result
+
+        start = time.perf_counter()
+        result = self.analyzer.analyze_intent(query)
+        llm_elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.llm_calls += 1
+            self.rule_ms += rule_elapsed
+            self.llm_ms += llm_elapsed
+        result["tier"] = "llm"
+        result["rule_confidence"] = rule_result.get("confidence", 0.0)
+        return result
+
+    __call__ = analyze
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取运行统计
+
+        Returns:
+            规则命中率、LLM 调用次数、推迟到融合生成的次数、平均耗时、估计节省的 LLM 时间
+        """
+        with self._lock:
+            total = self.rule_hits + self.llm_calls + self.deferred
+            avg_llm_ms = self.llm_ms / self.llm_calls if self.llm_calls else 0.0
+            return {
+                "confidence_threshold": self.confidence_threshold,
+                "total": total,
+                "rule_hits": self.rule_hits,
+                "llm_calls": self.llm_calls,
+                "deferred_to_sql": self.deferred,
+                "rule_rate_percent": round(self.rule_hits / total * 100, 2) if total else 0,
+                "avg_rule_ms": round(self.rule_ms / total, 3) if total else 0,
+                "avg_llm_ms": round(avg_llm_ms, 2),
+                "estimated_saved_ms": round((self.rule_hits + self.deferred) * avg_llm_ms, 2),
+            }
+
+
+def evaluate_intent_engine(
+    records: List[Dict[str, Any]],
+    engine: TieredIntentEngine,
+    assumed_llm_ms: float = DEFAULT_ASSUMED_LLM_MS,
+) -> Dict[str, Any]:
+    """
+    离线评估：在历史查询集上对比关键词分析与 LLM 结果
+
+    每条记录的参照结果优先取记录中的 intent_type/is_spatial（历史 LLM 输出或人工标注），
+    缺失时若引擎配置了 LLM 则实时调用获取；LLM 耗时优先取记录中的 llm_ms
+
+    Args:
+        records: 查询记录 [{"query", "intent_type"?, "is_spatial"?, "llm_ms"?}]
+        engine: 分级意图引擎（提供阈值与关键词分析）
+        assumed_llm_ms: 既无记录也无法实测时假定的 LLM 耗时（毫秒）
+
+    Returns:
+        评估报告（规则覆盖率、一致率、节省的延迟、不一致样例）
+    """
+    evaluated = 0
+    accepted = 0
+    accepted_agree = 0
+    overall_agree = 0
+    rule_ms = 0.0
+    saved_ms = 0.0
+    llm_ms_samples: List[float] = []
+    latency_source = "recorded"
+    disagreements: List[Dict[str, Any]] = []
+
+    for record in records:
+        query = record.get("query") or ""
+        if not query:
+            continue
+
+        start = time.perf_counter()
+        rule_result = engine.analyze_by_rules(query)
+        rule_ms += (time.perf_counter() - start) * 1000
+
+        expected = record if "intent_type" in record else None
+        llm_ms = record.get("llm_ms")
+        if expected is None and engine.analyzer is not None:
+            start = time.perf_counter()
+            expected = engine.analyzer.analyze_intent(query)
+            llm_ms = (time.perf_counter() - start) * 1000
+            latency_source = "measured"
+        if expected is None:
+            continue
+        if llm_ms is None:
+            llm_ms = assumed_llm_ms
+            latency_source = "assumed"
+        llm_ms_samples.append(float(llm_ms))
+
+        evaluated += 1
+        agree = (rule_result["intent_type"] == expected["intent_type"]
+                 and bool(rule_result["is_spatial"]) == bool(expected.get("is_spatial", False)))
+        overall_agree += agree
+        if engine.accepts(query, rule_result):
+            accepted += 1
+            accepted_agree += agree
+            saved_ms += float(llm_ms)
+            if not agree and len(disagreements) < 10:
+                disagreements.append({
+                    "query": query,
+                    "rules": [rule_result["intent_type"], rule_result["is_spatial"]],
+                    "expected": [expected["intent_type"], bool(expected.get("is_spatial", False))],
+                    "confidence": round(rule_result.get("confidence", 0.0), 2),
+                })
+
+    return {
+        "queries": evaluated,
+        "confidence_threshold": engine.confidence_threshold,
+        "rule_accepted": accepted,
+        "rule_coverage_percent": round(accepted / evaluated * 100, 2) if evaluated else 0,
+        "accepted_agreement_percent": round(accepted_agree / accepted * 100, 2) if accepted else 0,
+        "overall_keyword_agreement_percent": round(overall_agree / evaluated * 100, 2) if evaluated else 0,
+        "avg_rule_ms": round(rule_ms / evaluated, 3) if evaluated else 0,
+        "avg_llm_ms": round(sum(llm_ms_samples) / len(llm_ms_samples), 2) if llm_ms_samples else 0,
+        "llm_latency_source": latency_source,
+        "latency_saved_ms": round(saved_ms, 2),
+        "disagreements": disagreements,
+    }
+
+
+def _normalize_sql(sql: Optional[str]) -> str:
+    """比较用的SQL归一化：去掉末尾分号、合并空白、统一小写"""
+    return " ".join((sql or "").strip().rstrip(";").split()).lower()
+
+
+def evaluate_fused_generation(
+    records: List[Dict[str, Any]],
+    sql_generator: Any,
+    intent_analyzer: Any,
+    database_schema: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    离线对比意图 + SQL 融合模式与两次调用路径（需要真实 LLM）
+
+    - 两次调用: IntentAnalyzer.analyze_intent → SQLGenerator.generate_initial_sql
+    - 融合调用: SQLGenerator.generate_sql_with_intent（以关键词结果为预判）
+
+    意图参照优先取记录中的 intent_type/is_spatial（人工标注），缺失时以两次调用路径的意图为参照；
+    记录中带 sql 时额外统计两条路径生成的SQL与记录SQL的一致率
+
+    Args:
+        records: 查询记录 [{"query", "intent_type"?, "is_spatial"?, "sql"?}]
+        sql_generator: SQLGenerator 实例
+        intent_analyzer: IntentAnalyzer 实例
+        database_schema: 格式化的数据库Schema（可选，默认使用生成器缓存的schema）
+
+    Returns:
+        评估报告（意图准确率、SQL一致率、两条路径的平均耗时、不一致样例）
+    """
+    evaluated = 0
+    two_call_correct = 0
+    fused_correct = 0
+    sql_agree = 0
+    recorded = 0
+    two_call_sql_match = 0
+    fused_sql_match = 0
+    two_call_ms = 0.0
+    fused_ms = 0.0
+    disagreements: List[Dict[str, Any]] = []
+
+    def same_intent(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        return (a.get("intent_type") == b.get("intent_type")
+                and bool(a.get("is_spatial", False)) == bool(b.get("is_spatial", False)))
+
+    for record in records:
+        query = record.get("query") or ""
+        if not query:
+            continue
+
+        start = time.perf_counter()
+        intent = intent_analyzer.analyze_intent(query)
+        two_call_sql = sql_generator.generate_initial_sql(
+            query, intent_info=intent, database_schema=database_schema)
+        two_call_ms += (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        fused = sql_generator.generate_sql_with_intent(
+            query, intent_hint=PromptManager._analyze_intent_by_keywords(query), database_schema=database_schema)
+        fused_ms += (time.perf_counter() - start) * 1000
+
+        expected = record if "intent_type" in record else intent
+        evaluated += 1
+        two_call_correct += same_intent(intent, expected)
+        fused_correct += same_intent(fused["intent_info"], expected)
+        same_sql = _normalize_sql(two_call_sql) == _normalize_sql(fused["sql"])
+        sql_agree += same_sql
+        if record.get("sql"):
+            recorded += 1
+            two_call_sql_match += _normalize_sql(two_call_sql) == _normalize_sql(record["sql"])
+            fused_sql_match += _normalize_sql(fused["sql"]) == _normalize_sql(record["sql"])
+
+        if (not same_intent(fused["intent_info"], expected) or not same_sql) and len(disagreements) < 10:
+            disagreements.append({
+                "query": query,
+                "expected": [expected.get("intent_type"), bool(expected.get("is_spatial", False))],
+                "fused": [fused["intent_info"].get("intent_type"), fused["intent_info"].get("is_spatial")],
+                "two_call_sql": two_call_sql[:200],
+                "fused_sql": fused["sql"][:200],
+            })
+
+    def percent(n: int, d: int) -> float:
+        return round(n / d * 100, 2) if d else 0
+
+    return {
+        "queries": evaluated,
+        "intent_reference": "labels" if any("intent_type" in r for r in records) else "two_call",
+        "two_call_intent_accuracy_percent": percent(two_call_correct, evaluated),
+        "fused_intent_accuracy_percent": percent(fused_correct, evaluated),
+        "sql_agreement_percent": percent(sql_agree, evaluated),
+        "recorded_sql": recorded,
+        "two_call_recorded_sql_match_percent": percent(two_call_sql_match, recorded),
+        "fused_recorded_sql_match_percent": percent(fused_sql_match, recorded),
+        "avg_two_call_ms": round(two_call_ms / evaluated, 2) if evaluated else 0,
+        "avg_fused_ms": round(fused_ms / evaluated, 2) if evaluated else 0,
+        "latency_saved_percent": percent(two_call_ms - fused_ms, two_call_ms) if two_call_ms else 0,
+        "disagreements": disagreements,
+    }
+
+
+def _load_intent_records(path: str) -> List[Dict[str, Any]]:
+    """读取查询集：每行一条查询，或 JSON Lines（query/query_text + 可选 intent_type/is_spatial/llm_ms）"""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                record["query"] = record.get("query") or record.get("query_text") or ""
+            else:
+                record = {"query": line}
+            if record["query"]:
+                records.append(record)
+    return records
+
+
+# 测试代码：python -m core.processors.intent_engine [查询集文件] [置信度阈值]
+#          python -m core.processors.intent_engine --fused <查询集文件>   （融合模式对比，需要 LLM 与数据库）
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if len(sys.argv) > 2 and sys.argv[1] == "--fused":
+        from ..llm import BaseLLM
+        from ..database import DatabaseConnector
+        from ..prompts import PromptType
+        from .intent_analyzer import IntentAnalyzer
+        from .schema_fetcher import SchemaFetcher
+        from .sql_generator import SQLGenerator
+
+        llm = BaseLLM()
+        fetcher = SchemaFetcher(DatabaseConnector())
+        report = evaluate_fused_generation(
+            _load_intent_records(sys.argv[2]),
+            SQLGenerator(llm, PromptManager.get_prompt(PromptType.SCENIC_QUERY)),
+            IntentAnalyzer(llm),
+            database_schema=fetcher.format_schema_for_llm(fetcher.fetch_schema(use_cache=True)),
+        )
+        print(f"=== 意图 + SQL 融合模式对比（{report['queries']} 条查询） ===\n")
+        for key, value in report.items():
+            if key != "disagreements":
+                print(f"  {key}: {value}")
+        for item in report["disagreements"]:
+            print(f"  ✗ {item}")
+        sys.exit(0)
+
+    if len(sys.argv) > 1:
+        sample = _load_intent_records(sys.argv[1])
+    else:
+        # (查询, 期望意图, 是否空间)
+        sample = [
+            {"query": q, "intent_type": t, "is_spatial": s} for q, t, s in [
+                ("统计浙江省有多少个5A景区", "summary", False),
+                ("浙江省一共有多少个4A景区", "summary", False),
+                ("统计各省份5A景区数量", "summary", False),
+                ("云南省有多少个景区", "summary", False),
+                ("江苏省5A景区总数是多少", "summary", False),
+                ("统计西湖周围5公里的景点分布", "summary", True),
+                ("杭州西湖附近5公里的景区", "query", True),
+                ("距离西湖10公里以内的景点", "query", True),
+                ("查找距离杭州10公里内的景区", "query", True),
+                ("黄山附近有哪些景点", "query", True),
+                ("故宫周边的景区推荐", "query", True),
+                ("查询浙江省的5A景区", "query", False),
+                ("列出北京的4A级景区", "query", False),
+                ("推荐几个杭州的景区", "query", False),
+                ("成都有哪些好玩的景点", "query", False),
+                ("西湖的门票和开放时间", "query", False),
+                ("查询景区", "query", False),
+                ("附近有什么", "query", True),
+            ]
+        ]
+
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.6
+    report = evaluate_intent_engine(sample, TieredIntentEngine(confidence_threshold=threshold))
+    print(f"=== 分级意图离线评估（{report['queries']} 条查询，阈值 {threshold}） ===\n")
+    for key, value in report.items():
+        if key != "disagreements":
+            print(f"  {key}: {value}")
+    for item in report["disagreements"]:
+        print(f"  ✗ {item}")
+
+    if len(sys.argv) == 1:
+        print("\n--- 阈值扫描 ---")
+        for t in (0.5, 0.6, 0.7, 0.8, 0.9):
+            r = evaluate_intent_engine(sample, TieredIntentEngine(confidence_threshold=t))
+            print(f"  threshold={t:.1f}  coverage={r['rule_coverage_percent']:6.2f}%  "
+                  f"agreement={r['accepted_agreement_percent']:6.2f}%  saved={r['latency_saved_ms']:.0f}ms")
@@ -15,6 +15,8 @@ import re
 from typing import Dict, Any, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from .sql_executor import SQLExecutor  # ✅ 导入基类
+from ..deadline import remaining_seconds
+from ..tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -106,16 +108,37 @@ class OptimizedSQLExecutor(SQLExecutor):  # ✅ 继承自 SQLExecutor
         
         while retry_count <= self.max_retries:
             try:
-                # 使用固定超时时间，不再逐步增加
+                # 使用固定超时时间，不再逐步增加；请求有截止时间时不超过剩余时间
                 current_timeout = self.timeout
+                remaining = remaining_seconds()
+                if remaining is not None:
+                    if remaining <= 0:
+                        self.logger.warning("请求已超过截止时间，停止执行SQL")
+                        return {
+                            "status": "error",
+                            "data": None,
+                            "count": 0,
+                            "raw_result": None,
+                            "error": "请求已超过截止时间，未执行SQL",
+                            "error_type": "DEADLINE_EXCEEDED"
+                        }
+                    current_timeout = min(current_timeout, remaining)
                 
                 # 根据重试次数优化SQL
                 current_sql = self._get_retry_sql(sql, retry_count)
                 
                 self.logger.info(f"执行 {retry_count}/{self.max_retries}: 超时={current_timeout}s, SQL={current_sql[:200]}...")
          
-                # 执行查询
-                result = self._execute_single_query(current_sql, current_timeout)
+                # 执行查询（每次尝试记录一个 db.query 追踪 span）
+                with span("db.query", attempt=retry_count, timeout_s=current_timeout, sql=current_sql[:500]) as db_span:
+                    result = self._execute_single_query(current_sql, current_timeout)
+                    db_span.set_attributes(
+                        rows=result.get("count", 0),
+                        optimized=result.get("optimized"),
+                        error_type=result.get("error_type"),
+                    )
+                    if result["status"] != "success":
+                        db_span.set_error(result.get("error"))
                 
                 if result["status"] == "success":
                     self.logger.info(f"执行成功: 第{retry_count}次执行")
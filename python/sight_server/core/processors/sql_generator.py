@@ -3,11 +3,15 @@ SQL生成器模块 - Sight Server
 负责将自然语言查询转换为SQL语句
 """
 
+import json
 import logging
 import re
 from typing import Optional, List, Dict, Any
 from langchain_core.prompts import PromptTemplate
 
+from ..schemas import FusedIntentSQL
+from ..prompts import PromptType
+
 import re
 import sqlparse
 from sqlparse.sql import Identifier, IdentifierList, TokenList, Token
@@ -16,6 +20,93 @@ from sqlparse.tokens import Keyword, DML, Whitespace, Punctuation, Name
 
 logger = logging.getLogger(__name__)
 
+# ✅ SQL修复/改进 prompt 的静态部分：放在 prompt 开头、所有查询共用，
+#    使 DeepSeek/OpenAI 兼容接口的上下文缓存可以复用这段前缀（schema 紧随其后，本次查询的信息放在最后）
+SQL_FIX_INSTRUCTIONS = """你是一个精通 PostgreSQL 和 PostGIS 的 SQL 专家，需要诊断并修复执行失败的 SQL。
+
+## 🤔 请运用你的 PostgreSQL 专业知识进行诊断和修复
+
+### 思考框架：
+
+1. **错误诊断**
+   - 这是什么类型的 PostgreSQL 错误？（语法、约束、聚合、类型转换、作用域等）
+   - 结合错误码和错误位置，SQL 的哪个部分违反了 PostgreSQL 规则？
+   - 错误的根本原因是什么？
+
+2. **上下文关联分析**
+   - 用户真正需要什么数据？查询的意图是什么？（获取数据、统计、空间查询）
+   - 当前的 SQL 结构是否匹配查询意图？使用的表是否合适？
+   - 参考下方Schema信息，字段类型是否正确使用？
+   - 执行耗时是否暗示性能问题？
+
+3. **修复策略**
+   - 如何在保持查询意图的同时修复错误？
+   - 是否需要调整：表连接方式、WHERE 位置、聚合函数、子查询结构、字段作用域？
+   - 对于空间查询，PostGIS 函数使用是否正确？
+   - 有没有更优雅的 PostgreSQL 解决方案？
+
+4. **最佳实践**
+   - 修复后的 SQL 是否符合 PostgreSQL 语法规范？
+   - 是否考虑了数据类型匹配和性能优化？（参考下方Schema信息）
+   - 是否处理了可能的 NULL 值和边界情况？
+
+---
+
+## 📚 相关背景知识（供参考）
+
+**PostgreSQL 核心规则**:
+- 聚合查询时，SELECT/WHERE/HAVING 中引用的非聚合字段必须在 GROUP BY 中
+- 子查询的表别名（如 a, t）作用域仅限于该子查询内部，外层无法直接访问
+- UNION ALL 要求各子查询返回相同数量、顺序和类型的字段
+- FROM 子句必须先定义表和别名，才能在 SELECT/WHERE 中使用
+- 对于空间查询，确保 PostGIS 函数参数类型正确
+
+**常见错误码解读**:
+- 42P01: 表不存在
+- 42703: 列不存在
+- 42601: 语法错误
+- 42883: 函数不存在（常见于 PostGIS 函数）
+
+---"""
+
+SQL_FEEDBACK_INSTRUCTIONS = """你是 PostgreSQL + PostGIS 专家，需要基于验证反馈改进 SQL 查询。
+
+## 🎯 任务
+
+请根据下方验证反馈中指出的问题，改进 SQL 查询以满足用户需求。
+
+## 🔍 改进方向
+
+1. **分析反馈**:
+   - 反馈指出了什么问题？（缺少字段、数据不准确、不相关等）
+   - 问题的根本原因是什么？
+   - 用户实际需要什么信息？
+
+2. **改进策略**:
+   - 如果缺少关键字段：添加必要的字段到 SELECT 子句
+   - 如果需要坐标信息：确保包含 ST_X(geom) as longitude, ST_Y(geom) as latitude
+   - 如果数据不准确：检查 WHERE 条件和 JOIN 关系
+   - 如果结果不相关：重新审视查询逻辑
+
+3. **数据库Schema应用**:
+   - 参考下方Schema信息，确保使用正确的表名和字段名
+   - 注意字段类型（如 geometry 类型需用 PostGIS 函数）
+   - 考虑表之间的关联关系
+
+4. **查询意图考虑**:
+   - 如果是 summary 类型：确保包含聚合函数（COUNT, SUM, AVG等）和 GROUP BY
+   - 如果是 query 类型：确保返回完整的记录列表
+   - 如果是空间查询：确保包含坐标字段和空间函数
+
+## ⚠️ 重要约束
+
+- 必须保留 `json_agg(...) as result` 的输出格式
+- 确保包含完整的 FROM 子句
+- 使用合适的表别名（a_sight → a, tourist_spot → t）
+- 根据需求选择合适的 JOIN 类型（FULL OUTER JOIN / LEFT JOIN）
+
+---"""
+
 
 class SQLGenerator:
     ALIAS_TABLE_MAP = {
@@ -102,22 +193,11 @@ class SQLGenerator:
 
         {base_prompt}
 
-        **数据库Schema信息**（完整字段类型供你参考）:
-        {database_schema}
-
-        **用户查询**: {query}
-
-        **查询意图分析**（供你参考）:
-        - 查询类型: {intent_type} (query=用户需要具体数据 / summary=用户需要统计结果)
-        - 空间特征: {is_spatial} (True=涉及距离/位置计算 / False=普通数据查询)
-        - 置信度: {confidence}
-        - 相关关键词: {keywords_matched}
-
         ---
 
         ## 📋 意图组合决策表（快速决策指南）
 
-        根据 **intent_type** 和 **is_spatial** 的组合，选择对应的 SQL 结构：
+        根据下方查询意图分析中 **intent_type** 和 **is_spatial** 的组合，选择对应的 SQL 结构：
 
         ┌─────────────┬─────────────┬──────────────────────────────┬────────────────────────────┐
         │ intent_type │ is_spatial  │ 查询示例                     │ SQL 结构要求               │
@@ -128,8 +208,6 @@ class SQLGenerator:
         │ summary     │ True ⭐     │ "武汉市景区的空间分布"       │ GROUP BY + 空间字段        │
         └─────────────┴─────────────┴──────────────────────────────┴────────────────────────────┘
 
-        **当前查询属于**: {intent_type} + {spatial_type} → 请严格遵守对应的 SQL 结构要求
-
         ---
 
         ## ⚠️ CRITICAL RULES（绝对必须遵守）
@@ -298,7 +376,7 @@ class SQLGenerator:
            - **intent_type = "query"**: 用户需要具体记录列表或详细信息
 
         ### 2. 数据获取策略
-           - 需要从哪些表获取数据？（参考上方Schema信息中的表结构）
+           - 需要从哪些表获取数据？（参考下方Schema信息中的表结构）
            - 如何确保获取完整的数据（包括只在某个表中存在的记录）？
            - 是否需要表连接？用什么连接方式最合适（INNER JOIN、LEFT JOIN、UNION ALL等）？
            - 对于两表数据只有部分重合的情况，如何设计查询才不会遗漏数据？
@@ -329,6 +407,21 @@ class SQLGenerator:
 
         ---
 
+        **数据库Schema信息**（完整字段类型供你参考）:
+        {database_schema}
+
+        ---
+
+        **用户查询**: {query}
+
+        **查询意图分析**（供你参考）:
+        - 查询类型: {intent_type} (query=用户需要具体数据 / summary=用户需要统计结果)
+        - 空间特征: {is_spatial} (True=涉及距离/位置计算 / False=普通数据查询)
+        - 置信度: {confidence}
+        - 相关关键词: {keywords_matched}
+
+        **当前查询属于**: {intent_type} + {spatial_type} → 请严格遵守上方对应的 SQL 结构要求
+
         请基于你的专业判断和 PostgreSQL 最佳实践，生成最优的 SQL 查询。
 
         只返回SQL语句，不要解释。
@@ -350,20 +443,6 @@ class SQLGenerator:
 
         {base_prompt}
 
-        **数据库Schema信息**（完整字段类型供你参考）:
-        {database_schema}
-
-        **用户原始需求**: {original_query}
-
-        **已执行的查询**:
-        ```sql
-        {previous_sql}
-        ```
-
-        **当前数据状况**:
-        - 已获取记录数: {record_count}
-        - 发现缺失字段: {missing_fields}
-
         ---
 
         {match_rules}
@@ -374,7 +453,7 @@ class SQLGenerator:
 
         1. **数据完整性分析**
            - 哪些字段缺失了？
-           - 这些字段通常在哪个表中？（参考上方Schema信息中的表结构和字段类型）
+           - 这些字段通常在哪个表中？（参考下方Schema信息中的表结构和字段类型）
            - 是否可以通过补充查询获取？还是数据源本身不完整？
 
         2. **补充查询策略**
@@ -394,6 +473,22 @@ class SQLGenerator:
 
         ---
 
+        **数据库Schema信息**（完整字段类型供你参考）:
+        {database_schema}
+
+        ---
+
+        **用户原始需求**: {original_query}
+
+        **已执行的查询**:
+        ```sql
+        {previous_sql}
+        ```
+
+        **当前数据状况**:
+        - 已获取记录数: {record_count}
+        - 发现缺失字段: {missing_fields}
+
         请基于你的 SQL 专业知识，生成补充查询的 SQL 语句。
 
         只返回SQL语句，不要解释。
@@ -408,6 +503,37 @@ class SQLGenerator:
                     "missing_fields",
                 ]
 
+                # ✅ 意图 + SQL 融合 Prompt：复用 SQL 生成 Prompt 的前缀（静态规则 + schema），
+                #    只替换本次查询部分，让模型在一次调用中同时给出意图判断和 SQL
+                self.fused_generation_template = self.sql_generation_template.split("**用户查询**: {query}")[0] + """**用户查询**: {query}
+
+        **关键词预判**（仅供参考，可能不准确）:
+        - 查询类型: {rule_intent_type}
+        - 空间特征: {rule_is_spatial}
+        - 置信度: {rule_confidence}
+
+        请先判断查询意图，再按上方决策表中对应的 SQL 结构生成 SQL：
+        - intent_type: "query"（用户需要具体数据）或 "summary"（用户需要统计结果）
+        - is_spatial: 是否涉及距离/位置计算
+        - is_query_clear: 查询是否明确（缺少地点、类型等关键信息时为 false）
+        - confidence: 意图判断的置信度（0-1）
+        - keywords_matched: 识别到的关键词
+        - reasoning: 一句话说明判断依据
+        - sql: 生成的 SQL（字符串中的双引号和换行需按 JSON 转义）
+
+        只返回一个 JSON 对象，不要解释，格式如下：
+        {{"intent_type": "query", "is_spatial": false, "is_query_clear": true, "confidence": 0.9, "keywords_matched": ["5A"], "reasoning": "...", "sql": "SELECT ..."}}
+
+        JSON:"""
+                self.fused_generation_inputs = [
+                    "base_prompt",
+                    "database_schema",
+                    "query",
+                    "rule_intent_type",
+                    "rule_is_spatial",
+                    "rule_confidence",
+                ]
+
     def set_database_schema(self, formatted_schema: Optional[str]):
         """缓存数据库schema，避免每次调用时重复传入"""
         if formatted_schema and formatted_schema.strip():
@@ -499,7 +625,7 @@ class SQLGenerator:
                 f"Generating initial SQL for query: {query} "
                 f"(intent={intent_type}, spatial={is_spatial}, confidence={confidence:.2f}, match_mode={match_mode})"
             )
-            response = self.llm.llm.invoke(prompt_text)
+            response = self.llm.invoke_prompt(prompt_text, call_site="sql_generation")
 
             # 提取SQL
             sql = self._extract_sql(response)
@@ -536,6 +662,94 @@ class SQLGenerator:
             self.logger.error(f"Initial SQL generation failed: {e}")
             raise
 
+    def generate_sql_with_intent(
+        self,
+        query: str,
+        intent_hint: Optional[Dict[str, Any]] = None,
+        database_schema: Optional[str] = None,
+        match_mode: str = "fuzzy",
+    ) -> Dict[str, Any]:
+        """
+        意图 + SQL 融合生成：一次 LLM 调用同时返回查询意图和 SQL
+
+        Args:
+            query: 用户查询
+            intent_hint: 关键词意图分析结果（作为预判提示，解析失败时作为意图回退值）
+            database_schema: 格式化的数据库Schema字符串（可选）
+            match_mode: 匹配模式（fuzzy/ exact）
+
+        Returns:
+            {"sql": str, "intent_info": 意图分析结果（与 IntentAnalyzer 格式一致，tier="fused"）}
+        """
+        hint = intent_hint or {}
+        schema_str = self._resolve_schema_for_prompt(database_schema)
+        template = self.fused_generation_template.replace(
+            "{match_rules}", self._get_match_rules(match_mode, context="initial"))
+        prompt_text = PromptTemplate(template=template, input_variables=self.fused_generation_inputs).format(
+            base_prompt=self.base_prompt,
+            database_schema=schema_str,
+            query=query,
+            rule_intent_type=hint.get("intent_type", "query"),
+            rule_is_spatial=hint.get("is_spatial", False),
+            rule_confidence=f"{hint.get('confidence', 0.0):.2f}",
+        )
+
+        self.logger.debug(f"Generating fused intent + SQL for query: {query} (match_mode={match_mode})")
+        response = self.llm.invoke_prompt(prompt_text, call_site="sql_generation")
+        content = response.content if hasattr(response, "content") else str(response)
+
+        try:
+            parsed = FusedIntentSQL.model_validate(json.loads(self._extract_json_object(content)))
+        except (ValueError, TypeError) as e:
+            # 输出不是合法 JSON 时仍尽量取出 SQL，意图沿用关键词预判
+            self.logger.warning(f"Fused intent + SQL output not parseable ({e}), using keyword intent")
+            sql = self._extract_sql(self._extract_fenced_sql(content))
+            intent_info = dict(hint)
+            intent_info["analysis_details"] = dict(hint.get("analysis_details") or {}, method="fused_fallback")
+            intent_info["tier"] = "fused"
+            return {"sql": sql, "intent_info": intent_info}
+
+        intent_info = {
+            "intent_type": parsed.intent_type.value,
+            "is_spatial": parsed.is_spatial,
+            "confidence": parsed.confidence,
+            "reasoning": parsed.reasoning,
+            "keywords_matched": parsed.keywords_matched,
+            "is_query_clear": parsed.is_query_clear,
+            "prompt_type": PromptType.SPATIAL_QUERY if parsed.is_spatial else PromptType.SCENIC_QUERY,
+            "description": parsed.reasoning,
+            "analysis_details": {
+                "method": "fused_llm",
+                "model": getattr(self.llm, "model", None),
+                "rule_intent_type": hint.get("intent_type"),
+                "rule_confidence": hint.get("confidence", 0.0),
+            },
+            "semantic_enhanced": True,
+            "tier": "fused",
+        }
+        sql = self._extract_sql(parsed.sql)
+        self.logger.info(
+            f"Generated fused intent + SQL ({intent_info['intent_type']}, spatial={parsed.is_spatial}, "
+            f"confidence={parsed.confidence:.2f}): {sql[:100]}...")
+        return {"sql": sql, "intent_info": intent_info}
+
+    @staticmethod
+    def _extract_json_object(text: str) -> str:
+        """取出响应中第一个 { 到最后一个 } 之间的 JSON 文本（兼容 ```json 代码块）"""
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end <= start:
+            raise ValueError("no JSON object in response")
+        return text[start:end + 1]
+
+    @staticmethod
+    def _extract_fenced_sql(text: str) -> str:
+        """从非 JSON 响应中取出 SQL（```sql 代码块或第一个 SELECT/WITH 开始的部分）"""
+        fenced = re.search(r"```(?:sql)?\s*(.*?)```", text, flags=re.IGNORECASE | re.DOTALL)
+        if fenced:
+            return fenced.group(1)
+        match = re.search(r"\b(SELECT|WITH)\b.*", text, flags=re.IGNORECASE | re.DOTALL)
+        return match.group(0) if match else text
+
     def generate_followup_sql(
         self,
         original_query: str,
@@ -579,7 +793,7 @@ class SQLGenerator:
             self.logger.debug(
                 f"Generating followup SQL; previous count={record_count}, missing fields={missing_fields or []}, match_mode={match_mode}"
             )
-            response = self.llm.llm.invoke(prompt_text)
+            response = self.llm.invoke_prompt(prompt_text, call_site="sql_generation")
 
             # 提取SQL
             sql = self._extract_sql(response)
@@ -662,11 +876,14 @@ class SQLGenerator:
             schema_str = self._resolve_schema_for_prompt(database_schema)
 
             # ✅ 启发式修复提示词（调动 LLM 的 SQL 专业知识）
-            fix_prompt = f"""你是一个精通 PostgreSQL 和 PostGIS 的 SQL 专家。
+            # 静态修复指引 + schema 在前、本次错误信息在后，保证 prompt 前缀稳定（命中服务端上下文缓存）
+            fix_prompt = f"""{SQL_FIX_INSTRUCTIONS}
 
 **数据库Schema信息**（完整字段类型供你参考）:
 {schema_str}
 
+---
+
 **用户需求**: {query}
 
 **生成的 SQL**:
@@ -679,45 +896,6 @@ class SQLGenerator:
 {error}
 ```
 
----
-
-## 🤔 请运用你的 PostgreSQL 专业知识进行诊断和修复
-
-### 思考框架：
-
-1. **错误诊断**
-   - 这是什么类型的 PostgreSQL 错误？（语法、约束、聚合、类型转换、作用域等）
-   - 错误的根本原因是什么？
-   - SQL 的哪个部分违反了 PostgreSQL 规则？
-
-2. **问题分析**
-   - 查询的意图是什么？（获取数据、统计、空间查询）
-   - 当前的 SQL 结构有什么问题？
-   - 哪些 PostgreSQL 特性或规则与此相关？
-   - 参考上方Schema信息，字段类型是否正确使用？
-
-3. **修复策略**
-   - 如何在保持查询意图的同时修复错误？
-   - 是否需要调整：表连接方式、WHERE 位置、聚合函数、子查询结构、字段作用域？
-   - 有没有更优雅的 PostgreSQL 解决方案？
-
-4. **最佳实践**
-   - 修复后的 SQL 是否符合 PostgreSQL 语法规范？
-   - 是否考虑了性能优化？
-   - 是否处理了可能的 NULL 值和边界情况？（参考Schema中的字段类型）
-
----
-
-## 📚 相关背景知识（供参考）
-
-**PostgreSQL 核心规则**:
-- 聚合查询时，SELECT/WHERE/HAVING 中引用的非聚合字段必须在 GROUP BY 中
-- 子查询的表别名（如 a, t）作用域仅限于该子查询内部，外层无法直接访问
-- UNION ALL 要求各子查询返回相同数量、顺序和类型的字段
-- FROM 子句必须先定义表和别名，才能在 SELECT/WHERE 中使用
-
----
-
 请基于你的 SQL 专业知识和对错误的理解，生成修复后的 SQL 语句。
 
 只返回修复后的 SQL，不要解释。
@@ -726,7 +904,7 @@ class SQLGenerator:
 
             # 调用LLM生成修复后的SQL
             self.logger.debug(f"Attempting to fix SQL with error: {error[:100]}")
-            response = self.llm.llm.invoke(fix_prompt)
+            response = self.llm.invoke_prompt(fix_prompt, call_site="sql_fix")
 
             # 提取修复后的SQL
             fixed_sql = self._extract_sql(response)
@@ -774,11 +952,14 @@ class SQLGenerator:
             is_spatial = intent_info.get("is_spatial", False) if intent_info else False
 
             # 构建改进提示词
-            improve_prompt = f"""你是 PostgreSQL + PostGIS 专家，需要基于验证反馈改进 SQL 查询。
+            # 静态改进指引 + schema 在前、本次反馈在后，保证 prompt 前缀稳定
+            improve_prompt = f"""{SQL_FEEDBACK_INSTRUCTIONS}
 
 **数据库Schema信息**:
 {schema_str}
 
+---
+
 **用户问题**: {query}
 
 **查询意图**: {intent_type} (空间查询: {'是' if is_spatial else '否'})
@@ -791,51 +972,13 @@ class SQLGenerator:
 **验证反馈**:
 {feedback}
 
----
-
-## 🎯 任务
-
-请根据验证反馈中指出的问题，改进 SQL 查询以满足用户需求。
-
-## 🔍 改进方向
-
-1. **分析反馈**:
-   - 反馈指出了什么问题？（缺少字段、数据不准确、不相关等）
-   - 问题的根本原因是什么？
-   - 用户实际需要什么信息？
-
-2. **改进策略**:
-   - 如果缺少关键字段：添加必要的字段到 SELECT 子句
-   - 如果需要坐标信息：确保包含 ST_X(geom) as longitude, ST_Y(geom) as latitude
-   - 如果数据不准确：检查 WHERE 条件和 JOIN 关系
-   - 如果结果不相关：重新审视查询逻辑
-
-3. **数据库Schema应用**:
-   - 参考上方Schema信息，确保使用正确的表名和字段名
-   - 注意字段类型（如 geometry 类型需用 PostGIS 函数）
-   - 考虑表之间的关联关系
-
-4. **查询意图考虑**:
-   - 如果是 summary 类型：确保包含聚合函数（COUNT, SUM, AVG等）和 GROUP BY
-   - 如果是 query 类型：确保返回完整的记录列表
-   - 如果是空间查询：确保包含坐标字段和空间函数
-
-## ⚠️ 重要约束
-
-- 必须保留 `json_agg(...) as result` 的输出格式
-- 确保包含完整的 FROM 子句
-- 使用合适的表别名（a_sight → a, tourist_spot → t）
-- 根据需求选择合适的 JOIN 类型（FULL OUTER JOIN / LEFT JOIN）
-
-## 输出
-
 只返回改进后的 SQL，不要解释。
 
 改进后的 SQL:"""
 
             # 调用LLM生成改进的SQL
             self.logger.debug(f"Regenerating SQL based on feedback: {feedback[:100]}")
-            response = self.llm.llm.invoke(improve_prompt)
+            response = self.llm.invoke_prompt(improve_prompt, call_site="sql_fix")
 
             # 提取改进后的SQL
             improved_sql = self._extract_sql(response)
@@ -1356,11 +1499,14 @@ class SQLGenerator:
             rows_affected = execution_context.get("rows_affected", 0)
 
             # ✅ 增强修复提示词（利用完整的错误上下文）
-            fix_prompt = f"""你是一个精通 PostgreSQL 和 PostGIS 的 SQL 专家。
+            # 静态修复指引 + schema 在前、本次错误上下文在后，保证 prompt 前缀稳定
+            fix_prompt = f"""{SQL_FIX_INSTRUCTIONS}
 
 **数据库Schema信息**（完整字段类型供你参考）:
 {schema_str}
 
+---
+
 **用户需求**: {original_query}
 **增强查询**: {enhanced_query}
 **查询意图**: {intent_type} (query=具体数据 / summary=统计结果)
@@ -1383,55 +1529,7 @@ class SQLGenerator:
 - 使用的表: {', '.join(tables_accessed) if tables_accessed else '未知'}
 - Schema 状态: {'已加载' if schema_used else '未加载'}
 
----
-
-## 🤔 请运用你的 PostgreSQL 专业知识进行深度诊断和修复
-
-### 思考框架：
-
-1. **错误深度分析**
-   - 根据 PostgreSQL 错误码 {error_code}，这是什么类型的错误？
-   - 错误位置 {error_position} 指向 SQL 的哪个部分？
-   - 结合查询意图 {intent_type} 和空间需求 {requires_spatial}，分析根本原因
-
-2. **上下文关联分析**
-   - 用户真正需要什么数据？（参考原始需求: {original_query}）
-   - 当前 SQL 结构是否匹配查询意图？
-   - 使用的表 {tables_accessed} 是否合适？
-   - 执行耗时 {execution_time_ms:.0f}ms 是否暗示性能问题？
-
-3. **修复策略制定**
-   - 如何保持查询意图 {intent_type} 的同时修复错误？
-   - 是否需要调整：表连接策略、聚合函数使用、子查询结构、字段作用域？
-   - 对于空间查询 {requires_spatial}，PostGIS 函数使用是否正确？
-   - 如何优化性能避免超时？
-
-4. **最佳实践验证**
-   - 修复后的 SQL 是否符合 PostgreSQL 语法规范？
-   - 是否考虑了数据类型匹配？（参考上方Schema信息）
-   - 是否处理了可能的 NULL 值和边界情况？
-   - 是否利用了适当的索引和查询优化？
-
----
-
-## 📚 相关背景知识（供参考）
-
-**PostgreSQL 核心规则**:
-- 聚合查询时，SELECT/WHERE/HAVING 中引用的非聚合字段必须在 GROUP BY 中
-- 子查询的表别名作用域仅限于该子查询内部，外层无法直接访问
-- UNION ALL 要求各子查询返回相同数量、顺序和类型的字段
-- FROM 子句必须先定义表和别名，才能在 SELECT/WHERE 中使用
-- 对于空间查询，确保 PostGIS 函数参数类型正确
-
-**常见错误码解读**:
-- 42P01: 表不存在
-- 42703: 列不存在
-- 42601: 语法错误
-- 42883: 函数不存在（常见于 PostGIS 函数）
-
----
-
-请基于完整的错误上下文和你的 SQL 专业知识，生成修复后的 SQL 语句。
+请结合以上错误上下文和你的 SQL 专业知识，生成修复后的 SQL 语句。
 
 只返回修复后的 SQL，不要解释。
 
@@ -1439,7 +1537,7 @@ class SQLGenerator:
 
             # 调用LLM生成修复后的SQL
             self.logger.debug(f"Attempting to fix SQL with enhanced context, error_code: {error_code}")
-            response = self.llm.llm.invoke(fix_prompt)
+            response = self.llm.invoke_prompt(fix_prompt, call_site="sql_fix")
 
             # 提取修复后的SQL
             fixed_sql = self._extract_sql(response)
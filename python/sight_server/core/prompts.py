@@ -8,6 +8,7 @@
 from typing import Optional, Dict, Any, List
 from enum import Enum
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +56,45 @@ SUMMARY_KEYWORDS = [
     'statistics', 'summary', 'analyze', 'how many', 'percentage'
 ]
 
+# ==================== 关键词意图分析的预编译正则（模块加载时编译一次） ====================
+
+# 统计模式（模式, 权重）
+SUMMARY_PATTERNS = [
+    (re.compile(r'有多少个?\b'), 0.5),         # "有多少个"、"有多少"
+    (re.compile(r'一共.*?多少'), 0.5),          # "一共有多少"
+    (re.compile(r'总共.*?多少'), 0.5),          # "总共有多少"
+    (re.compile(r'多少.*?个'), 0.4),            # "多少个景区"
+    (re.compile(r'(多少|几).{0,5}?个'), 0.35),  # "多少/几XX个"
+    (re.compile(r'排名'), 0.25),
+    (re.compile(r'分布情况'), 0.3)
+]
+
+# 排除模式（不是统计查询的特征）
+SUMMARY_EXCLUSION_PATTERNS = [
+    re.compile(r'这几个'),        # "这几个景区"是指代
+    re.compile(r'那几个'),        # "那几个景区"是指代
+    re.compile(r'哪几个'),        # "哪几个景区"是疑问
+    re.compile(r'前\d+个'),       # "前10个"是排序
+    re.compile(r'后\d+个'),       # "后10个"是排序
+]
+
+# 空间模式（模式, 权重）
+SPATIAL_PATTERNS = [
+    (re.compile(r'距离.{0,10}?[公里|千米|米|km]'), 0.5),      # "距离XX 10公里"
+    (re.compile(r'附近.{0,20}?[景区|景点]'), 0.4),            # "附近的景区"
+    (re.compile(r'周边.{0,20}?[景区|景点]'), 0.4),            # "周边的景区"
+    (re.compile(r'[东南西北].{0,5}?公里'), 0.3),              # "东边5公里"
+    (re.compile(r'经纬度'), 0.25),
+    (re.compile(r'坐标'), 0.2)
+]
+
+# 景区等级模式（模式, 权重）
+SCENIC_LEVEL_PATTERNS = [
+    (re.compile(r'[1-5]a景区'), 0.3),
+    (re.compile(r'[1-5]a级'), 0.3),
+    (re.compile(r'[1-5]a景点'), 0.3)
+]
+
 
 class PromptManager:
     """
@@ -473,8 +513,6 @@ ORDER BY avg_rating DESC NULLS LAST
             "matched_patterns": []
         }
 
-        import re
-
         # ==================== 统计意图分析（优化版）====================
         summary_score = 0.0
 
@@ -509,37 +547,17 @@ ORDER BY avg_rating DESC NULLS LAST
                 analysis_details["matched_patterns"].append(
                     f"弱统计关键词: {keyword}")
 
-        # ✅ 统计模式识别（优化正则）
-        summary_patterns = [
-            (r'有多少个?\b', 0.5),        # "有多少个"、"有多少"
-            (r'一共.*?多少', 0.5),         # "一共有多少"
-            (r'总共.*?多少', 0.5),         # "总共有多少"
-            (r'多少.*?个', 0.4),           # "多少个景区"
-            (r'(多少|几).{0,5}?个', 0.35),  # "多少/几XX个"
-            (r'排名', 0.25),
-            (r'分布情况', 0.3)
-        ]
-
-        # ✅ 排除模式（不是统计查询的特征）
-        exclusion_patterns = [
-            r'这几个',        # "这几个景区"是指代
-            r'那几个',        # "那几个景区"是指代
-            r'哪几个',        # "哪几个景区"是疑问
-            r'前\d+个',       # "前10个"是排序
-            r'后\d+个',       # "后10个"是排序
-        ]
-
-        # 检查排除模式
-        has_exclusion = any(re.search(pattern, query_lower)
-                            for pattern in exclusion_patterns)
+        # ✅ 统计模式识别（预编译正则，见 SUMMARY_PATTERNS / SUMMARY_EXCLUSION_PATTERNS）
+        has_exclusion = any(pattern.search(query_lower)
+                            for pattern in SUMMARY_EXCLUSION_PATTERNS)
 
         if not has_exclusion:
             # 只有在没有排除模式时才进行统计模式匹配
-            for pattern, weight in summary_patterns:
-                if re.search(pattern, query_lower):
+            for pattern, weight in SUMMARY_PATTERNS:
+                if pattern.search(query_lower):
                     summary_score += weight
                     analysis_details["matched_patterns"].append(
-                        f"统计模式: {pattern}")
+                        f"统计模式: {pattern.pattern}")
 
         # ✅ 意图动词检测 - Summary 加成
         summary_verbs = ['统计', '计算', '汇总', '总结']
@@ -585,20 +603,11 @@ ORDER BY avg_rating DESC NULLS LAST
                 analysis_details["matched_patterns"].append(
                     f"弱空间关键词: {keyword}")
 
-        # ✅ 空间模式识别（优化正则）
-        spatial_patterns = [
-            (r'距离.{0,10}?[公里|千米|米|km]', 0.5),      # "距离XX 10公里"
-            (r'附近.{0,20}?[景区|景点]', 0.4),            # "附近的景区"
-            (r'周边.{0,20}?[景区|景点]', 0.4),            # "周边的景区"
-            (r'[东南西北].{0,5}?公里', 0.3),              # "东边5公里"
-            (r'经纬度', 0.25),
-            (r'坐标', 0.2)
-        ]
-
-        for pattern, weight in spatial_patterns:
-            if re.search(pattern, query_lower):
+        # ✅ 空间模式识别（预编译正则，见 SPATIAL_PATTERNS）
+        for pattern, weight in SPATIAL_PATTERNS:
+            if pattern.search(query_lower):
                 spatial_score += weight
-                analysis_details["matched_patterns"].append(f"空间模式: {pattern}")
+                analysis_details["matched_patterns"].append(f"空间模式: {pattern.pattern}")
 
         analysis_details["spatial_score"] = min(spatial_score, 1.0)
 
@@ -615,17 +624,11 @@ ORDER BY avg_rating DESC NULLS LAST
                     f"景区关键词: {keyword}")
 
         # 景区等级模式
-        level_patterns = [
-            (r'[1-5]a景区', 0.3),
-            (r'[1-5]a级', 0.3),
-            (r'[1-5]a景点', 0.3)
-        ]
-
-        for pattern, weight in level_patterns:
-            if re.search(pattern, query_lower):
+        for pattern, weight in SCENIC_LEVEL_PATTERNS:
+            if pattern.search(query_lower):
                 scenic_score += weight
                 analysis_details["matched_patterns"].append(
-                    f"景区等级模式: {pattern}")
+                    f"景区等级模式: {pattern.pattern}")
 
         analysis_details["scenic_score"] = min(scenic_score, 1.0)
 
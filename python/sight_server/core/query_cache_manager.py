@@ -10,13 +10,21 @@ import hashlib
 import logging
 import difflib
 import socket
-from typing import Optional, Dict, Any, Tuple, List
+import threading
+from typing import Optional, Dict, Any, Tuple, List, Iterable, Set
 from datetime import datetime, timedelta
 from decimal import Decimal
 
 from sympy import true
 # from sentence_transformers import SentenceTransformer as ST, util as st_util
 
+from .cache_journal import CacheMetadataJournal
+from .cache_index import CacheIndex, CacheEvictionWorker
+from .cache_codec import CacheCodec, decolumnarize
+from .cache_invalidation import TableChangeMonitor, extract_sql_tables
+from .cache_refresh import StaleCacheRefresher
+from .query_normalizer import QueryNormalizer
+
 # 配置默认值
 DEFAULT_EMBEDDING_MODEL_OFFLINE_MODE = False
 DEFAULT_EMBEDDING_MODEL_TIMEOUT = 30
@@ -82,6 +90,16 @@ class QueryCacheManager:
         similarity_threshold: float = 0.95,
         embedding_model: str = "paraphrase-multilingual-MiniLM-L12-v2",
         lazy_load_embedding: bool = True,        # ✅ 新增：懒加载模型
+        embedding_quantization: str = "none",
+        embedding_batch_size: int = 32,
+        journal_compact_min_records: int = 1000,
+        journal_fsync: bool = False,
+        eviction_batch_ratio: float = 0.05,
+        expire_interval: float = 60.0,
+        max_bytes: Optional[int] = None,
+        codec: Optional[CacheCodec] = None,
+        stale_while_revalidate: int = 0,
+        query_normalizer: Optional[QueryNormalizer] = None,
     ):
         """
         初始化查询缓存管理器（支持语义相似度搜索）
@@ -95,14 +113,32 @@ class QueryCacheManager:
             enable_semantic_search: 是否启用语义相似度搜索（✅ 新增）
             similarity_threshold: 语义相似度阈值（0-1），默认0.92（✅ 新增）
             embedding_model: Embedding模型名称（✅ 新增）
+            embedding_quantization: Embedding推理量化模式 none/float16/int8
+            embedding_batch_size: Embedding批量编码大小
+            journal_compact_min_records: 元数据日志触发压缩的最小记录数
+            journal_fsync: 元数据日志每次追加后是否 fsync
+            eviction_batch_ratio: 达到容量上限时一次淘汰的比例（批量淘汰，减少淘汰频率）
+            expire_interval: 后台过期清理间隔（秒）
+            max_bytes: 文件缓存的最大编码字节数（None 表示只按条目数限制）
+            codec: 缓存编解码器，默认列式 + 超过阈值压缩
+            stale_while_revalidate: 过期后仍可返回旧结果并后台刷新的时间窗口（秒），
+                需调用 enable_background_refresh 后生效
+            query_normalizer: 查询规范化流水线（缓存键、相似度、语义索引共用），默认全部步骤
         """
         self.cache_dir = cache_dir
         self.ttl = ttl
         self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.codec = codec or CacheCodec()
+        self._total_bytes = 0
+        self.stale_while_revalidate = stale_while_revalidate
+        self._refresher: Optional[StaleCacheRefresher] = None
+        self._stale_hits = 0
         self.cache_metadata_file = os.path.join(
             cache_dir, "query_cache_metadata.json")
         self.database_connector = database_connector
         self.cache_strategy = cache_strategy
+        self.query_normalizer = query_normalizer or QueryNormalizer()
 
         # ✅ 语义搜索配置
         self.enable_semantic_search = enable_semantic_search
@@ -110,7 +146,9 @@ class QueryCacheManager:
 
         # ✅ 初始化 Embedding 模型（仅在启用语义搜索时，延迟导入）
         self.embedding_model = None
-        self.query_embeddings = {}  # 缓存查询向量，避免重复计算
+        self.embedding_service = None  # 共享向量服务（批量编码 + 向量持久化）
+        self.embedding_quantization = embedding_quantization
+        self.embedding_batch_size = embedding_batch_size
         self.lazy_load_embedding = lazy_load_embedding
         self.embedding_model_name = embedding_model
         self.model_cache_dir = os.path.join(cache_dir, "models")
@@ -142,9 +180,29 @@ class QueryCacheManager:
         # 创建缓存目录
         os.makedirs(cache_dir, exist_ok=True)
 
-        # 加载缓存元数据
+        # 加载缓存元数据（快照 + 追加日志）
+        self._metadata_journal = CacheMetadataJournal(
+            self.cache_metadata_file,
+            compact_min_records=journal_compact_min_records,
+            fsync=journal_fsync,
+        )
         self.metadata = self._load_metadata()
 
+        # LRU/TTL 内存索引 + 后台淘汰线程
+        self._lock = threading.RLock()
+        self._index = CacheIndex()
+        self._table_index: Dict[str, Set[str]] = {}
+        self._table_monitor: Optional[TableChangeMonitor] = None
+        self._invalidated_by_tables = 0
+        self._invalidation_listeners: List[Any] = []
+        self._rebuild_index()
+        self.eviction_batch_size = max(1, int(max_size * eviction_batch_ratio))
+        self._eviction_worker = CacheEvictionWorker(
+            self._delete_evicted_entries,
+            expire_callback=self.cleanup_expired_entries,
+            expire_interval=expire_interval,
+        )
+
         # ✅ 新增：语义搜索统计
         self.metadata["semantic_stats"] = {
             "semantic_hits": 0,
@@ -309,10 +367,19 @@ class QueryCacheManager:
 
         if SENTENCE_TRANSFORMERS_AVAILABLE and SentenceTransformer:
             try:
-                # 使用改进的模型加载方法
-                self.embedding_model = self._initialize_embedding_model_safely(
-                    self.embedding_model_name, self.cache_dir
+                from .embedding_service import get_shared_embedding_service
+
+                # 使用改进的模型加载方法，模型在进程内共享
+                self.embedding_service = get_shared_embedding_service(
+                    self.embedding_model_name,
+                    loader=lambda: self._initialize_embedding_model_safely(
+                        self.embedding_model_name, self.cache_dir),
+                    store_dir=os.path.join(self.cache_dir, "embeddings"),
+                    quantization=self.embedding_quantization,
+                    batch_size=self.embedding_batch_size
                 )
+                if self.embedding_service:
+                    self.embedding_model = self.embedding_service.model
 
                 if self.embedding_model:
                     logger.info("✓ Embedding model loaded successfully")
@@ -331,29 +398,168 @@ class QueryCacheManager:
             self.enable_semantic_search = False
 
     def _load_metadata(self) -> Dict[str, Any]:
-        """加载缓存元数据"""
-        if os.path.exists(self.cache_metadata_file):
-            try:
-                with open(self.cache_metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.warning(f"Failed to load cache metadata: {e}")
-
-        return {
+        """加载缓存元数据（快照 + 回放日志）"""
+        default = {
             "cache_entries": {},
             "total_hits": 0,
             "total_misses": 0,
             "created_at": datetime.now().isoformat(),
-            "last_cleanup": datetime.now().isoformat()
+            "last_cleanup": datetime.now().isoformat(),
+            "pinned_keys": []
         }
+        metadata = self._metadata_journal.load(default)
+        for key, value in default.items():
+            metadata.setdefault(key, value)
+        return metadata
 
     def _save_metadata(self):
-        """保存缓存元数据"""
+        """保存完整缓存元数据（写新快照并清空日志）"""
+        self._metadata_journal.compact(self.metadata)
+
+    def _persist_entry(self, cache_key: str):
+        """追加记录单个缓存条目的元数据变更"""
+        entry = self.metadata["cache_entries"].get(cache_key)
+        if entry is None:
+            return
+        self._metadata_journal.put(cache_key, entry)
+        self._maybe_compact_metadata()
+
+    def _persist_removal(self, cache_key: str):
+        """追加记录单个缓存条目的删除"""
+        self._metadata_journal.delete(cache_key)
+        self._maybe_compact_metadata()
+
+    def _persist_fields(self, *field_names: str):
+        """追加记录顶层字段（命中统计、清理时间等）的变更"""
+        self._metadata_journal.set_fields(
+            {name: self.metadata.get(name) for name in field_names})
+        self._maybe_compact_metadata()
+
+    def _maybe_compact_metadata(self):
+        """日志记录数超过阈值时压缩（均摊 O(1)）"""
+        if self._metadata_journal.needs_compaction(len(self.metadata["cache_entries"])):
+            self._save_metadata()
+
+    def _entry_expires_at(self, entry: Dict[str, Any]) -> float:
+        """获取元数据条目的过期时间戳（兼容没有 expires_at 字段的旧元数据）"""
+        expires_at = entry.get("expires_at")
+        if expires_at is not None:
+            return float(expires_at)
         try:
-            with open(self.cache_metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save cache metadata: {e}")
+            created_at = datetime.fromisoformat(entry.get("created_at", ""))
+            return created_at.timestamp() + self.ttl
+        except (TypeError, ValueError):
+            return time.time() + self.ttl
+
+    def _rebuild_index(self):
+        """启动时根据元数据重建 LRU/TTL 索引（仅执行一次排序）"""
+        entries = sorted(
+            self.metadata["cache_entries"].items(),
+            key=lambda x: x[1].get("updated_at", ""))
+        for cache_key, entry in entries:
+            self._index.add(cache_key, self._entry_expires_at(entry) + self.stale_while_revalidate)
+            self._total_bytes += entry.get("size", 0)
+            self._tag_entry(cache_key, entry.get("tables", []))
+        for cache_key in self.metadata["pinned_keys"]:
+            if cache_key in self.metadata["cache_entries"]:
+                self._index.pin(cache_key)
+
+    def _cache_file_path(self, cache_key: str) -> str:
+        """缓存文件路径（编码格式）"""
+        return os.path.join(self.cache_dir, f"{cache_key}{self.codec.file_extension}")
+
+    def _legacy_cache_file_path(self, cache_key: str) -> str:
+        """旧版明文 JSON 缓存文件路径"""
+        return os.path.join(self.cache_dir, f"{cache_key}.json")
+
+    def _find_cache_file(self, cache_key: str) -> Optional[str]:
+        """查找缓存文件（优先编码格式，兼容旧版 JSON 文件）"""
+        for cache_file in (self._cache_file_path(cache_key), self._legacy_cache_file_path(cache_key)):
+            if os.path.exists(cache_file):
+                return cache_file
+        return None
+
+    def _read_cache_file(self, cache_file: str) -> Dict[str, Any]:
+        """读取并解码缓存文件"""
+        with open(cache_file, 'rb') as f:
+            return self.codec.decode(f.read(), tier="file")
+
+    def _delete_cache_files(self, cache_key: str):
+        """删除缓存键对应的所有缓存文件（包括旧版 JSON 文件）"""
+        for cache_file in (self._cache_file_path(cache_key), self._legacy_cache_file_path(cache_key)):
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+
+    def _drop_entry_metadata(self, cache_key: str):
+        """
+        从元数据中移除条目并更新已用字节数和依赖表索引（调用方需持有锁）
+
+        固定状态（pinned_keys）保留，只有 unpin() 会取消固定；条目重新写入后自动恢复固定
+        """
+        entry = self.metadata["cache_entries"].pop(cache_key, None)
+        if entry is not None:
+            self._total_bytes -= entry.get("size", 0)
+            self._untag_entry(cache_key, entry.get("tables", []))
+            self._persist_removal(cache_key)
+            # 淘汰/过期/失效的条目不再参与语义检索，同步移除其向量
+            if self.embedding_service and entry.get("query"):
+                self.embedding_service.remove([self.normalize_query(entry["query"])])
+
+    def _tag_entry(self, cache_key: str, tables: Iterable[str]):
+        """登记缓存条目依赖的数据表（调用方需持有锁）"""
+        for table in tables:
+            self._table_index.setdefault(table, set()).add(cache_key)
+
+    def _untag_entry(self, cache_key: str, tables: Iterable[str]):
+        """移除缓存条目的依赖表登记（调用方需持有锁）"""
+        for table in tables:
+            keys = self._table_index.get(table)
+            if keys is not None:
+                keys.discard(cache_key)
+                if not keys:
+                    del self._table_index[table]
+
+    def _enforce_byte_capacity(self):
+        """超过字节容量时按 LRU 批量淘汰（保留最近写入的条目）"""
+        if not self.max_bytes:
+            return
+        with self._lock:
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                evicted = self._evict_lru_entries(
+                    min(self.eviction_batch_size, len(self._index) - 1))
+                if not evicted:
+                    break
+
+    def _encode_for_database(self, result_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        数据库层编码：result_data 列仍为 JSON，只做列式转换以去掉重复键名
+
+        Args:
+            result_data: 原始结果数据
+
+        Returns:
+            列式转换后的结果数据
+        """
+        start = time.perf_counter()
+        encoded = self.codec.columnarize(result_data)
+        raw_size = len(json.dumps(result_data, ensure_ascii=False, cls=DecimalEncoder))
+        encoded_size = len(json.dumps(encoded, ensure_ascii=False, cls=DecimalEncoder))
+        self.codec.record_sizes("database", raw_size, encoded_size, time.perf_counter() - start)
+        return encoded
+
+    def _decode_from_database(self, result_data: Any) -> Dict[str, Any]:
+        """解析数据库中的 result_data（兼容字符串和列式编码）"""
+        start = time.perf_counter()
+        if isinstance(result_data, str):
+            try:
+                result_data = json.loads(result_data)
+            except json.JSONDecodeError:
+                result_data = {}
+        elif not isinstance(result_data, dict):
+            result_data = {}
+        result_data = decolumnarize(result_data)
+        self.codec.record_decode("database", time.perf_counter() - start)
+        return result_data
 
     def get_cache_key(self, query: str, context: Dict[str, Any]) -> str:
         """
@@ -366,19 +572,32 @@ class QueryCacheManager:
         Returns:
             缓存键（MD5哈希）
         """
-        # 标准化查询文本
-        normalized_query = " ".join(query.lower().strip().split())
+        # 标准化查询文本（全半角、繁简、标点、数字/等级、同义词）
+        normalized_query = self.normalize_query(query)
 
         # 只基于查询文本生成缓存键，忽略上下文参数
         return hashlib.md5(normalized_query.encode('utf-8')).hexdigest()
 
+    def normalize_query(self, query: str) -> str:
+        """
+        规范化查询文本（缓存键、相似度计算和语义索引使用同一规则）
+
+        Args:
+            query: 查询文本
+
+        Returns:
+            规范化后的查询文本
+        """
+        return self.query_normalizer.normalize(query)
+
     def save_query_cache(
         self,
         query_text: str,
         result_data: Dict[str, Any],
         response_time: Optional[float] = None,
         ttl_seconds: Optional[int] = None,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        tables: Optional[List[str]] = None
     ) -> int:
         """
         保存查询结果缓存到 query_cache 表
@@ -389,6 +608,7 @@ class QueryCacheManager:
             response_time: 响应时间
             ttl_seconds: 生存时间（秒）
             context: 上下文信息（可选）
+            tables: 结果依赖的数据表，默认从 result_data["sql"] 中提取
 
         Returns:
             缓存记录ID
@@ -397,10 +617,12 @@ class QueryCacheManager:
         cache_key = self.get_cache_key(query_text, cache_context)
 
         try:
-            # ✅ 新增：检查缓存容量，如果超过限制则淘汰最近最少使用的缓存
-            total_entries = len(self.metadata["cache_entries"])
-            if total_entries >= self.max_size:
-                self._evict_lru_entries(total_entries - self.max_size + 1)
+            # ✅ 新增：检查缓存容量，如果超过限制则批量淘汰最近最少使用的缓存
+            with self._lock:
+                total_entries = len(self._index)
+                if cache_key not in self._index and total_entries >= self.max_size:
+                    self._evict_lru_entries(
+                        max(total_entries - self.max_size + 1, self.eviction_batch_size))
 
             record_id = 0
 
@@ -409,7 +631,7 @@ class QueryCacheManager:
                 record_id = self.database_connector.save_query_cache(
                     cache_key=cache_key,
                     query_text=query_text,
-                    result_data=result_data,
+                    result_data=self._encode_for_database(result_data),
                     response_time=response_time,
                     ttl_seconds=ttl_seconds or self.ttl
                 )
@@ -417,7 +639,8 @@ class QueryCacheManager:
 
             # 保存到文件系统
             if self.cache_strategy in ["file_only", "hybrid"]:
-                self._save_to_filesystem(cache_key, result_data, query_text)
+                self._save_to_filesystem(
+                    cache_key, result_data, query_text, ttl_seconds=ttl_seconds, tables=tables)
                 logger.debug(f"查询结果缓存已保存到文件系统，键: {cache_key}")
 
             return record_id
@@ -457,28 +680,29 @@ class QueryCacheManager:
             if result:
                 self.metadata["total_hits"] += 1
                 # 如果文件系统没有，则同步到文件系统
-                cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
-                if not os.path.exists(cache_file):
+                if self._find_cache_file(cache_key) is None:
                     self._save_to_filesystem(cache_key, result)
                 return result
 
             # 数据库没有，尝试文件系统
             result = self._get_from_filesystem(cache_key)
             if result:
-                # 如果数据库没有，则同步到数据库
-                self._save_to_database(cache_key, result)
+                # 如果数据库没有，则同步到数据库（过期旧结果等后台刷新后再写入）
+                if not result.get("stale"):
+                    self._save_to_database(cache_key, result)
                 return result
 
             # 都没有找到
             self.metadata["total_misses"] += 1
             return None
 
-    def _get_from_database(self, cache_key: str) -> Optional[Dict[str, Any]]:
+    def _get_from_database(self, cache_key: str, count_hit: bool = True) -> Optional[Dict[str, Any]]:
         """
         从数据库获取查询结果缓存
 
         Args:
             cache_key: 缓存键
+            count_hit: 是否累加数据库中的 hit_count
 
         Returns:
             缓存结果，如果不存在或已过期则返回None
@@ -487,19 +711,13 @@ class QueryCacheManager:
             return None
 
         try:
-            db_result = self.database_connector.get_query_cache(cache_key)
+            db_result = self.database_connector.get_query_cache(cache_key, count_hit=count_hit)
             if db_result:
                 logger.debug(f"数据库查询缓存命中，键: {cache_key}")
 
                 # ✅ 修复：正确处理 result_data 字段
-                result_data = db_result.get("result_data", {})
-                if isinstance(result_data, str):
-                    try:
-                        result_data = json.loads(result_data)
-                    except json.JSONDecodeError:
-                        result_data = {}
-                elif not isinstance(result_data, dict):
-                    result_data = {}
+                result_data = self._decode_from_database(
+                    db_result.get("result_data", {}))
 
                 # ✅ 修复：直接返回 result_data，而不是包装在 result_data 字段中
                 # 这样 main.py 可以直接使用 data、answer、count 等字段
@@ -537,7 +755,8 @@ class QueryCacheManager:
             self.database_connector.save_query_cache(
                 cache_key=cache_key,
                 query_text=result.get("query_text", ""),
-                result_data=result.get("result_data", {}),
+                result_data=self._encode_for_database(
+                    result.get("result_data", {})),
                 response_time=result.get("response_time"),
                 ttl_seconds=self.ttl
             )
@@ -557,33 +776,50 @@ class QueryCacheManager:
         Returns:
             缓存结果，如果不存在或已过期则返回None
         """
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
+        # 检查是否过期（优先使用内存索引，未索引的文件才回退到 mtime）
+        if self._index.is_expired(cache_key, time.time()):
+            logger.debug(f"文件缓存已过期，键: {cache_key}")
+            self._remove_cache_file(cache_key)
+            return None
 
-        if not os.path.exists(cache_file):
+        cache_file = self._find_cache_file(cache_key)
+        if cache_file is None:
+            if cache_key in self._index:
+                self._remove_cache_file(cache_key)
             return None
 
         try:
-            # 检查是否过期
-            file_mtime = os.path.getmtime(cache_file)
-            if time.time() - file_mtime > self.ttl:
-                logger.debug(f"文件缓存已过期，键: {cache_key}")
-                self._remove_cache_file(cache_key)
-                return None
+            if cache_key not in self._index:
+                file_mtime = os.path.getmtime(cache_file)
+                if time.time() - file_mtime > self.ttl:
+                    logger.debug(f"文件缓存已过期，键: {cache_key}")
+                    self._remove_cache_file(cache_key)
+                    return None
 
-            # 读取缓存文件
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                result = json.load(f)
+            # 读取并解码缓存文件
+            result = self._read_cache_file(cache_file)
+
+            # 已过期但仍在 stale-while-revalidate 窗口内：返回旧结果并后台刷新
+            entry = self.metadata["cache_entries"].get(cache_key)
+            if (entry is not None and not self._index.is_pinned(cache_key)
+                    and self._entry_expires_at(entry) <= time.time()):
+                if not self._serve_stale(cache_key, entry, result):
+                    self._remove_cache_file(cache_key)
+                    return None
 
             # 更新元数据
-            self.metadata["total_hits"] += 1
-            if cache_key in self.metadata["cache_entries"]:
-                self.metadata["cache_entries"][cache_key]["hit_count"] += 1
-                self.metadata["cache_entries"][cache_key]["last_accessed"] = datetime.now(
-                ).isoformat()
-                self.metadata["cache_entries"][cache_key]["updated_at"] = datetime.now(
-                ).isoformat()  # ✅ 新增：更新访问时间
+            with self._lock:
+                self.metadata["total_hits"] += 1
+                if cache_key in self.metadata["cache_entries"]:
+                    self.metadata["cache_entries"][cache_key]["hit_count"] += 1
+                    self.metadata["cache_entries"][cache_key]["last_accessed"] = datetime.now(
+                    ).isoformat()
+                    self.metadata["cache_entries"][cache_key]["updated_at"] = datetime.now(
+                    ).isoformat()  # ✅ 新增：更新访问时间
+                    self._index.touch(cache_key)
+                    self._persist_entry(cache_key)
 
-            self._save_metadata()
+                self._persist_fields("total_hits")
             logger.debug(f"文件查询缓存命中，键: {cache_key}")
             return result
 
@@ -591,7 +827,14 @@ class QueryCacheManager:
             logger.error(f"读取查询缓存文件失败 {cache_file}: {e}")
             return None
 
-    def _save_to_filesystem(self, cache_key: str, result: Dict[str, Any], query: str = "") -> bool:
+    def _save_to_filesystem(
+        self,
+        cache_key: str,
+        result: Dict[str, Any],
+        query: str = "",
+        ttl_seconds: Optional[int] = None,
+        tables: Optional[List[str]] = None
+    ) -> bool:
         """
         保存查询结果缓存到文件系统
 
@@ -599,33 +842,58 @@ class QueryCacheManager:
             cache_key: 缓存键
             result: 要缓存的结果
             query: 原始查询
+            ttl_seconds: 生存时间（秒），默认使用 self.ttl
+            tables: 结果依赖的数据表，默认从 result["sql"] 中提取
 
         Returns:
             是否成功
         """
         try:
-            cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
+            cache_file = self._cache_file_path(cache_key)
 
             # 在结果中添加查询文本，确保语义搜索能正常工作
             enhanced_result = result.copy()
             enhanced_result["query_text"] = query
 
-            # 保存缓存文件
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(enhanced_result, f, ensure_ascii=False,
-                          indent=2, cls=DecimalEncoder)
+            # 编码并保存缓存文件
+            encoded = self.codec.encode(enhanced_result, tier="file")
+            with open(cache_file, 'wb') as f:
+                f.write(encoded)
 
-            # 更新元数据 - 确保存储原始查询文本而不是哈希值
-            self.metadata["cache_entries"][cache_key] = {
-                "query": query,  # 存储原始查询文本
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat(),  # ✅ 新增：更新时间字段
-                "last_accessed": datetime.now().isoformat(),
-                "hit_count": 1,
-                "size": len(json.dumps(enhanced_result, ensure_ascii=False, cls=DecimalEncoder))
-            }
+            legacy_file = self._legacy_cache_file_path(cache_key)
+            if os.path.exists(legacy_file):
+                os.remove(legacy_file)
 
-            self._save_metadata()
+            # 更新元数据 - 确保存储原始查询文本而不是哈希值
+            expires_at = time.time() + (ttl_seconds or self.ttl)
+            if tables is None:
+                tables = extract_sql_tables(result.get("sql"))
+            with self._lock:
+                previous = self.metadata["cache_entries"].get(cache_key)
+                if previous is not None:
+                    self._total_bytes -= previous.get("size", 0)
+                    self._untag_entry(cache_key, previous.get("tables", []))
+                self._total_bytes += len(encoded)
+                self._tag_entry(cache_key, tables)
+                self.metadata["cache_entries"][cache_key] = {
+                    "query": query,  # 存储原始查询文本
+                    "created_at": datetime.now().isoformat(),
+                    "updated_at": datetime.now().isoformat(),  # ✅ 新增：更新时间字段
+                    "last_accessed": datetime.now().isoformat(),
+                    "expires_at": expires_at,
+                    "sql": result.get("sql"),
+                    "tables": tables,
+                    "hit_count": 1,
+                    "size": len(encoded)
+                }
+                self._index.add(cache_key, expires_at + self.stale_while_revalidate)
+                if cache_key in self.metadata["pinned_keys"]:
+                    self._index.pin(cache_key)
+                self._persist_entry(cache_key)
+            self._enforce_byte_capacity()
+            # 新条目的向量攒批编码并持久化，重启后无需重新编码
+            if self.embedding_service and query:
+                self.embedding_service.add([self.normalize_query(query)])
             logger.debug(f"文件查询缓存已保存，键: {cache_key}")
             return True
 
@@ -636,91 +904,341 @@ class QueryCacheManager:
     def _remove_cache_file(self, cache_key: str):
         """删除缓存文件"""
         try:
-            cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
-            if os.path.exists(cache_file):
-                os.remove(cache_file)
+            self._delete_cache_files(cache_key)
 
-            # 从元数据中移除
-            if cache_key in self.metadata["cache_entries"]:
-                del self.metadata["cache_entries"][cache_key]
+            # 从元数据和索引中移除
+            with self._lock:
+                self._index.remove(cache_key)
+                self._drop_entry_metadata(cache_key)
         except Exception as e:
             logger.error(f"删除查询缓存文件失败，键 {cache_key}: {e}")
 
-    def _evict_lru_entries(self, count: int = 1):
+    def _evict_lru_entries(self, count: int = 1) -> int:
         """
-        淘汰最近最少使用的缓存条目（基于updated_at字段）
+        淘汰最近最少使用的缓存条目（固定条目不参与淘汰）
+
+        元数据和索引在调用线程中同步移除（O(1)/条），
+        文件和数据库记录的删除交给后台线程批量执行
 
         Args:
             count: 要淘汰的条目数量
+
+        Returns:
+            实际淘汰的数量
         """
         if count <= 0:
-            return
+            return 0
 
-        logger.info(f"开始淘汰 {count} 个最近最少使用的缓存条目...")
+        with self._lock:
+            evicted_keys = self._index.pop_lru(count)
+            for cache_key in evicted_keys:
+                self._drop_entry_metadata(cache_key)
 
-        # 获取所有缓存条目并按updated_at排序
-        cache_entries = list(self.metadata["cache_entries"].items())
-        if not cache_entries:
-            return
+        if evicted_keys:
+            self._eviction_worker.submit(evicted_keys)
+            logger.info(f"淘汰 {len(evicted_keys)} 个最近最少使用的缓存条目（后台删除）")
+        return len(evicted_keys)
 
-        # 按updated_at升序排序（最早的在前）
-        cache_entries.sort(key=lambda x: x[1].get("updated_at", ""))
+    def _delete_evicted_entries(self, cache_keys: List[str]):
+        """
+        后台删除已淘汰条目的文件和数据库记录
 
-        evicted_count = 0
-        for cache_key, _ in cache_entries[:count]:
+        Args:
+            cache_keys: 已从索引中淘汰的缓存键
+        """
+        for cache_key in cache_keys:
+            # 淘汰后又被重新写入的键不删除
+            with self._lock:
+                if cache_key in self._index:
+                    continue
             try:
-                # 删除文件系统缓存
-                cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
-                if os.path.exists(cache_file):
-                    os.remove(cache_file)
+                self._delete_cache_files(cache_key)
 
-                # 删除数据库缓存
                 if self.database_connector and self.cache_strategy in ["db_only", "hybrid"]:
                     self.database_connector.delete_query_cache(cache_key)
 
-                # 从元数据中移除
-                if cache_key in self.metadata["cache_entries"]:
-                    del self.metadata["cache_entries"][cache_key]
-
-                evicted_count += 1
                 logger.debug(f"淘汰缓存条目: {cache_key}")
-
             except Exception as e:
                 logger.warning(f"淘汰缓存条目失败 {cache_key}: {e}")
 
-        logger.info(f"成功淘汰 {evicted_count} 个最近最少使用的缓存条目")
-        self._save_metadata()
+    def hydrate(self, query_text: str) -> bool:
+        """
+        检查查询是否已有有效缓存，并把仅存在于数据库的结果同步到文件系统（不计入命中统计，也不累加数据库中的 hit_count）
 
-    def cleanup_expired_entries(self) -> int:
+        Args:
+            query_text: 查询文本
+
+        Returns:
+            是否已有有效缓存
         """
-        清理过期缓存条目
+        cache_key = self.get_cache_key(query_text, {})
+        with self._lock:
+            entry = self.metadata["cache_entries"].get(cache_key)
+            fresh_in_file = (
+                entry is not None
+                and (self._index.is_pinned(cache_key)
+                     or self._entry_expires_at(entry) > time.time())
+                and self._find_cache_file(cache_key) is not None
+            )
+        if fresh_in_file:
+            return True
+
+        if self.cache_strategy == "file_only":
+            return False
+        result = self._get_from_database(cache_key, count_hit=False)
+        if not result:
+            return False
+        if self.cache_strategy == "hybrid":
+            self._save_to_filesystem(cache_key, result, query_text)
+        return True
+
+    def pin(self, query_text: str) -> bool:
+        """
+        固定查询缓存：不会被淘汰或过期，由 refresh_pinned 定期刷新
+
+        Args:
+            query_text: 查询文本（条目需已存在于缓存中）
 
         Returns:
-            清理的数量
+            是否固定成功
         """
-        logger.info("Cleaning up expired query cache entries...")
-        removed_count = 0
-        current_time = time.time()
+        cache_key = self.get_cache_key(query_text, {})
+        with self._lock:
+            if cache_key not in self.metadata["cache_entries"]:
+                return False
+            self._index.pin(cache_key)
+            if cache_key not in self.metadata["pinned_keys"]:
+                self.metadata["pinned_keys"].append(cache_key)
+                self._persist_fields("pinned_keys")
+        logger.info(f"固定查询缓存: {query_text[:50]}")
+        return True
+
+    def unpin(self, query_text: str) -> bool:
+        """
+        取消固定查询缓存（恢复正常 TTL 和 LRU）
 
-        for cache_key in list(self.metadata["cache_entries"].keys()):
-            cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
+        Args:
+            query_text: 查询文本
 
-            if not os.path.exists(cache_file):
-                self._remove_cache_file(cache_key)
-                removed_count += 1
+        Returns:
+            是否取消成功
+        """
+        cache_key = self.get_cache_key(query_text, {})
+        with self._lock:
+            if cache_key not in self.metadata["pinned_keys"]:
+                return False
+            self.metadata["pinned_keys"].remove(cache_key)
+            self._persist_fields("pinned_keys")
+            self._index.unpin(cache_key, time.time() + self.ttl)
+        return True
+
+    def get_pinned_queries(self) -> List[str]:
+        """获取已固定的查询文本列表"""
+        with self._lock:
+            return [
+                self.metadata["cache_entries"][key].get("query", "")
+                for key in self.metadata["pinned_keys"]
+                if key in self.metadata["cache_entries"]
+            ]
+
+    def refresh_pinned(self) -> int:
+        """
+        将所有固定条目提交给后台刷新器（重放SQL刷新数据）
+
+        Returns:
+            提交的刷新任务数
+        """
+        if self._refresher is None:
+            return 0
+        scheduled = 0
+        with self._lock:
+            pinned_keys = list(self.metadata["pinned_keys"])
+        for cache_key in pinned_keys:
+            entry = self.metadata["cache_entries"].get(cache_key)
+            cache_file = self._find_cache_file(cache_key)
+            if entry is None or cache_file is None:
+                continue
+            try:
+                result = self._read_cache_file(cache_file)
+            except Exception as e:
+                logger.warning(f"读取固定缓存失败 {cache_key}: {e}")
                 continue
+            query_text = entry.get("query") or result.get("query_text", "")
+            if query_text and self._refresher.schedule(cache_key, query_text, result):
+                scheduled += 1
+        return scheduled
 
-            # 检查是否过期
-            file_mtime = os.path.getmtime(cache_file)
-            if current_time - file_mtime > self.ttl:
-                self._remove_cache_file(cache_key)
-                removed_count += 1
+    def enable_background_refresh(
+        self,
+        replay_fn,
+        rerun_fn=None,
+        max_pending: int = 100
+    ):
+        """
+        启用后台刷新：固定条目的定期/失效后刷新，以及 stale-while-revalidate（窗口为 0 时不返回旧结果）
+
+        Args:
+            replay_fn: SQL重放函数，参数为保存的SQL，返回 {"status", "data", "count"}
+            rerun_fn: 重放失败时完整重跑Agent的函数，参数为查询文本，返回新的结果数据
+            max_pending: 最大待刷新任务数
+        """
+        if self._refresher is not None:
+            return
+        self._refresher = StaleCacheRefresher(
+            replay_fn=replay_fn,
+            save_fn=lambda query_text, result: self.save_query_cache(query_text, result),
+            rerun_fn=rerun_fn,
+            max_pending=max_pending,
+        )
+        logger.info(
+            f"✓ Background cache refresh enabled (stale-while-revalidate window={self.stale_while_revalidate}s)")
 
-        self.metadata["last_cleanup"] = datetime.now().isoformat()
-        self._save_metadata()
+    def _serve_stale(self, cache_key: str, entry: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        """
+        判断过期条目能否作为旧结果返回，并提交后台刷新
 
-        logger.info(f"Cleaned up {removed_count} expired query cache entries")
-        return removed_count
+        Args:
+            cache_key: 缓存键
+            entry: 元数据条目
+            result: 缓存结果（原地标记 stale）
+
+        Returns:
+            是否可以返回旧结果
+        """
+        if self._refresher is None or not self.stale_while_revalidate:
+            return False
+        query_text = entry.get("query") or result.get("query_text", "")
+        if not query_text:
+            return False
+        self._refresher.schedule(cache_key, query_text, dict(result))
+        result["stale"] = True
+        self._stale_hits += 1
+        logger.debug(f"返回过期旧结果并后台刷新，键: {cache_key}")
+        return True
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        失效依赖指定数据表的缓存条目
+
+        Args:
+            tables: 发生变更的表名
+
+        Returns:
+            失效的条目数量
+        """
+        tables = set(tables)
+        for listener in self._invalidation_listeners:
+            try:
+                listener(tables)
+            except Exception as e:
+                logger.warning(f"缓存失效监听器执行失败: {e}")
+
+        with self._lock:
+            cache_keys = set()
+            for table in tables:
+                cache_keys.update(self._table_index.get(table, ()))
+            # 固定条目保持固定，失效后按保存的SQL重新查询
+            pinned = {
+                cache_key: self.metadata["cache_entries"][cache_key].get("query", "")
+                for cache_key in cache_keys
+                if cache_key in self.metadata["pinned_keys"] and cache_key in self.metadata["cache_entries"]
+            }
+            for cache_key in cache_keys:
+                self._index.remove(cache_key)
+                self._drop_entry_metadata(cache_key)
+            self._invalidated_by_tables += len(cache_keys)
+
+        if cache_keys:
+            pinned_results = {}
+            for cache_key in pinned:
+                cache_file = self._find_cache_file(cache_key)
+                if cache_file is None:
+                    continue
+                try:
+                    pinned_results[cache_key] = self._read_cache_file(cache_file)
+                except Exception as e:
+                    logger.warning(f"读取固定缓存失败 {cache_key}: {e}")
+            for cache_key in cache_keys:
+                self._delete_cache_files(cache_key)
+            if self.database_connector and self.cache_strategy in ["db_only", "hybrid"]:
+                self.database_connector.delete_query_caches(list(cache_keys))
+            logger.info(f"因数据表变更失效 {len(cache_keys)} 个缓存条目: {sorted(tables)}")
+
+            for cache_key, result in pinned_results.items():
+                query_text = pinned[cache_key] or result.get("query_text", "")
+                if self._refresher is None:
+                    logger.warning(f"后台刷新未启用，固定缓存失效后无法刷新: {query_text[:50]}")
+                elif query_text:
+                    self._refresher.schedule(cache_key, query_text, result)
+        return len(cache_keys)
+
+    def add_invalidation_listener(self, listener):
+        """
+        注册数据表失效监听器（如SQL指纹结果缓存），随查询缓存一起失效
+
+        Args:
+            listener: 回调函数，参数为变更的表名集合
+        """
+        self._invalidation_listeners.append(listener)
+
+    def start_table_change_monitor(
+        self,
+        mode: str = "poll",
+        poll_interval: float = 10.0,
+        install_triggers: bool = True
+    ) -> bool:
+        """
+        启动数据表变更监听，数据变更时只失效依赖该表的缓存条目
+
+        Args:
+            mode: 信号源 notify（触发器 + LISTEN/NOTIFY）/ poll（轮询 pg_stat_user_tables）
+            poll_interval: 轮询间隔（秒）
+            install_triggers: notify 模式下是否自动安装表触发器
+
+        Returns:
+            是否成功启动
+        """
+        if not self.database_connector:
+            logger.warning("未配置数据库连接器，无法监听数据表变更")
+            return False
+        if self._table_monitor is not None:
+            return True
+
+        try:
+            monitor = TableChangeMonitor(
+                self.invalidate_tables,
+                database_connector=self.database_connector,
+                mode=mode,
+                poll_interval=poll_interval,
+            )
+            if mode == "notify" and install_triggers:
+                self.database_connector.install_table_change_triggers(channel=monitor.channel)
+            monitor.start()
+            self._table_monitor = monitor
+            return True
+        except Exception as e:
+            logger.error(f"启动数据表变更监听失败: {e}")
+            return False
+
+    def cleanup_expired_entries(self) -> int:
+        """
+        清理过期缓存条目（基于过期堆，不逐个检查文件）
+
+        Returns:
+            清理的数量
+        """
+        with self._lock:
+            expired_keys = self._index.pop_expired(time.time())
+            for cache_key in expired_keys:
+                self._drop_entry_metadata(cache_key)
+
+            self.metadata["last_cleanup"] = datetime.now().isoformat()
+            self._persist_fields("last_cleanup")
+
+        if expired_keys:
+            self._delete_evicted_entries(expired_keys)
+            logger.info(f"Cleaned up {len(expired_keys)} expired query cache entries")
+        return len(expired_keys)
 
     def get_cache_stats(self) -> Dict[str, Any]:
         """
@@ -738,15 +1256,30 @@ class QueryCacheManager:
 
         stats = {
             "total_entries": len(self.metadata["cache_entries"]),
+            "indexed_entries": len(self._index),
+            "eviction_batch_size": self.eviction_batch_size,
+            "eviction_pending_batches": self._eviction_worker.pending(),
+            "evicted_in_background": self._eviction_worker.keys_evicted,
             "total_hits": total_hits,
             "total_misses": total_misses,
             "hit_rate_percent": round(hit_rate, 2),
             "cache_dir": self.cache_dir,
             "ttl_seconds": self.ttl,
             "max_size": self.max_size,
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "codec": self.codec.get_stats(),
+            "dependency_tables": len(self._table_index),
+            "invalidated_by_table_change": self._invalidated_by_tables,
+            "table_change_monitor": self._table_monitor.get_stats() if self._table_monitor else None,
+            "pinned_entries": len(self.metadata["pinned_keys"]),
+            "stale_while_revalidate": self.stale_while_revalidate,
+            "stale_hits": self._stale_hits,
+            "background_refresh": self._refresher.get_stats() if self._refresher else None,
             "created_at": self.metadata["created_at"],
             "last_cleanup": self.metadata["last_cleanup"],
-            "cache_strategy": self.cache_strategy
+            "cache_strategy": self.cache_strategy,
+            "metadata_journal": self._metadata_journal.get_stats()
         }
 
         # ✅ 新增：语义搜索统计
@@ -766,23 +1299,42 @@ class QueryCacheManager:
         logger.info("Clearing all query cache entries...")
         removed_count = 0
 
-        for cache_key in list(self.metadata["cache_entries"].keys()):
-            self._remove_cache_file(cache_key)
-            removed_count += 1
+        with self._lock:
+            self.metadata["pinned_keys"] = []
+            for cache_key in list(self.metadata["cache_entries"].keys()):
+                self._remove_cache_file(cache_key)
+                removed_count += 1
 
-        # 重置元数据
-        self.metadata["cache_entries"] = {}
-        self.metadata["total_hits"] = 0
-        self.metadata["total_misses"] = 0
-        self.metadata["last_cleanup"] = datetime.now().isoformat()
+            # 重置元数据
+            self.metadata["cache_entries"] = {}
+            self.metadata["total_hits"] = 0
+            self.metadata["total_misses"] = 0
+            self.metadata["last_cleanup"] = datetime.now().isoformat()
+            self._index.clear()
+            self._table_index.clear()
+            self._total_bytes = 0
 
-        # ✅ 清空向量缓存
-        self.query_embeddings.clear()
+            # ✅ 清空向量缓存
+            if self.embedding_service:
+                self.embedding_service.clear()
 
-        self._save_metadata()
+            self._save_metadata()
         logger.info(f"Cleared all {removed_count} query cache entries")
         return removed_count
 
+    def close(self):
+        """停止后台淘汰线程，压缩元数据日志并释放文件句柄（正常关闭时调用，加快下次启动恢复）"""
+        if self._table_monitor is not None:
+            self._table_monitor.stop()
+        if self._refresher is not None:
+            self._refresher.stop()
+        self._eviction_worker.stop()
+        with self._lock:
+            self._save_metadata()
+        self._metadata_journal.close()
+        if self.embedding_service:
+            self.embedding_service.close()
+
     def get_with_similarity_search(
         self,
         query: str,
@@ -854,12 +1406,11 @@ class QueryCacheManager:
         cached_queries = {}
 
         # 从文件系统获取
-        for cache_key, metadata in self.metadata["cache_entries"].items():
-            cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
-            if os.path.exists(cache_file):
+        for cache_key, metadata in list(self.metadata["cache_entries"].items()):
+            cache_file = self._find_cache_file(cache_key)
+            if cache_file is not None:
                 try:
-                    with open(cache_file, 'r', encoding='utf-8') as f:
-                        cache_data = json.load(f)
+                    cache_data = self._read_cache_file(cache_file)
                     cached_queries[metadata["query"]] = cache_data
                 except Exception as e:
                     logger.warning(f"读取缓存文件失败 {cache_file}: {e}")
@@ -872,14 +1423,8 @@ class QueryCacheManager:
                     query_text = db_cache.get("query_text", "")
                     if query_text:
                         # 处理 result_data - 检查数据类型
-                        result_data = db_cache.get("result_data", "{}")
-                        if isinstance(result_data, str):
-                            try:
-                                result_data = json.loads(result_data)
-                            except json.JSONDecodeError:
-                                result_data = {}
-                        elif not isinstance(result_data, dict):
-                            result_data = {}
+                        result_data = self._decode_from_database(
+                            db_cache.get("result_data", "{}"))
 
                         cached_queries[query_text] = {
                             "result_data": result_data,
@@ -904,8 +1449,8 @@ class QueryCacheManager:
             相似度分数 (0.0-1.0)
         """
         # 标准化查询
-        normalized1 = " ".join(query1.lower().strip().split())
-        normalized2 = " ".join(query2.lower().strip().split())
+        normalized1 = self.normalize_query(query1)
+        normalized2 = self.normalize_query(query2)
 
         # 使用 difflib 计算相似度
         similarity = difflib.SequenceMatcher(
@@ -973,7 +1518,7 @@ class QueryCacheManager:
 
         流程：
         1. 计算当前查询的向量
-        2. 遍历已缓存查询，计算相似度
+        2. 与已缓存查询的向量批量计算相似度
         3. 返回最相似且超过阈值的缓存键
         """
         if not self.enable_semantic_search:
@@ -988,53 +1533,30 @@ class QueryCacheManager:
 
         try:
             # 1. 标准化查询文本（与 get_cache_key 一致）
-            normalized_query = " ".join(query.lower().strip().split())
-
-            # 2. 编码当前查询
-            query_embedding = self.embedding_model.encode(
-                normalized_query, convert_to_tensor=True)
-
-            # 3. 遍历已缓存的查询
-            best_match = None
-            best_similarity = 0.0
-            target_intent = context.get("query_intent", "query")
-            target_spatial = context.get("enable_spatial", True)
-            # 获取所有缓存的查询
+            normalized_query = self.normalize_query(query)
+
+            # 2. 获取所有缓存的查询，批量比较（已缓存查询的向量持久化复用，缺失的一次性批量编码）
             cached_queries = self._get_all_cached_queries()
             if not cached_queries:
                 return None
-            for cached_query, cache_data in cached_queries.items():
-                # cached_query = cached_entry.get("query", "")
-                # if not cached_query:
-                #     continue
-
-                # ✅ 上下文过滤（确保 intent 和 spatial 一致）
-                # 从缓存键中提取上下文信息（需要解析，这里简化处理：直接比较查询文本）
-                # 注意：这里假设缓存元数据中存储了原始查询文本
-
-                # 获取或计算缓存查询的向量
-                if cached_query not in self.query_embeddings:
-                    self.query_embeddings[cached_query] = self.embedding_model.encode(
-                        cached_query, convert_to_tensor=True
-                    )
-
-                cached_embedding = self.query_embeddings[cached_query]
-
-                # 计算余弦相似度
-                similarity = util.cos_sim(
-                    query_embedding, cached_embedding).item()
-
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = cached_query
+            # 语义索引以规范化文本为键，比较后映射回原始查询
+            normalized_to_raw = {}
+            for cached_query in cached_queries:
+                normalized_to_raw.setdefault(self.normalize_query(cached_query), cached_query)
+            match = self.embedding_service.most_similar(
+                normalized_query, list(normalized_to_raw))
+            if match is None:
+                return None
+            best_normalized, best_similarity = match
+            best_match = normalized_to_raw[best_normalized]
 
-            # 4. 如果相似度超过阈值，返回缓存键
-            if best_match and best_similarity >= self.similarity_threshold:
+            # 3. 如果相似度超过阈值，返回缓存键
+            if best_similarity >= self.similarity_threshold:
                 logger.info(
                     f"✓ Found similar cached query (similarity={best_similarity:.2%}): "
-                    f"'{cached_query[:50]}:'{query[:50]}...'"
+                    f"'{best_match[:50]}:'{query[:50]}...'"
                 )
-                return (best_match, best_similarity, cache_data['result_data'])
+                return (best_match, best_similarity, cached_queries[best_match]['result_data'])
 
             return None
 
@@ -1085,13 +1607,13 @@ class QueryCacheManager:
                     self.metadata["semantic_stats"]["semantic_hits"] += 1
                     self.metadata["semantic_stats"]["last_semantic_search"] = datetime.now(
                     ).isoformat()
-                    self._save_metadata()
+                    self._persist_fields("semantic_stats")
                     return similar_data
 
         # 3. 缓存未命中
         logger.debug(f"✗ Cache MISS: {query[:50]}...")
         self.metadata["semantic_stats"]["semantic_misses"] += 1
-        self._save_metadata()
+        self._persist_fields("semantic_stats")
         return None
 
     def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
@@ -1128,7 +1650,8 @@ class QueryCacheManager:
             "semantic_hit_rate_percent": round(semantic_hit_rate, 2),
             "similarity_threshold": self.similarity_threshold,
             "last_semantic_search": semantic_stats["last_semantic_search"],
-            "embedding_model_loaded": self.embedding_model is not None
+            "embedding_model_loaded": self.embedding_model is not None,
+            "embedding_service": self.embedding_service.get_stats() if self.embedding_service else None
         }
 
     def get_with_semantic_fallback(
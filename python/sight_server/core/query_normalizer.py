@@ -0,0 +1,419 @@
+"""
+查询规范化模块 - Sight Server
+生成缓存键前对中文查询做规范化（全半角、繁简、标点、数字/景区等级、地名别称、语气词），
+让同一问题的不同写法落到同一个缓存键，精确匹配和相似度/语义检索共用
+"""
+
+import re
+import json
+import logging
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ==================== 繁简转换 ====================
+
+# 未安装 opencc 时使用的常用繁体字表（覆盖景区/地名/查询常用字）
+_TRADITIONAL_TO_SIMPLIFIED = str.maketrans(
+    "區縣級館園灣門東廣雲貴龍島臺遼寧蘇陝廈蘭爾濱漢鄭長鄉勝點數個國這裡裏麼與嗎統計詢麗風場號們歷遺產觀態護閣廟橋鐘樓華"
+    "門開關陽陰湖瀋夢紀覽歲網頁說請問幾條處離遠近們會這裡邊際鎮莊臨濟鶴蓮綠紅藍黃黑劍雙齊爭書畫寶貝壽農業藝術戲劇"
+    "導遊覽線車飛機場鐵輪氣溫熱涼節慶誰將為麼單價錢費電話義烏漁廬峽淵溝潤滬贛閩鄂湘粵瓊渝黔滇藏隴寧青疆澳",
+    "区县级馆园湾门东广云贵龙岛台辽宁苏陕厦兰尔滨汉郑长乡胜点数个国这里里么与吗统计询丽风场号们历遗产观态护阁庙桥钟楼华"
+    "门开关阳阴湖沈梦纪览岁网页说请问几条处离远近们会这里边际镇庄临济鹤莲绿红蓝黄黑剑双齐争书画宝贝寿农业艺术戏剧"
+    "导游览线车飞机场铁轮气温热凉节庆谁将为么单价钱费电话义乌渔庐峡渊沟润沪赣闽鄂湘粤琼渝黔滇藏陇宁青疆澳",
+)
+
+_opencc_converter = None
+
+
+def _get_opencc_converter():
+    """延迟加载 opencc（可选依赖），不可用时返回 False"""
+    global _opencc_converter
+    if _opencc_converter is None:
+        try:
+            import opencc
+            _opencc_converter = opencc.OpenCC("t2s")
+        except Exception:
+            _opencc_converter = False
+    return _opencc_converter
+
+
+# ==================== 中文数字 ====================
+
+_CHINESE_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+                   "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CHINESE_UNITS = {"十": 10, "百": 100, "千": 1000, "万": 10000}
+# 以数字（或省略了"一"的"十"）开头的中文数字串；"千米"整体是单位，其中的"千"不当作数字；
+# 不从另一串中文数字中间开始匹配，单独的 百/千/万（如"万人以上"）保持不变
+_CHINESE_NUMBER = (
+    r"(?<![零〇一二两三四五六七八九十百千万])"
+    r"(?:[零〇一二两三四五六七八九]|十)(?:[零〇一二两三四五六七八九十百万]|千(?!米))*"
+)
+# 只转换后面跟着计量单位的中文数字，避免误改"一下""四处""一家人""三星堆"等词语
+_NUMERAL_UNITS = r"(?=个|公里|千米|米|天|小时|分钟|星级|级|a|元)"
+
+
+def chinese_to_int(text: str) -> Optional[int]:
+    """
+    将中文数字转换为整数（支持到"万"，如 二十、一百零五、两千）
+
+    Args:
+        text: 中文数字
+
+    Returns:
+        整数，无法解析时返回 None
+    """
+    total, section, number = 0, 0, 0
+    for char in text:
+        if char in _CHINESE_DIGITS:
+            number = _CHINESE_DIGITS[char]
+        elif char in _CHINESE_UNITS:
+            unit = _CHINESE_UNITS[char]
+            if unit == 10000:
+                total += ((section + number) or 1) * unit
+                section, number = 0, 0
+            else:
+                # "十五" 省略了前面的 "一"
+                section += (number or 1) * unit
+                number = 0
+        else:
+            return None
+    return total + section + number
+
+
+# ==================== 地名别称 ====================
+
+_PROVINCES = [
+    "北京", "天津", "上海", "重庆", "河北", "山西", "辽宁", "吉林", "黑龙江", "江苏", "浙江",
+    "安徽", "福建", "江西", "山东", "河南", "湖北", "湖南", "广东", "海南", "四川", "贵州",
+    "云南", "陕西", "甘肃", "青海", "台湾",
+]
+_MUNICIPALITIES = ("北京", "天津", "上海", "重庆")
+_AUTONOMOUS_REGIONS = {
+    "内蒙古自治区": "内蒙古", "广西壮族自治区": "广西", "西藏自治区": "西藏",
+    "宁夏回族自治区": "宁夏", "新疆维吾尔自治区": "新疆",
+    "香港特别行政区": "香港", "澳门特别行政区": "澳门", "内蒙": "内蒙古",
+}
+_CITIES = [
+    "杭州", "宁波", "温州", "绍兴", "嘉兴", "湖州", "金华", "衢州", "舟山", "台州", "丽水",
+    "南京", "苏州", "无锡", "常州", "扬州", "镇江", "南通", "徐州", "广州", "深圳", "珠海",
+    "成都", "西安", "武汉", "长沙", "郑州", "济南", "青岛", "厦门", "福州", "昆明", "大理",
+    "丽江", "桂林", "贵阳", "南宁", "海口", "三亚", "拉萨", "兰州", "西宁", "银川", "乌鲁木齐",
+    "呼和浩特", "哈尔滨", "长春", "沈阳", "大连", "石家庄", "太原", "合肥", "黄山", "南昌",
+    "九江", "洛阳", "开封", "张家界", "北海", "秦皇岛", "承德",
+]
+# 与景区/地标同名的城市（黄山市 ≠ 黄山风景区、北海市 ≠ 北海公园），"X市"保持全称
+_LANDMARK_CITIES = ("黄山", "张家界", "北海")
+_NICKNAMES = {
+    "帝都": "北京", "魔都": "上海", "羊城": "广州", "花城": "广州", "鹏城": "深圳",
+    "蓉城": "成都", "杭城": "杭州", "泉城": "济南", "春城": "昆明", "冰城": "哈尔滨",
+    "江城": "武汉", "星城": "长沙", "鹭岛": "厦门", "榕城": "福州", "山城": "重庆",
+    "雾都": "重庆", "金陵": "南京", "姑苏": "苏州", "古都西安": "西安",
+}
+
+
+def default_synonyms() -> Dict[str, str]:
+    """
+    默认地名同义词表：省/市/自治区全称和常见别称统一为简称
+
+    只有直辖市去掉"市"；与省同名的地级市（如 吉林市）、与景区同名的城市（如 黄山市）保持全称，
+    不能与省（吉林省 → 吉林）或景区（黄山）共用缓存键
+    """
+    synonyms: Dict[str, str] = {}
+    for province in _PROVINCES:
+        if province in _MUNICIPALITIES:
+            synonyms[f"{province}市"] = province
+        else:
+            synonyms[f"{province}省"] = province
+    for city in _CITIES:
+        if city not in _LANDMARK_CITIES:
+            synonyms[f"{city}市"] = city
+    synonyms.update(_AUTONOMOUS_REGIONS)
+    synonyms.update(_NICKNAMES)
+    return synonyms
+
+
+# ==================== 规范化步骤 ====================
+
+_CJK = r"㐀-鿿"
+_SPACE_NEAR_CJK = re.compile(rf"(?<=[{_CJK}])\s+|\s+(?=[{_CJK}])")
+# 比较运算符决定查询条件（海拔>1000 与 海拔<1000 不能共用缓存键），去标点时保留
+_COMPARISON_CHARS = "<>≤≥≠="
+_SPACE_NEAR_OPERATOR = re.compile(rf"\s*([{_COMPARISON_CHARS}]+)\s*")
+_LEVEL_PATTERN = re.compile(r"([1-5])\s*a(?:\s*级(?:别)?)?(?![a-z])")
+_REPEATED_A_PATTERN = re.compile(r"(?<![a-z0-9])(a{2,5})(?:\s*级(?:别)?)?(?![a-z0-9])")
+_STAR_PATTERN = re.compile(r"([1-5])\s*(?:星级|星)")
+
+DEFAULT_LEADING_PHRASES = ("请问一下", "请问", "请帮我", "帮我", "麻烦", "我想知道", "我想了解", "告诉我")
+# 不含"吧"等也会出现在名词结尾的字（如"酒吧"）
+DEFAULT_TRAILING_PARTICLES = "吗呢呀啊哦嘛"
+
+
+def fold_width(text: str) -> str:
+    """全角转半角、兼容字符统一（NFKC），并统一为小写"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def to_simplified(text: str) -> str:
+    """繁体转简体（优先使用 opencc，未安装时使用内置常用字表）"""
+    converter = _get_opencc_converter()
+    if converter:
+        return converter.convert(text)
+    return text.translate(_TRADITIONAL_TO_SIMPLIFIED)
+
+
+def _keep_symbol(text: str, i: int) -> bool:
+    """标点/符号是否属于查询条件：比较运算符（含 !=）、数字间的小数点、数字前的负号/数字间的连字符"""
+    c = text[i]
+    prev_char = text[i - 1] if i > 0 else ""
+    next_char = text[i + 1] if i + 1 < len(text) else ""
+    if c in _COMPARISON_CHARS:
+        return True
+    if c == "!":
+        return next_char == "="
+    if c == ".":
+        return prev_char.isdigit() and next_char.isdigit()
+    if c == "-":
+        return next_char.isdigit()
+    return False
+
+
+def strip_punctuation(text: str) -> str:
+    """去掉标点和符号（保留比较运算符和数字中的 . -），去掉中文和运算符前后的空白，合并其余空白"""
+    chars = [
+        " " if unicodedata.category(c)[0] in ("P", "S") and not _keep_symbol(text, i) else c
+        for i, c in enumerate(text)
+    ]
+    text = "".join(chars)
+    text = _SPACE_NEAR_CJK.sub("", text)
+    text = _SPACE_NEAR_OPERATOR.sub(r"\1", text)
+    return " ".join(text.split())
+
+
+def canonicalize_numerals(text: str) -> str:
+    """计量单位前的中文数字转为阿拉伯数字（如 三个 → 3个、十公里 → 10公里、五a → 5a），"四处"等词语不变"""
+    def _replace(match: "re.Match") -> str:
+        value = chinese_to_int(match.group())
+        return str(value) if value is not None else match.group()
+
+    return re.sub(_CHINESE_NUMBER + _NUMERAL_UNITS, _replace, text)
+
+
+def canonicalize_levels(text: str) -> str:
+    """景区等级统一（5A级/5a/AAAAA/五A → 5a）、星级统一（五星级 → 5星）"""
+    text = _REPEATED_A_PATTERN.sub(lambda m: f"{len(m.group(1))}a", text)
+    text = _LEVEL_PATTERN.sub(r"\1a", text)
+    return _STAR_PATTERN.sub(r"\1星", text)
+
+
+def strip_particles(
+    text: str,
+    leading: Iterable[str] = DEFAULT_LEADING_PHRASES,
+    trailing: str = DEFAULT_TRAILING_PARTICLES,
+) -> str:
+    """去掉句首客套语和句尾语气词"""
+    for phrase in leading:
+        if text.startswith(phrase) and len(text) > len(phrase):
+            text = text[len(phrase):]
+            break
+    stripped = text.rstrip(trailing)
+    return stripped if stripped else text
+
+
+def collapse_whitespace(text: str) -> str:
+    """去掉首尾空白并合并连续空白（与旧版缓存键一致的基础规范化）"""
+    return " ".join(text.lower().strip().split())
+
+
+class QueryNormalizer:
+    """
+    查询规范化流水线
+
+    每个步骤是 str -> str 的函数，按顺序执行；可通过 steps 选择内置步骤或 add_step 追加自定义步骤
+    """
+
+    BUILTIN_STEPS: Dict[str, Callable[[str], str]] = {
+        "width": fold_width,
+        "simplify": to_simplified,
+        "punctuation": strip_punctuation,
+        "numerals": canonicalize_numerals,
+        "levels": canonicalize_levels,
+        "particles": strip_particles,
+    }
+    DEFAULT_STEPS = ("width", "simplify", "punctuation", "numerals", "levels", "synonyms", "particles")
+
+    def __init__(
+        self,
+        steps: Optional[Iterable[str]] = None,
+        synonyms: Optional[Dict[str, str]] = None,
+        synonyms_file: Optional[str] = None,
+    ):
+        """
+        初始化规范化流水线
+
+        Args:
+            steps: 启用的内置步骤名（默认全部）；空列表表示只做基础的大小写/空白规范化
+            synonyms: 同义词表（别称 → 规范名），默认使用内置地名表
+            synonyms_file: 额外的同义词表 JSON 文件（{"别称": "规范名"}），与 synonyms 合并
+        """
+        self.synonyms = dict(default_synonyms() if synonyms is None else synonyms)
+        if synonyms_file:
+            self.synonyms.update(self._load_synonyms_file(synonyms_file))
+        self._folded_synonyms = {fold_width(k): v for k, v in self.synonyms.items()}
+        self._synonym_pattern = self._compile_synonyms(self.synonyms)
+
+        step_names = list(self.DEFAULT_STEPS if steps is None else steps)
+        self.steps: List[Tuple[str, Callable[[str], str]]] = []
+        for name in step_names:
+            if name == "synonyms":
+                self.steps.append((name, self.apply_synonyms))
+            elif name in self.BUILTIN_STEPS:
+                self.steps.append((name, self.BUILTIN_STEPS[name]))
+            else:
+                raise ValueError(f"Unknown query normalization step: {name}")
+
+    @staticmethod
+    def _load_synonyms_file(path: str) -> Dict[str, str]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                synonyms = json.load(f)
+            logger.info(f"Loaded {len(synonyms)} query synonyms from {path}")
+            return synonyms
+        except Exception as e:
+            logger.warning(f"Failed to load query synonyms file {path}: {e}")
+            return {}
+
+    @staticmethod
+    def _compile_synonyms(synonyms: Dict[str, str]) -> Optional["re.Pattern"]:
+        """按长度降序构建单次扫描的正则（长词优先，如 "浙江省" 先于 "浙江"）"""
+        if not synonyms:
+            return None
+        keys = sorted(synonyms, key=len, reverse=True)
+        return re.compile("|".join(re.escape(fold_width(k)) for k in keys))
+
+    def apply_synonyms(self, text: str) -> str:
+        """按同义词表替换别称"""
+        if self._synonym_pattern is None:
+            return text
+        return self._synonym_pattern.sub(lambda m: self._folded_synonyms[m.group()], text)
+
+    def add_step(self, name: str, step: Callable[[str], str]) -> None:
+        """追加自定义规范化步骤"""
+        self.steps.append((name, step))
+
+    def normalize(self, query: str) -> str:
+        """
+        规范化查询文本
+
+        Args:
+            query: 原始查询
+
+        Returns:
+            规范化后的查询（空结果时回退为基础规范化）
+        """
+        text = collapse_whitespace(query)
+        for _, step in self.steps:
+            text = step(text)
+        return text.strip() or collapse_whitespace(query)
+
+    __call__ = normalize
+
+    @property
+    def step_names(self) -> List[str]:
+        return [name for name, _ in self.steps]
+
+
+def measure_hit_ratio(queries: List[str], normalize: Callable[[str], str]) -> Dict[str, float]:
+    """
+    按查询日志顺序回放，统计无限容量缓存下的命中率（某个规范化结果之前出现过即视为命中）
+
+    Args:
+        queries: 查询日志
+        normalize: 规范化函数
+
+    Returns:
+        命中数、命中率、不同缓存键数
+    """
+    seen = set()
+    hits = 0
+    for query in queries:
+        key = normalize(query)
+        if key in seen:
+            hits += 1
+        seen.add(key)
+    return {
+        "queries": len(queries),
+        "hits": hits,
+        "hit_ratio_percent": round(hits / len(queries) * 100, 2) if queries else 0,
+        "distinct_keys": len(seen),
+    }
+
+
+def _load_query_log(path: str) -> List[str]:
+    """读取查询日志：每行一条查询，或 JSON Lines（取 query/query_text 字段）"""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                line = record.get("query") or record.get("query_text") or ""
+            if line:
+                queries.append(line)
+    return queries
+
+
+# 测试代码：python -m core.query_normalizer [查询日志文件]
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) > 1:
+        log = _load_query_log(sys.argv[1])
+    else:
+        log = [
+            "浙江省的5A景区", "浙江的5A级景区", "浙江省的5A景区？", "浙江省的五A景区", "浙江省的AAAAA景区",
+            "浙江省的５Ａ景区", "请问浙江省的5A景区", "浙江省的5A景区呢", "浙江 省 的 5A 景区",
+            "杭州市有哪些4A景区", "杭城有哪些4A景区", "杭州有哪些 4A级 景区?", "杭州有哪些AAAA景区",
+            "北京市的博物馆", "帝都的博物馆", "北京的博物館", "統計雲南省5A景區數量", "统计云南省5a景区数量",
+            "距离西湖十公里内的景点", "距离西湖10公里内的景点", "距離西湖10公里內的景點",
+            "查询三个5A景区", "查询3个5A景区", "广西壮族自治区的5A景区", "广西的5A景区",
+        ]
+
+    baseline = measure_hit_ratio(log, collapse_whitespace)
+    print(f"=== 缓存键命中率（{len(log)} 条查询） ===\n")
+    print(f"{'pipeline':40} {'hit %':>8} {'keys':>6}")
+    print(f"{'baseline (lower + whitespace)':40} {baseline['hit_ratio_percent']:8.2f} {baseline['distinct_keys']:6}")
+
+    # 逐步叠加，观察每个步骤的增益
+    steps: List[str] = []
+    for name in QueryNormalizer.DEFAULT_STEPS:
+        steps.append(name)
+        stats = measure_hit_ratio(log, QueryNormalizer(steps=steps).normalize)
+        print(f"{'+ ' + name:40} {stats['hit_ratio_percent']:8.2f} {stats['distinct_keys']:6}")
+
+    if len(sys.argv) == 1:
+        normalizer = QueryNormalizer()
+        print()
+        for query in log[:8]:
+            print(f"{query:24} -> {normalizer.normalize(query)}")
+
+        # 回归检查：条件不同的查询不能落到同一个缓存键
+        distinct_pairs = [
+            ("海拔>1000米的景区", "海拔<1000米的景区"),
+            ("海拔≥1000米的景区", "海拔≤1000米的景区"),
+            ("门票 != 0 的景区", "门票 = 0 的景区"),
+            ("评分3.5以上的景区", "评分35以上的景区"),
+            ("门票-0的景区", "门票0的景区"),
+            ("黄山市的景区", "黄山的景区"),
+            ("吉林市的景区", "吉林省的景区"),
+        ]
+        for left, right in distinct_pairs:
+            assert normalizer.normalize(left) != normalizer.normalize(right), (left, right)
+        assert normalizer.normalize("海拔 ＞ 1000米") == normalizer.normalize("海拔>1000米")
+        assert normalizer.normalize("四处看看") == "四处看看"
+        print(f"regression checks passed ({len(distinct_pairs)} distinct pairs)")
@@ -0,0 +1,475 @@
+"""
+Schema裁剪模块 - Sight Server
+按查询从 schema 快照中挑选相关的表和字段（关键词、字段名、可选的向量相似度），
+在 token 预算内生成精简 schema，替代 SQL 生成/修复 prompt 中的完整 schema
+"""
+
+import re
+import time
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CJK_CHAR = re.compile(r"[一-鿿]")
+_CJK_RUN = re.compile(r"[一-鿿]+")
+_NAME_TOKEN_SPLIT = re.compile(r"[_\W\d]+")
+
+# 默认必选的核心表（绝大多数景区查询只涉及这两张表）
+DEFAULT_CORE_TABLES: Tuple[str, ...] = ("a_sight", "tourist_spot")
+
+# 字段名片段 → 查询中的关键词（字段名片段同时适用于英文与中文字段名）
+COLUMN_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("level", ("等级", "级别", "5a", "4a", "3a", "2a", "a级", "几a")),
+    ("等级", ("等级", "级别", "5a", "4a", "3a", "2a", "a级", "几a")),
+    ("province", ("省", "自治区")),
+    ("省", ("省", "自治区")),
+    ("city", ("市", "城市")),
+    ("市", ("市", "城市")),
+    ("district", ("区县", "县", "区域")),
+    ("county", ("县",)),
+    ("address", ("地址", "位置", "在哪")),
+    ("地址", ("地址", "位置", "在哪")),
+    ("rating", ("评分", "分数", "评价", "口碑", "好评")),
+    ("score", ("评分", "分数", "评价", "口碑", "好评")),
+    ("评分", ("评分", "分数", "评价", "口碑", "好评")),
+    ("ticket", ("门票", "票价", "价格", "多少钱", "免费", "收费")),
+    ("price", ("门票", "票价", "价格", "多少钱", "免费", "收费")),
+    ("门票", ("门票", "票价", "价格", "多少钱", "免费", "收费")),
+    ("intro", ("介绍", "简介", "特色", "描述", "亮点")),
+    ("desc", ("介绍", "简介", "特色", "描述", "亮点")),
+    ("介绍", ("介绍", "简介", "特色", "描述", "亮点")),
+    ("open", ("开放", "营业", "几点")),
+    ("time", ("开放时间", "营业时间", "几点", "时长", "游玩时间")),
+    ("时间", ("开放时间", "营业时间", "几点", "时长", "游玩时间")),
+    ("season", ("季节", "最佳", "什么时候")),
+    ("lng", ("坐标", "经纬", "经度", "附近", "周边", "周围", "距离", "公里", "千米", "范围内")),
+    ("lat", ("坐标", "经纬", "纬度", "附近", "周边", "周围", "距离", "公里", "千米", "范围内")),
+    ("lon", ("坐标", "经纬", "经度", "附近", "周边", "周围", "距离", "公里", "千米", "范围内")),
+    ("geom", ("坐标", "附近", "周边", "周围", "距离", "公里", "千米", "范围内", "地图")),
+    ("坐标", ("坐标", "经纬", "附近", "周边", "周围", "距离", "公里", "千米")),
+    ("phone", ("电话", "联系")),
+    ("tel", ("电话", "联系")),
+    ("type", ("类型", "类别", "种类")),
+    ("类型", ("类型", "类别", "种类")),
+    ("image", ("图片", "照片")),
+    ("photo", ("图片", "照片")),
+    ("url", ("网址", "官网", "链接")),
+    ("en", ("英文",)),
+]
+
+# 表名片段 → 查询中的关键词（非核心表只有命中时才进入 prompt）
+TABLE_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("sight", ("景区", "景点")),
+    ("spot", ("景区", "景点", "旅游")),
+    ("region", ("行政区", "地区", "区划")),
+    ("province", ("省份", "各省")),
+    ("city", ("城市", "各市")),
+    ("hotel", ("酒店", "住宿", "宾馆")),
+    ("restaurant", ("餐厅", "美食", "吃")),
+    ("food", ("美食", "小吃")),
+    ("weather", ("天气", "气温")),
+    ("route", ("路线", "线路")),
+    ("traffic", ("交通",)),
+    ("transport", ("交通",)),
+    ("review", ("评论", "评价")),
+    ("visitor", ("客流", "游客")),
+]
+
+# 字段名中不参与双字匹配的常见前缀
+_COLUMN_NAME_STOPWORDS = ("所属", "是否", "名称")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数（中文约 1 字 1 token，其他字符约 4 字符 1 token）
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的 token 数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_CHAR.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _bigrams(text: str) -> set:
+    grams = set()
+    for run in _CJK_RUN.findall(text):
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def _fragment_in(fragment: str, name: str) -> bool:
+    """中文片段按子串匹配；英文片段按单词匹配（3 个字符以内须完全相等，避免 lat 命中 template）"""
+    if _CJK_CHAR.search(fragment):
+        return fragment in name
+    for token in _NAME_TOKEN_SPLIT.split(name):
+        if token == fragment or (len(fragment) > 3 and token.startswith(fragment)):
+            return True
+    return False
+
+
+def _column_line(col: Dict[str, Any]) -> str:
+    """与 SchemaFetcher.format_schema_for_llm 的字段行格式一致，用于预算估算"""
+    col_type = str(col.get("type", ""))
+    if col.get("max_length"):
+        col_type += f"({col['max_length']})"
+    nullable = "NULL" if col.get("nullable") else "NOT NULL"
+    pk_mark = " [PK]" if col.get("is_primary_key") else ""
+    return f"    - {col.get('name')}: {col_type} {nullable}{pk_mark}"
+
+
+class SchemaSelector:
+    """
+    Schema相关性选择器
+
+    - 必选: 核心表；每张入选表的主键、外键、name 列、空间列（连接与坐标输出必需）
+    - 相关: 字段名直接出现在查询中、字段关键词命中、中文字段名双字重合、向量相似度超过阈值
+    - 补充: 预算有余时按原顺序补充核心表的其余字段；非核心表只保留必选与相关字段
+    - 超预算: 先整表去掉得分最低的非核心表，再去掉得分最低的相关字段（必选字段不去掉）
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 800,
+        core_tables: Sequence[str] = DEFAULT_CORE_TABLES,
+        table_threshold: float = 0.5,
+        embedding_service: Optional[Any] = None,
+        embedding_threshold: float = 0.45,
+    ):
+        """
+        初始化Schema选择器
+
+        Args:
+            token_budget: 精简 schema 的 token 预算（估算值）
+            core_tables: 始终保留的核心表
+            table_threshold: 非核心表入选的最低得分
+            embedding_service: EmbeddingService 实例或返回它的无参函数（可选，模型懒加载时使用后者），
+                提供查询与字段描述的向量相似度
+            embedding_threshold: 向量相似度计为相关的最低值
+        """
+        self.token_budget = token_budget
+        self.core_tables = tuple(core_tables)
+        self.table_threshold = table_threshold
+        self.embedding_service = embedding_service
+        self.embedding_threshold = embedding_threshold
+        self._descriptor_vectors: Dict[str, Any] = {}
+        self._name_keywords: Dict[Tuple[str, bool], List[Tuple[str, ...]]] = {}
+
+        self.selections = 0
+        self.tokens_full = 0
+        self.tokens_selected = 0
+        self.select_ms = 0.0
+
+    # ==================== 评分 ====================
+
+    def _keyword_score(self, name: str, query: str, table: bool = False) -> Tuple[float, str]:
+        """名称直接命中 1.0，关键词命中 0.8，中文名称双字重合按比例最高 0.8"""
+        lowered = name.lower()
+        if len(lowered) >= 2 and lowered in query:
+            return 1.0, "name"
+
+        # 名称对应的关键词组与查询无关，按名称缓存
+        groups = self._name_keywords.get((lowered, table))
+        if groups is None:
+            groups = [keywords for fragment, keywords in (TABLE_KEYWORDS if table else COLUMN_KEYWORDS)
+                      if _fragment_in(fragment, lowered)]
+            self._name_keywords[(lowered, table)] = groups
+        for keywords in groups:
+            for keyword in keywords:
+                if keyword in query:
+                    return 0.8, f"keyword:{keyword}"
+
+        stripped = lowered
+        for stopword in _COLUMN_NAME_STOPWORDS:
+            stripped = stripped.replace(stopword, "")
+        grams = _bigrams(stripped)
+        if grams:
+            overlap = len(grams & _bigrams(query)) / len(grams)
+            if overlap > 0:
+                return round(0.8 * overlap, 3), "bigram"
+        return 0.0, ""
+
+    def _embedding_score(self, query_vector: Any, descriptor: str) -> float:
+        vector = self._descriptor_vectors.get(descriptor)
+        if vector is None:
+            vector = self._get_embedding_service().embed(descriptor)
+            self._descriptor_vectors[descriptor] = vector
+        return float((query_vector.astype("float32") * vector.astype("float32")).sum())
+
+    def _get_embedding_service(self) -> Optional[Any]:
+        service = self.embedding_service
+        if service is not None and not hasattr(service, "embed") and callable(service):
+            service = service()
+        return service
+
+    @staticmethod
+    def _descriptor(table: str, column: Optional[str] = None) -> str:
+        """向量描述文本：名称 + 关键词表中的中文含义，方便多语言模型对齐"""
+        name = column or table
+        lowered = name.lower()
+        hints = []
+        for fragment, keywords in (COLUMN_KEYWORDS if column else TABLE_KEYWORDS):
+            if _fragment_in(fragment, lowered):
+                hints.extend(keywords[:2])
+        text = f"{table}.{column}" if column else table
+        return f"{text} {' '.join(dict.fromkeys(hints))}".strip()
+
+    @staticmethod
+    def _required_columns(table_info: Dict[str, Any]) -> set:
+        required = set(table_info.get("primary_keys") or [])
+        required.update(fk.get("column") for fk in table_info.get("foreign_keys") or [])
+        if table_info.get("spatial_column"):
+            required.add(table_info["spatial_column"])
+        for col in table_info.get("columns") or []:
+            if col.get("name") == "name":
+                required.add("name")
+        return required
+
+    # ==================== 选择 ====================
+
+    def select(self, query: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        为查询选择相关的表和字段
+
+        Args:
+            query: 用户查询
+            schema: SchemaFetcher.fetch_schema 返回的 schema 快照
+
+        Returns:
+            {"schema": 精简后的 schema（结构与输入一致）, "tables": {表: [字段]},
+             "dropped_tables", "columns_total", "columns_kept", "matches",
+             "estimated_tokens", "token_budget", "over_budget", "elapsed_ms"}
+        """
+        start = time.perf_counter()
+        query_text = (query or "").lower()
+        tables: Dict[str, Any] = schema.get("tables") or {}
+
+        query_vector = None
+        embedder = self._get_embedding_service()
+        if embedder is not None and query_text:
+            try:
+                query_vector = embedder.embed(query)
+            except Exception as e:
+                logger.warning(f"Schema selector embedding failed, using keywords only: {e}")
+
+        table_scores: Dict[str, float] = {}
+        column_scores: Dict[str, Dict[str, float]] = {}
+        matches: Dict[str, str] = {}
+        for table, info in tables.items():
+            scores: Dict[str, float] = {}
+            for col in info.get("columns") or []:
+                name = col.get("name", "")
+                score, reason = self._keyword_score(name, query_text)
+                if query_vector is not None:
+                    similarity = self._embedding_score(query_vector, self._descriptor(table, name))
+                    if similarity >= self.embedding_threshold and similarity > score:
+                        score, reason = round(similarity, 3), "embedding"
+                if score > 0:
+                    scores[name] = score
+                    matches[f"{table}.{name}"] = reason
+            column_scores[table] = scores
+
+            table_score, reason = self._keyword_score(table, query_text, table=True)
+            if query_vector is not None:
+                similarity = self._embedding_score(query_vector, self._descriptor(table))
+                if similarity >= self.embedding_threshold and similarity > table_score:
+                    table_score, reason = round(similarity, 3), "embedding"
+            if reason:
+                matches[table] = reason
+            best_column = max(scores.values(), default=0.0)
+            table_scores[table] = max(table_score, 0.6 * best_column)
+
+        selected = [t for t in tables if t in self.core_tables or table_scores[t] >= self.table_threshold]
+        if not selected:
+            # 既无核心表也无命中的表，保留完整 schema
+            selected = list(tables)
+
+        # 必选 + 相关字段
+        kept: Dict[str, set] = {}
+        for table in selected:
+            info = tables[table]
+            required = self._required_columns(info)
+            kept[table] = required | set(column_scores[table])
+
+        # 按行预估 token，预算检查只需求和
+        line_tokens = {
+            (table, col.get("name")): estimate_tokens(_column_line(col)) + 1
+            for table in selected for col in tables[table].get("columns") or []
+        }
+
+        def cost(table_set: Dict[str, set]) -> int:
+            return sum(estimate_tokens(f"表名: {table}") + 1
+                       + sum(line_tokens.get((table, name), 0) for name in names)
+                       for table, names in table_set.items())
+
+        # 超预算：先去掉非核心表，再去掉得分最低的相关字段
+        for table in sorted((t for t in selected if t not in self.core_tables), key=lambda t: table_scores[t]):
+            if cost(kept) <= self.token_budget:
+                break
+            del kept[table]
+        if cost(kept) > self.token_budget:
+            optional = sorted(
+                ((score, table, name) for table in kept for name, score in column_scores[table].items()
+                 if name not in self._required_columns(tables[table])),
+            )
+            for _, table, name in optional:
+                if cost(kept) <= self.token_budget:
+                    break
+                kept[table].discard(name)
+
+        # 预算有余：按原顺序补充核心表的其余字段
+        for table in sorted(kept, key=lambda t: -table_scores[t]):
+            if table not in self.core_tables:
+                continue
+            for col in tables[table].get("columns") or []:
+                name = col.get("name")
+                if name in kept[table]:
+                    continue
+                kept[table].add(name)
+                if cost(kept) > self.token_budget:
+                    kept[table].discard(name)
+                    break
+
+        pruned_tables = {}
+        for table in tables:
+            if table not in kept:
+                continue
+            info = dict(tables[table])
+            info["columns"] = [col for col in info.get("columns") or [] if col.get("name") in kept[table]]
+            info["foreign_keys"] = [fk for fk in info.get("foreign_keys") or []
+                                    if fk.get("references_table") in kept]
+            pruned_tables[table] = info
+
+        pruned = {key: value for key, value in schema.items() if key not in ("tables", "spatial_tables")}
+        pruned["tables"] = pruned_tables
+        pruned["spatial_tables"] = {t: v for t, v in (schema.get("spatial_tables") or {}).items()
+                                    if t in pruned_tables}
+
+        estimated = cost(kept)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.selections += 1
+        self.select_ms += elapsed_ms
+
+        return {
+            "schema": pruned,
+            "tables": {t: [c["name"] for c in info["columns"]] for t, info in pruned_tables.items()},
+            "dropped_tables": [t for t in tables if t not in pruned_tables],
+            "columns_total": sum(len(info.get("columns") or []) for info in tables.values()),
+            "columns_kept": sum(len(info["columns"]) for info in pruned_tables.values()),
+            "matches": matches,
+            "estimated_tokens": estimated,
+            "token_budget": self.token_budget,
+            "over_budget": estimated > self.token_budget,
+            "elapsed_ms": round(elapsed_ms, 3),
+        }
+
+    def record(self, full_tokens: int, selected_tokens: int) -> None:
+        """
+        记录一次裁剪前后的 prompt schema token 数（用于统计）
+
+        Args:
+            full_tokens: 完整 schema 的 token 数
+            selected_tokens: 精简 schema 的 token 数
+        """
+        self.tokens_full += full_tokens
+        self.tokens_selected += selected_tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取运行统计
+
+        Returns:
+            选择次数、平均耗时、裁剪前后的平均 schema token 数
+        """
+        n = self.selections
+        return {
+            "selections": n,
+            "token_budget": self.token_budget,
+            "embedding_enabled": self._get_embedding_service() is not None,
+            "avg_select_ms": round(self.select_ms / n, 3) if n else 0,
+            "avg_schema_tokens_full": round(self.tokens_full / n, 1) if n else 0,
+            "avg_schema_tokens_selected": round(self.tokens_selected / n, 1) if n else 0,
+            "token_reduction_percent": (
+                round((1 - self.tokens_selected / self.tokens_full) * 100, 2) if self.tokens_full else 0),
+        }
+
+
+# 测试代码
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    def col(name, type_="character varying", pk=False, max_length=None):
+        return {"name": name, "type": type_, "nullable": not pk, "is_primary_key": pk, "max_length": max_length}
+
+    def format_schema(schema: Dict[str, Any]) -> str:
+        lines = []
+        for table, info in schema["tables"].items():
+            lines.append(f"表名: {table}")
+            lines.append("  字段:")
+            lines.extend(_column_line(c) for c in info["columns"])
+            if info.get("spatial_column"):
+                lines.append(f"  空间列: {info['spatial_column']} (POINT, SRID=4326)")
+            lines.append("")
+        return "\n".join(lines)
+
+    sample_schema = {
+        "tables": {
+            "a_sight": {
+                "columns": [col("gid", "integer", pk=True), col("name", max_length=100), col("level", max_length=10),
+                            col("所属省份"), col("所属城市"), col("所属区县"), col("地址"),
+                            col("lng_wgs84", "double precision"), col("lat_wgs84", "double precision"),
+                            col("geom", "geometry")],
+                "primary_keys": ["gid"], "foreign_keys": [], "spatial_column": "geom",
+            },
+            "tourist_spot": {
+                "columns": [col("id", "integer", pk=True), col("name", max_length=200), col("评分"), col("门票"),
+                            col("开放时间"), col("建议游玩时间"), col("建议季节"), col("介绍", "text"),
+                            col("小贴士", "text"), col("地址"), col("电话"), col("链接"), col("图片链接")],
+                "primary_keys": ["id"], "foreign_keys": [],
+            },
+            "b_region": {
+                "columns": [col("gid", "integer", pk=True), col("province"), col("city"), col("district"),
+                            col("adcode"), col("geom", "geometry")],
+                "primary_keys": ["gid"], "foreign_keys": [], "spatial_column": "geom",
+            },
+            "hotel_info": {
+                "columns": [col("id", "integer", pk=True), col("name"), col("star", "integer"), col("price", "numeric"),
+                            col("address"), col("phone"), col("sight_id", "integer")],
+                "primary_keys": ["id"],
+                "foreign_keys": [{"column": "sight_id", "references_table": "a_sight", "references_column": "gid"}],
+            },
+            "query_log": {
+                "columns": [col("id", "integer", pk=True), col("query_text", "text"), col("sql_text", "text"),
+                            col("status"), col("created_at", "timestamp"), col("duration_ms", "integer")],
+                "primary_keys": ["id"], "foreign_keys": [],
+            },
+            "sql_patterns": {
+                "columns": [col("id", "integer", pk=True), col("query_template", "text"), col("sql_template", "text"),
+                            col("success_count", "integer"), col("updated_at", "timestamp")],
+                "primary_keys": ["id"], "foreign_keys": [],
+            },
+        },
+        "spatial_tables": {"a_sight": {}, "b_region": {}},
+    }
+
+    full_text = format_schema(sample_schema)
+    full_tokens = estimate_tokens(full_text)
+    print(f"完整 schema: {len(sample_schema['tables'])} 张表, ≈{full_tokens} tokens\n")
+
+    for budget in (800, 150):
+        selector = SchemaSelector(token_budget=budget)
+        print(f"--- token_budget={budget} ---")
+        for query in ["查询浙江省的5A景区", "西湖的门票和开放时间", "杭州西湖附近5公里的景区",
+                      "黄山附近有哪些酒店", "统计各省份5A景区数量"]:
+            selection = selector.select(query, sample_schema)
+            text = format_schema(selection["schema"])
+            selector.record(full_tokens, estimate_tokens(text))
+            print(f"{query}: {list(selection['tables'])} "
+                  f"columns {selection['columns_kept']}/{selection['columns_total']}, "
+                  f"≈{estimate_tokens(text)} tokens, {selection['elapsed_ms']}ms")
+        print(f"{selector.get_stats()}\n")
@@ -49,6 +49,15 @@ class QueryIntentAnalysis(BaseModel):
     )
 
 
+class FusedIntentSQL(QueryIntentAnalysis):
+    """LLM 单次调用返回的意图分析 + SQL（意图/SQL 融合模式的结构化输出）"""
+
+    sql: str = Field(
+        default="",
+        description="按识别出的意图生成的 SQL 语句"
+    )
+
+
 class QueryResult(BaseModel):
     """SQL查询结果的标准输出格式"""
     status: str = Field(
@@ -78,6 +87,22 @@ class QueryResult(BaseModel):
         default=None,
         description="查询意图分析信息，包含 intent_type, is_spatial, keywords_matched 等"
     )
+    error_type: Optional[str] = Field(
+        default=None,
+        description="失败时的错误分类（来自错误处理器，如 SQL_SYNTAX_ERROR、FIELD_ERROR）"
+    )
+    retry_count: Optional[int] = Field(
+        default=None,
+        description="失败前经历的重试轮数"
+    )
+    retries_exhausted: Optional[bool] = Field(
+        default=None,
+        description="失败时重试是否已用尽（SQL执行重试或总重试达到上限，而非截止时间/LLM预算中止）"
+    )
+    llm_usage: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="本次查询的LLM用量：prompt/completion token、耗时、按节点汇总及预算状态"
+    )
 
 
 # ==================== LangGraph 状态模型 ====================
@@ -103,6 +128,9 @@ class AgentState(TypedDict):
     # ==================== 数据库Schema ====================
     database_schema: Optional[Dict[str, Any]]  # 数据库schema信息（表结构、字段等）
     schema_fetched: bool  # schema是否已获取
+    formatted_schema: Optional[str]  # 完整的格式化schema（按错误修复SQL时使用）
+    pruned_schema: Optional[str]  # 按查询裁剪后的格式化schema（SQL生成prompt使用）
+    schema_selection: Optional[Dict[str, Any]]  # schema裁剪结果（入选的表/字段、token数）
 
     # ==================== 多步查询累积 ====================
     # 使用 Annotated[List, add] 实现历史累加
@@ -148,6 +176,7 @@ class AgentState(TypedDict):
     query_id: str  # ✅ 唯一查询ID（UUID，用于日志追踪）
     query_start_time: str  # ✅ 查询开始时间（ISO格式）
     node_execution_logs: Annotated[List[Dict[str, Any]], add]  # ✅ 节点执行日志
+    llm_budget_exhausted: bool  # ✅ 本次查询的LLM token/耗时预算是否已用完（跳过可选的LLM节点）
 
     # ==================== Memory 机制 ====================
     # 短期记忆：当前会话的查询历史
@@ -182,7 +211,11 @@ class AgentState(TypedDict):
     analysis: Optional[str]  # 深度分析内容
     insights: Optional[List[str]]  # 关键洞察列表
     suggestions: Optional[List[str]]  # 相关建议列表
-    analysis_type: Optional[str]  # 分析类型（statistical/spatial/trend）
+    analysis_type: Optional[str]  # 分析类型（statistical/spatial/trend/template）
+    want_insights: bool  # ✅ 客户端要求深度分析（答案始终经过LLM，不使用模板回答）
+    fused_answer_ready: bool  # ✅ validate_and_answer 已在验证的同一次LLM调用中生成最终回答
+    deadline: Optional[float]  # ✅ 请求截止时间（Unix 时间戳，AGENT_MAX_EXECUTION_TIME），None 表示不限制
+    deadline_exceeded: bool  # ✅ 已超过截止时间（条件边直接转到答案生成，返回部分结果）
 
     # ==================== 最终输出 ====================
     final_data: Optional[List[Dict[str, Any]]]  # 最终合并的数据
@@ -266,6 +299,37 @@ class ValidationResult(BaseModel):
         )
 
 
+class ValidatedAnswer(BaseModel):
+    """LLM 单次调用返回的验证结论 + 最终回答（验证与回答融合节点的结构化输出）"""
+
+    validation_passed: bool = Field(
+        description="查询结果是否满足用户需求"
+    )
+
+    confidence: float = Field(
+        ge=0.0, le=1.0,
+        description="验证结论的置信度 (0-1之间的浮点数)"
+    )
+
+    reason: str = Field(
+        description="验证结论的简要原因"
+    )
+
+    improvement_hint: str = Field(
+        default="",
+        description="验证未通过时修改SQL的具体建议（缺少的过滤条件、字段或聚合方式等）"
+    )
+
+    answer: str = Field(
+        description="基于查询结果的面向用户的最终回答"
+    )
+
+    insights: List[str] = Field(
+        default_factory=list,
+        description="1-3 条关键洞察（可选）"
+    )
+
+
 # ==================== 测试代码 ====================
 
 if __name__ == "__main__":
@@ -294,6 +358,9 @@ if __name__ == "__main__":
         # 数据库Schema字段
         "database_schema": None,
         "schema_fetched": False,
+        "formatted_schema": None,
+        "pruned_schema": None,
+        "schema_selection": None,
         "sql_history": [],
         "execution_results": [],
         "thought_chain": [],
@@ -315,6 +382,7 @@ if __name__ == "__main__":
         "query_id": "test-query-123",
         "query_start_time": "2025-10-04T00:00:00",
         "node_execution_logs": [],
+        "llm_budget_exhausted": False,
         "intent_info": None,
         # Memory 机制字段
         "session_history": [],
@@ -338,6 +406,10 @@ if __name__ == "__main__":
         "insights": None,
         "suggestions": None,
         "analysis_type": None,
+        "want_insights": False,
+        "fused_answer_ready": False,
+        "deadline": None,
+        "deadline_exceeded": False,
         # 最终输出字段
         "final_data": None,
         "answer": "",
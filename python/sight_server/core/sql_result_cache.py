@@ -0,0 +1,359 @@
+"""
+SQL结果缓存模块 - Sight Server
+按规范化 SQL 指纹缓存执行结果，使不同自然语言表述生成的相同 SQL 共享一次数据库执行
+"""
+
+import re
+import copy
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .cache_invalidation import extract_sql_tables
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<string>'(?:[^']|'')*')          # 字符串常量（保留原样）
+    |(?P<quoted>"(?:[^"]|"")*")         # 带引号的标识符（大小写敏感，保留原样）
+    |(?P<number>\d+(?:\.\d+)?)
+    |(?P<word>[A-Za-z_][\w$]*)
+    |(?P<op>::|<=|>=|<>|!=|\|\||->>|->|[^\s\w])
+    """,
+    re.VERBOSE
+)
+_COMMENT_PATTERN = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+
+# 表引用之后出现这些关键字时说明没有别名
+_CLAUSE_KEYWORDS = {
+    "where", "group", "order", "limit", "offset", "having", "on", "using",
+    "join", "left", "right", "inner", "outer", "cross", "full", "natural",
+    "union", "intersect", "except", "window", "fetch", "for", "lateral",
+    "tablesample", "select", "returning", "set",
+}
+
+
+def _tokenize(sql: str) -> List[str]:
+    """切分 SQL，未加引号的关键字和标识符统一为小写"""
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(_COMMENT_PATTERN.sub(" ", sql)):
+        kind = match.lastgroup
+        token = match.group()
+        tokens.append(token.lower() if kind == "word" else token)
+    return tokens
+
+
+def _canonicalize_table_aliases(tokens: List[str]) -> List[str]:
+    """
+    将表别名替换为按出现顺序编号的规范名（t1、t2...），并去掉可选的 AS
+
+    只引用一张表时别名是多余的，直接去掉别名及其限定前缀；
+    列别名（SELECT 列表中的 AS）决定结果字段名，保持不变
+    """
+    aliases: Dict[str, str] = {}
+    alias_positions: List[int] = []
+    table_count = 0
+    result: List[str] = []
+    i = 0
+    expect_table = False
+    while i < len(tokens):
+        token = tokens[i]
+        result.append(token)
+        i += 1
+
+        if token in ("from", "join"):
+            expect_table = True
+            continue
+        if not expect_table:
+            continue
+        expect_table = False
+
+        # 子查询 / 函数调用作为表时不处理别名
+        if token == "(" or (i < len(tokens) and tokens[i] == "("):
+            table_count += 2
+            continue
+        table_count += 1
+        # 模式限定名 schema.table
+        while i + 1 < len(tokens) and tokens[i] == ".":
+            result.extend(tokens[i:i + 2])
+            i += 2
+
+        has_as = i < len(tokens) and tokens[i] == "as"
+        alias_pos = i + 1 if has_as else i
+        if alias_pos < len(tokens):
+            alias = tokens[alias_pos]
+            if re.match(r'[a-z_]', alias) and alias not in _CLAUSE_KEYWORDS:
+                aliases.setdefault(alias, f"t{len(aliases) + 1}")
+                alias_positions.append(len(result))
+                result.append(aliases[alias])
+                i = alias_pos + 1
+        # FROM a, b 形式的逗号表列表
+        if i < len(tokens) and tokens[i] == ",":
+            result.append(",")
+            i += 1
+            expect_table = True
+
+    if not aliases:
+        return result
+
+    single_table = table_count == 1
+    skip = set(alias_positions) if single_table else set()
+
+    # 替换别名引用（alias.column）；单表时去掉限定前缀
+    normalized = []
+    idx = 0
+    while idx < len(result):
+        token = result[idx]
+        if idx in skip:
+            idx += 1
+            continue
+        if token in aliases and idx + 1 < len(result) and result[idx + 1] == ".":
+            if single_table:
+                idx += 2
+                continue
+            normalized.append(aliases[token])
+        else:
+            normalized.append(token)
+        idx += 1
+    return normalized
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    规范化 SQL 文本：去掉注释和多余空白、关键字/标识符小写、表别名规范化、去掉末尾分号
+
+    Args:
+        sql: 原始 SQL
+
+    Returns:
+        规范化后的 SQL
+    """
+    tokens = _tokenize(sql)
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return " ".join(_canonicalize_table_aliases(tokens))
+
+
+def fingerprint_sql(sql: str) -> str:
+    """
+    计算 SQL 指纹（规范化 SQL 的 SHA1）
+
+    Args:
+        sql: 原始 SQL
+
+    Returns:
+        十六进制指纹
+    """
+    return hashlib.sha1(normalize_sql(sql).encode("utf-8")).hexdigest()
+
+
+def is_read_only_sql(sql: str) -> bool:
+    """判断是否为只读查询（仅缓存 SELECT / WITH ... SELECT）"""
+    tokens = _tokenize(sql)
+    if not tokens or tokens[0] not in ("select", "with"):
+        return False
+    return not any(t in ("insert", "update", "delete", "into") for t in tokens)
+
+
+class SqlResultCache:
+    """
+    SQL结果缓存（进程内）
+
+    - 键: 规范化 SQL 指纹
+    - 淘汰: LRU + 独立 TTL + 条目数上限，超过行数上限的结果不缓存
+    - 失效: 记录结果依赖的数据表，可按表失效
+    """
+
+    def __init__(
+        self,
+        ttl: int = 600,
+        max_entries: int = 500,
+        max_rows: int = 5000,
+    ):
+        """
+        初始化SQL结果缓存
+
+        Args:
+            ttl: 缓存生存时间（秒）
+            max_entries: 最大缓存条目数
+            max_rows: 可缓存结果的最大行数
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._table_index: Dict[str, Set[str]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.saved_ms = 0.0
+
+    def get(self, sql: str) -> Optional[Dict[str, Any]]:
+        """
+        查找 SQL 的缓存结果
+
+        Args:
+            sql: 待执行的 SQL
+
+        Returns:
+            执行结果副本，未命中返回 None
+        """
+        if not is_read_only_sql(sql):
+            return None
+        fingerprint = fingerprint_sql(sql)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry["expires_at"] <= time.time():
+                self._remove(fingerprint)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(fingerprint)
+            entry["hits"] += 1
+            self.hits += 1
+            self.saved_ms += entry["duration_ms"]
+            result = entry["result"]
+        return copy.deepcopy(result)
+
+    def put(self, sql: str, result: Dict[str, Any], duration_ms: float = 0.0) -> bool:
+        """
+        缓存执行成功的只读查询结果
+
+        Args:
+            sql: 已执行的 SQL
+            result: 执行结果
+            duration_ms: 本次执行耗时（用于统计节省的时间）
+
+        Returns:
+            是否已缓存
+        """
+        if result.get("status") != "success" or not is_read_only_sql(sql):
+            return False
+        if (result.get("count") or 0) > self.max_rows:
+            return False
+
+        fingerprint = fingerprint_sql(sql)
+        tables = extract_sql_tables(sql)
+        stored = {k: v for k, v in result.items() if k != "raw_result"}
+        with self._lock:
+            self._remove(fingerprint)
+            self._entries[fingerprint] = {
+                "result": copy.deepcopy(stored),
+                "tables": tables,
+                "expires_at": time.time() + self.ttl,
+                "duration_ms": duration_ms,
+                "hits": 0,
+            }
+            for table in tables:
+                self._table_index.setdefault(table, set()).add(fingerprint)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                oldest, _ = next(iter(self._entries.items()))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def _remove(self, fingerprint: str) -> None:
+        """移除条目（调用方需持有锁）"""
+        entry = self._entries.pop(fingerprint, None)
+        if entry is None:
+            return
+        for table in entry["tables"]:
+            keys = self._table_index.get(table)
+            if keys is not None:
+                keys.discard(fingerprint)
+                if not keys:
+                    del self._table_index[table]
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        失效依赖指定数据表的缓存条目
+
+        Args:
+            tables: 发生变更的表名
+
+        Returns:
+            失效的条目数量
+        """
+        with self._lock:
+            fingerprints = set()
+            for table in tables:
+                fingerprints.update(self._table_index.get(table, ()))
+            for fingerprint in fingerprints:
+                self._remove(fingerprint)
+            self.invalidations += len(fingerprints)
+        return len(fingerprints)
+
+    def clear(self) -> int:
+        """清空缓存"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._table_index.clear()
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            命中率、条目数、淘汰/过期/失效次数、节省的执行时间等
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate_percent": round(self.hits / total * 100, 2) if total else 0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "saved_execution_ms": round(self.saved_ms, 2),
+        }
+
+
+# 测试代码
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    print("=== SQL 指纹规范化 ===\n")
+    variants = [
+        "SELECT name, level FROM a_sight WHERE province = '浙江省' AND level = '5A'",
+        "select name,level\n  from A_SIGHT\n where province='浙江省' and level='5A';",
+        "SELECT s.name, s.level FROM a_sight s WHERE s.province = '浙江省' AND s.level = '5A'",
+        "SELECT x.name, x.level FROM a_sight AS x WHERE x.province = '浙江省' AND x.level = '5A' -- 5A景区",
+    ]
+    for sql in variants:
+        print(f"{fingerprint_sql(sql)[:12]}  {normalize_sql(sql)}")
+
+    different = "SELECT name, level FROM a_sight WHERE province = '浙江省' AND level = '4A'"
+    assert len({fingerprint_sql(sql) for sql in variants}) == 1
+    joined = [
+        "SELECT s.name FROM a_sight s JOIN tourist_spot t ON s.name = t.name",
+        "SELECT a.name FROM a_sight AS a JOIN tourist_spot AS b ON a.name = b.name",
+    ]
+    print(f"{fingerprint_sql(joined[0])[:12]}  {normalize_sql(joined[0])}")
+    assert fingerprint_sql(joined[0]) == fingerprint_sql(joined[1])
+    assert fingerprint_sql(different) != fingerprint_sql(variants[0])
+
+    cache = SqlResultCache(ttl=60, max_entries=2)
+    cache.put(variants[2], {"status": "success", "data": [{"name": "西湖"}], "count": 1}, duration_ms=120)
+    print(f"\nhit with alias variant: {cache.get(variants[3]) is not None}")
+    print(f"invalidated: {cache.invalidate_tables(['a_sight'])}")
+    print(cache.get_stats())
@@ -0,0 +1,462 @@
+"""
+查询链路追踪模块 - Sight Server
+为每个查询记录带父子关系的计时 span（图节点、LLM 调用、数据库查询等），
+最近的查询保存在环形缓冲区中，可渲染为瀑布图或导出为 OpenTelemetry 兼容的 JSON
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "sight-server"
+
+# 当前查询的追踪记录与当前 span（LangGraph / 线程池复制上下文后，子线程中的 span 仍挂在正确的父节点下）
+_current_trace: contextvars.ContextVar[Optional["QueryTrace"]] = contextvars.ContextVar(
+    "query_trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "trace_span", default=None)
+
+
+class Span:
+    """
+    一个计时区间
+
+    start_ns / end_ns 为 Unix 纳秒时间戳（用于导出），耗时按 perf_counter 计算
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.thread = threading.current_thread().name
+        self._start = time.perf_counter()
+        self._duration_ms: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """设置单个属性（None 忽略）"""
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        """批量设置属性（None 忽略）"""
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def set_error(self, error: Any) -> None:
+        """标记为失败"""
+        self.status = "error"
+        self.error = str(error)
+
+    def end(self) -> None:
+        """结束计时（重复调用无效）"""
+        if self.end_ns is None:
+            self._duration_ms = (time.perf_counter() - self._start) * 1000
+            self.end_ns = self.start_ns + int(self._duration_ms * 1_000_000)
+
+    @property
+    def duration_ms(self) -> float:
+        """耗时（毫秒），未结束时为当前已耗时"""
+        if self._duration_ms is not None:
+            return self._duration_ms
+        return (time.perf_counter() - self._start) * 1000
+
+
+class _NoopSpan:
+    """未在追踪范围内时返回的空 span，调用方无需判空"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def set_error(self, error: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class QueryTrace:
+    """
+    单个查询的全部 span（线程安全，并行节点共享同一实例）
+    """
+
+    def __init__(self, query_id: str, max_spans: int = 500, **attributes: Any):
+        """
+        初始化查询追踪
+
+        Args:
+            query_id: 查询ID
+            max_spans: 单个查询最多保留的 span 数（超出后丢弃并计数）
+            **attributes: 根 span 的属性（如 query、conversation_id）
+        """
+        self.query_id = query_id
+        self.trace_id = uuid.uuid4().hex
+        self.max_spans = max_spans
+        self.dropped = 0
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self.root = Span("query", self.trace_id, None, {"query_id": query_id, **attributes})
+        self.spans.append(self.root)
+
+    def add(self, span: Span) -> None:
+        """追加 span"""
+        with self._lock:
+            if len(self.spans) >= self.max_spans:
+                self.dropped += 1
+                return
+            self.spans.append(span)
+
+    @property
+    def finished(self) -> bool:
+        return self.root.end_ns is not None
+
+    def summary(self) -> Dict[str, Any]:
+        """查询级概要（用于最近查询列表）"""
+        return {
+            "query_id": self.query_id,
+            "trace_id": self.trace_id,
+            "query": self.root.attributes.get("query"),
+            "started_at": self.root.start_ns / 1e9,
+            "duration_ms": round(self.root.duration_ms, 2),
+            "status": self.root.status if self.finished else "running",
+            "span_count": len(self.spans),
+        }
+
+    def waterfall(self) -> Dict[str, Any]:
+        """
+        渲染瀑布图数据
+
+        Returns:
+            查询概要 + 按开始时间排序的 span 列表（offset_ms 为相对查询开始的偏移，depth 为嵌套层级）
+            + 按 span 名称汇总的耗时
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+            dropped = self.dropped
+        depths: Dict[str, int] = {}
+        rows: List[Dict[str, Any]] = []
+        by_name: Dict[str, Dict[str, Any]] = {}
+        for span in spans:
+            depth = depths.get(span.parent_id, -1) + 1 if span.parent_id else 0
+            depths[span.span_id] = depth
+            duration = round(span.duration_ms, 2)
+            rows.append({
+                "name": span.name,
+                "span_id": span.span_id,
+                "parent_span_id": span.parent_id,
+                "depth": depth,
+                "offset_ms": round((span.start_ns - self.root.start_ns) / 1e6, 2),
+                "duration_ms": duration,
+                "status": span.status if span.end_ns is not None else "running",
+                "error": span.error,
+                "thread": span.thread,
+                "attributes": dict(span.attributes),
+            })
+            if span is not self.root:
+                bucket = by_name.setdefault(span.name, {"count": 0, "total_ms": 0.0})
+                bucket["count"] += 1
+                bucket["total_ms"] = round(bucket["total_ms"] + duration, 2)
+
+        return {
+            **self.summary(),
+            "dropped_spans": dropped,
+            "by_name": dict(sorted(by_name.items(), key=lambda item: -item[1]["total_ms"])),
+            "spans": rows,
+        }
+
+    def format_waterfall(self, width: int = 40) -> str:
+        """
+        渲染文本瀑布图（调试用）
+
+        Args:
+            width: 时间轴字符宽度
+
+        Returns:
+            多行文本
+        """
+        data = self.waterfall()
+        total = max(data["duration_ms"], 1e-6)
+        lines = [f"{data['query_id']} ({data['duration_ms']:.1f}ms, {data['span_count']} spans)"]
+        for row in data["spans"]:
+            start = int(row["offset_ms"] / total * width)
+            length = max(1, int(row["duration_ms"] / total * width))
+            bar = " " * start + "█" * min(length, width - start)
+            label = "  " * row["depth"] + row["name"]
+            lines.append(f"{label:<36} |{bar:<{width}}| {row['duration_ms']:>9.1f}ms")
+        return "\n".join(lines)
+
+    def to_otel(self) -> Dict[str, Any]:
+        """
+        导出为 OpenTelemetry OTLP/JSON 格式（resourceSpans → scopeSpans → spans）
+
+        Returns:
+            可直接写入文件或发送给 OTLP/HTTP collector 的字典
+        """
+        with self._lock:
+            spans = list(self.spans)
+        otel_spans = []
+        for span in spans:
+            end_ns = span.end_ns if span.end_ns is not None else span.start_ns + int(span.duration_ms * 1_000_000)
+            item: Dict[str, Any] = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 2 if span.parent_id is None else 1,  # SERVER / INTERNAL
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(end_ns),
+                "attributes": [_otel_attribute(k, v) for k, v in span.attributes.items()],
+                "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 1},
+            }
+            if span.parent_id:
+                item["parentSpanId"] = span.parent_id
+            otel_spans.append(item)
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otel_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": otel_spans,
+                }],
+            }]
+        }
+
+
+def _otel_attribute(key: str, value: Any) -> Dict[str, Any]:
+    """转换为 OTLP/JSON 的 KeyValue"""
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)}
+    return {"key": key, "value": typed}
+
+
+class TraceStore:
+    """
+    最近查询的追踪记录（环形缓冲区，按 query_id 索引，线程安全）
+    """
+
+    def __init__(self, max_traces: int = 200, enabled: bool = True):
+        """
+        初始化追踪存储
+
+        Args:
+            max_traces: 最多保留的查询数，超出后淘汰最早的查询
+            enabled: 是否记录追踪
+        """
+        self.max_traces = max_traces
+        self.enabled = enabled
+        self._traces: "OrderedDict[str, QueryTrace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def configure(self, max_traces: Optional[int] = None, enabled: Optional[bool] = None) -> None:
+        """
+        调整配置（缩小容量时立即淘汰多余的查询）
+
+        Args:
+            max_traces: 最多保留的查询数
+            enabled: 是否记录追踪
+        """
+        with self._lock:
+            if max_traces is not None:
+                self.max_traces = max(1, max_traces)
+            if enabled is not None:
+                self.enabled = enabled
+            self._evict()
+
+    def add(self, trace: QueryTrace) -> None:
+        """保存查询追踪（同一 query_id 覆盖旧记录）"""
+        with self._lock:
+            self._traces.pop(trace.query_id, None)
+            self._traces[trace.query_id] = trace
+            self._evict()
+
+    def _evict(self) -> None:
+        while len(self._traces) > self.max_traces:
+            self._traces.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, query_id: str) -> Optional[QueryTrace]:
+        """按 query_id 获取追踪记录"""
+        with self._lock:
+            return self._traces.get(query_id)
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        最近查询的概要（新的在前）
+
+        Args:
+            limit: 返回数量
+
+        Returns:
+            概要列表
+        """
+        with self._lock:
+            traces = list(self._traces.values())[-limit:] if limit > 0 else []
+        return [trace.summary() for trace in reversed(traces)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_traces": self.max_traces,
+                "traces": len(self._traces),
+                "evicted": self.evicted,
+            }
+
+
+_store = TraceStore()
+
+
+def get_trace_store() -> TraceStore:
+    """获取进程内共享的追踪存储"""
+    return _store
+
+
+def current_trace() -> Optional[QueryTrace]:
+    """获取当前上下文中的查询追踪（不在查询内时返回 None）"""
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(query_id: str, **attributes: Any) -> Iterator[Optional[QueryTrace]]:
+    """
+    在查询执行期间记录追踪（创建根 span "query"，查询开始时即可通过 query_id 查看进行中的追踪）
+
+    Args:
+        query_id: 查询ID
+        **attributes: 根 span 的属性
+
+    Yields:
+        QueryTrace 实例（追踪关闭时为 None）
+    """
+    if not _store.enabled:
+        yield None
+        return
+
+    trace = QueryTrace(query_id, **attributes)
+    _store.add(trace)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.set_error(e)
+        raise
+    finally:
+        trace.root.end()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    记录一个计时 span（父 span 为当前上下文中的 span，异常时标记为失败并继续抛出）
+
+    Args:
+        name: span 名称（如 node.generate_sql、llm.sql_generation、db.query）
+        **attributes: span 属性（None 忽略）
+
+    Yields:
+        Span 实例；不在查询追踪范围内时为空 span
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    current = Span(name, trace.trace_id, parent.span_id if parent else trace.root.span_id, attributes)
+    trace.add(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(e)
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+
+
+def set_span_attributes(**attributes: Any) -> None:
+    """给当前 span 设置属性（不在追踪范围内时忽略）"""
+    current = _current_span.get()
+    if current is not None and _current_trace.get() is not None:
+        current.set_attributes(**attributes)
+
+
+def export_otel(trace: QueryTrace, export_dir: str) -> str:
+    """
+    将查询追踪以 OTLP/JSON 格式写入本地文件
+
+    Args:
+        trace: 查询追踪
+        export_dir: 导出目录
+
+    Returns:
+        文件路径
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in trace.query_id)
+    path = os.path.join(export_dir, f"{safe_id}.otel.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace.to_otel(), f, ensure_ascii=False, indent=2)
+    logger.info(f"Trace exported: {path}")
+    return path
+
+
+# 测试代码
+if __name__ == "__main__":
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    logging.basicConfig(level=logging.INFO)
+
+    with start_trace("demo_query", query="查询浙江省的5A景区") as trace:
+        with span("node.prepare_query", node="prepare_query", iteration=0):
+            def stage(name: str, seconds: float) -> None:
+                with span(f"node.{name}", node=name):
+                    time.sleep(seconds)
+
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                for f in [pool.submit(contextvars.copy_context().run, stage, "fetch_schema", 0.03),
+                          pool.submit(contextvars.copy_context().run, stage, "analyze_intent", 0.05)]:
+                    f.result()
+        with span("node.generate_sql", node="generate_sql", iteration=0):
+            with span("llm.sql_generation", call_site="sql_generation") as s:
+                time.sleep(0.08)
+                s.set_attributes(prompt_tokens=1800, completion_tokens=220)
+        with span("node.execute_sql", node="execute_sql", iteration=0):
+            with span("db.query") as s:
+                time.sleep(0.02)
+                s.set_attribute("rows", 19)
+
+    print(trace.format_waterfall())
+    print(json.dumps(trace.waterfall()["by_name"], ensure_ascii=False, indent=2))
+    print(export_otel(trace, tempfile.mkdtemp()))
+    print(json.dumps(get_trace_store().get_stats(), ensure_ascii=False))
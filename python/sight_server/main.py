@@ -4,6 +4,19 @@ Sight Server - FastAPI 主应用
 """
 
 from core.query_cache_manager import QueryCacheManager
+from core.cache_codec import CacheCodec
+from core.sql_result_cache import SqlResultCache
+from core.cache_warmup import CacheWarmer
+from core.negative_cache import NegativeResultCache, OUTCOME_NO_DATA
+from core.query_normalizer import QueryNormalizer
+from core.llm import (
+    get_response_cache, get_llm_gateway_stats, close_llm_gateways,
+    get_chat_history_store, close_chat_history_store,
+)
+from core.llm_usage import get_usage_aggregator
+from core.tracing import export_otel, get_trace_store
+from core.deadline import DEADLINE_EXCEEDED_STATUS, deadline_after
+from core.llm_profiles import parse_profile_bindings
 import logging
 import time
 from contextlib import asynccontextmanager
@@ -47,6 +60,9 @@ agent_initialized = False
 
 # ✅ 新增：全局查询缓存管理器
 query_cache_manager: Optional[QueryCacheManager] = None
+sql_result_cache: Optional[SqlResultCache] = None
+cache_warmer: Optional[CacheWarmer] = None
+negative_cache: Optional[NegativeResultCache] = None
 
 
 # ==================== 生命周期管理 ====================
@@ -66,12 +82,143 @@ async def lifespan(app: FastAPI):
 
     # 关闭时
     logger.info("🛑 Shutting down Sight Server...")
+    if cache_warmer is not None:
+        cache_warmer.stop()
     if sql_agent is not None:
         try:
             sql_agent.close()
             logger.info("✓ SQL Agent closed")
         except Exception as e:
             logger.error(f"Error closing SQL Agent: {e}")
+    if query_cache_manager is not None:
+        try:
+            query_cache_manager.close()
+            logger.info("✓ Query Cache Manager closed")
+        except Exception as e:
+            logger.error(f"Error closing Query Cache Manager: {e}")
+    try:
+        close_llm_gateways()
+        logger.info("✓ LLM gateways closed")
+    except Exception as e:
+        logger.error(f"Error closing LLM gateways: {e}")
+    try:
+        close_chat_history_store()
+    except Exception as e:
+        logger.error(f"Error flushing chat history store: {e}")
+
+
+def _request_deadline(start_time: float) -> Optional[float]:
+    """按 AGENT_MAX_EXECUTION_TIME 计算请求截止时间（从请求到达开始计时，缓存查找等耗时也计入）"""
+    return deadline_after(settings.AGENT_MAX_EXECUTION_TIME, start_time)
+
+
+def _query_status(status_value: str) -> QueryStatus:
+    """
+    Agent 状态 → 响应状态
+
+    deadline_exceeded 表示超时后返回的部分结果，按 success 返回（message 说明已超时）
+    """
+    if status_value == DEADLINE_EXCEEDED_STATUS:
+        return QueryStatus.SUCCESS
+    return QueryStatus(status_value)
+
+
+def _rerun_query_for_cache(query: str) -> Optional[dict]:
+    """
+    完整重跑 Agent 并构建缓存数据（后台刷新过期缓存时，SQL重放失败的兜底）
+
+    Args:
+        query: 查询文本
+
+    Returns:
+        与查询接口保存格式一致的缓存数据，失败返回 None
+    """
+    import json
+
+    if sql_agent is None:
+        return None
+    result_dict = json.loads(sql_agent.run(query))
+    if result_dict.get("status") != "success":
+        return None
+    return {
+        "status": result_dict.get("status"),
+        "answer": result_dict.get("answer", ""),
+        "data": result_dict.get("data"),
+        "count": result_dict.get("count", 0),
+        "message": result_dict.get("message", "查询成功"),
+        "sql": result_dict.get("sql"),
+        "intent_info": result_dict.get("intent_info"),
+    }
+
+
+def _run_cache_warmup(pin_top_n: Optional[int] = None, allow_rerun: bool = False) -> Optional[dict]:
+    """
+    执行缓存预热
+
+    Args:
+        pin_top_n: 固定的热门条目数量，默认使用 CACHE_PIN_TOP_N
+        allow_rerun: SQL重放不可用时是否完整重跑 Agent
+
+    Returns:
+        预热报告，预热器未初始化时返回 None
+    """
+    if cache_warmer is None:
+        return None
+    logger.info("Warming up query cache from query history...")
+    return cache_warmer.warm_up(
+        limit=settings.CACHE_WARMUP_LIMIT,
+        lookback_days=settings.CACHE_WARMUP_LOOKBACK_DAYS,
+        pin_top_n=settings.CACHE_PIN_TOP_N if pin_top_n is None else pin_top_n,
+        allow_rerun=allow_rerun,
+        time_budget=settings.CACHE_WARMUP_TIME_BUDGET
+    )
+
+
+def _serve_negative_cache(
+    query: str,
+    conversation_id: str,
+    include_sql: bool,
+    start_time: float,
+    force_refresh: bool
+) -> Optional[QueryResponse]:
+    """
+    查找失败结果缓存，命中时直接构建响应
+
+    Args:
+        query: 查询文本
+        conversation_id: 会话ID
+        include_sql: 是否返回SQL
+        start_time: 请求开始时间
+        force_refresh: 是否强制重新查询（跳过失败缓存）
+
+    Returns:
+        命中时返回响应，否则返回 None
+    """
+    if negative_cache is None:
+        return None
+    if force_refresh:
+        negative_cache.record_bypass()
+        return None
+
+    entry = negative_cache.get(query)
+    if entry is None:
+        return None
+
+    age = int(time.time() - entry["created_at"])
+    outcome_text = "未找到匹配结果" if entry["outcome"] == OUTCOME_NO_DATA else \
+        f"重试 {entry['retry_count']} 次后仍失败（{entry['error_type'] or '未知错误'}）"
+    logger.info(f"✓ Negative cache HIT ({entry['outcome']}): {query[:50]}...")
+    return QueryResponse(
+        status=QueryStatus(entry["status"]),
+        answer=entry["answer"],
+        data=None,
+        count=0,
+        message=f"{outcome_text}：{age} 秒前已查询过相同问题，可使用 force_refresh=true 重新查询",
+        sql=entry["sql"] if include_sql else None,
+        execution_time=round(time.time() - start_time, 3),
+        intent_info=entry["intent_info"],
+        conversation_id=conversation_id
+    )
 
 
 def initialize_agent() -> bool:
@@ -81,7 +228,7 @@ def initialize_agent() -> bool:
     Returns:
         bool: 初始化是否成功
     """
-    global sql_agent, agent_initialized, query_cache_manager
+    global sql_agent, agent_initialized, query_cache_manager, sql_result_cache, cache_warmer, negative_cache
 
     if agent_initialized and sql_agent is not None:
         logger.info("Agent already initialized")
@@ -95,20 +242,111 @@ def initialize_agent() -> bool:
             ttl=3600,  # 1小时
             max_size=1000,
             cache_strategy="hybrid",   # 混合策略：数据库 + 文件系统
-            database_connector=DatabaseConnector()
+            database_connector=DatabaseConnector(),
+            max_bytes=settings.CACHE_MAX_BYTES or None,
+            stale_while_revalidate=settings.CACHE_STALE_WHILE_REVALIDATE,
+            embedding_model=settings.CACHE_EMBEDDING_MODEL,
+            embedding_quantization=settings.CACHE_EMBEDDING_QUANTIZATION,
+            embedding_batch_size=settings.CACHE_EMBEDDING_BATCH_SIZE,
+            # ✅ 缓存键规范化流水线（精确键、相似度和语义索引共用）
+            query_normalizer=QueryNormalizer(
+                steps=[s.strip() for s in settings.CACHE_KEY_NORMALIZATION_STEPS.split(",") if s.strip()],
+                synonyms_file=settings.CACHE_KEY_SYNONYMS_FILE
+            ),
+            codec=CacheCodec(
+                compression=settings.CACHE_COMPRESSION,
+                compress_threshold=settings.CACHE_COMPRESS_THRESHOLD
+            )
         )
         logger.info("✓ Query Cache Manager initialized successfully")
 
+        # ✅ SQL指纹结果缓存，随查询缓存一起按数据表失效
+        if settings.SQL_RESULT_CACHE_ENABLED:
+            sql_result_cache = SqlResultCache(
+                ttl=settings.SQL_RESULT_CACHE_TTL,
+                max_entries=settings.SQL_RESULT_CACHE_MAX_ENTRIES
+            )
+            query_cache_manager.add_invalidation_listener(
+                sql_result_cache.invalidate_tables)
+
+        # ✅ 失败结果缓存：近期无数据/重试耗尽的相同问题直接返回，数据表变更时失效
+        if settings.NEGATIVE_CACHE_ENABLED:
+            negative_cache = NegativeResultCache(
+                no_data_ttl=settings.NEGATIVE_CACHE_NO_DATA_TTL,
+                failure_ttl=settings.NEGATIVE_CACHE_FAILURE_TTL,
+                normalizer=query_cache_manager.normalize_query
+            )
+            query_cache_manager.add_invalidation_listener(
+                negative_cache.invalidate_tables)
+
+        # ✅ 数据表变更时精确失效依赖的缓存条目
+        if settings.CACHE_INVALIDATION_MODE != "off":
+            query_cache_manager.start_table_change_monitor(
+                mode=settings.CACHE_INVALIDATION_MODE,
+                poll_interval=settings.CACHE_INVALIDATION_POLL_INTERVAL
+            )
+
         # ✅ 然后初始化 SQL Query Agent，传入统一的缓存管理器
         logger.info("Initializing SQL Query Agent...")
         sql_agent = SQLQueryAgent(
             enable_spatial=True,
             cache_manager=query_cache_manager,  # ✅ 传入统一的缓存管理器
-            enable_cache=True  # ✅ 确保启用缓存
+            enable_cache=True,  # ✅ 确保启用缓存
+            sql_result_cache=sql_result_cache,
+            enable_sql_result_cache=settings.SQL_RESULT_CACHE_ENABLED,
+            # ✅ 关键词规则置信度足够时跳过意图分析LLM调用
+            intent_rule_threshold=(
+                settings.INTENT_RULE_CONFIDENCE_THRESHOLD
+                if settings.INTENT_RULE_FIRST_ENABLED else None),
+            intent_min_query_chars=settings.INTENT_RULE_MIN_QUERY_CHARS,
+            # ✅ 意图判断不确定时与SQL生成合并为一次LLM调用
+            fused_intent_sql=settings.INTENT_SQL_FUSED_ENABLED,
+            # ✅ 单个查询的最大执行时间（HTTP 接口从请求到达开始计时）
+            max_execution_time=settings.AGENT_MAX_EXECUTION_TIME,
+            # ✅ SQL生成/修复prompt只携带与查询相关的表和字段
+            schema_token_budget=(
+                settings.SCHEMA_PRUNING_TOKEN_BUDGET
+                if settings.SCHEMA_PRUNING_ENABLED else None),
+            schema_core_tables=[
+                t.strip() for t in settings.SCHEMA_PRUNING_CORE_TABLES.split(",") if t.strip()],
+            schema_embedding_service=(
+                (lambda: query_cache_manager.embedding_service)
+                if settings.SCHEMA_PRUNING_USE_EMBEDDINGS else None),
+            llm_token_budget=settings.QUERY_LLM_TOKEN_BUDGET,
+            llm_time_budget_ms=settings.QUERY_LLM_TIME_BUDGET_MS,
+            answer_template_max_items=(
+                settings.ANSWER_TEMPLATE_MAX_LIST_ITEMS
+                if settings.ANSWER_TEMPLATE_ENABLED else None),
+            validation_score_band=(
+                (settings.VALIDATION_HEURISTIC_FAIL_SCORE, settings.VALIDATION_HEURISTIC_PASS_SCORE)
+                if settings.VALIDATION_HEURISTIC_ENABLED else None),
+            # ✅ 按组件路由模型：意图/验证等简单任务可绑定到小而快的模型
+            llm_profiles=settings.LLM_PROFILES,
+            llm_profile_bindings=parse_profile_bindings(settings.LLM_PROFILE_BINDINGS)
         )
         agent_initialized = True
         logger.info("✓ SQL Query Agent initialized successfully")
 
+        # ✅ 后台重放SQL刷新缓存（失败时完整重跑Agent）：固定条目始终需要刷新，
+        # CACHE_STALE_WHILE_REVALIDATE > 0 时过期条目还会先返回旧结果
+        query_cache_manager.enable_background_refresh(
+            replay_fn=sql_agent.replay_sql,
+            rerun_fn=_rerun_query_for_cache
+        )
+
+        # ✅ 根据历史热门查询预热缓存（同步执行，完成后服务才就绪），并固定前 N 个条目
+        cache_warmer = CacheWarmer(
+            cache_manager=query_cache_manager,
+            database_connector=sql_agent.db_connector,
+            replay_fn=sql_agent.replay_sql,
+            rerun_fn=_rerun_query_for_cache
+        )
+        if settings.CACHE_WARMUP_ENABLED and settings.CACHE_WARMUP_LIMIT > 0:
+            _run_cache_warmup()
+        if settings.CACHE_PIN_TOP_N > 0:
+            cache_warmer.start_pinned_refresh(
+                interval=settings.CACHE_PINNED_REFRESH_INTERVAL)
+
         return True
 
     except Exception as e:
@@ -225,7 +463,8 @@ async def query_get(
     limit: Optional[int] = Query(None, description="结果数量限制", ge=1, le=100),
     include_sql: bool = Query(True, description="是否返回 SQL 语句"),  # ✅ 改为默认True
     conversation_id: Optional[str] = Query(None, description="会话ID，用于多轮对话上下文跟踪。如果不提供，将自动生成新的会话ID", examples=[
-                                           "session-12345678-1234-1234-1234-123456789abc"])
+                                           "session-12345678-1234-1234-1234-123456789abc"]),
+    force_refresh: bool = Query(False, description="跳过缓存（包括失败结果缓存）强制重新查询")
 ):
     """
     自然语言查询端点 (GET 方法)
@@ -245,6 +484,7 @@ async def query_get(
     - GET /query?q=查询浙江省的5A景区
     - GET /query?q=查找距离杭州10公里内的景区&limit=20
     - GET /query?q=统计浙江省有多少个4A景区&include_sql=true
+    - GET /query?q=查询浙江省的5A景区&force_refresh=true
     """
     # 检查 Agent 是否初始化
     if not agent_initialized or sql_agent is None:
@@ -273,9 +513,9 @@ async def query_get(
 
             # 首先尝试精确匹配
             cache_key = query_cache_manager.get_cache_key(q, cache_context)
-            cached_result = query_cache_manager.get_query_cache(cache_key)
+            cached_result = None if force_refresh else query_cache_manager.get_query_cache(cache_key)
 
-            if not cached_result:
+            if not cached_result and not force_refresh:
                 # 精确匹配未命中，尝试语义搜索回退
                 logger.info('精确匹配未命中，尝试语义搜索回退')
                 cached_result = query_cache_manager.get_with_semantic_fallback(
@@ -340,10 +580,17 @@ async def query_get(
                     )
                     return cached_response
 
-        # ✅ 2. 缓存未命中，执行 Agent 查询
+        # ✅ 2. 近期无数据/失败的相同问题直接返回
+        negative_response = _serve_negative_cache(
+            q, actual_conversation_id, include_sql, start_time, force_refresh)
+        if negative_response:
+            return negative_response
+
+        # ✅ 3. 缓存未命中，执行 Agent 查询
         logger.info(f"✗ Cache MISS: {q[:50]}... Executing Agent...")
         # ✅ 传递会话ID给Agent
-        result_json = sql_agent.run(q, conversation_id=actual_conversation_id)
+        result_json = sql_agent.run(
+            q, conversation_id=actual_conversation_id, deadline=_request_deadline(start_time))
         # if result_json["__interrupt__"] is not None:
         #     interrupt_info= result_json["__interrupt__"]
         #     execution_time = time.time() - start_time
@@ -402,7 +649,7 @@ async def query_get(
 
         # 构建正常响应
         response = QueryResponse(
-            status=QueryStatus(result_dict.get("status", "success")),
+            status=_query_status(result_dict.get("status", "success")),
             answer=result_dict.get("answer", ""),
             data=result_dict.get("data"),
             count=result_dict.get("count", 0),
@@ -413,8 +660,11 @@ async def query_get(
             conversation_id=actual_conversation_id  # ✅ 返回会话ID
         )
 
-        # ✅ 3. 保存缓存（包含完整的 QueryResponse）
-        if query_cache_manager and result_dict.get("status") == "success":
+        # ✅ 4. 保存缓存（包含完整的 QueryResponse；无数据结果只进入短期的失败结果缓存）
+        if negative_cache:
+            negative_cache.record(q, result_dict, execution_time * 1000)
+        if query_cache_manager and result_dict.get("status") == "success" \
+                and (negative_cache is None or result_dict.get("count")):
             cache_context["query_intent"] = result_dict.get(
                 "intent_info", {}).get("intent_type", "query")
 
@@ -425,7 +675,7 @@ async def query_get(
                 "data": response.data,
                 "count": response.count,
                 "message": response.message,
-                "sql": response.sql,
+                "sql": result_dict.get("sql"),  # 始终保存SQL用于提取依赖表，返回时再按 include_sql 过滤
                 "intent_info": response.intent_info,
                 "conversation_id": actual_conversation_id  # ✅ 保存会话ID到缓存
             }
@@ -433,7 +683,7 @@ async def query_get(
             cache_key = query_cache_manager.get_cache_key(q, cache_context)
             if query_cache_manager.save_query_cache(q, cache_data, execution_time, context=cache_context):
                 logger.info(f"✓ Cache SAVED: {q[:50]}...")
-        # ✅ 4. 保存会话历史记录
+        # ✅ 5. 保存会话历史记录
         if sql_agent and sql_agent.db_connector and result_dict.get("status") == "success":
             try:
                 # 保存到 conversation_history 表
@@ -491,7 +741,10 @@ async def query_get(
 
 
 @app.post("/query", response_model=QueryResponse, summary="自然语言查询 (POST)")
-async def query_post(request: QueryRequest):
+async def query_post(
+    request: QueryRequest,
+    force_refresh: bool = Query(False, description="跳过缓存（包括失败结果缓存）强制重新查询")
+):
     """
     自然语言查询端点 (POST 方法)
 
@@ -540,7 +793,7 @@ async def query_post(request: QueryRequest):
             # 生成缓存键并获取缓存
             cache_key = query_cache_manager.get_cache_key(
                 request.query, cache_context)
-            cached_result = query_cache_manager.get_query_cache(cache_key)
+            cached_result = None if force_refresh else query_cache_manager.get_query_cache(cache_key)
 
             if cached_result:
                 # 缓存命中，直接构建响应
@@ -586,12 +839,18 @@ async def query_post(request: QueryRequest):
                 )
                 return cached_response
 
-        # ✅ 2. 缓存未命中，执行 Agent 查询
+        # ✅ 2. 近期无数据/失败的相同问题直接返回
+        negative_response = _serve_negative_cache(
+            request.query, actual_conversation_id, request.include_sql, start_time, force_refresh)
+        if negative_response:
+            return negative_response
+
+        # ✅ 3. 缓存未命中，执行 Agent 查询
         logger.info(
             f"✗ Cache MISS: {request.query[:50]}... Executing Agent...")
         # ✅ 传递会话ID给Agent
         result_json = sql_agent.run(
-            request.query, conversation_id=actual_conversation_id)
+            request.query, conversation_id=actual_conversation_id, deadline=_request_deadline(start_time))
 
         # 解析结果
         import json
@@ -621,7 +880,7 @@ async def query_post(request: QueryRequest):
 
         # 构建正常响应
         response = QueryResponse(
-            status=QueryStatus(result_dict.get("status", "success")),
+            status=_query_status(result_dict.get("status", "success")),
             answer=result_dict.get("answer", ""),
             data=result_dict.get("data"),
             count=result_dict.get("count", 0),
@@ -632,8 +891,11 @@ async def query_post(request: QueryRequest):
             conversation_id=actual_conversation_id  # ✅ 返回会话ID
         )
 
-        # ✅ 3. 保存缓存（包含完整的 QueryResponse）
-        if query_cache_manager and result_dict.get("status") == "success":
+        # ✅ 4. 保存缓存（包含完整的 QueryResponse；无数据结果只进入短期的失败结果缓存）
+        if negative_cache:
+            negative_cache.record(request.query, result_dict, execution_time * 1000)
+        if query_cache_manager and result_dict.get("status") == "success" \
+                and (negative_cache is None or result_dict.get("count")):
             cache_context["query_intent"] = result_dict.get(
                 "intent_info", {}).get("intent_type", "query")
 
@@ -644,7 +906,7 @@ async def query_post(request: QueryRequest):
                 "data": response.data,
                 "count": response.count,
                 "message": response.message,
-                "sql": response.sql,
+                "sql": result_dict.get("sql"),  # 始终保存SQL用于提取依赖表，返回时再按 include_sql 过滤
                 "intent_info": response.intent_info,
                 "conversation_id": actual_conversation_id  # ✅ 保存会话ID到缓存
             }
@@ -654,7 +916,7 @@ async def query_post(request: QueryRequest):
             if query_cache_manager.save_query_cache(request.query, cache_data, execution_time, context=cache_context):
                 logger.info(f"✓ Cache SAVED: {request.query[:50]}...")
 
-        # ✅ 4. 保存会话历史记录
+        # ✅ 5. 保存会话历史记录
         if sql_agent and sql_agent.db_connector and result_dict.get("status") == "success":
             try:
                 # 保存到 conversation_history 表
@@ -751,7 +1013,7 @@ async def query_geojson(request: GeoJSONRequest):
 
         # ✅ 传递会话ID给Agent
         result_json = sql_agent.run(
-            request.query, conversation_id=actual_conversation_id)
+            request.query, conversation_id=actual_conversation_id, deadline=_request_deadline(start_time))
 
         # 解析结果
         import json
@@ -877,14 +1139,14 @@ async def query_thought_chain(request: ThoughtChainRequest):
 
         # ✅ 传递会话ID给Agent
         result = sql_agent.run_with_thought_chain(
-            request.query, conversation_id=actual_conversation_id)
+            request.query, conversation_id=actual_conversation_id, deadline=_request_deadline(start_time))
 
         # 计算执行时间
         execution_time = time.time() - start_time
 
         # 检查结果状态
         query_status = QueryStatus.SUCCESS if result.get(
-            "status") == "success" else QueryStatus.ERROR
+            "status") in ("success", DEADLINE_EXCEEDED_STATUS) else QueryStatus.ERROR
 
         # 构建响应
         response = ThoughtChainResponse(
@@ -995,6 +1257,16 @@ async def get_cache_stats():
 
         stats["semantic_search_enabled"] = query_cache_manager.enable_semantic_search
         stats["cache_strategy"] = query_cache_manager.cache_strategy
+        if sql_result_cache:
+            stats["sql_result_cache"] = sql_result_cache.get_stats()
+        if negative_cache:
+            stats["negative_cache"] = negative_cache.get_stats()
+        llm_cache = get_response_cache()
+        if llm_cache:
+            stats["llm_response_cache"] = llm_cache.get_stats()
+        if cache_warmer:
+            stats["warmup"] = cache_warmer.get_stats()
+            stats["pinned_queries"] = query_cache_manager.get_pinned_queries()
 
         return {
             "status": "success",
@@ -1024,6 +1296,13 @@ async def clear_cache():
 
     try:
         cleared_count = query_cache_manager.clear_all()
+        if sql_result_cache:
+            sql_result_cache.clear()
+        if negative_cache:
+            negative_cache.clear()
+        llm_cache = get_response_cache()
+        if llm_cache:
+            llm_cache.clear()
 
         return {
             "status": "success",
@@ -1039,6 +1318,197 @@ async def clear_cache():
         )
 
 
+@app.post("/cache/invalidate", summary="按数据表失效缓存")
+async def invalidate_cache(tables: list[str] = Query(..., description="发生变更的表名")):
+    """
+    失效依赖指定数据表的查询缓存
+
+    供外部系统（如 Java 后端）在更新数据后主动调用，只清除受影响的缓存条目
+    """
+    if not query_cache_manager:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="查询缓存管理器未初始化"
+        )
+
+    try:
+        invalidated_count = query_cache_manager.invalidate_tables(tables)
+
+        return {
+            "status": "success",
+            "message": f"成功失效 {invalidated_count} 个缓存条目",
+            "invalidated_count": invalidated_count,
+            "tables": tables
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to invalidate cache: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"失效缓存失败: {str(e)}"
+        )
+
+
+@app.post("/cache/warmup", summary="预热缓存")
+async def warmup_cache(
+    pin_top_n: Optional[int] = Query(None, ge=0, description="固定的热门条目数量，默认使用配置值"),
+    allow_rerun: bool = Query(False, description="SQL重放不可用时是否完整重跑 Agent（会调用LLM）")
+):
+    """
+    根据历史热门查询重新预热缓存
+
+    返回预热耗时、覆盖率和各来源的条目数
+    """
+    if not query_cache_manager or not cache_warmer:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="查询缓存管理器未初始化"
+        )
+
+    try:
+        report = _run_cache_warmup(pin_top_n=pin_top_n, allow_rerun=allow_rerun)
+
+        return {
+            "status": "success",
+            "message": f"成功预热 {report['warmed']} 个缓存条目",
+            "report": report
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to warm up cache: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"预热缓存失败: {str(e)}"
+        )
+
+
+@app.post("/cache/pin", summary="固定查询缓存")
+async def pin_cache(query: str = Query(..., description="要固定的查询文本")):
+    """
+    固定查询缓存条目：不会被淘汰或过期，由后台定期重放SQL刷新
+    """
+    if not query_cache_manager:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="查询缓存管理器未初始化"
+        )
+
+    if not query_cache_manager.pin(query):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="查询缓存不存在，无法固定"
+        )
+    return {"status": "success", "message": "已固定查询缓存", "query": query}
+
+
+@app.delete("/cache/pin", summary="取消固定查询缓存")
+async def unpin_cache(query: str = Query(..., description="要取消固定的查询文本")):
+    """
+    取消固定查询缓存条目，恢复正常的 TTL 和 LRU 淘汰
+    """
+    if not query_cache_manager:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="查询缓存管理器未初始化"
+        )
+
+    if not query_cache_manager.unpin(query):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="查询缓存未固定"
+        )
+    return {"status": "success", "message": "已取消固定查询缓存", "query": query}
+
+
+@app.get("/agent/stats", summary="获取Agent运行统计")
+async def get_agent_stats():
+    """
+    获取Agent运行统计
+
+    返回分级意图引擎的规则命中率、LLM调用次数、估计节省的延迟，
+    schema裁剪前后的平均token数，
+    以及LLM网关各调用点的延迟分位数、重试与对冲次数等
+    """
+    if not sql_agent:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Agent未初始化"
+        )
+
+    stats = {}
+    if sql_agent.intent_engine:
+        stats["intent_engine"] = sql_agent.intent_engine.get_stats()
+    if sql_agent.schema_selector:
+        stats["schema_selector"] = sql_agent.schema_selector.get_stats()
+    if sql_agent.answer_router:
+        stats["answer_router"] = sql_agent.answer_router.get_stats()
+    if sql_agent.heuristic_validator:
+        stats["heuristic_validator"] = sql_agent.heuristic_validator.get_stats()
+    stats["llm_gateway"] = get_llm_gateway_stats()
+    stats["chat_history"] = get_chat_history_store().get_stats()
+    stats["llm_usage"] = get_usage_aggregator().get_stats()
+    stats["llm_profiles"] = sql_agent.llm_profiles.get_stats()
+    stats["tracing"] = get_trace_store().get_stats()
+
+    return {
+        "status": "success",
+        "agent_stats": stats
+    }
+
+
+@app.get("/debug/traces", summary="最近查询的链路追踪列表")
+async def list_traces(limit: int = Query(20, ge=1, le=200, description="返回数量")):
+    """
+    最近查询的链路追踪概要（新的在前），用于查找 query_id
+
+    query_id 也会在查询结果的 llm_usage.query_id 中返回
+    """
+    store = get_trace_store()
+    return {
+        "status": "success",
+        "tracing": store.get_stats(),
+        "traces": store.recent(limit)
+    }
+
+
+@app.get("/debug/trace/{query_id}", summary="查询链路追踪（瀑布图）")
+async def get_trace(
+    query_id: str,
+    format: str = Query("waterfall", pattern="^(waterfall|otel)$", description="waterfall: 瀑布图；otel: OpenTelemetry OTLP/JSON"),
+    export: bool = Query(False, description="是否同时以 OTLP/JSON 格式导出到本地文件（TRACE_EXPORT_DIR）")
+):
+    """
+    获取单个查询的链路追踪
+
+    **返回：**
+    - waterfall: 按开始时间排序的 span（节点、LLM 调用、数据库查询），
+      含相对查询开始的偏移、耗时、嵌套层级和属性（node、iteration、tokens、rows 等）
+    - otel: OpenTelemetry OTLP/JSON（resourceSpans），可导入 Jaeger / Tempo 等工具
+    - export=true 时返回导出文件路径
+    """
+    trace = get_trace_store().get(query_id)
+    if trace is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"未找到查询追踪: {query_id}（可能已被淘汰或未启用追踪）"
+        )
+
+    response = {
+        "status": "success",
+        "trace": trace.to_otel() if format == "otel" else trace.waterfall()
+    }
+    if export:
+        try:
+            response["export_path"] = export_otel(trace, settings.TRACE_EXPORT_DIR)
+        except OSError as e:
+            logger.error(f"Trace export failed: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"追踪导出失败: {str(e)}"
+            )
+    return response
+
+
 @app.post("/query/resume", response_model=ResumeQueryResponse, summary="继续被中断的查询")
 async def resume_query(request: ResumeQueryRequest):
     """
@@ -1074,7 +1544,8 @@ async def resume_query(request: ResumeQueryRequest):
         # ✅ 使用澄清后的查询继续执行
         result_json = sql_agent.run(
             request.clarified_query,
-            conversation_id=request.conversation_id
+            conversation_id=request.conversation_id,
+            deadline=_request_deadline(start_time)
         )
 
         # 解析结果
@@ -1086,7 +1557,7 @@ async def resume_query(request: ResumeQueryRequest):
 
         # 构建响应
         response = ResumeQueryResponse(
-            status=QueryStatus(result_dict.get("status", QueryStatus.SUCCESS)),
+            status=_query_status(result_dict.get("status", "success")),
             answer=result_dict.get("answer", ""),
             data=result_dict.get("data"),
             count=result_dict.get("count", 0),